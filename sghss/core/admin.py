@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Usuario, Paciente, Administrador, ProfissionalSaude, Consulta, LogAcao
+from .models import Usuario, Paciente, Administrador, ProfissionalSaude, HorarioAtendimento, Consulta, LogAcao
 
 
 @admin.register(Usuario)
@@ -21,21 +21,30 @@ class AdministradorAdmin(admin.ModelAdmin):
     search_fields = ("nome_completo", "usuario__email")
 
 
+class HorarioAtendimentoInline(admin.TabularInline):
+    model = HorarioAtendimento
+    extra = 0
+
+
 @admin.register(ProfissionalSaude)
 class ProfissionalSaudeAdmin(admin.ModelAdmin):
     list_display = ("id", "nome_completo", "especialidade", "registro_profissional", "usuario")
     search_fields = ("nome_completo", "especialidade", "registro_profissional", "usuario__email")
+    inlines = [HorarioAtendimentoInline]
 
 
 @admin.register(Consulta)
 class ConsultaAdmin(admin.ModelAdmin):
     list_display = ("id", "paciente", "profissional", "tipo_atendimento", "data_horario", "status")
+    list_select_related = ("paciente", "profissional")
     list_filter = ("tipo_atendimento", "status")
     search_fields = ("paciente__nome_completo", "profissional__nome_completo")
 
 
 @admin.register(LogAcao)
 class LogAcaoAdmin(admin.ModelAdmin):
-    list_display = ("id", "data_hora", "usuario", "acao", "ip")
-    list_filter = ("acao",)
+    list_display = ("id", "data_hora", "usuario", "acao", "entidade", "entidade_id", "ip")
+    # "usuario" pode ser nulo, e o select_related() automático do admin só segue FKs obrigatórias.
+    list_select_related = ("usuario",)
+    list_filter = ("acao", "entidade")
     search_fields = ("acao", "usuario__email", "detalhes")
@@ -0,0 +1,118 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Consulta, ProfissionalSaude
+
+# Limite do intervalo aceito em /horarios-livres/, para manter a resposta pequena.
+INTERVALO_MAXIMO_DIAS = 62
+
+
+def duracao_consulta(profissional):
+    return timedelta(minutes=profissional.duracao_consulta_minutos)
+
+
+def janelas_de_atendimento(horarios, inicio, fim):
+    """
+    Converte as janelas semanais (dia_semana, hora_inicio, hora_fim) em
+    intervalos concretos, no fuso local, entre as datas de inicio e fim.
+    """
+    por_dia = {}
+    for dia_semana, hora_inicio, hora_fim in horarios:
+        por_dia.setdefault(dia_semana, []).append((hora_inicio, hora_fim))
+
+    dia = timezone.localtime(inicio).date()
+    ultimo_dia = timezone.localtime(fim).date()
+    while dia <= ultimo_dia:
+        for hora_inicio, hora_fim in sorted(por_dia.get(dia.weekday(), [])):
+            yield (
+                timezone.make_aware(datetime.combine(dia, hora_inicio)),
+                timezone.make_aware(datetime.combine(dia, hora_fim)),
+            )
+        dia += timedelta(days=1)
+
+
+def conflita(ocupados, data_horario, duracao):
+    """
+    Indica se uma consulta iniciando em data_horario se sobrepõe a alguma das
+    consultas em "ocupados" (lista ordenada de inícios, todas com a mesma
+    duração). Busca binária: O(log n).
+    """
+    i = bisect_right(ocupados, data_horario - duracao)
+    return i < len(ocupados) and ocupados[i] < data_horario + duracao
+
+
+def calcular_horarios_livres(horarios, ocupados, inicio, fim, duracao):
+    """
+    Gera os inícios de horários livres entre inicio e fim, percorrendo cada
+    janela de atendimento em passos de "duracao" e descartando os que se
+    sobrepõem a consultas já agendadas.
+    """
+    livres = []
+    for janela_inicio, janela_fim in janelas_de_atendimento(horarios, inicio, fim):
+        horario = janela_inicio
+        while horario + duracao <= janela_fim:
+            if horario >= inicio and horario + duracao <= fim and not conflita(ocupados, horario, duracao):
+                livres.append(horario)
+            horario += duracao
+    return livres
+
+
+def consultas_agendadas(profissional, inicio, fim):
+    """
+    Inícios das consultas ainda agendadas que podem ocupar algum horário entre
+    inicio e fim. Consulta por faixa no índice parcial (profissional, data_horario).
+    """
+    return list(
+        Consulta.objects.filter(
+            profissional=profissional,
+            status=Consulta.STATUS_AGENDADA,
+            data_horario__gt=inicio - duracao_consulta(profissional),
+            data_horario__lt=fim,
+        )
+        .order_by("data_horario")
+        .values_list("data_horario", flat=True)
+    )
+
+
+def horarios_livres(profissional, inicio, fim):
+    horarios = profissional.horarios_atendimento.values_list("dia_semana", "hora_inicio", "hora_fim")
+    inicio = max(inicio, timezone.now())
+    return calcular_horarios_livres(
+        list(horarios), consultas_agendadas(profissional, inicio, fim), inicio, fim, duracao_consulta(profissional)
+    )
+
+
+def verificar_disponibilidade(profissional, data_horario, ignorar_consulta_id=None):
+    """
+    Valida um agendamento para o profissional. Deve ser chamada dentro de uma
+    transação. No SQLite o select_for_update é ignorado: quem serializa os
+    agendamentos concorrentes é o BEGIN IMMEDIATE do perfil "producao"
+    (settings), que toma o bloqueio de escrita antes desta verificação. Em
+    bancos com SELECT ... FOR UPDATE, a linha do profissional é bloqueada e a
+    serialização fica restrita ao mesmo profissional.
+    """
+    profissional = ProfissionalSaude.objects.select_for_update().get(pk=profissional.pk)
+    duracao = duracao_consulta(profissional)
+
+    horarios = list(profissional.horarios_atendimento.values_list("dia_semana", "hora_inicio", "hora_fim"))
+    if horarios:
+        dentro_do_expediente = any(
+            janela_inicio <= data_horario and data_horario + duracao <= janela_fim
+            for janela_inicio, janela_fim in janelas_de_atendimento(horarios, data_horario, data_horario)
+        )
+        if not dentro_do_expediente:
+            raise ValidationError({"detalhe": "Horário fora do expediente do profissional."})
+
+    conflitos = Consulta.objects.filter(
+        profissional=profissional,
+        status=Consulta.STATUS_AGENDADA,
+        data_horario__gt=data_horario - duracao,
+        data_horario__lt=data_horario + duracao,
+    )
+    if ignorar_consulta_id is not None:
+        conflitos = conflitos.exclude(pk=ignorar_consulta_id)
+    if conflitos.exists():
+        raise ValidationError({"detalhe": "O profissional já possui consulta agendada neste horário."})
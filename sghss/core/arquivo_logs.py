@@ -0,0 +1,581 @@
+"""
+Retenção dos logs de auditoria (LogAcao) em arquivos mensais compactados.
+
+"python manage.py arquivar_logs" move os logs mais antigos que RETENCAO_DIAS
+para DIRETORIO e os apaga do banco. Cada mês (data local) tem dois arquivos,
+ambos só recebem acréscimos:
+
+* logs-AAAA-MM.jsonl.gz: um membro gzip por lote arquivado, com um log JSON
+  por linha. O arquivo inteiro é um gzip válido (membros concatenados);
+* logs-AAAA-MM.indice.jsonl: uma linha por membro com posição e tamanho no
+  .gz, primeira/última data_hora, faixas de ids, usuários, ações e logins por
+  dia; depois que as linhas saem do banco, uma linha {"confirmado": n}.
+
+Cada lote segue a ordem: grava e sincroniza (fsync) o membro, grava e
+sincroniza a linha do índice, apaga as linhas do banco, confirma. Se o
+processo cair no meio, a próxima execução desfaz o membro sem índice
+(trunca o .gz) e termina a exclusão dos lotes não confirmados; nenhuma linha
+é perdida ou arquivada duas vezes. Os ids não são reaproveitados (o SQLite
+usa AUTOINCREMENT nas chaves do Django), então um id identifica o log tanto
+no banco quanto no arquivo.
+
+/api/logs/ (PaginacaoComArquivo) completa as páginas com os logs arquivados
+que atendem aos filtros; o índice evita abrir membros fora do período, do
+usuário ou da ação pedidos. As exportações de logs (core/exportacao.py) leem
+o arquivo e depois o banco sob uma trava compartilhada (travar_leitura), que
+impede um arquivamento de mover linhas entre as duas leituras.
+"""
+import gzip
+import json
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import reduce
+from operator import or_
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Usuario, LogAcao
+from .paginacao import PaginacaoCursor
+
+CONFIGURACAO_PADRAO = {
+    "RETENCAO_DIAS": 365,
+    "DIRETORIO": "arquivo_logs",
+    "TAMANHO_LOTE": 5000,
+}
+
+CAMPOS = ("id", "usuario_id", "acao", "entidade", "entidade_id", "detalhes", "data_hora", "ip")
+ORDENACAO = ("-data_hora", "-id")
+# Faixas de ids por DELETE (2 parâmetros cada).
+FAIXAS_POR_INSTRUCAO = 400
+
+
+def configuracao_arquivo_logs():
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    configuracao.update(getattr(settings, "SGHSS_ARQUIVO_LOGS", {}))
+    return configuracao
+
+
+def diretorio_arquivo():
+    return Path(configuracao_arquivo_logs()["DIRETORIO"])
+
+
+class ArquivamentoEmAndamento(Exception):
+    pass
+
+
+class ArquivoCorrompido(Exception):
+    pass
+
+
+def _faixas(ids):
+    """
+    Ids em ordem crescente como faixas [inicio, fim] de ids consecutivos.
+    """
+    faixas = []
+    for valor in ids:
+        if faixas and faixas[-1][1] == valor - 1:
+            faixas[-1][1] = valor
+        else:
+            faixas.append([valor, valor])
+    return faixas
+
+
+def _sincronizar(arquivo):
+    arquivo.flush()
+    os.fsync(arquivo.fileno())
+
+
+class Segmento:
+    """
+    Um mês do arquivo: o .jsonl.gz com os logs e o índice dos seus membros.
+    """
+
+    def __init__(self, diretorio, mes):
+        self.mes = mes
+        self.dados = diretorio / f"logs-{mes}.jsonl.gz"
+        self.indice = diretorio / f"logs-{mes}.indice.jsonl"
+
+    def ler_indice(self):
+        """
+        (entradas, confirmados, bytes válidos do índice). Uma última linha
+        incompleta (queda durante a gravação) é ignorada.
+        """
+        entradas, confirmados, validos = [], set(), 0
+        if not self.indice.exists():
+            return entradas, confirmados, validos
+        with open(self.indice, "rb") as arquivo:
+            for linha in arquivo:
+                if not linha.endswith(b"\n"):
+                    break
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    break
+                validos += len(linha)
+                if "confirmado" in registro:
+                    confirmados.add(registro["confirmado"])
+                else:
+                    entradas.append(registro)
+        return entradas, confirmados, validos
+
+    def recuperar(self):
+        """
+        Desfaz o que uma execução interrompida deixou pela metade: linha de
+        índice incompleta e membro gravado sem entrada no índice. Devolve as
+        entradas ainda não confirmadas.
+        """
+        entradas, confirmados, validos = self.ler_indice()
+        if self.indice.exists() and self.indice.stat().st_size > validos:
+            with open(self.indice, "r+b") as arquivo:
+                arquivo.truncate(validos)
+                _sincronizar(arquivo)
+
+        fim = max((entrada["inicio"] + entrada["tamanho"] for entrada in entradas), default=0)
+        tamanho = self.dados.stat().st_size if self.dados.exists() else 0
+        if tamanho < fim:
+            raise ArquivoCorrompido(f"{self.dados} tem {tamanho} bytes; o índice espera {fim}.")
+        if tamanho > fim:
+            with open(self.dados, "r+b") as arquivo:
+                arquivo.truncate(fim)
+                _sincronizar(arquivo)
+        return [entrada for entrada in entradas if entrada["bloco"] not in confirmados]
+
+    def anexar(self, logs):
+        """
+        Grava os logs (dicts com CAMPOS, em ordem de id) como um novo membro e
+        registra o membro no índice. Devolve a entrada do índice.
+        """
+        entradas, _, _ = self.ler_indice()
+        linhas = "".join(json.dumps(_para_json(log), separators=(",", ":")) + "\n" for log in logs)
+        membro = gzip.compress(linhas.encode("utf-8"), compresslevel=6, mtime=0)
+
+        with open(self.dados, "ab") as arquivo:
+            inicio = arquivo.tell()
+            arquivo.write(membro)
+            _sincronizar(arquivo)
+
+        datas = [log["data_hora"] for log in logs]
+        logins = Counter(
+            timezone.localdate(log["data_hora"]).isoformat() for log in logs if log["acao"] == LogAcao.ACAO_LOGIN
+        )
+        entrada = {
+            "bloco": max((entrada["bloco"] for entrada in entradas), default=0) + 1,
+            "inicio": inicio,
+            "tamanho": len(membro),
+            "linhas": len(logs),
+            "primeira_data": min(datas).isoformat(),
+            "ultima_data": max(datas).isoformat(),
+            "ids": _faixas([log["id"] for log in logs]),
+            "usuarios": sorted({log["usuario_id"] for log in logs if log["usuario_id"] is not None}),
+            "acoes": sorted({log["acao"] for log in logs}),
+            "logins_por_dia": dict(sorted(logins.items())),
+        }
+        self._acrescentar_ao_indice(entrada)
+        return entrada
+
+    def confirmar(self, entrada):
+        self._acrescentar_ao_indice({"confirmado": entrada["bloco"]})
+
+    def _acrescentar_ao_indice(self, registro):
+        with open(self.indice, "ab") as arquivo:
+            arquivo.write(json.dumps(registro, separators=(",", ":")).encode("utf-8") + b"\n")
+            _sincronizar(arquivo)
+
+    def ler_membro(self, entrada):
+        with open(self.dados, "rb") as arquivo:
+            arquivo.seek(entrada["inicio"])
+            conteudo = gzip.decompress(arquivo.read(entrada["tamanho"]))
+        return [_de_json(json.loads(linha)) for linha in conteudo.splitlines()]
+
+
+def _para_json(log):
+    registro = dict(log)
+    registro["data_hora"] = log["data_hora"].isoformat()
+    return registro
+
+
+def _de_json(registro):
+    registro["data_hora"] = datetime.fromisoformat(registro["data_hora"])
+    return registro
+
+
+def _segmentos(diretorio):
+    if not diretorio.is_dir():
+        return []
+    meses = sorted(caminho.name[len("logs-"):-len(".indice.jsonl")] for caminho in diretorio.glob("logs-*.indice.jsonl"))
+    return [Segmento(diretorio, mes) for mes in meses]
+
+
+def _travar(arquivo, diretorio, compartilhada=False):
+    try:
+        try:
+            import fcntl
+        except ImportError:  # Windows: o msvcrt só tem trava exclusiva
+            import msvcrt
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(arquivo.fileno(), (fcntl.LOCK_SH if compartilhada else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+    except OSError:
+        raise ArquivamentoEmAndamento(f"{diretorio} está em uso por um arquivamento ou uma exportação de logs.")
+
+
+@contextmanager
+def _trava(diretorio):
+    with open(diretorio / ".trava", "a+b") as arquivo:
+        _travar(arquivo, diretorio)
+        yield
+
+
+def travar_leitura():
+    """
+    Trava compartilhada do arquivo para quem lê o arquivo e depois o banco
+    (exportações): enquanto ela existir, nenhum arquivamento move logs de um
+    para o outro, e as leituras não se bloqueiam entre si (no Windows, sim).
+    Devolve o arquivo da trava; fechá-lo a libera. Levanta
+    ArquivamentoEmAndamento se um arquivamento estiver rodando.
+    """
+    diretorio = diretorio_arquivo()
+    diretorio.mkdir(parents=True, exist_ok=True)
+    arquivo = open(diretorio / ".trava", "a+b")
+    try:
+        _travar(arquivo, diretorio, compartilhada=True)
+    except ArquivamentoEmAndamento:
+        arquivo.close()
+        raise
+    return arquivo
+
+
+def _excluir_do_banco(entrada, banco):
+    faixas = entrada["ids"]
+    excluidos = 0
+    with transaction.atomic(using=banco):
+        for inicio in range(0, len(faixas), FAIXAS_POR_INSTRUCAO):
+            filtro = reduce(or_, (Q(id__range=faixa) for faixa in faixas[inicio:inicio + FAIXAS_POR_INSTRUCAO]))
+            excluidos += LogAcao.objects.using(banco).filter(filtro)._raw_delete(banco)
+    return excluidos
+
+
+def arquivar(retencao_dias=None, tamanho_lote=None, agora=None, banco=DEFAULT_DB_ALIAS, aviso=None):
+    """
+    Arquiva e apaga do banco os logs anteriores a agora - retencao_dias
+    (padrão: RETENCAO_DIAS). Devolve {"arquivados": n, "recuperados": n}
+    (recuperados: lotes de uma execução interrompida concluídos agora).
+    """
+    configuracao = configuracao_arquivo_logs()
+    if retencao_dias is None:
+        retencao_dias = configuracao["RETENCAO_DIAS"]
+    if tamanho_lote is None:
+        tamanho_lote = configuracao["TAMANHO_LOTE"]
+    diretorio = diretorio_arquivo()
+    diretorio.mkdir(parents=True, exist_ok=True)
+    corte = (agora or timezone.now()) - timedelta(days=retencao_dias)
+    totais = {"arquivados": 0, "recuperados": 0}
+
+    with _trava(diretorio):
+        for segmento in _segmentos(diretorio):
+            for entrada in segmento.recuperar():
+                _excluir_do_banco(entrada, banco)
+                segmento.confirmar(entrada)
+                totais["recuperados"] += 1
+
+        while True:
+            logs = list(
+                LogAcao.objects.using(banco)
+                .filter(data_hora__lt=corte)
+                .order_by("id")
+                .values(*CAMPOS)[:tamanho_lote]
+            )
+            if not logs:
+                break
+            por_mes = {}
+            for log in logs:
+                por_mes.setdefault(timezone.localtime(log["data_hora"]).strftime("%Y-%m"), []).append(log)
+            anexados = [
+                (segmento, segmento.anexar(logs_do_mes))
+                for segmento, logs_do_mes in ((Segmento(diretorio, mes), por_mes[mes]) for mes in sorted(por_mes))
+            ]
+            for segmento, entrada in anexados:
+                _excluir_do_banco(entrada, banco)
+                segmento.confirmar(entrada)
+            totais["arquivados"] += len(logs)
+            if aviso is not None:
+                aviso(totais["arquivados"])
+    return totais
+
+
+class _EntradaCarregada:
+    __slots__ = ("segmento", "entrada", "primeira", "ultima", "usuarios", "acoes", "faixas")
+
+    def __init__(self, segmento, entrada):
+        self.segmento = segmento
+        self.entrada = entrada
+        self.primeira = datetime.fromisoformat(entrada["primeira_data"])
+        self.ultima = datetime.fromisoformat(entrada["ultima_data"])
+        self.usuarios = frozenset(entrada["usuarios"])
+        self.acoes = frozenset(entrada["acoes"])
+        self.faixas = entrada["ids"]
+
+    def contem_id(self, log_id):
+        return any(inicio <= log_id <= fim for inicio, fim in self.faixas)
+
+
+_indices = {}
+_trava_indices = threading.Lock()
+
+
+def entradas_arquivadas():
+    """
+    Entradas dos índices de todos os meses, relidas só quando um índice muda.
+    """
+    diretorio = diretorio_arquivo()
+    entradas = []
+    with _trava_indices:
+        for segmento in _segmentos(diretorio):
+            estado = segmento.indice.stat()
+            assinatura = (estado.st_size, estado.st_mtime_ns)
+            guardado = _indices.get(segmento.indice)
+            if guardado is None or guardado[0] != assinatura:
+                lidas, _, _ = segmento.ler_indice()
+                guardado = (assinatura, [_EntradaCarregada(segmento, entrada) for entrada in lidas])
+                _indices[segmento.indice] = guardado
+            entradas.extend(guardado[1])
+    return entradas
+
+
+def logins_por_dia():
+    """
+    Logins arquivados por dia (para estatisticas.reconstruir).
+    """
+    totais = Counter()
+    for segmento in _segmentos(diretorio_arquivo()):
+        entradas, confirmados, _ = segmento.ler_indice()
+        for entrada in entradas:
+            if entrada["bloco"] in confirmados:
+                totais.update({datetime.fromisoformat(dia).date(): n for dia, n in entrada["logins_por_dia"].items()})
+    return totais
+
+
+def _atende(log, filtros):
+    if filtros.get("usuario_id") is not None and log["usuario_id"] != filtros["usuario_id"]:
+        return False
+    if filtros.get("acao") and log["acao"] != filtros["acao"]:
+        return False
+    if filtros.get("entidade") and log["entidade"] != filtros["entidade"]:
+        return False
+    if filtros.get("entidade_id") is not None and log["entidade_id"] != filtros["entidade_id"]:
+        return False
+    if filtros.get("inicio") is not None and log["data_hora"] < filtros["inicio"]:
+        return False
+    if filtros.get("fim") is not None and log["data_hora"] > filtros["fim"]:
+        return False
+    return True
+
+
+def _entrada_atende(carregada, filtros):
+    if filtros.get("usuario_id") is not None and filtros["usuario_id"] not in carregada.usuarios:
+        return False
+    if filtros.get("acao") and filtros["acao"] not in carregada.acoes:
+        return False
+    if filtros.get("inicio") is not None and carregada.ultima < filtros["inicio"]:
+        return False
+    if filtros.get("fim") is not None and carregada.primeira > filtros["fim"]:
+        return False
+    return True
+
+
+def _chave(log):
+    return (log["data_hora"], log["id"])
+
+
+def buscar(filtros, limite, depois_de=None, antes_de=None, crescente=False):
+    """
+    Até "limite" logs arquivados que atendem aos filtros, na ordem de
+    /api/logs/ (data_hora, id decrescentes; crescentes se "crescente").
+    "depois_de" e "antes_de" são chaves (data_hora, id) que limitam a faixa
+    na ordem pedida: a posição do cursor e a última linha já garantida pelo banco.
+    """
+    # Em ordem cronológica: mais_antiga < chave < mais_nova.
+    mais_antiga, mais_nova = (depois_de, antes_de) if crescente else (antes_de, depois_de)
+
+    candidatas = []
+    for carregada in entradas_arquivadas():
+        if not _entrada_atende(carregada, filtros):
+            continue
+        if mais_nova is not None and carregada.primeira > mais_nova[0]:
+            continue
+        if mais_antiga is not None and carregada.ultima < mais_antiga[0]:
+            continue
+        candidatas.append(carregada)
+    # Primeiro os membros mais próximos do início da página.
+    if crescente:
+        candidatas.sort(key=lambda carregada: carregada.primeira)
+    else:
+        candidatas.sort(key=lambda carregada: carregada.ultima, reverse=True)
+
+    encontrados = []
+    for carregada in candidatas:
+        if len(encontrados) >= limite:
+            limiar = encontrados[limite - 1]["data_hora"]
+            if (carregada.primeira > limiar) if crescente else (carregada.ultima < limiar):
+                break
+        for log in carregada.segmento.ler_membro(carregada.entrada):
+            chave = _chave(log)
+            if mais_nova is not None and chave >= mais_nova:
+                continue
+            if mais_antiga is not None and chave <= mais_antiga:
+                continue
+            if _atende(log, filtros):
+                encontrados.append(log)
+        encontrados.sort(key=_chave, reverse=not crescente)
+        del encontrados[limite:]
+    return encontrados
+
+
+def exportar(inicio=None, fim=None, banco=None):
+    """
+    Logs arquivados (dicts com CAMPOS) entre inicio e fim, em listas de um
+    membro cada, mês a mês na ordem do arquivamento. Quem chama segura
+    travar_leitura(). Um lote não confirmado só entra se já saiu do banco
+    (queda entre a exclusão e a confirmação); senão, ainda está lá.
+    """
+    filtros = {"inicio": inicio, "fim": fim}
+    for segmento in _segmentos(diretorio_arquivo()):
+        entradas, confirmados, _ = segmento.ler_indice()
+        for entrada in entradas:
+            if not _entrada_atende(_EntradaCarregada(segmento, entrada), filtros):
+                continue
+            # A exclusão de um lote é atômica: basta olhar o primeiro id.
+            if entrada["bloco"] not in confirmados and \
+                    LogAcao.objects.using(banco).filter(id=entrada["ids"][0][0]).exists():
+                continue
+            logs = [log for log in segmento.ler_membro(entrada) if _atende(log, filtros)]
+            if logs:
+                yield logs
+
+
+def obter(log_id):
+    """
+    Log arquivado com o id informado (dict com CAMPOS) ou None.
+    """
+    try:
+        log_id = int(log_id)
+    except (TypeError, ValueError):
+        return None
+    for carregada in entradas_arquivadas():
+        if carregada.contem_id(log_id):
+            for log in carregada.segmento.ler_membro(carregada.entrada):
+                if log["id"] == log_id:
+                    return log
+    return None
+
+
+def _usuarios(logs):
+    ids = {log["usuario_id"] for log in logs if log["usuario_id"] is not None}
+    if not ids:
+        return {}
+    return {usuario["id"]: usuario for usuario in Usuario.objects.filter(id__in=ids).values("id", "email", "papel")}
+
+
+def como_instancias(logs):
+    """
+    Logs arquivados como instâncias de LogAcao (não salvas) com o usuário
+    atual de cada um; o usuário excluído fica como None, como no banco.
+    """
+    usuarios = _usuarios(logs)
+    instancias = []
+    for log in logs:
+        dados = usuarios.get(log["usuario_id"])
+        instancia = LogAcao(**{campo: log[campo] for campo in CAMPOS if campo != "usuario_id"})
+        instancia.usuario = Usuario(**dados) if dados else None
+        instancias.append(instancia)
+    return instancias
+
+
+def como_valores(logs, campos):
+    """
+    Logs arquivados no formato de queryset.values(*campos) de LogAcao.
+    """
+    usuarios = _usuarios(logs)
+    linhas = []
+    for log in logs:
+        usuario = usuarios.get(log["usuario_id"])
+        linha = {}
+        for campo in campos:
+            if campo.startswith("usuario__"):
+                linha[campo] = usuario[campo[len("usuario__"):]] if usuario else None
+            elif campo in ("usuario", "usuario_id"):
+                linha[campo] = usuario["id"] if usuario else None
+            else:
+                linha[campo] = log[campo]
+        linhas.append(linha)
+    return linhas
+
+
+class PaginacaoComArquivo(PaginacaoCursor):
+    """
+    Paginação por cursor de /api/logs/ que completa cada página com os logs
+    arquivados. Os membros do arquivo só são lidos quando podem entrar na
+    página: uma página inteira de logs mais novos que o arquivo custa apenas
+    a consulta ao índice, já em memória. A paginação por offset cobre só o banco.
+
+    A view informa os filtros da query string em filtros_arquivo(params).
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        pagina = super().paginate_queryset(queryset, request, view)
+        if self.delegado is not None:
+            return pagina
+        return self._completar(pagina, queryset, request, view, como_valores, como_instancias)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        pagina = await super().apaginate_queryset(queryset, request, view)
+        return await sync_to_async(self._completar)(pagina, queryset, request, view, como_valores, como_instancias)
+
+    def concluir(self, resultados):
+        # Guarda a página completa (com a linha extra) para _completar.
+        self.resultados_banco = resultados
+        return super().concluir(resultados)
+
+    def _completar(self, pagina, queryset, request, view, valores, instancias):
+        if tuple(self.ordenacao) != ORDENACAO or not entradas_arquivadas():
+            return pagina
+
+        por_chave = self._chave_linha
+        # Com a página do banco cheia, só interessa o que vem antes da linha extra.
+        limite_banco = por_chave(self.resultados_banco[-1]) if len(self.resultados_banco) > self.tamanho else None
+        arquivados = buscar(
+            view.filtros_arquivo(request.query_params),
+            self.tamanho + 1,
+            depois_de=tuple(self.posicao) if self.posicao is not None else None,
+            antes_de=limite_banco,
+            crescente=self.reverso,
+        )
+        if not arquivados:
+            return pagina
+
+        campos = getattr(queryset, "_fields", None)
+        convertidos = valores(arquivados, campos) if campos else instancias(arquivados)
+        ids_banco = {self._id_linha(linha) for linha in self.resultados_banco}
+        juntos = list(self.resultados_banco) + [
+            linha for linha in convertidos if self._id_linha(linha) not in ids_banco
+        ]
+        juntos.sort(key=por_chave, reverse=not self.reverso)
+        return super().concluir(juntos[:self.tamanho + 1])
+
+    @staticmethod
+    def _chave_linha(linha):
+        if isinstance(linha, dict):
+            return (linha["data_hora"], linha["id"])
+        return (linha.data_hora, linha.id)
+
+    @staticmethod
+    def _id_linha(linha):
+        return linha["id"] if isinstance(linha, dict) else linha.id
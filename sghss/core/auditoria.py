@@ -0,0 +1,237 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, connection, transaction
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+
+from .models import LogAcao
+
+logger = logging.getLogger(__name__)
+
+# Enviado pelos sinks logo depois de gravar registros (argumento "logs"); no
+# SinkBufferizado, dentro da transação do lote. Os contadores de logins
+# (core/estatisticas.py) são ajustados por ele, em core/signals.py.
+logs_gravados = Signal()
+
+CONFIGURACAO_PADRAO = {
+    "SINK": "core.auditoria.SinkSincrono",
+    "TAMANHO_LOTE": 200,
+    "INTERVALO_FLUSH": 1.0,
+    "TAMANHO_MAXIMO_FILA": 10000,
+}
+
+
+def configuracao_auditoria():
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    configuracao.update(getattr(settings, "SGHSS_AUDITORIA", {}))
+    return configuracao
+
+
+class SinkAuditoria:
+    """
+    Destino dos registros de auditoria. Recebe instâncias de LogAcao ainda
+    não salvas e decide quando e como persistí-las.
+    """
+
+    def registrar(self, log):
+        raise NotImplementedError
+
+    def registrar_lote(self, logs):
+        for log in logs:
+            self.registrar(log)
+
+    def flush(self):
+        pass
+
+    def fechar(self):
+        self.flush()
+
+    def metricas(self):
+        return {}
+
+    def _avisar(self, logs):
+        logs_gravados.send(sender=self.__class__, logs=logs)
+
+
+class SinkSincrono(SinkAuditoria):
+    """
+    Grava cada registro imediatamente, dentro da transação da requisição.
+    É o comportamento original e o usado nos testes da API (core/tests.py).
+    """
+
+    def __init__(self, **opcoes):
+        self.gravadas = 0
+
+    def registrar(self, log):
+        log.save()
+        self._avisar([log])
+        self.gravadas += 1
+
+    def registrar_lote(self, logs):
+        LogAcao.objects.bulk_create(logs)
+        self._avisar(logs)
+        self.gravadas += len(logs)
+
+    def metricas(self):
+        return {"gravadas": self.gravadas}
+
+
+class SinkBufferizado(SinkAuditoria):
+    """
+    Enfileira os registros em memória e os grava em lote (bulk_create) numa
+    thread de fundo, quando a fila atinge TAMANHO_LOTE ou a cada
+    INTERVALO_FLUSH segundos. Registros que não cabem na fila são descartados
+    e contabilizados.
+    """
+
+    def __init__(self, TAMANHO_LOTE=200, INTERVALO_FLUSH=1.0, TAMANHO_MAXIMO_FILA=10000, **opcoes):
+        self.tamanho_lote = TAMANHO_LOTE
+        self.intervalo_flush = INTERVALO_FLUSH
+        self.fila = queue.Queue(maxsize=TAMANHO_MAXIMO_FILA)
+        self._trava_flush = threading.Lock()
+        self._trava_thread = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+
+        self.enfileiradas = 0
+        self.gravadas = 0
+        self.descartadas = 0
+        self.flushes = 0
+        self.ultima_latencia_flush_ms = 0.0
+        self.maior_latencia_flush_ms = 0.0
+
+    def registrar(self, log):
+        # Só enfileira após o commit, para não auditar ações desfeitas por rollback.
+        transaction.on_commit(lambda: self._enfileirar(log))
+
+    def registrar_lote(self, logs):
+        def enfileirar_lote():
+            for log in logs:
+                self._enfileirar(log)
+
+        transaction.on_commit(enfileirar_lote)
+
+    def _enfileirar(self, log):
+        self._garantir_thread()
+        try:
+            self.fila.put_nowait(log)
+        except queue.Full:
+            self.descartadas += 1
+            logger.warning("Fila de auditoria cheia; registro descartado: %s", log.acao)
+            return
+        self.enfileiradas += 1
+        if self.fila.qsize() >= self.tamanho_lote:
+            self._acordar.set()
+
+    def _garantir_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._trava_thread:
+            if self._thread is None or not self._thread.is_alive():
+                self._parar.clear()
+                self._thread = threading.Thread(
+                    target=self._executar, name="auditoria-flush", daemon=True
+                )
+                self._thread.start()
+
+    def _executar(self):
+        try:
+            while not self._parar.is_set():
+                self._acordar.wait(self.intervalo_flush)
+                self._acordar.clear()
+                close_old_connections()
+                self.flush()
+            self.flush()
+        finally:
+            connection.close()
+
+    def _drenar(self):
+        lote = []
+        while len(lote) < self.tamanho_lote:
+            try:
+                lote.append(self.fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def flush(self):
+        with self._trava_flush:
+            while True:
+                lote = self._drenar()
+                if not lote:
+                    break
+                inicio = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        LogAcao.objects.bulk_create(lote)
+                        self._avisar(lote)
+                except Exception:
+                    self.descartadas += len(lote)
+                    logger.exception("Falha ao gravar %d registros de auditoria.", len(lote))
+                    continue
+                latencia = (time.perf_counter() - inicio) * 1000
+                self.gravadas += len(lote)
+                self.flushes += 1
+                self.ultima_latencia_flush_ms = latencia
+                self.maior_latencia_flush_ms = max(self.maior_latencia_flush_ms, latencia)
+
+    def fechar(self):
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=max(self.intervalo_flush * 5, 5))
+        self.flush()
+
+    def metricas(self):
+        return {
+            "profundidade_fila": self.fila.qsize(),
+            "enfileiradas": self.enfileiradas,
+            "gravadas": self.gravadas,
+            "descartadas": self.descartadas,
+            "flushes": self.flushes,
+            "ultima_latencia_flush_ms": round(self.ultima_latencia_flush_ms, 3),
+            "maior_latencia_flush_ms": round(self.maior_latencia_flush_ms, 3),
+        }
+
+
+_sink = None
+_trava_sink = threading.Lock()
+
+
+def obter_sink():
+    global _sink
+    if _sink is None:
+        with _trava_sink:
+            if _sink is None:
+                configuracao = configuracao_auditoria()
+                classe = import_string(configuracao.pop("SINK"))
+                _sink = classe(**configuracao)
+    return _sink
+
+
+def encerrar_sink():
+    """
+    Descarrega os registros pendentes e descarta o sink atual; o próximo
+    registro cria um novo a partir das configurações.
+    """
+    global _sink
+    with _trava_sink:
+        sink, _sink = _sink, None
+    if sink is not None:
+        sink.fechar()
+
+
+def _ao_alterar_configuracao(setting, **kwargs):
+    if setting == "SGHSS_AUDITORIA":
+        encerrar_sink()
+
+
+setting_changed.connect(_ao_alterar_configuracao)
+atexit.register(encerrar_sink)
@@ -0,0 +1,221 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.core.signals import setting_changed
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+CONFIGURACAO_PADRAO = {
+    "ATIVO": True,
+    "TAMANHO_MAXIMO": 10000,
+    "TTL": 300,
+    # Alias de um backend de settings.CACHES para compartilhar o cache entre
+    # processos. Com None, cada processo mantém o seu cache em memória, e um
+    # token revogado continua valendo nos outros processos até o TTL.
+    "CACHE": None,
+}
+
+PREFIXO_CHAVE = "sghss:token:"
+
+
+def configuracao_cache_token():
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    configuracao.update(getattr(settings, "SGHSS_CACHE_TOKEN", {}))
+    return configuracao
+
+
+class CacheLocal:
+    """
+    Cache LRU com expiração (TTL), restrito ao processo e seguro entre threads.
+    """
+
+    def __init__(self, tamanho_maximo, ttl):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def definir(self, chave, valor):
+        with self._trava:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+
+    def remover(self, chave):
+        with self._trava:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+class CacheCompartilhado:
+    """
+    Adaptador para um backend do framework de cache do Django (arquivos,
+    Redis, Memcached...), usado quando SGHSS_CACHE_TOKEN["CACHE"] é definido.
+    """
+
+    def __init__(self, alias, ttl):
+        self.alias = alias
+        self.ttl = ttl
+
+    @property
+    def cache(self):
+        # O Django mantém uma instância do backend por thread.
+        return caches[self.alias]
+
+    def obter(self, chave):
+        return self.cache.get(PREFIXO_CHAVE + chave)
+
+    def definir(self, chave, valor):
+        self.cache.set(PREFIXO_CHAVE + chave, valor, self.ttl)
+
+    def remover(self, chave):
+        self.cache.delete(PREFIXO_CHAVE + chave)
+
+    def limpar(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class MetricasCacheToken:
+    def __init__(self):
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+
+    def como_dict(self, cache):
+        total = self.acertos + self.falhas
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "invalidacoes": self.invalidacoes,
+            "taxa_acerto": round(self.acertos / total, 4) if total else 0.0,
+            "tamanho": len(cache) if cache is not None else 0,
+        }
+
+
+metricas = MetricasCacheToken()
+_cache = None
+_trava_cache = threading.Lock()
+
+
+def obter_cache():
+    global _cache
+    if _cache is None:
+        with _trava_cache:
+            if _cache is None:
+                configuracao = configuracao_cache_token()
+                if configuracao["CACHE"]:
+                    _cache = CacheCompartilhado(configuracao["CACHE"], configuracao["TTL"])
+                else:
+                    _cache = CacheLocal(configuracao["TAMANHO_MAXIMO"], configuracao["TTL"])
+    return _cache
+
+
+def invalidar_token(chave):
+    if _cache is None and not configuracao_cache_token()["CACHE"]:
+        return
+    obter_cache().remover(chave)
+    metricas.invalidacoes += 1
+
+
+def invalidar_tokens_dos_usuarios(ids):
+    """
+    Remove do cache os tokens desses usuários. QuerySet.update() e
+    bulk_update() não disparam os sinais de core/signals.py: quem desativa ou
+    altera usuários em massa chama esta função depois.
+    """
+    if _cache is None and not configuracao_cache_token()["CACHE"]:
+        return
+    for chave in Token.objects.filter(user_id__in=list(ids)).values_list("key", flat=True):
+        invalidar_token(chave)
+
+
+def _campos_usuario():
+    modelo = Token._meta.get_field("user").related_model
+    return [campo.attname for campo in modelo._meta.concrete_fields if campo.attname != "password"]
+
+
+def _para_cache(token):
+    """
+    O que vai para o cache: a chave e a data do token e os campos do usuário,
+    exceto o hash da senha, que não sai do banco.
+    """
+    return (token.key, token.created, tuple(getattr(token.user, campo) for campo in _campos_usuario()))
+
+
+def _do_cache(valor):
+    """
+    Token e usuário remontados de _para_cache(). A senha fica adiada: só é
+    lida do banco se alguém a acessar, e um save() não a sobrescreve.
+    """
+    chave, criado, valores = valor
+    usuario = Token._meta.get_field("user").related_model.from_db(DEFAULT_DB_ALIAS, _campos_usuario(), valores)
+    token = Token.from_db(DEFAULT_DB_ALIAS, ["key", "user_id", "created"], (chave, usuario.pk, criado))
+    token.user = usuario
+    return token
+
+
+def metricas_cache_token():
+    return metricas.como_dict(_cache)
+
+
+def _ao_alterar_configuracao(setting, **kwargs):
+    global _cache
+    if setting in ("SGHSS_CACHE_TOKEN", "CACHES"):
+        _cache = None
+
+
+setting_changed.connect(_ao_alterar_configuracao)
+
+
+class TokenAutenticacaoCache(TokenAuthentication):
+    """
+    TokenAuthentication que guarda o par (usuário, token) já resolvido, evitando
+    o JOIN Token + Usuario a cada requisição. As entradas são invalidadas pelos
+    sinais em core/signals.py quando o token é removido (logout, troca de
+    senha) ou o usuário é alterado/desativado; alterações com QuerySet.update()
+    precisam chamar invalidar_tokens_dos_usuarios().
+    """
+
+    def authenticate_credentials(self, key):
+        if not configuracao_cache_token()["ATIVO"]:
+            return super().authenticate_credentials(key)
+
+        cache = obter_cache()
+        valor = cache.obter(key)
+        if valor is not None:
+            metricas.acertos += 1
+            # Instâncias novas a cada acerto: alterações em request.user não vazam para outras requisições.
+            token = _do_cache(valor)
+            return (token.user, token)
+
+        metricas.falhas += 1
+        usuario, token = super().authenticate_credentials(key)
+        cache.definir(key, _para_cache(token))
+        return (copy.copy(usuario), token)
@@ -0,0 +1,173 @@
+"""
+Busca de pacientes por nome, CPF e e-mail (/api/pacientes/busca/).
+
+No SQLite, a tabela FTS5 core_paciente_busca (migração 0009) guarda, para
+cada paciente (rowid = id do paciente), o nome, o CPF só com dígitos e o
+e-mail. O tokenizador unicode61 ignora maiúsculas e acentos ("joao" acha
+"João") e os índices de prefixo atendem termos incompletos ("mar silv").
+O índice é atualizado pelos sinais de Paciente e Usuario (core/signals.py);
+cargas que não passam pelo save() chamam indexar_pacientes() ou reconstruir().
+
+O índice devolve os LIMITE_CANDIDATOS pacientes de melhor bm25 (ORDER BY
+rank antes do LIMIT, para que um termo comum não corte os mais relevantes),
+que são reordenados aqui por _pontuar. O bm25 percorre todas as ocorrências
+de cada termo: buscas só com prefixos muito comuns ("ma") custam centenas de
+milissegundos em bases grandes; nomes completos, CPF e e-mail, poucos.
+
+Em outros bancos, a busca usa o LIKE equivalente ao search_fields do admin.
+"""
+import re
+import unicodedata
+from functools import reduce
+from operator import and_
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+
+from .models import Paciente
+
+TABELA = "core_paciente_busca"
+LIMITE_CANDIDATOS = 200
+MAXIMO_TERMOS = 8
+
+# Mesma normalização de normalizar_cpf(), em SQL (reconstruir e indexar_pacientes).
+_CPF_SQL = "REPLACE(REPLACE(REPLACE(REPLACE(p.cpf, '.', ''), '-', ''), '/', ''), ' ', '')"
+_SELECT_INDICE = (
+    f"SELECT p.id, p.nome_completo, {_CPF_SQL}, u.email "
+    "FROM core_paciente p INNER JOIN core_usuario u ON u.id = p.usuario_id"
+)
+
+
+def normalizar_cpf(cpf):
+    return re.sub(r"\D", "", cpf)
+
+
+def _normalizar(texto):
+    decomposto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+
+
+def termos_da_busca(texto):
+    """
+    Termos da busca, sem acentos e em minúsculas. Dígitos separados por
+    pontuação de CPF viram um termo só ("123.456.789-01" -> "12345678901").
+    """
+    texto = re.sub(r"(?<=\d)[.\-/\s]+(?=\d)", "", _normalizar(texto))
+    return re.findall(r"[^\W_]+", texto)[:MAXIMO_TERMOS]
+
+
+def indice_disponivel(banco=DEFAULT_DB_ALIAS):
+    return connections[banco].vendor == "sqlite"
+
+
+def _pontuar(termos, texto, nome, cpf, email):
+    palavras = re.findall(r"[^\W_]+", _normalizar(nome))
+    pontos = 10 if email.lower() == texto.lower() else 0
+    for termo in termos:
+        if termo in palavras or cpf == termo:
+            pontos += 3
+        elif cpf.startswith(termo) or any(palavra.startswith(termo) for palavra in palavras):
+            pontos += 2
+        else:
+            pontos += 1  # encontrado só no e-mail
+    # "maria silva" antes de "ana maria silva".
+    if palavras and palavras[0].startswith(termos[0]):
+        pontos += 1
+    return pontos
+
+
+def buscar(texto, limite, banco=DEFAULT_DB_ALIAS):
+    """
+    Ids dos pacientes encontrados, do mais ao menos relevante.
+    """
+    if not indice_disponivel(banco):
+        return buscar_like(texto, limite, banco)
+
+    texto = texto.strip()
+    if "@" in texto:
+        # E-mail: só a parte local, e só na coluna email. Os termos do domínio
+        # se repetem em milhares de linhas e tornariam a busca lenta.
+        termos = termos_da_busca(texto.split("@", 1)[0])
+        expressao = "email : (" + " ".join(f'"{termo}"*' for termo in termos) + ")"
+    else:
+        termos = termos_da_busca(texto)
+        expressao = " ".join(f'"{termo}"*' for termo in termos)
+    if not termos:
+        return []
+
+    with connections[banco].cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, nome, cpf, email FROM {TABELA} WHERE {TABELA} MATCH %s ORDER BY rank LIMIT %s",
+            [expressao, LIMITE_CANDIDATOS],
+        )
+        candidatos = cursor.fetchall()
+
+    candidatos.sort(key=lambda linha: (-_pontuar(termos, texto, *linha[1:]), _normalizar(linha[1]), linha[0]))
+    return [linha[0] for linha in candidatos[:limite]]
+
+
+def buscar_like(texto, limite, banco=DEFAULT_DB_ALIAS):
+    """
+    Busca por LIKE, como PacienteAdmin.search_fields: cada palavra precisa
+    aparecer (icontains) no nome, no CPF ou no e-mail.
+    """
+    palavras = texto.split()[:MAXIMO_TERMOS]
+    if not palavras:
+        return []
+    filtro = reduce(and_, (
+        Q(nome_completo__icontains=palavra) | Q(cpf__icontains=palavra) | Q(usuario__email__icontains=palavra)
+        for palavra in palavras
+    ))
+    return list(
+        Paciente.objects.using(banco).filter(filtro).order_by("nome_completo", "id").values_list("id", flat=True)[:limite]
+    )
+
+
+def indexar_pacientes(ids, banco=DEFAULT_DB_ALIAS, tamanho_lote=500):
+    """
+    Grava (ou regrava) os pacientes indicados no índice, em lotes.
+    """
+    if not indice_disponivel(banco):
+        return
+    ids = list(ids)
+    with connections[banco].cursor() as cursor:
+        for inicio in range(0, len(ids), tamanho_lote):
+            lote = ids[inicio:inicio + tamanho_lote]
+            marcadores = ", ".join(["%s"] * len(lote))
+            cursor.execute(
+                f"INSERT OR REPLACE INTO {TABELA} (rowid, nome, cpf, email) {_SELECT_INDICE} WHERE p.id IN ({marcadores})",
+                lote,
+            )
+
+
+def indexar_usuario(usuario_id, banco=DEFAULT_DB_ALIAS):
+    # Troca de e-mail: regrava o paciente do usuário, se houver.
+    if not indice_disponivel(banco):
+        return
+    with connections[banco].cursor() as cursor:
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {TABELA} (rowid, nome, cpf, email) {_SELECT_INDICE} WHERE p.usuario_id = %s",
+            [usuario_id],
+        )
+
+
+def remover_paciente(paciente_id, banco=DEFAULT_DB_ALIAS):
+    if not indice_disponivel(banco):
+        return
+    with connections[banco].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA} WHERE rowid = %s", [paciente_id])
+
+
+def reconstruir(banco=DEFAULT_DB_ALIAS):
+    """
+    Recria o índice a partir de Paciente e Usuario e compacta seus segmentos.
+    Devolve a quantidade de pacientes indexados.
+    """
+    if not indice_disponivel(banco):
+        return 0
+    with transaction.atomic(using=banco), connections[banco].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA}")
+        cursor.execute(f"INSERT INTO {TABELA} (rowid, nome, cpf, email) {_SELECT_INDICE}")
+        cursor.execute(f"INSERT INTO {TABELA} ({TABELA}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {TABELA}")
+        return cursor.fetchone()[0]
@@ -0,0 +1,26 @@
+"""
+Backend de cache em arquivos (CACHES em settings.py) visto por todos os
+processos do servidor na mesma máquina.
+
+É o FileBasedCache do Django com uma diferença: o limite de entradas
+(MAX_ENTRIES) é conferido a cada VERIFICAR_LIMITE_A_CADA gravações, e não em
+todas. O original lista o diretório inteiro a cada set(), o que com alguns
+milhares de entradas custa mais que a leitura que o cache quer evitar. Entre
+uma conferência e outra, o cache pode passar do limite em algumas entradas.
+"""
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class CacheArquivo(FileBasedCache):
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        opcoes = params.get("OPTIONS", {})
+        self._verificar_a_cada = max(int(opcoes.get("VERIFICAR_LIMITE_A_CADA", 100)), 1)
+        # O Django cria uma instância do backend por thread: a contagem é de cada uma.
+        self._gravacoes = 0
+
+    def _cull(self):
+        self._gravacoes += 1
+        if self._gravacoes % self._verificar_a_cada == 0:
+            super()._cull()
@@ -0,0 +1,378 @@
+"""
+Cache das respostas de list/retrieve dos viewsets (CacheRespostaMixin).
+
+A chave de uma resposta reúne a URL completa (com a query string), o formato,
+o escopo de quem pede e as versões dos grupos de que ela depende:
+
+* o modelo inteiro ("core.consulta"), renovado em cargas em massa e quando não
+  dá para saber exatamente o que mudou;
+* na listagem, a lista do escopo ("core.consulta:lista:usuario:7");
+* no detalhe, o registro ("core.consulta:42").
+
+O escopo é "admin" para administradores, que veem todos os registros e
+compartilham as entradas, e o próprio usuário para os demais papéis, cujo
+get_queryset só mostra os seus registros: uma resposta nunca é servida a um
+escopo diferente do que a gerou.
+
+Os sinais de Paciente, Administrador, ProfissionalSaude, Consulta e Usuario
+(core/signals.py) renovam as versões afetadas quando a transação é confirmada.
+As entradas antigas deixam de ser encontradas e saem do cache pelo TTL ou pelo
+limite de entradas do backend (MAX_ENTRIES). Como nada é apagado por padrão de
+chave, qualquer backend do Django serve, desde que compartilhado entre os
+processos do servidor (o padrão é o CacheArquivo): com o locmem, um processo
+não vê as invalidações feitas pelos outros, e o manage.py check avisa.
+"""
+import hashlib
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from .models import Usuario, Consulta
+from .roteamento import configuracao_replicas, leitura_em_replica
+
+CONFIGURACAO_PADRAO = {
+    "ATIVO": True,
+    # Alias de settings.CACHES. O número máximo de entradas é o MAX_ENTRIES do backend.
+    "CACHE": "default",
+    "TTL_LISTA": 60,
+    "TTL_DETALHE": 300,
+    # Respostas maiores que isto (em bytes) não são guardadas.
+    "TAMANHO_MAXIMO_ENTRADA": 256 * 1024,
+}
+
+PREFIXO_RESPOSTA = "sghss:resposta:"
+PREFIXO_VERSAO = "sghss:versao:"
+ESCOPO_ADMIN = "admin"
+# Cabeçalhos guardados junto com o corpo (validadores do GET condicional).
+CABECALHOS_GUARDADOS = ("ETag", "Last-Modified", "Cache-Control", "Vary")
+
+
+def configuracao_cache_respostas():
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    configuracao.update(getattr(settings, "SGHSS_CACHE_RESPOSTAS", {}))
+    return configuracao
+
+
+class MetricasCacheRespostas:
+    def __init__(self):
+        self.acertos = 0
+        self.falhas = 0
+
+    def como_dict(self):
+        total = self.acertos + self.falhas
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": round(self.acertos / total, 4) if total else 0.0,
+        }
+
+
+metricas = MetricasCacheRespostas()
+
+
+def metricas_cache_respostas():
+    return metricas.como_dict()
+
+
+def escopo_usuario(usuario_id):
+    return f"usuario:{usuario_id}"
+
+
+def escopo(usuario):
+    if usuario.papel == Usuario.PAPEL_ADMIN:
+        return ESCOPO_ADMIN
+    return escopo_usuario(usuario.pk)
+
+
+def grupo_modelo(modelo):
+    return modelo._meta.label_lower
+
+
+def grupo_lista(modelo, escopo_lista):
+    return f"{grupo_modelo(modelo)}:lista:{escopo_lista}"
+
+
+def grupo_registro(modelo, pk):
+    return f"{grupo_modelo(modelo)}:{pk}"
+
+
+def grupos_da_leitura(modelo, usuario, pk=None):
+    """
+    Grupos de que depende a listagem (pk=None) ou o detalhe de "modelo" visto
+    por "usuario". None se a pk da URL não é válida (a view responde o 404).
+    """
+    if pk is None:
+        return [grupo_modelo(modelo), grupo_lista(modelo, escopo(usuario))]
+    try:
+        # "007" e "7" são o mesmo registro e precisam do mesmo grupo.
+        pk = modelo._meta.pk.to_python(pk)
+    except DjangoValidationError:
+        return None
+    return [grupo_modelo(modelo), grupo_registro(modelo, pk)]
+
+
+def _versoes_encontradas(chaves, encontradas):
+    # Versão nunca criada (ou descartada pelo backend) sem add() bem-sucedido:
+    # um valor novo não coincide com nenhuma entrada gravada.
+    return [encontradas.get(chave) or time.time_ns() for chave in chaves]
+
+
+def versoes(cache, grupos):
+    """
+    Versão atual de cada grupo (instante em ns da última invalidação).
+    """
+    chaves = [PREFIXO_VERSAO + grupo for grupo in grupos]
+    encontradas = cache.get_many(chaves)
+    faltando = [chave for chave in chaves if chave not in encontradas]
+    if faltando:
+        for chave in faltando:
+            cache.add(chave, time.time_ns(), None)
+        encontradas.update(cache.get_many(faltando))
+    return _versoes_encontradas(chaves, encontradas)
+
+
+async def aversoes(cache, grupos):
+    chaves = [PREFIXO_VERSAO + grupo for grupo in grupos]
+    encontradas = await cache.aget_many(chaves)
+    faltando = [chave for chave in chaves if chave not in encontradas]
+    if faltando:
+        for chave in faltando:
+            await cache.aadd(chave, time.time_ns(), None)
+        encontradas.update(await cache.aget_many(faltando))
+    return _versoes_encontradas(chaves, encontradas)
+
+
+def chave_resposta(request, usuario, formato, versoes_grupos):
+    partes = [request.build_absolute_uri(), escopo(usuario), formato, *(str(versao) for versao in versoes_grupos)]
+    return PREFIXO_RESPOSTA + hashlib.blake2b("\n".join(partes).encode(), digest_size=16).hexdigest()
+
+
+def resposta_guardada(request, entrada):
+    """
+    Resposta montada a partir de uma entrada do cache; 304 se o cliente já tem
+    essa versão (If-None-Match / If-Modified-Since).
+    """
+    metricas.acertos += 1
+    resposta = HttpResponse(entrada["conteudo"], content_type=entrada["tipo"])
+    for nome, valor in entrada["cabecalhos"].items():
+        resposta[nome] = valor
+    ultima_modificacao = parse_http_date_safe(entrada["cabecalhos"].get("Last-Modified", ""))
+    return get_conditional_response(
+        request, etag=resposta.get("ETag"), last_modified=ultima_modificacao, response=resposta
+    )
+
+
+def montar_entrada(resposta, versoes_grupos, configuracao):
+    """
+    Entrada do cache para uma resposta já renderizada, ou None se ela não deve
+    ser guardada: erro, corpo grande demais ou lida de uma réplica logo depois
+    de uma invalidação (a réplica pode ainda não ter recebido a escrita).
+    """
+    if resposta.status_code != 200 or len(resposta.content) > configuracao["TAMANHO_MAXIMO_ENTRADA"]:
+        return None
+    if leitura_em_replica():
+        janela = configuracao_replicas()["JANELA_PRIMARIO"] * 1_000_000_000
+        if time.time_ns() - max(versoes_grupos) < janela:
+            return None
+    return {
+        "conteudo": resposta.content,
+        "tipo": resposta["Content-Type"],
+        "cabecalhos": {nome: resposta[nome] for nome in CABECALHOS_GUARDADOS if resposta.has_header(nome)},
+    }
+
+
+def ttl(configuracao, detalhe):
+    return configuracao["TTL_DETALHE"] if detalhe else configuracao["TTL_LISTA"]
+
+
+def _renovar(grupos):
+    agora = time.time_ns()
+    caches[configuracao_cache_respostas()["CACHE"]].set_many(
+        {PREFIXO_VERSAO + grupo: agora for grupo in grupos}, None
+    )
+
+
+_invalidacoes_em_lote = ContextVar("cache_respostas_em_lote", default=None)
+
+
+@contextmanager
+def invalidacoes_em_lote(banco=DEFAULT_DB_ALIAS):
+    """
+    Junta as invalidações feitas no bloco (exclusões em cascata, por exemplo)
+    e renova cada grupo uma vez só, ao final.
+    """
+    grupos = set()
+    marcador = _invalidacoes_em_lote.set(grupos)
+    try:
+        yield
+    finally:
+        _invalidacoes_em_lote.reset(marcador)
+        invalidar(*grupos, banco=banco)
+
+
+def invalidar(*grupos, banco=DEFAULT_DB_ALIAS):
+    """
+    Renova as versões dos grupos quando a transação atual for confirmada (na
+    hora, fora de uma transação). Antes do commit, uma leitura ainda veria os
+    dados antigos e os guardaria sob a versão nova.
+    """
+    if not grupos:
+        return
+    pendentes = _invalidacoes_em_lote.get()
+    if pendentes is not None:
+        pendentes.update(grupos)
+        return
+    transaction.on_commit(partial(_renovar, grupos), using=banco)
+
+
+def invalidar_modelos(*modelos, banco=DEFAULT_DB_ALIAS):
+    invalidar(*(grupo_modelo(modelo) for modelo in modelos), banco=banco)
+
+
+def invalidar_perfil(modelo, pk, usuario_id, banco=DEFAULT_DB_ALIAS):
+    """
+    Paciente, Administrador ou ProfissionalSaude: o detalhe, a listagem dos
+    administradores e a do próprio dono do perfil.
+    """
+    invalidar(
+        grupo_registro(modelo, pk),
+        grupo_lista(modelo, ESCOPO_ADMIN),
+        grupo_lista(modelo, escopo_usuario(usuario_id)),
+        banco=banco,
+    )
+
+
+def invalidar_consultas(ids, usuarios, banco=DEFAULT_DB_ALIAS):
+    """
+    Consultas "ids" cujos pacientes e profissionais são os "usuarios" (ids de
+    Usuario): os detalhes e as listagens dos administradores e desses usuários.
+    """
+    invalidar(
+        grupo_lista(Consulta, ESCOPO_ADMIN),
+        *(grupo_lista(Consulta, escopo_usuario(usuario_id)) for usuario_id in set(usuarios)),
+        *(grupo_registro(Consulta, consulta_id) for consulta_id in ids),
+        banco=banco,
+    )
+
+
+def _usuario_do_participante(consulta, nome):
+    relacao = Consulta._meta.get_field(nome)
+    perfil = relacao.get_cached_value(consulta, default=None)
+    if perfil is None or perfil.pk != getattr(consulta, relacao.attname):
+        return None
+    return perfil.__dict__.get("usuario_id")
+
+
+def invalidar_consulta(consulta, anteriores, banco=DEFAULT_DB_ALIAS):
+    """
+    Uma consulta salva ou excluída. "anteriores" são os participantes gravados
+    antes (Consulta.participantes; None na criação). Se os usuários do paciente
+    e do profissional não estão carregados, ou se a consulta mudou de dono,
+    invalida todas as consultas em vez de consultar o banco.
+    """
+    usuarios = [_usuario_do_participante(consulta, "paciente"), _usuario_do_participante(consulta, "profissional")]
+    if None in usuarios or anteriores not in (None, consulta.participantes()):
+        invalidar_modelos(Consulta, banco=banco)
+        return
+    invalidar_consultas([consulta.pk], usuarios, banco)
+
+
+class CacheRespostaMixin:
+    """
+    Viewsets: list/retrieve respondem do cache, sem consultar o banco, enquanto
+    nenhum dos grupos de que a resposta depende é invalidado. Deve vir antes de
+    RespostaCondicionalMixin: o ETag guardado já responde o If-None-Match.
+    alist/aretrieve fazem o mesmo nas views assíncronas.
+    """
+
+    acoes_cache = ("list", "retrieve")
+
+    def _grupos_da_acao(self, request):
+        """
+        (configuração, grupos, detalhe) quando a ação atual passa pelo cache; senão None.
+        """
+        configuracao = configuracao_cache_respostas()
+        if not configuracao["ATIVO"] or self.action not in self.acoes_cache:
+            return None
+        if transaction.get_connection().in_atomic_block:
+            # Leitura dentro de uma transação (lote com "transacao", core/lote.py):
+            # as escritas dela só invalidam o cache no commit, e podem ser desfeitas.
+            return None
+
+        detalhe = self.action == "retrieve"
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field] if detalhe else None
+        grupos = grupos_da_leitura(self.queryset.model, request.user, pk)
+        if grupos is None:
+            return None
+        return configuracao, grupos, detalhe
+
+    def _responder_com_cache(self, metodo, request, *args, **kwargs):
+        self._entrada_pendente = None
+        acao = self._grupos_da_acao(request)
+        if acao is None:
+            return metodo(request, *args, **kwargs)
+
+        configuracao, grupos, detalhe = acao
+        cache = caches[configuracao["CACHE"]]
+        versoes_grupos = versoes(cache, grupos)
+        chave = chave_resposta(request._request, request.user, request.accepted_media_type or "", versoes_grupos)
+        entrada = cache.get(chave)
+        if entrada is not None:
+            return resposta_guardada(request._request, entrada)
+
+        metricas.falhas += 1
+        self._entrada_pendente = (cache, chave, versoes_grupos, ttl(configuracao, detalhe), configuracao)
+        return metodo(request, *args, **kwargs)
+
+    async def _aresponder_com_cache(self, metodo, request, *args, **kwargs):
+        self._entrada_pendente = None
+        acao = self._grupos_da_acao(request)
+        if acao is None:
+            return await metodo(request, *args, **kwargs)
+
+        configuracao, grupos, detalhe = acao
+        cache = caches[configuracao["CACHE"]]
+        versoes_grupos = await aversoes(cache, grupos)
+        chave = chave_resposta(request._request, request.user, request.accepted_media_type or "", versoes_grupos)
+        entrada = await cache.aget(chave)
+        if entrada is not None:
+            return resposta_guardada(request._request, entrada)
+
+        metricas.falhas += 1
+        self._entrada_pendente = (cache, chave, versoes_grupos, ttl(configuracao, detalhe), configuracao)
+        return await metodo(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self._responder_com_cache(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._responder_com_cache(super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._aresponder_com_cache(super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self._aresponder_com_cache(super().aretrieve, request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        pendente = getattr(self, "_entrada_pendente", None)
+        if pendente is not None and isinstance(response, Response) and response.status_code == 200:
+            self._entrada_pendente = None
+            cache, chave, versoes_grupos, validade, configuracao = pendente
+            # O renderizador já foi escolhido; o Django não renderiza de novo.
+            response.render()
+            entrada = montar_entrada(response, versoes_grupos, configuracao)
+            if entrada is not None:
+                cache.set(chave, entrada, validade)
+        return response
@@ -0,0 +1,184 @@
+"""
+Campos esparsos nas leituras dos viewsets (CamposEsparsosMixin).
+
+?fields=id,status devolve só esses campos; ?exclude=detalhes devolve todos
+menos esses. Os dois podem vir juntos, e a ordem da resposta é sempre a do
+serializer. Só valem os campos que o serializer devolve: um nome inexistente
+ou só de escrita (como "senha") responde 400.
+
+A restrição chega ao SQL:
+
+* no caminho rápido (core/serializacao_rapida.py), o .values() lê apenas as
+  colunas dos campos pedidos, e as relações aninhadas que ficaram de fora
+  deixam de gerar JOIN;
+* no caminho normal, o queryset recebe .only() com essas colunas e mantém só
+  os select_related que os serializers aninhados pedidos usam. Isso também
+  vale sem ?fields=: as relações devolvidas apenas como chave primária (o
+  paciente de uma consulta, por exemplo) não precisam de JOIN.
+
+Os campos de ordenação do cursor sempre são lidos, para montar next/previous.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .serializacao_rapida import campos_ordenacao
+
+PARAMETRO_CAMPOS = "fields"
+PARAMETRO_EXCLUIR = "exclude"
+
+_legiveis = {}
+_colunas = {}
+
+
+def campos_legiveis(classe_serializer):
+    """
+    Nomes dos campos devolvidos pelo serializer, na ordem da resposta.
+    """
+    if classe_serializer not in _legiveis:
+        _legiveis[classe_serializer] = tuple(campo.field_name for campo in classe_serializer()._readable_fields)
+    return _legiveis[classe_serializer]
+
+
+def _nomes(params, parametro):
+    # Aceita tanto ?fields=a,b quanto ?fields=a&fields=b.
+    return [nome.strip() for valor in params.getlist(parametro) for nome in valor.split(",") if nome.strip()]
+
+
+def campos_pedidos(params, classe_serializer):
+    """
+    Campos pedidos em ?fields=/?exclude=, na ordem do serializer, ou None
+    quando a resposta leva todos eles.
+    """
+    incluir = _nomes(params, PARAMETRO_CAMPOS)
+    excluir = _nomes(params, PARAMETRO_EXCLUIR)
+    if not incluir and not excluir:
+        return None
+
+    legiveis = campos_legiveis(classe_serializer)
+    for parametro, nomes in ((PARAMETRO_CAMPOS, incluir), (PARAMETRO_EXCLUIR, excluir)):
+        invalidos = [nome for nome in nomes if nome not in legiveis]
+        if invalidos:
+            raise ValidationError({
+                "detalhe": (
+                    f"Campos inválidos em '{parametro}': {', '.join(invalidos)}. "
+                    f"Disponíveis: {', '.join(legiveis)}."
+                )
+            })
+
+    campos = tuple(nome for nome in legiveis if (not incluir or nome in incluir) and nome not in excluir)
+    if not campos:
+        raise ValidationError({"detalhe": "Nenhum campo sobrou para a resposta."})
+    return None if campos == legiveis else campos
+
+
+def _calcular_colunas(serializer, campos, prefixo=""):
+    modelo = getattr(getattr(serializer, "Meta", None), "model", None)
+    if modelo is None:
+        return None
+    caminhos = [prefixo + modelo._meta.pk.name]
+    relacoes = []
+    for campo in serializer._readable_fields:
+        if campos is not None and campo.field_name not in campos:
+            continue
+        if len(campo.source_attrs) != 1:
+            return None
+        try:
+            campo_modelo = modelo._meta.get_field(campo.source)
+        except FieldDoesNotExist:
+            return None
+        if not campo_modelo.concrete:
+            return None
+
+        caminho = prefixo + campo.source
+        caminhos.append(caminho)
+        if isinstance(campo, serializers.BaseSerializer):
+            if getattr(campo, "many", False):
+                return None
+            aninhado = _calcular_colunas(campo, None, f"{caminho}__")
+            if aninhado is None:
+                return None
+            caminhos.extend(aninhado[0])
+            relacoes.append(caminho)
+            relacoes.extend(aninhado[1])
+    return caminhos, relacoes
+
+
+def colunas(classe_serializer, campos=None):
+    """
+    (caminhos para .only(), relações para select_related) que bastam para
+    serializar "campos", ou None se algum deles não vem direto de uma coluna
+    do modelo (campo calculado, source com pontos, relação "many"...).
+    """
+    chave = (classe_serializer, campos)
+    if chave not in _colunas:
+        _colunas[chave] = _calcular_colunas(classe_serializer(), campos)
+    return _colunas[chave]
+
+
+def restringir_queryset(queryset, classe_serializer, campos=None, extras=()):
+    """
+    Queryset que carrega só as colunas e os JOINs usados pelos campos (e pelos
+    "extras", como os campos de ordenação). Sem como saber, fica como está.
+    """
+    resultado = colunas(classe_serializer, campos)
+    if resultado is None:
+        return queryset
+    caminhos, relacoes = resultado
+    queryset = queryset.select_related(None)
+    if relacoes:
+        queryset = queryset.select_related(*relacoes)
+    return queryset.only(*caminhos, *extras)
+
+
+def restringir_serializer(serializer, campos):
+    """
+    Remove do serializer (ou do filho, com many=True) os campos não pedidos.
+    """
+    alvo = serializer.child if isinstance(serializer, serializers.ListSerializer) else serializer
+    for nome in [nome for nome in alvo.fields if nome not in campos]:
+        alvo.fields.pop(nome)
+    return serializer
+
+
+def recortar(dados, campos):
+    """
+    Dados já serializados só com os campos pedidos.
+    """
+    if campos is None:
+        return dados
+    return {nome: valor for nome, valor in dados.items() if nome in campos}
+
+
+class CamposEsparsosMixin:
+    """
+    Viewsets: ?fields=/?exclude= nas ações de "acoes_campos". Deve vir antes
+    de LeituraRapidaMixin, que usa campos_saida() para escolher o mapeamento.
+    """
+
+    acoes_campos = ("list", "retrieve")
+
+    def campos_saida(self):
+        if self.action not in self.acoes_campos:
+            return None
+        if not hasattr(self, "_campos_saida"):
+            self._campos_saida = campos_pedidos(self.request.query_params, self.get_serializer_class())
+        return self._campos_saida
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Pedido inválido responde 400 antes do cache e do GET condicional.
+        self.campos_saida()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in self.acoes_campos:
+            return queryset
+        return restringir_queryset(queryset, self.get_serializer_class(), self.campos_saida(), campos_ordenacao(self))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        campos = self.campos_saida()
+        if campos is not None:
+            restringir_serializer(serializer, campos)
+        return serializer
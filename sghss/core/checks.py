@@ -0,0 +1,62 @@
+"""
+Verificações do sistema (manage.py check, runserver, servir) para os caches
+que precisam ser vistos por todos os processos do servidor. O "servir" com
+mais de um trabalhador recusa-se a subir se algum deles for de cada processo.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning, register
+
+from .autenticacao import configuracao_cache_token
+from .cache_respostas import configuracao_cache_respostas
+from .roteamento import configuracao_replicas
+
+DICA = (
+    "Aponte \"CACHE\" para um alias de CACHES compartilhado entre os processos (core.cache_arquivo."
+    "CacheArquivo, Redis, Memcached) ou sirva a aplicação com um único processo."
+)
+
+
+def cache_do_processo(alias):
+    """
+    Indica se o alias de settings.CACHES (None: o cache em memória do
+    próprio recurso) guarda as entradas só na memória de cada processo.
+    """
+    return alias is None or isinstance(caches[alias], LocMemCache)
+
+
+def caches_do_processo():
+    """
+    [(id, mensagem)] dos recursos ligados cujo cache não é compartilhado
+    entre os processos do servidor.
+    """
+    problemas = []
+    token = configuracao_cache_token()
+    if token["ATIVO"] and cache_do_processo(token["CACHE"]):
+        problemas.append((
+            "sghss.W001",
+            "O cache de tokens (SGHSS_CACHE_TOKEN) é de cada processo: logout e desativação de "
+            f"usuários só valem no processo que os atendeu, e os demais aceitam o token por até {token['TTL']} s.",
+        ))
+    respostas = configuracao_cache_respostas()
+    if respostas["ATIVO"] and cache_do_processo(respostas["CACHE"]):
+        problemas.append((
+            "sghss.W002",
+            "O cache de respostas (SGHSS_CACHE_RESPOSTAS) é de cada processo: as invalidações feitas "
+            "num processo não chegam aos demais, que servem listagens e detalhes desatualizados por até "
+            f"{max(respostas['TTL_LISTA'], respostas['TTL_DETALHE'])} s.",
+        ))
+    replicas = configuracao_replicas()
+    if replicas["REPLICAS"] and cache_do_processo(replicas["CACHE"]):
+        problemas.append((
+            "sghss.W003",
+            "A marca de \"preso ao principal\" (SGHSS_REPLICAS) é de cada processo: quem acabou de "
+            "escrever pode ser atendido por outro processo e ler de uma réplica desatualizada nos "
+            f"{replicas['JANELA_PRIMARIO']} s seguintes.",
+        ))
+    return problemas
+
+
+@register()
+def verificar_caches(app_configs, **kwargs):
+    return [Warning(mensagem, hint=DICA, id=codigo) for codigo, mensagem in caches_do_processo()]
@@ -0,0 +1,131 @@
+"""
+GET condicional (ETag / Last-Modified) para list/retrieve.
+
+Os validadores saem de uma consulta barata, feita antes de ler e serializar
+os dados:
+
+* listagem: MAX(atualizado_em) e COUNT(*) do queryset já restrito ao papel
+  do usuário e filtrado. A contagem cobre exclusões, que não mudam o MAX.
+  Só há ETag: nenhuma data representa uma exclusão, então Last-Modified
+  faria um If-Modified-Since devolver 304 com a lista desatualizada;
+* detalhe: atualizado_em da própria linha, como ETag e Last-Modified.
+
+O ETag também leva o caminho com a query string (página, filtros), o
+usuário e o formato da resposta. Se o cliente já tem a versão atual, a
+resposta é um 304 sem corpo.
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+CAMPO_MODIFICACAO = "atualizado_em"
+
+
+def calcular_etag(request, usuario, formato, *validadores):
+    partes = [request.get_full_path(), str(usuario.pk), formato, *(str(valor) for valor in validadores)]
+    resumo = hashlib.blake2b("\n".join(partes).encode(), digest_size=16).hexdigest()
+    return f'W/"{resumo}"'
+
+
+def validadores_lista(queryset, campo=CAMPO_MODIFICACAO):
+    totais = queryset.order_by().aggregate(ultima=Max(campo), total=Count("pk"))
+    return totais["ultima"], totais["total"]
+
+
+async def avalidadores_lista(queryset, campo=CAMPO_MODIFICACAO):
+    totais = await queryset.order_by().aaggregate(ultima=Max(campo), total=Count("pk"))
+    return totais["ultima"], totais["total"]
+
+
+def resposta_nao_modificada(request, etag, ultima_modificacao=None):
+    """
+    HttpResponseNotModified se os cabeçalhos condicionais da requisição
+    (If-None-Match / If-Modified-Since) batem com os validadores; senão None.
+    """
+    timestamp = int(ultima_modificacao.timestamp()) if ultima_modificacao else None
+    resposta = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if isinstance(resposta, HttpResponseNotModified):
+        aplicar_validadores(resposta, etag, ultima_modificacao)
+        return resposta
+    return None
+
+
+def aplicar_validadores(resposta, etag, ultima_modificacao=None):
+    resposta["ETag"] = etag
+    if ultima_modificacao is not None:
+        resposta["Last-Modified"] = http_date(ultima_modificacao.timestamp())
+    # Resposta de um usuário: o cliente guarda e revalida a cada uso.
+    patch_cache_control(resposta, private=True, no_cache=True)
+    patch_vary_headers(resposta, ("Authorization",))
+    return resposta
+
+
+class RespostaCondicionalMixin:
+    """
+    Viewsets cujo modelo tem "campo_modificacao": list/retrieve respondem 304
+    quando o cliente manda If-None-Match/If-Modified-Since ainda válidos.
+    Custa uma consulta a mais quando a resposta completa é necessária.
+    alist/aretrieve fazem o mesmo nas views assíncronas.
+    """
+
+    campo_modificacao = CAMPO_MODIFICACAO
+
+    def _formato(self):
+        return getattr(self.request, "accepted_media_type", "") or ""
+
+    def list(self, request, *args, **kwargs):
+        ultima, total = validadores_lista(self.filter_queryset(self.get_queryset()), self.campo_modificacao)
+        etag = calcular_etag(request._request, request.user, self._formato(), ultima, total)
+        nao_modificada = resposta_nao_modificada(request._request, etag)
+        if nao_modificada is not None:
+            return nao_modificada
+        return aplicar_validadores(super().list(request, *args, **kwargs), etag)
+
+    def _filtro_detalhe(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return (
+            self.filter_queryset(self.get_queryset())
+            .filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            .values_list(self.campo_modificacao, flat=True)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            ultima = self._filtro_detalhe().first()
+        except (TypeError, ValueError, DjangoValidationError):
+            ultima = None
+        if ultima is None:
+            # Inexistente (ou pk inválida): o caminho normal responde o 404.
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = calcular_etag(request._request, request.user, self._formato(), ultima)
+        nao_modificada = resposta_nao_modificada(request._request, etag, ultima)
+        if nao_modificada is not None:
+            return nao_modificada
+        return aplicar_validadores(super().retrieve(request, *args, **kwargs), etag, ultima)
+
+    async def alist(self, request, *args, **kwargs):
+        ultima, total = await avalidadores_lista(self.filter_queryset(self.get_queryset()), self.campo_modificacao)
+        etag = calcular_etag(request._request, request.user, self._formato(), ultima, total)
+        nao_modificada = resposta_nao_modificada(request._request, etag)
+        if nao_modificada is not None:
+            return nao_modificada
+        return aplicar_validadores(await super().alist(request, *args, **kwargs), etag)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        try:
+            ultima = await self._filtro_detalhe().afirst()
+        except (TypeError, ValueError, DjangoValidationError):
+            ultima = None
+        if ultima is None:
+            return await super().aretrieve(request, *args, **kwargs)
+
+        etag = calcular_etag(request._request, request.user, self._formato(), ultima)
+        nao_modificada = resposta_nao_modificada(request._request, etag, ultima)
+        if nao_modificada is not None:
+            return nao_modificada
+        return aplicar_validadores(await super().aretrieve(request, *args, **kwargs), etag, ultima)
@@ -0,0 +1,280 @@
+"""
+Contadores pré-agregados para o painel de /api/estatisticas/.
+
+EstatisticaConsulta guarda quantas consultas há por dia, profissional, status
+e tipo de atendimento; EstatisticaLogin, quantos logins houve por dia. Os
+contadores são ajustados a cada consulta criada, alterada (status, data,
+profissional ou tipo) ou excluída e a cada login gravado pelo sink de
+auditoria (sinal logs_gravados), tudo em core/signals.py. O painel lê só
+essas tabelas: o custo depende do período pedido, não do tamanho do
+histórico. Gravações em massa que não
+passam pelo save() (bulk_create, update) exigem "reconstruir_estatisticas".
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import reduce
+from operator import or_
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import arquivo_logs
+from .models import Consulta, LogAcao, EstatisticaConsulta, EstatisticaLogin
+
+STATUS_CANCELAMENTO = (
+    Consulta.STATUS_CANCELADA_PACIENTE,
+    Consulta.STATUS_CANCELADA_PROFISSIONAL,
+    Consulta.STATUS_CANCELADA_ADMIN,
+)
+CAMPOS_CHAVE = ("data", "profissional_id", "status", "tipo_atendimento")
+# Chaves por instrução em aplicar_movimentos (4 parâmetros cada).
+TAMANHO_LOTE_CHAVES = 200
+
+_ajustes_em_lote = ContextVar("estatisticas_em_lote", default=False)
+
+
+@contextmanager
+def ajustes_em_lote():
+    """
+    Desliga o ajuste por instância feito nos sinais de Consulta; quem usa
+    ajusta os contadores de uma vez com aplicar_movimentos.
+    """
+    marcador = _ajustes_em_lote.set(True)
+    try:
+        yield
+    finally:
+        _ajustes_em_lote.reset(marcador)
+
+
+def ajuste_por_instancia():
+    return not _ajustes_em_lote.get()
+
+
+def _somar(modelo, chave, delta, banco):
+    atualizadas = modelo.objects.using(banco).filter(**chave).update(quantidade=F("quantidade") + delta)
+    # Sem linha para decrementar: ela foi removida junto com o profissional.
+    if atualizadas or delta < 0:
+        return
+    try:
+        with transaction.atomic(using=banco):
+            modelo.objects.using(banco).create(quantidade=delta, **chave)
+    except IntegrityError:
+        # Criada por outra transação entre o UPDATE e o INSERT.
+        modelo.objects.using(banco).filter(**chave).update(quantidade=F("quantidade") + delta)
+
+
+def _campos_consulta(chave):
+    return dict(zip(CAMPOS_CHAVE, chave))
+
+
+def chave_gravada(consulta_id, banco=DEFAULT_DB_ALIAS):
+    """
+    Chave estatística da consulta como está no banco (None se não existe).
+    """
+    consulta = (
+        Consulta.objects.using(banco)
+        .only("data_horario", "profissional_id", "status", "tipo_atendimento")
+        .filter(pk=consulta_id)
+        .first()
+    )
+    return consulta.chave_estatistica() if consulta else None
+
+
+def mover_consulta(anterior, atual, banco=DEFAULT_DB_ALIAS):
+    """
+    Tira a consulta do contador "anterior" e a soma em "atual" (chaves de
+    Consulta.chave_estatistica; None significa que ela não existia/deixou de existir).
+    """
+    if anterior == atual:
+        return
+    if anterior is None or atual is None:
+        chave, delta = (atual, 1) if anterior is None else (anterior, -1)
+        _somar(EstatisticaConsulta, _campos_consulta(chave), delta, banco)
+        return
+
+    # Mudança de status/data/tipo: os dois contadores num único UPDATE.
+    filtro_anterior = Q(**_campos_consulta(anterior))
+    atualizadas = (
+        EstatisticaConsulta.objects.using(banco)
+        .filter(filtro_anterior | Q(**_campos_consulta(atual)))
+        .update(quantidade=F("quantidade") + Case(When(filtro_anterior, then=Value(-1)), default=Value(1)))
+    )
+    if atualizadas < 2:
+        try:
+            with transaction.atomic(using=banco):
+                EstatisticaConsulta.objects.using(banco).create(quantidade=1, **_campos_consulta(atual))
+        except IntegrityError:
+            # O contador "atual" já existia: ou foi somado acima (faltava o
+            # anterior) ou acabou de ser criado por outra transação.
+            if not atualizadas:
+                _somar(EstatisticaConsulta, _campos_consulta(atual), 1, banco)
+
+
+def contar_chaves(consultas):
+    """
+    Quantas consultas do queryset há em cada chave estatística (uma consulta SQL).
+    """
+    linhas = (
+        consultas.annotate(data=TruncDate("data_horario"))
+        .values_list(*CAMPOS_CHAVE)
+        .annotate(quantidade=Count("id"))
+        .order_by()
+    )
+    return Counter({tuple(linha[:4]): linha[4] for linha in linhas})
+
+
+def aplicar_movimentos(movimentos, banco=DEFAULT_DB_ALIAS):
+    """
+    Soma {chave: delta} aos contadores com um SELECT, um UPDATE e, se preciso,
+    um INSERT por lote de chaves, qualquer que seja o número de consultas.
+    """
+    chaves = [chave for chave, delta in movimentos.items() if delta]
+    for inicio in range(0, len(chaves), TAMANHO_LOTE_CHAVES):
+        lote = chaves[inicio:inicio + TAMANHO_LOTE_CHAVES]
+        contadores = EstatisticaConsulta.objects.using(banco)
+        existentes = set(
+            contadores.filter(reduce(or_, (Q(**_campos_consulta(chave)) for chave in lote))).values_list(*CAMPOS_CHAVE)
+        )
+        if existentes:
+            filtros = {chave: Q(**_campos_consulta(chave)) for chave in existentes}
+            contadores.filter(reduce(or_, filtros.values())).update(
+                quantidade=F("quantidade") + Case(
+                    *(When(filtro, then=Value(movimentos[chave])) for chave, filtro in filtros.items()),
+                    default=Value(0),
+                )
+            )
+        contadores.bulk_create([
+            EstatisticaConsulta(quantidade=movimentos[chave], **_campos_consulta(chave))
+            for chave in lote
+            if chave not in existentes and movimentos[chave] > 0
+        ])
+
+
+def excluir_com_consultas(instancia, consultas):
+    """
+    Exclui um paciente ou profissional cujas consultas ("consultas") caem em
+    cascata, descontando-as dos contadores de uma vez em vez de uma a uma.
+    """
+    banco = instancia._state.db or DEFAULT_DB_ALIAS
+    with transaction.atomic(using=banco), ajustes_em_lote():
+        movimentos = {chave: -quantidade for chave, quantidade in contar_chaves(consultas).items()}
+        instancia.delete()
+        aplicar_movimentos(movimentos, banco)
+
+
+def contabilizar_logins(logs, banco=DEFAULT_DB_ALIAS):
+    por_dia = Counter(timezone.localdate(log.data_hora) for log in logs if log.acao == LogAcao.ACAO_LOGIN)
+    for data, quantidade in sorted(por_dia.items()):
+        _somar(EstatisticaLogin, {"data": data}, quantidade, banco)
+
+
+def _gravar_em_lotes(modelo, linhas, tamanho_lote, banco):
+    total = 0
+    lote = []
+    for linha in linhas:
+        lote.append(modelo(**linha))
+        if len(lote) >= tamanho_lote:
+            modelo.objects.using(banco).bulk_create(lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        modelo.objects.using(banco).bulk_create(lote)
+        total += len(lote)
+    return total
+
+
+def reconstruir(banco=DEFAULT_DB_ALIAS, tamanho_lote=1000):
+    """
+    Recalcula os contadores a partir de Consulta e LogAcao, numa transação.
+    Devolve a quantidade de linhas gravadas em cada tabela.
+    """
+    with transaction.atomic(using=banco):
+        EstatisticaConsulta.objects.using(banco).all().delete()
+        EstatisticaLogin.objects.using(banco).all().delete()
+
+        consultas = (
+            Consulta.objects.using(banco)
+            .annotate(data=TruncDate("data_horario"))
+            .values("data", "profissional_id", "status", "tipo_atendimento")
+            .annotate(quantidade=Count("id"))
+            .order_by()
+        )
+        logins = (
+            LogAcao.objects.using(banco)
+            .filter(acao=LogAcao.ACAO_LOGIN)
+            .annotate(data=TruncDate("data_hora"))
+            .values("data")
+            .annotate(quantidade=Count("id"))
+            .order_by()
+        )
+        # Logins já movidos para o arquivo (core/arquivo_logs.py) somam-se aos do banco.
+        por_dia = arquivo_logs.logins_por_dia()
+        for linha in logins:
+            por_dia[linha["data"]] += linha["quantidade"]
+        logins = ({"data": data, "quantidade": quantidade} for data, quantidade in sorted(por_dia.items()))
+        return {
+            "consultas": _gravar_em_lotes(EstatisticaConsulta, consultas.iterator(), tamanho_lote, banco),
+            "logins": _gravar_em_lotes(EstatisticaLogin, logins, tamanho_lote, banco),
+        }
+
+
+def _por_status(totais):
+    return {status: totais.get(status, 0) for status, _ in Consulta.STATUS_CHOICES}
+
+
+def _taxas_cancelamento(por_status, total):
+    taxas = {status: round(por_status[status] / total, 4) if total else 0.0 for status in STATUS_CANCELAMENTO}
+    taxas["total"] = round(sum(por_status[status] for status in STATUS_CANCELAMENTO) / total, 4) if total else 0.0
+    return taxas
+
+
+def painel(inicio, fim, profissional_id=None):
+    """
+    Totais do período [inicio, fim] (datas locais), lidos só das tabelas de
+    estatísticas.
+    """
+    consultas = EstatisticaConsulta.objects.filter(data__gte=inicio, data__lte=fim, quantidade__gt=0)
+    if profissional_id is not None:
+        consultas = consultas.filter(profissional_id=profissional_id)
+
+    por_status = defaultdict(int)
+    por_tipo = defaultdict(int)
+    for linha in consultas.values("status", "tipo_atendimento").annotate(total=Sum("quantidade")).order_by():
+        por_status[linha["status"]] += linha["total"]
+        por_tipo[linha["tipo_atendimento"]] += linha["total"]
+    por_status = _por_status(por_status)
+    total = sum(por_status.values())
+
+    profissionais = defaultdict(dict)
+    for linha in consultas.values("profissional_id", "status").annotate(total=Sum("quantidade")).order_by():
+        profissionais[linha["profissional_id"]][linha["status"]] = linha["total"]
+
+    dias = defaultdict(dict)
+    for linha in consultas.values("data", "status").annotate(total=Sum("quantidade")).order_by():
+        dias[linha["data"]][linha["status"]] = linha["total"]
+
+    logins = EstatisticaLogin.objects.filter(data__gte=inicio, data__lte=fim).order_by("data")
+
+    def resumo(totais):
+        totais = _por_status(totais)
+        soma = sum(totais.values())
+        return {"total": soma, "por_status": totais, "taxa_cancelamento": _taxas_cancelamento(totais, soma)["total"]}
+
+    return {
+        "periodo": {"de": inicio.isoformat(), "ate": fim.isoformat()},
+        "consultas": {
+            "total": total,
+            "por_status": por_status,
+            "por_tipo_atendimento": {tipo: por_tipo.get(tipo, 0) for tipo, _ in Consulta.TIPO_CHOICES},
+            "taxa_cancelamento": _taxas_cancelamento(por_status, total),
+            "por_profissional": [
+                {"profissional": profissional_id, **resumo(totais)}
+                for profissional_id, totais in sorted(profissionais.items())
+            ],
+            "por_dia": [{"data": data.isoformat(), **resumo(totais)} for data, totais in sorted(dias.items())],
+        },
+        "logins_por_dia": [{"data": log.data.isoformat(), "quantidade": log.quantidade} for log in logins],
+    }
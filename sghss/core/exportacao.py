@@ -0,0 +1,179 @@
+"""
+Exportação em fluxo (CSV ou NDJSON, opcionalmente gzip) de consultas e logs.
+As linhas são lidas do banco em blocos com iterator(chunk_size=...) e
+convertidas uma a uma, então a memória usada não depende do tamanho da tabela.
+Os logs incluem os arquivados (core/arquivo_logs.py), lidos um membro por vez.
+"""
+import csv
+import json
+import zlib
+from datetime import date, datetime, time
+from itertools import chain
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import arquivo_logs
+from .models import Consulta, LogAcao
+
+TAMANHO_BLOCO = 2000
+# Quantidade de bytes acumulados antes de entregar um pedaço ao cliente.
+TAMANHO_PEDACO = 64 * 1024
+
+EXPORTACOES = {
+    "consultas": {
+        "modelo": Consulta,
+        "campo_data": "data_horario",
+        "campos": [
+            "id", "paciente_id", "profissional_id", "administrador_criador_id",
+            "tipo_atendimento", "data_horario", "local", "link_teleconsulta",
+            "status", "justificativa_cancelamento", "criado_em", "atualizado_em",
+        ],
+    },
+    "logs": {
+        "modelo": LogAcao,
+        "campo_data": "data_hora",
+        "campos": [
+            "id", "usuario_id", "usuario__email", "acao", "entidade",
+            "entidade_id", "detalhes", "data_hora", "ip",
+        ],
+    },
+}
+
+FORMATOS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+def ler_data_hora(valor, fim_do_dia=False):
+    """
+    Limite de período ("de"/"ate") da API e do comando exportar_dados:
+    AAAA-MM-DD (início do dia ou, com fim_do_dia, o fim) ou data/hora ISO
+    8601, sem fuso = fuso local. None se vazio; ValueError se inválido.
+    """
+    if valor is None or valor == "":
+        return None
+    try:
+        data = parse_date(valor)
+        data_hora = None if data else parse_datetime(valor)
+    except (TypeError, ValueError):
+        # Fora do formato ou não é texto (corpo JSON).
+        data = data_hora = None
+
+    if data is not None:
+        data_hora = datetime.combine(data, time.max if fim_do_dia else time.min)
+    elif data_hora is None:
+        raise ValueError(f"Data inválida: {valor!r}.")
+
+    if timezone.is_naive(data_hora):
+        data_hora = timezone.make_aware(data_hora)
+    return data_hora
+
+
+def _valor(valor):
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
+
+
+def consultar(tipo, inicio=None, fim=None, banco=None):
+    """
+    Tuplas com os campos da exportação, em ordem de id. Nos logs, os
+    arquivados vêm antes dos do banco; quem os lê segura
+    arquivo_logs.travar_leitura() (gerar_exportacao já faz isso).
+    """
+    definicao = EXPORTACOES[tipo]
+    campo_data = definicao["campo_data"]
+    queryset = definicao["modelo"].objects.using(banco).order_by("id")
+    if inicio is not None:
+        queryset = queryset.filter(**{f"{campo_data}__gte": inicio})
+    if fim is not None:
+        queryset = queryset.filter(**{f"{campo_data}__lte": fim})
+    linhas = queryset.values_list(*definicao["campos"]).iterator(chunk_size=TAMANHO_BLOCO)
+    if tipo == "logs":
+        return chain(_logs_arquivados(definicao["campos"], inicio, fim, banco), linhas)
+    return linhas
+
+
+def _logs_arquivados(campos, inicio, fim, banco):
+    for logs in arquivo_logs.exportar(inicio, fim, banco):
+        for valores in arquivo_logs.como_valores(logs, campos):
+            yield tuple(valores[campo] for campo in campos)
+
+
+class _Eco:
+    """
+    "Arquivo" que apenas devolve o que recebe, para usar csv.writer em fluxo.
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def _linhas_csv(campos, linhas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([campo.replace("__", "_") for campo in campos])
+    for linha in linhas:
+        yield escritor.writerow(["" if v is None else _valor(v) for v in linha])
+
+
+def _linhas_ndjson(campos, linhas):
+    nomes = [campo.replace("__", "_") for campo in campos]
+    for linha in linhas:
+        yield json.dumps(dict(zip(nomes, map(_valor, linha))), ensure_ascii=False) + "\n"
+
+
+def _agrupar(textos):
+    pedaco = []
+    tamanho = 0
+    for texto in textos:
+        dados = texto.encode("utf-8")
+        pedaco.append(dados)
+        tamanho += len(dados)
+        if tamanho >= TAMANHO_PEDACO:
+            yield b"".join(pedaco)
+            pedaco = []
+            tamanho = 0
+    if pedaco:
+        yield b"".join(pedaco)
+
+
+def _comprimir(pedacos):
+    compressor = zlib.compressobj(wbits=31)  # 31 = cabeçalho gzip
+    for pedaco in pedacos:
+        comprimido = compressor.compress(pedaco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+
+def _liberando(pedacos, trava):
+    try:
+        yield from pedacos
+    finally:
+        trava.close()
+
+
+def gerar_exportacao(tipo, formato="csv", inicio=None, fim=None, comprimir=False, banco=None):
+    """
+    Gera os bytes da exportação em pedaços de ~64 KB. "banco" fixa o alias
+    lido, já que as linhas só são consultadas durante o envio da resposta.
+    Nos logs, a trava de leitura do arquivo é obtida já na chamada (ou
+    ArquivamentoEmAndamento é levantada) e liberada ao fim do envio.
+    """
+    campos = EXPORTACOES[tipo]["campos"]
+    trava = arquivo_logs.travar_leitura() if tipo == "logs" else None
+    linhas = consultar(tipo, inicio, fim, banco)
+    textos = _linhas_csv(campos, linhas) if formato == "csv" else _linhas_ndjson(campos, linhas)
+    pedacos = _agrupar(textos)
+    if comprimir:
+        pedacos = _comprimir(pedacos)
+    return pedacos if trava is None else _liberando(pedacos, trava)
+
+
+def nome_arquivo(tipo, formato, comprimir=False):
+    nome = f"{tipo}-{timezone.localtime():%Y%m%d-%H%M%S}.{FORMATOS[formato][1]}"
+    return nome + ".gz" if comprimir else nome
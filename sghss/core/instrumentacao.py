@@ -0,0 +1,236 @@
+"""
+Instrumentação de SQL por requisição (opcional, ver SGHSS_INSTRUMENTACAO).
+
+Para cada requisição são medidos o número de instruções SQL, o tempo total
+gasto no banco, as instruções mais lentas e os "formatos" de SQL repetidos
+(mesma instrução com parâmetros diferentes, o sintoma típico de N+1). O
+resultado vai no cabeçalho Server-Timing e numa linha de log em JSON.
+
+No modo estrito, usado nos testes, uma requisição que executa mais SQL que o
+orçamento declarado na view ("orcamento_sql") termina com OrcamentoSQLExcedido.
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+CONFIGURACAO_PADRAO = {
+    "ATIVO": False,
+    "MODO_ESTRITO": False,
+    # Quantas instruções mais lentas entram no log.
+    "MAIS_LENTAS": 3,
+    "CABECALHO": True,
+    "LOG": True,
+}
+
+_LISTA_IN = re.compile(r"IN \((?:%s|\?)(?:, (?:%s|\?))*\)")
+
+
+def configuracao_instrumentacao():
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    configuracao.update(getattr(settings, "SGHSS_INSTRUMENTACAO", {}))
+    return configuracao
+
+
+class OrcamentoSQLExcedido(Exception):
+    pass
+
+
+def formato_sql(sql):
+    """
+    Forma da instrução sem os parâmetros; listas IN de tamanhos diferentes
+    contam como o mesmo formato.
+    """
+    return _LISTA_IN.sub("IN (...)", sql)
+
+
+# Registro da requisição em andamento. Uma ContextVar também é vista pelas
+# threads do sync_to_async, onde o ORM assíncrono executa o SQL.
+_registro_atual = ContextVar("registro_sql", default=None)
+
+
+# Controle de transação (BEGIN, SAVEPOINT...) não conta: varia entre testes e
+# produção e não indica consulta desnecessária.
+_CONTROLE_TRANSACAO = ("BEGIN", "SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+def _gravar(execute, sql, params, many, context):
+    registro = _registro_atual.get()
+    if registro is None or sql.startswith(_CONTROLE_TRANSACAO):
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        registro.instrucoes.append((sql, time.perf_counter() - inicio))
+
+
+def _instalar(conexao):
+    if _gravar not in conexao.execute_wrappers:
+        conexao.execute_wrappers.append(_gravar)
+
+
+def instalar_nas_conexoes():
+    """
+    Garante o _gravar nas conexões da thread atual; as conexões abertas depois
+    recebem o wrapper pelo sinal connection_created.
+    """
+    for conexao in connections.all():
+        _instalar(conexao)
+
+
+def _ao_conectar(sender, connection, **kwargs):
+    _instalar(connection)
+
+
+connection_created.connect(_ao_conectar)
+
+
+class RegistroSQL:
+    """
+    Instruções (sql, duração) executadas durante uma requisição.
+    """
+
+    def __init__(self):
+        self.instrucoes = []
+
+    @property
+    def quantidade(self):
+        return len(self.instrucoes)
+
+    @property
+    def duracao(self):
+        return sum(duracao for _, duracao in self.instrucoes)
+
+    def mais_lentas(self, limite):
+        lentas = sorted(self.instrucoes, key=lambda item: item[1], reverse=True)[:limite]
+        return [{"sql": sql, "duracao_ms": round(duracao * 1000, 3)} for sql, duracao in lentas]
+
+    def duplicadas(self):
+        contagem = Counter(formato_sql(sql) for sql, _ in self.instrucoes)
+        return [{"sql": sql, "vezes": vezes} for sql, vezes in contagem.most_common() if vezes > 1]
+
+
+def orcamento_da_view(request):
+    """
+    Orçamento de SQL declarado na view que atendeu a requisição: um inteiro ou
+    um dicionário por ação ({"list": 2, "cancelar": 4, ...}).
+    """
+    rota = getattr(request, "resolver_match", None)
+    if rota is None:
+        return None, None
+
+    view = getattr(rota.func, "cls", rota.func)
+    acoes = getattr(rota.func, "actions", None) or {}
+    acao = acoes.get(request.method.lower(), request.method.lower())
+    orcamento = getattr(view, "orcamento_sql", None)
+    if isinstance(orcamento, dict):
+        orcamento = orcamento.get(acao)
+    return f"{view.__name__}.{acao}", orcamento
+
+
+def relatar(request, resposta, registro, duracao_total, configuracao):
+    nome_view, orcamento = orcamento_da_view(request)
+    duracao_sql = registro.duracao
+    duplicadas = registro.duplicadas()
+
+    if configuracao["CABECALHO"]:
+        metricas = [
+            f'sql;dur={duracao_sql * 1000:.2f};desc="{registro.quantidade} instrucoes, {len(duplicadas)} repetidas"',
+            f"total;dur={duracao_total * 1000:.2f}",
+        ]
+        existente = resposta.get("Server-Timing")
+        resposta["Server-Timing"] = ", ".join(([existente] if existente else []) + metricas)
+
+    if configuracao["LOG"]:
+        dados = {
+            "metodo": request.method,
+            "caminho": request.path,
+            "view": nome_view,
+            "status": resposta.status_code,
+            "duracao_ms": round(duracao_total * 1000, 3),
+            "sql": {
+                "quantidade": registro.quantidade,
+                "duracao_ms": round(duracao_sql * 1000, 3),
+                "orcamento": orcamento,
+                "mais_lentas": registro.mais_lentas(configuracao["MAIS_LENTAS"]),
+                "repetidas": duplicadas,
+            },
+        }
+        nivel = logging.WARNING if duplicadas or (orcamento is not None and registro.quantidade > orcamento) else logging.INFO
+        logger.log(nivel, json.dumps(dados, ensure_ascii=False), extra={"instrumentacao": dados})
+
+    if configuracao["MODO_ESTRITO"] and orcamento is not None and registro.quantidade > orcamento:
+        formatos = "\n".join(f"  {item['vezes']}x {item['sql']}" for item in duplicadas)
+        raise OrcamentoSQLExcedido(
+            f"{request.method} {request.path} ({nome_view}) executou {registro.quantidade} instruções SQL; "
+            f"orçamento: {orcamento}." + (f"\nRepetidas:\n{formatos}" if formatos else "")
+        )
+
+
+def instrumentar(request, get_response):
+    configuracao = configuracao_instrumentacao()
+    if not configuracao["ATIVO"]:
+        return get_response(request)
+
+    instalar_nas_conexoes()
+    registro = RegistroSQL()
+    marcador = _registro_atual.set(registro)
+    inicio = time.perf_counter()
+    try:
+        resposta = get_response(request)
+    finally:
+        _registro_atual.reset(marcador)
+    relatar(request, resposta, registro, time.perf_counter() - inicio, configuracao)
+    return resposta
+
+
+async def ainstrumentar(request, get_response):
+    configuracao = configuracao_instrumentacao()
+    if not configuracao["ATIVO"]:
+        return await get_response(request)
+
+    # As conexões usadas pelo ORM assíncrono pertencem à thread do sync_to_async.
+    await sync_to_async(instalar_nas_conexoes)()
+    registro = RegistroSQL()
+    marcador = _registro_atual.set(registro)
+    inicio = time.perf_counter()
+    try:
+        resposta = await get_response(request)
+    finally:
+        _registro_atual.reset(marcador)
+    relatar(request, resposta, registro, time.perf_counter() - inicio, configuracao)
+    return resposta
+
+
+def instrumentar_interna(request, executar):
+    """
+    Sub-requisição atendida dentro de outra (requisições em lote, core/lote.py):
+    o SQL dela é medido à parte e comparado com o orçamento da view que a
+    atende, não com o da requisição externa. Roda também em threads do pool
+    do lote, desde que no contexto copiado da requisição externa.
+    """
+    configuracao = configuracao_instrumentacao()
+    if not configuracao["ATIVO"]:
+        return executar(request)
+
+    instalar_nas_conexoes()
+    registro = RegistroSQL()
+    marcador = _registro_atual.set(registro)
+    inicio = time.perf_counter()
+    try:
+        resposta = executar(request)
+    finally:
+        _registro_atual.reset(marcador)
+    # A resposta da sub-requisição não chega ao cliente com cabeçalhos próprios.
+    relatar(request, resposta, registro, time.perf_counter() - inicio, {**configuracao, "CABECALHO": False})
+    return resposta
@@ -0,0 +1,438 @@
+"""
+Lembretes de consulta (por padrão 24 h e 1 h antes de data_horario).
+
+A fila fica em LembreteConsulta: uma linha por lembrete ainda a enviar,
+criada quando a consulta é agendada e refeita quando a data ou o status
+mudam (sinais de Consulta e cancelamento em lote). O trabalhador
+("python manage.py processar_lembretes") nunca varre Consulta: lê os
+próximos pendentes pelo índice parcial (enviar_em, id), guarda-os num heap
+em memória e dorme até o primeiro vencer.
+
+Vários trabalhadores podem rodar ao mesmo tempo. Cada lote vencido é
+reservado por um único UPDATE que marca as linhas com um token próprio e
+um prazo (RESERVA_SEGUNDOS); só as linhas marcadas com o token são
+enviadas. Se o trabalhador cair, a reserva vence e outro reenvia o lote.
+
+O envio passa por um backend configurável (BACKEND em SGHSS_LEMBRETES):
+BackendConsole escreve as mensagens na saída padrão e BackendArquivo em
+um arquivo JSONL, como substitutos locais de e-mail/SMS.
+"""
+import heapq
+import json
+import logging
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Consulta, LembreteConsulta
+
+logger = logging.getLogger(__name__)
+
+CONFIGURACAO_PADRAO = {
+    "BACKEND": "core.lembretes.BackendConsole",
+    "ANTECEDENCIAS_MINUTOS": [24 * 60, 60],
+    # Lembretes reservados e enviados por vez.
+    "TAMANHO_LOTE": 100,
+    # Próximos pendentes mantidos no heap e intervalo (s) entre releituras da fila.
+    "TAMANHO_HEAP": 1000,
+    "INTERVALO_RECARGA": 30,
+    "RESERVA_SEGUNDOS": 120,
+    "MAX_TENTATIVAS": 5,
+    # Espera (s) antes da primeira nova tentativa; dobra a cada falha.
+    "ESPERA_NOVA_TENTATIVA": 60,
+    "INTERVALO_RELATORIO": 60,
+}
+TAMANHO_LOTE_CONSULTAS = 500
+
+
+def configuracao_lembretes():
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    configuracao.update(getattr(settings, "SGHSS_LEMBRETES", {}))
+    return configuracao
+
+
+def _lembretes(consulta_id, data_horario, agora, antecedencias):
+    # Só os que ainda vencem no futuro: uma consulta marcada para daqui a
+    # 2 horas recebe apenas o lembrete de 1 hora.
+    return [
+        LembreteConsulta(
+            consulta_id=consulta_id,
+            antecedencia_minutos=minutos,
+            enviar_em=data_horario - timedelta(minutes=minutos),
+        )
+        for minutos in antecedencias
+        if data_horario - timedelta(minutes=minutos) > agora
+    ]
+
+
+def programar(consulta, criada, banco=DEFAULT_DB_ALIAS):
+    """
+    Ajusta a fila depois que a consulta foi salva. Nada muda se a data e o
+    status continuam os mesmos (Consulta._agendamento, lido em from_db).
+    """
+    atual = consulta.agendamento()
+    anterior = None if criada else getattr(consulta, "_agendamento", None)
+    if atual is not None and atual == anterior:
+        return
+    if atual is None:
+        # Instância com campos adiados: a data e o status vêm do banco.
+        reprogramar([consulta.pk], banco)
+    else:
+        if not criada:
+            remover([consulta.pk], banco)
+        data_horario, status = atual
+        if status == Consulta.STATUS_AGENDADA:
+            antecedencias = configuracao_lembretes()["ANTECEDENCIAS_MINUTOS"]
+            LembreteConsulta.objects.using(banco).bulk_create(
+                _lembretes(consulta.pk, data_horario, timezone.now(), antecedencias)
+            )
+    consulta._agendamento = consulta.agendamento()
+
+
+def remover(consultas_ids, banco=DEFAULT_DB_ALIAS):
+    """
+    Tira da fila os lembretes pendentes das consultas (uma instrução). Os já
+    enviados ficam como histórico.
+    """
+    return (
+        LembreteConsulta.objects.using(banco)
+        .filter(consulta_id__in=consultas_ids, status=LembreteConsulta.STATUS_PENDENTE)
+        .delete()[0]
+    )
+
+
+def reprogramar(consultas_ids, banco=DEFAULT_DB_ALIAS):
+    """
+    Refaz os lembretes pendentes das consultas a partir do banco.
+    """
+    antecedencias = configuracao_lembretes()["ANTECEDENCIAS_MINUTOS"]
+    agora = timezone.now()
+    with transaction.atomic(using=banco):
+        remover(consultas_ids, banco)
+        agendadas = Consulta.objects.using(banco).filter(
+            id__in=consultas_ids, status=Consulta.STATUS_AGENDADA, data_horario__gt=agora
+        )
+        novos = [
+            lembrete
+            for consulta_id, data_horario in agendadas.values_list("id", "data_horario")
+            for lembrete in _lembretes(consulta_id, data_horario, agora, antecedencias)
+        ]
+        LembreteConsulta.objects.using(banco).bulk_create(novos)
+    return len(novos)
+
+
+def reconstruir(banco=DEFAULT_DB_ALIAS):
+    """
+    Recria a fila inteira a partir das consultas agendadas no futuro. Use
+    após cargas em massa que não passam pelos sinais. Lembretes já enviados
+    (ou abandonados) não voltam para a fila. Devolve quantos ficaram pendentes.
+    """
+    antecedencias = configuracao_lembretes()["ANTECEDENCIAS_MINUTOS"]
+    agora = timezone.now()
+    total = 0
+    with transaction.atomic(using=banco):
+        LembreteConsulta.objects.using(banco).filter(status=LembreteConsulta.STATUS_PENDENTE).delete()
+        agendadas = Consulta.objects.using(banco).filter(status=Consulta.STATUS_AGENDADA, data_horario__gt=agora)
+        processados = set(
+            LembreteConsulta.objects.using(banco)
+            .filter(consulta__in=agendadas)
+            .values_list("consulta_id", "antecedencia_minutos")
+        )
+        lote = []
+        for consulta_id, data_horario in agendadas.values_list("id", "data_horario").iterator(
+            chunk_size=TAMANHO_LOTE_CONSULTAS
+        ):
+            lote.extend(
+                lembrete for lembrete in _lembretes(consulta_id, data_horario, agora, antecedencias)
+                if (consulta_id, lembrete.antecedencia_minutos) not in processados
+            )
+            if len(lote) >= TAMANHO_LOTE_CONSULTAS:
+                LembreteConsulta.objects.using(banco).bulk_create(lote)
+                total += len(lote)
+                lote = []
+        LembreteConsulta.objects.using(banco).bulk_create(lote)
+        total += len(lote)
+    return total
+
+
+def situacao_fila(banco=DEFAULT_DB_ALIAS):
+    """
+    Pendentes, vencidos e atraso do vencido mais antigo (para /api/metricas/).
+    """
+    agora = timezone.now()
+    totais = LembreteConsulta.objects.using(banco).filter(status=LembreteConsulta.STATUS_PENDENTE).aggregate(
+        pendentes=Count("id"),
+        vencidos=Count("id", filter=Q(enviar_em__lte=agora)),
+        mais_antigo=Min("enviar_em"),
+    )
+    mais_antigo = totais.pop("mais_antigo")
+    atraso = (agora - mais_antigo).total_seconds() if totais["vencidos"] else 0.0
+    return {**totais, "atraso_maximo_s": round(atraso, 3)}
+
+
+def montar_mensagem(lembrete):
+    consulta = lembrete.consulta
+    quando = timezone.localtime(consulta.data_horario).strftime("%d/%m/%Y às %H:%M")
+    if lembrete.antecedencia_minutos % 60:
+        antecedencia = f"{lembrete.antecedencia_minutos} minutos"
+    elif lembrete.antecedencia_minutos == 60:
+        antecedencia = "1 hora"
+    else:
+        antecedencia = f"{lembrete.antecedencia_minutos // 60} horas"
+
+    linhas = [
+        f"Olá, {consulta.paciente.nome_completo}.",
+        f"Sua consulta com {consulta.profissional.nome_completo} ({consulta.profissional.especialidade}) "
+        f"é em {antecedencia}: {quando}.",
+    ]
+    if consulta.tipo_atendimento == Consulta.TIPO_ONLINE:
+        linhas.append(f"Teleconsulta: {consulta.link_teleconsulta}")
+    elif consulta.local:
+        linhas.append(f"Local: {consulta.local}")
+    return {
+        "lembrete_id": lembrete.id,
+        "consulta_id": consulta.id,
+        "destinatario": consulta.paciente.usuario.email,
+        "assunto": f"Lembrete: consulta em {antecedencia}",
+        "texto": "\n".join(linhas),
+    }
+
+
+class BackendLembretes:
+    """
+    Destino das mensagens de lembrete. enviar() levanta uma exceção quando a
+    mensagem não pôde ser entregue.
+    """
+
+    def enviar(self, mensagem):
+        raise NotImplementedError
+
+    def enviar_lote(self, mensagens):
+        """
+        Envia as mensagens e devolve, na mesma ordem, None ou a exceção de cada uma.
+        """
+        erros = []
+        for mensagem in mensagens:
+            try:
+                self.enviar(mensagem)
+            except Exception as erro:
+                erros.append(erro)
+            else:
+                erros.append(None)
+        return erros
+
+    def fechar(self):
+        pass
+
+
+class BackendConsole(BackendLembretes):
+    def __init__(self, **opcoes):
+        self.saida = sys.stdout
+
+    def enviar(self, mensagem):
+        self.saida.write(f"Para: {mensagem['destinatario']}\nAssunto: {mensagem['assunto']}\n{mensagem['texto']}\n\n")
+        self.saida.flush()
+
+
+class BackendArquivo(BackendLembretes):
+    """
+    Acrescenta cada mensagem, como uma linha JSON, a ARQUIVO_ENVIOS.
+    """
+
+    def __init__(self, ARQUIVO_ENVIOS="lembretes_enviados.jsonl", **opcoes):
+        self.arquivo = open(ARQUIVO_ENVIOS, "a", encoding="utf-8")
+
+    def enviar(self, mensagem):
+        self.arquivo.write(json.dumps(mensagem, ensure_ascii=False) + "\n")
+
+    def enviar_lote(self, mensagens):
+        erros = super().enviar_lote(mensagens)
+        self.arquivo.flush()
+        return erros
+
+    def fechar(self):
+        self.arquivo.close()
+
+
+def obter_backend():
+    configuracao = configuracao_lembretes()
+    return import_string(configuracao.pop("BACKEND"))(**configuracao)
+
+
+class MetricasTrabalhador:
+    def __init__(self):
+        self.inicio = time.monotonic()
+        self.enviados = 0
+        self.falhas = 0
+        self.desistencias = 0
+        self.descartados = 0
+        self.reservados_por_outros = 0
+        self.recargas = 0
+        self.atrasos = deque(maxlen=10000)
+        self.maior_atraso = 0.0
+
+    def registrar_envio(self, atraso):
+        self.enviados += 1
+        self.atrasos.append(atraso)
+        self.maior_atraso = max(self.maior_atraso, atraso)
+
+    def como_dict(self):
+        decorrido = time.monotonic() - self.inicio
+        atrasos = sorted(self.atrasos)
+        return {
+            "enviados": self.enviados,
+            "falhas": self.falhas,
+            "desistencias": self.desistencias,
+            "descartados": self.descartados,
+            "reservados_por_outros": self.reservados_por_outros,
+            "recargas": self.recargas,
+            "vazao_por_s": round(self.enviados / decorrido, 3) if decorrido else 0.0,
+            "atraso_p50_s": round(statistics.median(atrasos), 3) if atrasos else 0.0,
+            "atraso_p95_s": round(atrasos[min(len(atrasos) - 1, int(len(atrasos) * 0.95))], 3) if atrasos else 0.0,
+            "atraso_maximo_s": round(self.maior_atraso, 3),
+        }
+
+
+class Trabalhador:
+    """
+    Envia os lembretes vencidos. O heap guarda (enviar_em, id) dos próximos
+    TAMANHO_HEAP pendentes e é relido a cada INTERVALO_RECARGA segundos, o
+    que também traz os lembretes criados depois da última leitura.
+    """
+
+    def __init__(self, backend=None, banco=DEFAULT_DB_ALIAS):
+        self.configuracao = configuracao_lembretes()
+        self.backend = backend or obter_backend()
+        self.banco = banco
+        self.heap = []
+        self.metricas = MetricasTrabalhador()
+
+    def _pendentes(self, agora):
+        return LembreteConsulta.objects.using(self.banco).filter(
+            Q(reservado_ate__isnull=True) | Q(reservado_ate__lt=agora),
+            status=LembreteConsulta.STATUS_PENDENTE,
+        )
+
+    def recarregar(self):
+        """
+        Relê os próximos pendentes (reservas vencidas incluídas) pelo índice
+        parcial. Devolve quantos vieram.
+        """
+        linhas = list(
+            self._pendentes(timezone.now())
+            .order_by("enviar_em", "id")
+            .values_list("enviar_em", "id")[:self.configuracao["TAMANHO_HEAP"]]
+        )
+        # Já vêm ordenados: a lista é um heap válido.
+        self.heap = linhas
+        self.metricas.recargas += 1
+        return len(linhas)
+
+    def vencidos(self, agora):
+        ids = []
+        while self.heap and self.heap[0][0] <= agora and len(ids) < self.configuracao["TAMANHO_LOTE"]:
+            ids.append(heapq.heappop(self.heap)[1])
+        return ids
+
+    def processar(self, ids):
+        """
+        Reserva os lembretes (os que outro trabalhador já reservou ou que
+        saíram da fila ficam de fora), envia e registra o resultado.
+        """
+        token = uuid.uuid4().hex
+        agora = timezone.now()
+        reservados = self._pendentes(agora).filter(id__in=ids, enviar_em__lte=agora).update(
+            reserva=token, reservado_ate=agora + timedelta(seconds=self.configuracao["RESERVA_SEGUNDOS"])
+        )
+        self.metricas.reservados_por_outros += len(ids) - reservados
+        if not reservados:
+            return 0
+
+        lembretes = list(
+            LembreteConsulta.objects.using(self.banco)
+            .filter(reserva=token)
+            .select_related("consulta__paciente__usuario", "consulta__profissional")
+        )
+        # Consulta cancelada entre a leitura do heap e a reserva.
+        descartados = [lembrete.id for lembrete in lembretes if lembrete.consulta.status != Consulta.STATUS_AGENDADA]
+        lembretes = [lembrete for lembrete in lembretes if lembrete.consulta.status == Consulta.STATUS_AGENDADA]
+        if descartados:
+            LembreteConsulta.objects.using(self.banco).filter(id__in=descartados).delete()
+            self.metricas.descartados += len(descartados)
+
+        erros = self.backend.enviar_lote([montar_mensagem(lembrete) for lembrete in lembretes])
+        enviado_em = timezone.now()
+        enviados = [lembrete for lembrete, erro in zip(lembretes, erros) if erro is None]
+        LembreteConsulta.objects.using(self.banco).filter(id__in=[lembrete.id for lembrete in enviados], reserva=token).update(
+            status=LembreteConsulta.STATUS_ENVIADO, enviado_em=enviado_em, tentativas=F("tentativas") + 1,
+            reserva=None, reservado_ate=None, erro=None,
+        )
+        for lembrete in enviados:
+            self.metricas.registrar_envio((enviado_em - lembrete.enviar_em).total_seconds())
+        for lembrete, erro in zip(lembretes, erros):
+            if erro is not None:
+                self._registrar_falha(lembrete, erro, token, enviado_em)
+        return len(enviados)
+
+    def _registrar_falha(self, lembrete, erro, token, agora):
+        logger.warning("Falha ao enviar o lembrete %s: %s", lembrete.id, erro)
+        tentativas = lembrete.tentativas + 1
+        campos = {"tentativas": tentativas, "erro": str(erro), "reserva": None, "reservado_ate": None}
+        if tentativas >= self.configuracao["MAX_TENTATIVAS"]:
+            campos["status"] = LembreteConsulta.STATUS_FALHOU
+            self.metricas.desistencias += 1
+        else:
+            espera = self.configuracao["ESPERA_NOVA_TENTATIVA"] * 2 ** (tentativas - 1)
+            campos["enviar_em"] = agora + timedelta(seconds=espera)
+            heapq.heappush(self.heap, (campos["enviar_em"], lembrete.id))
+        self.metricas.falhas += 1
+        LembreteConsulta.objects.using(self.banco).filter(id=lembrete.id, reserva=token).update(**campos)
+
+    def executar(self, parar=None, uma_vez=False, relatar=None):
+        """
+        Laço principal; termina quando "parar" (threading.Event) é sinalizado.
+        Com uma_vez, envia o que já venceu e retorna.
+        """
+        parar = parar or threading.Event()
+        intervalo = self.configuracao["INTERVALO_RECARGA"]
+        proxima_recarga = time.monotonic()
+        proximo_relatorio = proxima_recarga + self.configuracao["INTERVALO_RELATORIO"]
+        try:
+            while not parar.is_set():
+                close_old_connections()
+                if time.monotonic() >= proxima_recarga:
+                    self.recarregar()
+                    proxima_recarga = time.monotonic() + intervalo
+
+                ids = self.vencidos(timezone.now())
+                if ids:
+                    self.processar(ids)
+                elif uma_vez:
+                    # O heap pode ter sido esgotado: só para se uma releitura não traz nada vencido.
+                    self.recarregar()
+                    if not self.heap or self.heap[0][0] > timezone.now():
+                        break
+
+                if relatar is not None and time.monotonic() >= proximo_relatorio:
+                    relatar(self.metricas.como_dict())
+                    proximo_relatorio = time.monotonic() + self.configuracao["INTERVALO_RELATORIO"]
+                if ids or uma_vez:
+                    continue
+
+                espera = proxima_recarga - time.monotonic()
+                if self.heap:
+                    espera = min(espera, (self.heap[0][0] - timezone.now()).total_seconds())
+                parar.wait(max(espera, 0.01))
+        finally:
+            self.backend.fechar()
+        return self.metricas.como_dict()
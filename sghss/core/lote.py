@@ -0,0 +1,278 @@
+"""
+Requisições em lote (POST /api/batch/, LoteView).
+
+O corpo traz a lista de sub-requisições e as opções do lote:
+
+    {
+      "requisicoes": [
+        {"id": "paciente", "metodo": "GET", "url": "/api/pacientes/7/"},
+        {"id": "consultas", "metodo": "GET", "url": "/api/consultas/?fields=id,status"},
+        {"metodo": "POST", "url": "/api/consultas/", "corpo": {...}}
+      ],
+      "paralelo": true,
+      "transacao": false
+    }
+
+Cada sub-requisição passa pelo roteamento normal (sghss.urls -> core/urls.py)
+e é atendida pela própria view DRF, com as permissões, o cache de respostas,
+a réplica de leitura e o orçamento de SQL dela. O lote economiza o resto: uma
+ida e volta HTTP, uma passagem pelos middlewares e uma autenticação, já que
+as sub-requisições recebem o usuário autenticado do lote (autenticação
+forçada do DRF) sem consultar o token de novo.
+
+* "paralelo": GETs consecutivos rodam ao mesmo tempo num pool de threads
+  (TRABALHADORES). Uma escrita espera os GETs anteriores terminarem, e os
+  seguintes esperam por ela;
+* "transacao": tudo numa única transação, sempre em sequência. A primeira
+  sub-requisição com erro (status >= 400) desfaz o lote inteiro; as
+  seguintes não rodam e respondem 424.
+
+Limites (SGHSS_LOTE): MAX_REQUISICOES por lote e TEMPO_MAXIMO segundos para o
+lote todo. As sub-requisições que não começaram a tempo respondem 504 sem
+ser executadas.
+"""
+import contextvars
+import copy
+import io
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections, transaction
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .instrumentacao import instrumentar_interna
+
+logger = logging.getLogger(__name__)
+
+CONFIGURACAO_PADRAO = {
+    "MAX_REQUISICOES": 20,
+    # Segundos para o lote inteiro.
+    "TEMPO_MAXIMO": 10,
+    # Threads para os GETs de um lote "paralelo"; 1 desliga o paralelismo.
+    "TRABALHADORES": 4,
+}
+
+METODOS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+
+# Cabeçalhos do próprio lote que não valem para as sub-requisições.
+CABECALHOS_DO_LOTE = (
+    "CONTENT_TYPE", "CONTENT_LENGTH", "HTTP_ACCEPT", "HTTP_CONTENT_ENCODING",
+    "HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE", "HTTP_IF_MATCH", "HTTP_IF_UNMODIFIED_SINCE",
+)
+
+
+def configuracao_lote():
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    configuracao.update(getattr(settings, "SGHSS_LOTE", {}))
+    return configuracao
+
+
+_pool = None
+
+
+def obter_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=configuracao_lote()["TRABALHADORES"], thread_name_prefix="lote")
+    return _pool
+
+
+def _invalido(mensagem):
+    return ValidationError({"detalhe": mensagem})
+
+
+def ler_lote(dados, configuracao):
+    """
+    Sub-requisições do corpo do lote, validadas antes de qualquer execução:
+    um lote malformado responde 400 inteiro, sem efeitos parciais.
+    """
+    if not isinstance(dados, dict):
+        raise _invalido("Envie um objeto com a lista 'requisicoes'.")
+    requisicoes = dados.get("requisicoes")
+    if not isinstance(requisicoes, list) or not requisicoes:
+        raise _invalido("Informe ao menos uma requisição em 'requisicoes'.")
+    if len(requisicoes) > configuracao["MAX_REQUISICOES"]:
+        raise _invalido(f"O máximo é de {configuracao['MAX_REQUISICOES']} requisições por lote.")
+
+    itens = []
+    for indice, requisicao in enumerate(requisicoes):
+        if not isinstance(requisicao, dict):
+            raise _invalido(f"Requisição {indice}: envie um objeto com 'metodo' e 'url'.")
+        metodo = str(requisicao.get("metodo", "GET")).upper()
+        if metodo not in METODOS:
+            raise _invalido(f"Requisição {indice}: método inválido. Use {', '.join(METODOS)}.")
+        url = requisicao.get("url")
+        partes = urlsplit(url) if isinstance(url, str) else None
+        if partes is None or partes.scheme or partes.netloc or not partes.path.startswith("/"):
+            raise _invalido(f"Requisição {indice}: informe em 'url' um caminho como /api/consultas/.")
+        if metodo == "GET" and requisicao.get("corpo") is not None:
+            raise _invalido(f"Requisição {indice}: GET não leva 'corpo'.")
+        itens.append({
+            "id": requisicao.get("id", indice),
+            "metodo": metodo,
+            "caminho": partes.path,
+            "query": partes.query,
+            "corpo": requisicao.get("corpo"),
+        })
+    return itens
+
+
+def _resultado(item, status_http, corpo):
+    return {"id": item["id"], "status": status_http, "corpo": corpo}
+
+
+def _rota(item):
+    """
+    View DRF que atende o caminho, ou (status, mensagem) quando ele não pode
+    ser atendido dentro de um lote.
+    """
+    try:
+        # Sempre o urlconf principal: sob ASGI, o da requisição aponta para as views assíncronas.
+        rota = resolve(item["caminho"], urlconf=settings.ROOT_URLCONF)
+    except Resolver404:
+        return None, (status.HTTP_404_NOT_FOUND, "Endereço inexistente.")
+    classe = getattr(rota.func, "cls", None)
+    if classe is None or not issubclass(classe, APIView) or not getattr(classe, "permitir_em_lote", True):
+        return None, (status.HTTP_400_BAD_REQUEST, "Este endereço não pode ser usado em um lote.")
+    return rota, None
+
+
+def _montar(request, item, usuario, token):
+    corpo = b"" if item["corpo"] is None else json.dumps(item["corpo"]).encode("utf-8")
+    ambiente = {
+        chave: valor for chave, valor in request.META.items()
+        if chave not in CABECALHOS_DO_LOTE and not chave.startswith("wsgi.")
+    }
+    ambiente.update({
+        "REQUEST_METHOD": item["metodo"],
+        "PATH_INFO": item["caminho"],
+        "QUERY_STRING": item["query"],
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(corpo)),
+        "HTTP_ACCEPT": "application/json",
+        "wsgi.input": io.BytesIO(corpo),
+        "wsgi.url_scheme": request.scheme,
+    })
+    sub = WSGIRequest(ambiente)
+    # Autenticação forçada do DRF: a view não consulta o token de novo.
+    sub._force_auth_user = copy.copy(usuario)
+    sub._force_auth_token = token
+    return sub
+
+
+def _chamar(rota, sub):
+    try:
+        return rota.func(sub, *rota.args, **rota.kwargs)
+    except Exception:
+        logger.exception("Erro ao atender %s %s em um lote.", sub.method, sub.get_full_path())
+        return Response({"detalhe": "Erro interno ao atender a requisição."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _corpo(resposta):
+    if isinstance(resposta, Response):
+        # Ainda não renderizada: os dados entram direto na resposta do lote.
+        return resposta.data
+    if resposta.streaming or not resposta.content:
+        return None
+    if resposta.get("Content-Type", "").startswith("application/json"):
+        # Resposta vinda do cache de respostas, já em JSON.
+        return json.loads(resposta.content)
+    return resposta.content.decode(resposta.charset, "replace")
+
+
+def atender(request, item, usuario, token, prazo):
+    """
+    Resultado ({"id", "status", "corpo"}) de uma sub-requisição.
+    """
+    if time.monotonic() >= prazo:
+        return _resultado(item, status.HTTP_504_GATEWAY_TIMEOUT, {"detalhe": "Tempo máximo do lote esgotado."})
+    rota, erro = _rota(item)
+    if erro is not None:
+        return _resultado(item, erro[0], {"detalhe": erro[1]})
+
+    sub = _montar(request, item, usuario, token)
+    sub.resolver_match = rota
+    resposta = instrumentar_interna(sub, partial(_chamar, rota))
+    return _resultado(item, resposta.status_code, _corpo(resposta))
+
+
+def _atender_em_thread(*args):
+    try:
+        return atender(*args)
+    finally:
+        # As conexões da thread do pool não passam pelo ciclo de requisição do Django.
+        connections.close_all()
+
+
+def _atender_em_paralelo(request, itens, usuario, token, prazo):
+    if len(itens) == 1 or configuracao_lote()["TRABALHADORES"] <= 1:
+        return [atender(request, item, usuario, token, prazo) for item in itens]
+
+    pool = obter_pool()
+    # Cada tarefa no seu contexto copiado: roteamento de banco e instrumentação da requisição.
+    futuros = [
+        pool.submit(contextvars.copy_context().run, _atender_em_thread, request, item, usuario, token, prazo)
+        for item in itens
+    ]
+    wait(futuros, timeout=max(prazo - time.monotonic(), 0))
+    resultados = []
+    for item, futuro in zip(itens, futuros):
+        if futuro.done():
+            resultados.append(futuro.result())
+        else:
+            futuro.cancel()
+            resultados.append(
+                _resultado(item, status.HTTP_504_GATEWAY_TIMEOUT, {"detalhe": "Tempo máximo do lote esgotado."})
+            )
+    return resultados
+
+
+def executar_lote(request, itens, usuario, token, paralelo=False, transacao=False, configuracao=None):
+    """
+    Resultados das sub-requisições, na ordem do lote, e se a transação foi
+    confirmada (None fora do modo "transacao").
+    """
+    configuracao = configuracao or configuracao_lote()
+    prazo = time.monotonic() + configuracao["TEMPO_MAXIMO"]
+
+    if transacao:
+        resultados = []
+        with transaction.atomic():
+            for indice, item in enumerate(itens):
+                resultado = atender(request, item, usuario, token, prazo)
+                resultados.append(resultado)
+                if resultado["status"] >= 400:
+                    transaction.set_rollback(True)
+                    break
+        if len(resultados) == len(itens) and resultados[-1]["status"] < 400:
+            return resultados, True
+        for item in itens[len(resultados):]:
+            resultados.append(_resultado(
+                item, status.HTTP_424_FAILED_DEPENDENCY,
+                {"detalhe": f"Não executada: o lote foi desfeito pela requisição {indice}."},
+            ))
+        return resultados, False
+
+    resultados = []
+    gets = []
+    for item in itens:
+        if paralelo and item["metodo"] == "GET":
+            gets.append(item)
+            continue
+        if gets:
+            resultados.extend(_atender_em_paralelo(request, gets, usuario, token, prazo))
+            gets = []
+        resultados.append(atender(request, item, usuario, token, prazo))
+    if gets:
+        resultados.extend(_atender_em_paralelo(request, gets, usuario, token, prazo))
+    return resultados, None
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import arquivo_logs
+
+
+class Command(BaseCommand):
+    help = (
+        "Move os logs de auditoria mais antigos que a retenção (SGHSS_ARQUIVO_LOGS) para "
+        "arquivos mensais compactados e os apaga do banco. Pode ser interrompido e "
+        "executado de novo: a execução seguinte conclui o lote pendente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, help="Retenção em dias (padrão: RETENCAO_DIAS).")
+        parser.add_argument("--lote", type=int, help="Logs por lote (padrão: TAMANHO_LOTE).")
+        parser.add_argument("--banco", default="default", help="Alias do banco (settings.DATABASES).")
+
+    def handle(self, *args, **options):
+        if (options["dias"] is not None and options["dias"] < 0) or (options["lote"] is not None and options["lote"] < 1):
+            raise CommandError("Use --dias >= 0 e --lote >= 1.")
+
+        inicio = time.perf_counter()
+        try:
+            totais = arquivo_logs.arquivar(
+                options["dias"], options["lote"], banco=options["banco"],
+                aviso=lambda total: self.stdout.write(f"  {total} logs arquivados..."),
+            )
+        except (arquivo_logs.ArquivamentoEmAndamento, arquivo_logs.ArquivoCorrompido) as erro:
+            raise CommandError(str(erro))
+        if totais["recuperados"]:
+            self.stdout.write(f"{totais['recuperados']} lotes de uma execução interrompida concluídos.")
+        self.stdout.write(
+            f"{totais['arquivados']} logs arquivados em {arquivo_logs.diretorio_arquivo()} "
+            f"em {time.perf_counter() - inicio:.1f} s."
+        )
@@ -0,0 +1,72 @@
+import random
+import time
+from datetime import time as hora, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.agenda import calcular_horarios_livres, janelas_de_atendimento
+
+EXPEDIENTE = [
+    (dia, inicio, fim)
+    for dia in range(5)
+    for inicio, fim in ((hora(8), hora(12)), (hora(13), hora(18)))
+]
+
+
+class Command(BaseCommand):
+    help = "Mede o cálculo de horários livres com agendas sintéticas (sem acessar o banco)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profissionais", type=int, default=2000)
+        parser.add_argument("--dias", type=int, default=7)
+        parser.add_argument("--ocupacao", type=float, default=0.8, help="Fração dos horários já agendados.")
+        parser.add_argument("--duracao", type=int, default=30, help="Duração da consulta em minutos.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--comparar-linear", action="store_true", help="Também mede a busca linear de conflitos.")
+
+    def handle(self, *args, **options):
+        aleatorio = random.Random(options["seed"])
+        duracao = timedelta(minutes=options["duracao"])
+        inicio = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        fim = inicio + timedelta(days=options["dias"])
+
+        todos_horarios = []
+        for janela_inicio, janela_fim in janelas_de_atendimento(EXPEDIENTE, inicio, fim):
+            horario = janela_inicio
+            while horario + duracao <= min(janela_fim, fim):
+                todos_horarios.append(horario)
+                horario += duracao
+
+        agendas = [
+            sorted(h for h in todos_horarios if aleatorio.random() < options["ocupacao"])
+            for _ in range(options["profissionais"])
+        ]
+        ocupados = sum(len(agenda) for agenda in agendas)
+        self.stdout.write(
+            f"{options['profissionais']} profissionais, {len(todos_horarios)} horários cada, "
+            f"{ocupados} consultas agendadas."
+        )
+
+        inicio_medicao = time.perf_counter()
+        livres = 0
+        for agenda in agendas:
+            livres += len(calcular_horarios_livres(EXPEDIENTE, agenda, inicio, fim, duracao))
+        self._relatar("busca binária", time.perf_counter() - inicio_medicao, options["profissionais"], livres)
+
+        if options["comparar_linear"]:
+            inicio_medicao = time.perf_counter()
+            livres_linear = 0
+            for agenda in agendas:
+                livres_linear += sum(
+                    1 for h in todos_horarios
+                    if not any(h - duracao < o < h + duracao for o in agenda)
+                )
+            self._relatar("busca linear", time.perf_counter() - inicio_medicao, options["profissionais"], livres_linear)
+
+    def _relatar(self, nome, segundos, profissionais, livres):
+        self.stdout.write(
+            f"{nome}: {segundos * 1000:.1f} ms no total, "
+            f"{segundos / profissionais * 1e6:.1f} µs por profissional, "
+            f"{livres} horários livres."
+        )
@@ -0,0 +1,109 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from rest_framework.authtoken.models import Token
+
+from core.auditoria import encerrar_sink
+from core.models import Usuario, LogAcao
+
+PREFIXO_EMAIL = "benchmark-asgi-"
+SENHA = "SenhaBenchmark123"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara requisições/s do caminho WSGI (views DRF síncronas) com o caminho ASGI "
+        "(views assíncronas), com logins concorrentes misturados a leituras."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requisicoes", type=int, default=200)
+        parser.add_argument("--concorrencia", type=int, default=16)
+        parser.add_argument("--fracao-login", type=float, default=0.2)
+        parser.add_argument("--usuarios", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        usuarios, tokens = self._preparar(options["usuarios"])
+        aleatorio = random.Random(options["seed"])
+        roteiro = []
+        for _ in range(options["requisicoes"]):
+            indice = aleatorio.randrange(len(usuarios))
+            if aleatorio.random() < options["fracao_login"]:
+                roteiro.append(("login", usuarios[indice].email, None))
+            else:
+                url = aleatorio.choice(["/api/consultas/", "/api/logs/?tamanho=20"])
+                roteiro.append(("get", url, tokens[indice]))
+
+        try:
+            for nome, executar in (("WSGI", self._executar_wsgi), ("ASGI", self._executar_asgi)):
+                inicio = time.perf_counter()
+                codigos = executar(roteiro, options["concorrencia"])
+                segundos = time.perf_counter() - inicio
+                erros = sum(1 for codigo in codigos if codigo >= 400)
+                self.stdout.write(
+                    f"{nome}: {len(roteiro) / segundos:.1f} req/s "
+                    f"({len(roteiro)} requisições em {segundos:.2f} s, {erros} erros)"
+                )
+        finally:
+            self._limpar()
+
+    def _preparar(self, quantidade):
+        self._limpar()
+        senha_codificada = make_password(SENHA)
+        Usuario.objects.bulk_create(
+            Usuario(
+                email=f"{PREFIXO_EMAIL}{i}@sghss.local",
+                password=senha_codificada,
+                papel=Usuario.PAPEL_ADMIN,
+            )
+            for i in range(quantidade)
+        )
+        usuarios = list(Usuario.objects.filter(email__startswith=PREFIXO_EMAIL).order_by("id"))
+        tokens = [Token.objects.create(user=usuario).key for usuario in usuarios]
+        return usuarios, tokens
+
+    def _limpar(self):
+        encerrar_sink()
+        LogAcao.objects.filter(usuario__email__startswith=PREFIXO_EMAIL).delete()
+        Usuario.objects.filter(email__startswith=PREFIXO_EMAIL).delete()
+
+    def _executar_wsgi(self, roteiro, concorrencia):
+        def requisitar(item):
+            tipo, alvo, token = item
+            cliente = Client()
+            if tipo == "login":
+                resposta = cliente.post(
+                    "/api/auth/login/", {"email": alvo, "senha": SENHA}, content_type="application/json"
+                )
+            else:
+                resposta = cliente.get(alvo, HTTP_AUTHORIZATION=f"Token {token}")
+            return resposta.status_code
+
+        with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+            return list(pool.map(requisitar, roteiro))
+
+    def _executar_asgi(self, roteiro, concorrencia):
+        async def executar():
+            semaforo = asyncio.Semaphore(concorrencia)
+            cliente = AsyncClient()
+
+            async def requisitar(item):
+                tipo, alvo, token = item
+                async with semaforo:
+                    if tipo == "login":
+                        resposta = await cliente.post(
+                            "/api/auth/login/", {"email": alvo, "senha": SENHA}, content_type="application/json"
+                        )
+                    else:
+                        resposta = await cliente.get(alvo, headers={"Authorization": f"Token {token}"})
+                    return resposta.status_code
+
+            return await asyncio.gather(*(requisitar(item) for item in roteiro))
+
+        return asyncio.run(executar())
@@ -0,0 +1,94 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from core import busca
+from core.models import Paciente
+
+TIPOS = ("nome_completo", "prefixos", "cpf", "email")
+
+
+def _formatar_cpf(digitos):
+    return f"{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}"
+
+
+def montar_busca(tipo, nome, cpf, email):
+    """
+    O que a recepção digitaria para achar o paciente, sem acentos.
+    """
+    palavras = busca.termos_da_busca(nome)
+    if tipo == "nome_completo":
+        return " ".join(palavras)
+    if tipo == "prefixos":
+        return " ".join(palavra[:3] for palavra in palavras)
+    if tipo == "cpf":
+        return _formatar_cpf(busca.normalizar_cpf(cpf))[:9]
+    return email
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a busca de pacientes pelo índice FTS5 (/api/pacientes/busca/) com o LIKE "
+        "do admin, no banco configurado. Sorteia pacientes existentes, monta buscas por nome "
+        "completo, prefixos do nome, início do CPF e e-mail, e relata latências e em quantas "
+        "buscas o paciente sorteado aparece entre os resultados. Gere a base antes com "
+        "gerar_dados_sinteticos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--amostras", type=int, default=20, help="Pacientes sorteados (buscas por tipo).")
+        parser.add_argument("--limite", type=int, default=20, help="Resultados por busca.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--sem-like", action="store_true", help="Mede só o índice (o LIKE é lento em bases grandes).")
+        parser.add_argument("--banco", default=DEFAULT_DB_ALIAS, help="Alias do banco (settings.DATABASES).")
+
+    def handle(self, *args, **options):
+        banco = options["banco"]
+        if not busca.indice_disponivel(banco):
+            raise CommandError("O índice de busca só existe no SQLite.")
+        pacientes = Paciente.objects.using(banco)
+        maior_id = pacientes.order_by("-id").values_list("id", flat=True).first()
+        if maior_id is None:
+            raise CommandError("Não há pacientes no banco. Gere uma base com gerar_dados_sinteticos.")
+
+        aleatorio = random.Random(options["seed"])
+        amostra = []
+        while len(amostra) < options["amostras"]:
+            linha = (
+                pacientes.filter(id__gte=aleatorio.randint(1, maior_id)).order_by("id")
+                .values_list("id", "nome_completo", "cpf", "usuario__email").first()
+            )
+            if linha is not None:
+                amostra.append(linha)
+
+        total = pacientes.count()
+        self.stdout.write(f"{total} pacientes, {len(amostra)} buscas por tipo, limite {options['limite']}.")
+
+        motores = [("índice", busca.buscar)]
+        if not options["sem_like"]:
+            motores.append(("LIKE", busca.buscar_like))
+        # Primeira execução fora da medição: abre a conexão e aquece o cache de páginas.
+        for _, funcao in motores:
+            funcao(montar_busca("prefixos", *amostra[0][1:]), options["limite"], banco)
+
+        for tipo in TIPOS:
+            for nome_motor, funcao in motores:
+                latencias, encontrados = [], 0
+                for paciente_id, nome, cpf, email in amostra:
+                    texto = montar_busca(tipo, nome, cpf, email)
+                    inicio = time.perf_counter()
+                    ids = funcao(texto, options["limite"], banco)
+                    latencias.append(time.perf_counter() - inicio)
+                    encontrados += paciente_id in ids
+                self._relatar(tipo, nome_motor, latencias, encontrados)
+
+    def _relatar(self, tipo, motor, latencias, encontrados):
+        latencias.sort()
+        quantis = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else latencias * 99
+        self.stdout.write(
+            f"{tipo:<14} {motor:<7} p50 {quantis[49] * 1000:8.2f} ms  p95 {quantis[94] * 1000:8.2f} ms  "
+            f"máx {latencias[-1] * 1000:8.2f} ms  paciente encontrado em {encontrados}/{len(latencias)}"
+        )
@@ -0,0 +1,47 @@
+from django.test.utils import override_settings
+
+from core.management.commands.benchmark_condicional import Command as BenchmarkCondicional
+from core.models import Consulta
+from core.views import ConsultaViewSet, ProfissionalSaudeViewSet
+
+
+class Command(BenchmarkCondicional):
+    help = (
+        "Mede o cache de respostas (SGHSS_CACHE_RESPOSTAS) nas leituras mais frequentes: "
+        "para cada leitura, compara a resposta montada a partir do banco (cache desligado) "
+        "com a servida do cache, em tempo de CPU, latência e instruções SQL. Usa um banco "
+        "SQLite próprio, como benchmark_operacoes."
+    )
+
+    def _cenarios(self, pagina):
+        consulta = Consulta.objects.filter(paciente=self.paciente).order_by("id").first()
+        return [
+            (
+                "profissionais-saude (admin)", ProfissionalSaudeViewSet.as_view({"get": "list"}),
+                "/api/profissionais-saude/", self.token_admin, {},
+            ),
+            (
+                "consultas/{id} (paciente)", ConsultaViewSet.as_view({"get": "retrieve"}),
+                f"/api/consultas/{consulta.pk}/", self.token_paciente, {"pk": consulta.pk},
+            ),
+            *super()._cenarios(pagina),
+        ]
+
+    def _executar(self, options):
+        for nome, view, url, token, kwargs in self._cenarios(options["tamanho_pagina"]):
+            self._comparar(nome, view, url, token, kwargs)
+
+    def _comparar(self, nome, view, url, token, kwargs):
+        with override_settings(SGHSS_CACHE_RESPOSTAS={"ATIVO": False}):
+            sem_cache = self._medir(view, url, token, kwargs, {}, 200)
+        # O aquecimento de _medir grava a entrada; as iterações medidas são acertos.
+        com_cache = self._medir(view, url, token, kwargs, {}, 200)
+
+        self.stdout.write(nome)
+        for rotulo, resultado in (("sem cache", sem_cache), ("do cache", com_cache)):
+            self.stdout.write(
+                f"  {rotulo:10} CPU {resultado['cpu_ms']:7.3f} ms  p50 {resultado['p50_ms']:7.3f} ms  "
+                f"{resultado['bytes']:7d} bytes  SQL {resultado['sql']:g}"
+            )
+        economia_cpu = 1 - com_cache["cpu_ms"] / sem_cache["cpu_ms"] if sem_cache["cpu_ms"] else 0
+        self.stdout.write(f"  economia por leitura: {economia_cpu:.0%} de CPU")
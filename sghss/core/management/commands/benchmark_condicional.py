@@ -0,0 +1,146 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from core.management.commands.benchmark_operacoes import ContadorSQL, percentil
+from core.models import Usuario, Paciente, ProfissionalSaude, Consulta
+from core.views import ConsultaViewSet, PacienteViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o ganho do GET condicional (ETag / If-None-Match) em sondagens sem mudança: "
+        "para cada leitura, compara a requisição completa com a revalidação que recebe 304, "
+        "em tempo de CPU, latência, bytes enviados e instruções SQL. Usa um banco SQLite "
+        "próprio, como benchmark_operacoes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iteracoes", type=int, default=200)
+        parser.add_argument("--consultas", type=int, default=500, help="Consultas pré-existentes no banco.")
+        parser.add_argument("--tamanho-pagina", type=int, default=50)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("O benchmark roda apenas com o SQLite.")
+        self.iteracoes = options["iteracoes"]
+        self.fabrica = APIRequestFactory()
+
+        nome_original = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self._preparar(options["consultas"])
+            self._executar(options)
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+    def _cenarios(self, pagina):
+        listar_consultas = ConsultaViewSet.as_view({"get": "list"})
+        listar_pacientes = PacienteViewSet.as_view({"get": "list"})
+        detalhar_paciente = PacienteViewSet.as_view({"get": "retrieve"})
+        return [
+            ("consultas (admin)", listar_consultas, f"/api/consultas/?tamanho={pagina}", self.token_admin, {}),
+            ("consultas (paciente)", listar_consultas, f"/api/consultas/?tamanho={pagina}", self.token_paciente, {}),
+            ("pacientes (admin)", listar_pacientes, f"/api/pacientes/?tamanho={pagina}", self.token_admin, {}),
+            (
+                "paciente/{id} (paciente)", detalhar_paciente, f"/api/pacientes/{self.paciente.pk}/",
+                self.token_paciente, {"pk": self.paciente.pk},
+            ),
+        ]
+
+    def _executar(self, options):
+        # Só o GET condicional: com o cache de respostas, as requisições
+        # completas também deixariam de consultar o banco.
+        with override_settings(SGHSS_CACHE_RESPOSTAS={"ATIVO": False}):
+            for nome, view, url, token, kwargs in self._cenarios(options["tamanho_pagina"]):
+                self._comparar(nome, view, url, token, kwargs)
+
+    def _preparar(self, quantidade_consultas):
+        senha = make_password("SenhaBenchmark123")
+        admin = Usuario.objects.create(email="admin@benchmark.local", password=senha, papel=Usuario.PAPEL_ADMIN)
+        profissional = ProfissionalSaude.objects.create(
+            usuario=Usuario.objects.create(email="prof@benchmark.local", password=senha, papel=Usuario.PAPEL_PROFISSIONAL),
+            nome_completo="Profissional", especialidade="Clínica", registro_profissional="0",
+        )
+        pacientes = [
+            Paciente.objects.create(
+                usuario=Usuario.objects.create(
+                    email=f"paciente{i}@benchmark.local", password=senha, papel=Usuario.PAPEL_PACIENTE
+                ),
+                nome_completo=f"Paciente {i}", cpf=f"{i:011d}", data_nascimento="1990-01-01",
+            )
+            for i in range(100)
+        ]
+        self.paciente = pacientes[0]
+        inicio = timezone.now() - timedelta(days=365)
+        Consulta.objects.bulk_create(
+            Consulta(
+                # Metade das consultas é do paciente sondado.
+                paciente=self.paciente if i % 2 else pacientes[i % len(pacientes)],
+                profissional=profissional,
+                data_horario=inicio + timedelta(hours=i),
+                tipo_atendimento=Consulta.TIPO_ONLINE,
+            )
+            for i in range(quantidade_consultas)
+        )
+        self.token_admin = Token.objects.create(user=admin).key
+        self.token_paciente = Token.objects.create(user=self.paciente.usuario).key
+
+    def _get(self, view, url, token, kwargs, cabecalhos):
+        requisicao = self.fabrica.get(url, HTTP_AUTHORIZATION=f"Token {token}", **cabecalhos)
+        resposta = view(requisicao, **kwargs)
+        if hasattr(resposta, "render"):
+            resposta.render()
+        return resposta
+
+    def _medir(self, view, url, token, kwargs, cabecalhos, status_esperado):
+        # Aquecimento: caches de token, de mapeamento e páginas do SQLite.
+        for _ in range(5):
+            self._get(view, url, token, kwargs, cabecalhos)
+
+        cpu, latencias, instrucoes = [], [], []
+        contador = ContadorSQL()
+        with connection.execute_wrapper(contador):
+            for _ in range(self.iteracoes):
+                antes = contador.total
+                inicio_cpu, inicio = time.process_time(), time.perf_counter()
+                resposta = self._get(view, url, token, kwargs, cabecalhos)
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                cpu.append((time.process_time() - inicio_cpu) * 1000)
+                instrucoes.append(contador.total - antes)
+        if resposta.status_code != status_esperado:
+            raise CommandError(f"GET {url} respondeu {resposta.status_code} (esperado {status_esperado}).")
+        latencias.sort()
+        return {
+            "cpu_ms": statistics.fmean(cpu),
+            "p50_ms": percentil(latencias, 50),
+            "bytes": len(resposta.content),
+            "sql": statistics.fmean(instrucoes),
+        }
+
+    def _comparar(self, nome, view, url, token, kwargs):
+        etag = self._get(view, url, token, kwargs, {}).get("ETag")
+        if not etag:
+            raise CommandError(f"GET {url} não devolveu ETag.")
+        completa = self._medir(view, url, token, kwargs, {}, 200)
+        revalidada = self._medir(view, url, token, kwargs, {"HTTP_IF_NONE_MATCH": etag}, 304)
+
+        self.stdout.write(nome)
+        for rotulo, resultado in (("200 completa", completa), ("304 revalidada", revalidada)):
+            self.stdout.write(
+                f"  {rotulo:15} CPU {resultado['cpu_ms']:7.3f} ms  p50 {resultado['p50_ms']:7.3f} ms  "
+                f"{resultado['bytes']:7d} bytes  SQL {resultado['sql']:g}"
+            )
+        economia_cpu = 1 - revalidada["cpu_ms"] / completa["cpu_ms"] if completa["cpu_ms"] else 0
+        self.stdout.write(
+            f"  economia por sondagem: {economia_cpu:.0%} de CPU, "
+            f"{completa['bytes'] - revalidada['bytes']} bytes"
+        )
@@ -0,0 +1,89 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from core.management.commands.benchmark_condicional import Command as BenchmarkCondicional
+from core.management.commands.benchmark_operacoes import ContadorSQL, percentil
+
+
+class Command(BenchmarkCondicional):
+    help = (
+        "Compara a tela do paciente (detalhe do paciente, consultas e profissionais) aberta com "
+        "uma requisição por recurso e com um único POST /api/batch/, em sequência e com "
+        "\"paralelo\". As requisições passam pelos middlewares, mas não pela rede: no uso real, "
+        "o lote também economiza as idas e voltas. Usa um banco SQLite próprio, como "
+        "benchmark_operacoes; o cache de respostas fica desligado."
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--rtt", type=float, default=50.0,
+            help="Ida e volta da rede (ms) somada a cada requisição HTTP na estimativa final.",
+        )
+
+    def _executar(self, options):
+        urls = [
+            f"/api/pacientes/{self.paciente.pk}/",
+            f"/api/consultas/?tamanho={options['tamanho_pagina']}",
+            "/api/profissionais-saude/",
+        ]
+        self.cliente = Client(HTTP_AUTHORIZATION=f"Token {self.token_admin}")
+        with override_settings(SGHSS_CACHE_RESPOSTAS={"ATIVO": False}):
+            separadas = self._medir_cenario(lambda: [self._get(url) for url in urls])
+            lote = self._medir_cenario(lambda: self._lote(urls, paralelo=False))
+            paralelo = self._medir_cenario(lambda: self._lote(urls, paralelo=True))
+
+        self.stdout.write(f"tela do paciente ({len(urls)} leituras)")
+        cenarios = (
+            (f"{len(urls)} requisições", separadas, len(urls)), ("1 lote", lote, 1), ("1 lote paralelo", paralelo, 1),
+        )
+        for rotulo, resultado, idas in cenarios:
+            sql = f"{resultado['sql']:g}" if resultado is not paralelo else "-"
+            self.stdout.write(
+                f"  {rotulo:16} p50 {resultado['p50_ms']:7.3f} ms  p95 {resultado['p95_ms']:7.3f} ms  SQL {sql:>3}  "
+                f"com RTT de {options['rtt']:g} ms: {resultado['p50_ms'] + idas * options['rtt']:7.1f} ms"
+            )
+
+    def _get(self, url):
+        resposta = self.cliente.get(url)
+        if resposta.status_code != 200:
+            raise CommandError(f"GET {url} respondeu {resposta.status_code}.")
+        return resposta.json()
+
+    def _lote(self, urls, paralelo):
+        corpo = {"requisicoes": [{"metodo": "GET", "url": url} for url in urls], "paralelo": paralelo}
+        resposta = self.cliente.post("/api/batch/", json.dumps(corpo), content_type="application/json")
+        if resposta.status_code != 200:
+            raise CommandError(f"POST /api/batch/ respondeu {resposta.status_code}.")
+        resultados = resposta.json()["resultados"]
+        if any(resultado["status"] != 200 for resultado in resultados):
+            raise CommandError(f"Lote com erro: {[resultado['status'] for resultado in resultados]}.")
+        return [resultado["corpo"] for resultado in resultados]
+
+    def _medir_cenario(self, executar):
+        # Aquecimento: caches de token, de mapeamento, threads do pool e páginas do SQLite.
+        for _ in range(5):
+            executar()
+
+        latencias, instrucoes = [], []
+        contador = ContadorSQL()
+        with connection.execute_wrapper(contador):
+            for _ in range(self.iteracoes):
+                antes = contador.total
+                inicio = time.perf_counter()
+                executar()
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                instrucoes.append(contador.total - antes)
+        latencias.sort()
+        return {
+            "p50_ms": percentil(latencias, 50),
+            "p95_ms": percentil(latencias, 95),
+            # Só as conexões desta thread: o SQL das threads do lote paralelo não é contado.
+            "sql": statistics.fmean(instrucoes),
+        }
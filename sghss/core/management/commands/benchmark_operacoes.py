@@ -0,0 +1,304 @@
+import json
+import platform
+import sqlite3
+import statistics
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from core.auditoria import encerrar_sink
+from core.models import Usuario, Paciente, Administrador, ProfissionalSaude, Consulta, LogAcao
+from core.views import LoginView, ConsultaViewSet, registrar_log
+
+SENHA = "SenhaBenchmark123"
+PERCENTIS = (50, 90, 95, 99)
+# Métricas comparadas com a linha de base: latências relativas ao limite, SQL exato.
+METRICAS_LATENCIA = ("p50", "p95")
+OPERACOES = (
+    "login",
+    "listar_consultas_admin",
+    "listar_consultas_paciente",
+    "listar_consultas_profissional",
+    "criar_teleconsulta",
+    "cancelar_consulta",
+    "registrar_log",
+)
+
+
+def percentil(valores_ordenados, p):
+    if len(valores_ordenados) == 1:
+        return valores_ordenados[0]
+    posicao = (len(valores_ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(valores_ordenados) - 1)
+    fracao = posicao - inferior
+    return valores_ordenados[inferior] + (valores_ordenados[superior] - valores_ordenados[inferior]) * fracao
+
+
+class ContadorSQL:
+    """
+    Conta as instruções executadas na conexão (connection.execute_wrapper),
+    com custo bem menor que o do CaptureQueriesContext.
+    """
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Suíte de microbenchmarks das operações principais (login, listagem de consultas "
+        "por papel, criação de teleconsulta, cancelamento e registrar_log) num banco SQLite "
+        "próprio. Relata percentis de latência e número de instruções SQL, salva o resultado "
+        "em JSON e, com --comparar, falha se alguma métrica piorar além do limite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iteracoes", type=int, default=100)
+        parser.add_argument("--aquecimento", type=int, default=5, help="Execuções descartadas antes da medição.")
+        parser.add_argument("--consultas", type=int, default=500, help="Consultas pré-existentes no banco.")
+        parser.add_argument("--banco", help="Arquivo SQLite a usar (padrão: banco em memória).")
+        parser.add_argument("--saida", default="benchmark-operacoes.json", help="Arquivo JSON com os resultados.")
+        parser.add_argument("--comparar", help="JSON de uma execução anterior usada como linha de base.")
+        parser.add_argument(
+            "--limite", type=float, default=0.25,
+            help="Piora relativa tolerada nas latências (0.25 = 25%%). O número de instruções SQL não pode aumentar.",
+        )
+        parser.add_argument("--operacao", action="append", help="Executa apenas a(s) operação(ões) indicada(s).")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("A suíte roda apenas com o SQLite.")
+
+        linha_base = None
+        if options["comparar"]:
+            try:
+                linha_base = json.loads(Path(options["comparar"]).read_text(encoding="utf-8"))
+            except (OSError, ValueError) as erro:
+                raise CommandError(f"Não foi possível ler a linha de base: {erro}")
+
+        selecionadas = options["operacao"] or list(OPERACOES)
+        desconhecidas = set(selecionadas) - set(OPERACOES)
+        if desconhecidas:
+            raise CommandError(
+                f"Operações desconhecidas: {', '.join(sorted(desconhecidas))}. Disponíveis: {', '.join(OPERACOES)}."
+            )
+
+        self.iteracoes = options["iteracoes"]
+        self.aquecimento = options["aquecimento"]
+        self.fabrica = APIRequestFactory()
+
+        # Banco isolado (o mesmo mecanismo do "manage.py test"): o banco de
+        # desenvolvimento não é tocado. A auditoria é síncrona para que o INSERT
+        # do log entre na medição e na contagem de SQL de cada operação, e o
+        # cache de respostas fica desligado para que as listagens sejam medidas
+        # de fato, e não servidas do cache a partir da segunda repetição.
+        nome_original = connection.settings_dict["NAME"]
+        if options["banco"]:
+            connection.settings_dict.setdefault("TEST", {})["NAME"] = options["banco"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                SGHSS_AUDITORIA={"SINK": "core.auditoria.SinkSincrono"},
+                SGHSS_CACHE_RESPOSTAS={"ATIVO": False},
+            ):
+                self._preparar(options["consultas"])
+                operacoes = self._operacoes()
+                resultados = {nome: self._medir(nome, operacoes[nome]) for nome in selecionadas}
+        finally:
+            encerrar_sink()
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+        relatorio = {
+            "gerado_em": timezone.now().isoformat(),
+            "iteracoes": self.iteracoes,
+            "ambiente": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "maquina": platform.machine(),
+            },
+            "operacoes": resultados,
+        }
+        Path(options["saida"]).write_text(json.dumps(relatorio, indent=2, ensure_ascii=False), encoding="utf-8")
+        self.stdout.write(f"Resultados salvos em {options['saida']}.")
+
+        if linha_base is not None:
+            self._comparar(resultados, linha_base, options["limite"])
+
+    def _preparar(self, quantidade_consultas):
+        senha = make_password(SENHA)
+
+        def criar_usuario(email, papel):
+            return Usuario.objects.create(email=email, password=senha, papel=papel)
+
+        self.admin = criar_usuario("admin@benchmark.local", Usuario.PAPEL_ADMIN)
+        self.administrador = Administrador.objects.create(usuario=self.admin, nome_completo="Admin", cargo="TI")
+        self.usuario_profissional = criar_usuario("prof@benchmark.local", Usuario.PAPEL_PROFISSIONAL)
+        self.profissional = ProfissionalSaude.objects.create(
+            usuario=self.usuario_profissional, nome_completo="Profissional", especialidade="Clínica",
+            registro_profissional="0",
+        )
+        outro_profissional = ProfissionalSaude.objects.create(
+            usuario=criar_usuario("prof2@benchmark.local", Usuario.PAPEL_PROFISSIONAL),
+            nome_completo="Outro Profissional", especialidade="Clínica", registro_profissional="1",
+        )
+        pacientes = [
+            Paciente.objects.create(
+                usuario=criar_usuario(f"paciente{i}@benchmark.local", Usuario.PAPEL_PACIENTE),
+                nome_completo=f"Paciente {i}", cpf=f"{i:011d}", data_nascimento="1990-01-01",
+            )
+            for i in range(20)
+        ]
+        self.paciente = pacientes[0]
+        self.tokens = {
+            usuario.papel: Token.objects.create(user=usuario).key
+            for usuario in (self.admin, self.usuario_profissional, self.paciente.usuario)
+        }
+
+        # Consultas distribuídas entre pacientes e os dois profissionais, no passado,
+        # para não conflitarem com as criadas durante a medição.
+        inicio = timezone.now() - timedelta(days=365)
+        Consulta.objects.bulk_create(
+            Consulta(
+                paciente=pacientes[i % len(pacientes)],
+                profissional=self.profissional if i % 2 else outro_profissional,
+                data_horario=inicio + timedelta(hours=i),
+                tipo_atendimento=Consulta.TIPO_ONLINE if i % 3 else Consulta.TIPO_PRESENCIAL,
+            )
+            for i in range(quantidade_consultas)
+        )
+
+        # Uma consulta a cancelar por execução.
+        futuro = timezone.now() + timedelta(days=30)
+        total = self.iteracoes + self.aquecimento
+        self.a_cancelar = list(Consulta.objects.bulk_create(
+            Consulta(paciente=self.paciente, profissional=outro_profissional, data_horario=futuro + timedelta(hours=i))
+            for i in range(total)
+        ))
+        if any(consulta.pk is None for consulta in self.a_cancelar):
+            self.a_cancelar = list(
+                Consulta.objects.filter(profissional=outro_profissional, data_horario__gte=futuro).order_by("data_horario")
+            )
+        self.proximo_horario = futuro + timedelta(days=365)
+
+    def _requisicao(self, view, metodo, url, papel=None, dados=None, **kwargs):
+        cabecalhos = {"HTTP_AUTHORIZATION": f"Token {self.tokens[papel]}"} if papel else {}
+        requisicao = getattr(self.fabrica, metodo)(url, dados, format="json", **cabecalhos)
+        resposta = view(requisicao, **kwargs)
+        resposta.render()
+        if resposta.status_code >= 400:
+            raise CommandError(f"{metodo.upper()} {url} respondeu {resposta.status_code}: {resposta.content[:200]!r}")
+        return resposta
+
+    def _operacoes(self):
+        login = LoginView.as_view()
+        listar = ConsultaViewSet.as_view({"get": "list"})
+        criar = ConsultaViewSet.as_view({"post": "create"})
+        cancelar = ConsultaViewSet.as_view({"post": "cancelar"})
+        a_cancelar = iter(self.a_cancelar)
+
+        def fazer_login():
+            self._requisicao(login, "post", "/api/auth/login/", dados={"email": self.admin.email, "senha": SENHA})
+
+        def listar_como(papel):
+            return lambda: self._requisicao(listar, "get", "/api/consultas/", papel)
+
+        def criar_teleconsulta():
+            self.proximo_horario += timedelta(hours=1)
+            resposta = self._requisicao(criar, "post", "/api/consultas/", Usuario.PAPEL_ADMIN, dados={
+                "paciente": self.paciente.pk,
+                "profissional": self.profissional.pk,
+                "tipo_atendimento": Consulta.TIPO_ONLINE,
+                "data_horario": self.proximo_horario.isoformat(),
+            })
+            if not resposta.data.get("link_teleconsulta"):
+                raise CommandError("A consulta online foi criada sem link de teleconsulta.")
+
+        def cancelar_consulta():
+            consulta = next(a_cancelar)
+            self._requisicao(
+                cancelar, "post", f"/api/consultas/{consulta.pk}/cancelar/", Usuario.PAPEL_ADMIN,
+                dados={"justificativa": "Benchmark."}, pk=consulta.pk,
+            )
+
+        def registrar():
+            registrar_log(
+                self.admin, LogAcao.ACAO_LOGIN, "Usuário realizou login no sistema.", "127.0.0.1",
+                entidade=LogAcao.ENTIDADE_USUARIO, entidade_id=self.admin.pk,
+            )
+
+        return {
+            "login": fazer_login,
+            "listar_consultas_admin": listar_como(Usuario.PAPEL_ADMIN),
+            "listar_consultas_paciente": listar_como(Usuario.PAPEL_PACIENTE),
+            "listar_consultas_profissional": listar_como(Usuario.PAPEL_PROFISSIONAL),
+            "criar_teleconsulta": criar_teleconsulta,
+            "cancelar_consulta": cancelar_consulta,
+            "registrar_log": registrar,
+        }
+
+    def _medir(self, nome, operacao):
+        for _ in range(self.aquecimento):
+            operacao()
+
+        latencias = []
+        instrucoes = []
+        contador = ContadorSQL()
+        with connection.execute_wrapper(contador):
+            for _ in range(self.iteracoes):
+                antes = contador.total
+                inicio = time.perf_counter()
+                operacao()
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                instrucoes.append(contador.total - antes)
+
+        latencias.sort()
+        resultado = {
+            "latencia_ms": {
+                **{f"p{p}": round(percentil(latencias, p), 4) for p in PERCENTIS},
+                "media": round(statistics.fmean(latencias), 4),
+                "max": round(latencias[-1], 4),
+            },
+            "sql": {"media": round(statistics.fmean(instrucoes), 2), "max": max(instrucoes)},
+        }
+        latencia = resultado["latencia_ms"]
+        self.stdout.write(
+            f"{nome:32} p50 {latencia['p50']:8.2f} ms  p95 {latencia['p95']:8.2f} ms  "
+            f"p99 {latencia['p99']:8.2f} ms  SQL {resultado['sql']['media']:g} (máx. {resultado['sql']['max']})"
+        )
+        return resultado
+
+    def _comparar(self, resultados, linha_base, limite):
+        regressoes = []
+        for nome, atual in resultados.items():
+            anterior = linha_base.get("operacoes", {}).get(nome)
+            if anterior is None:
+                self.stdout.write(f"{nome}: sem linha de base, ignorada na comparação.")
+                continue
+            for metrica in METRICAS_LATENCIA:
+                antes = anterior["latencia_ms"][metrica]
+                depois = atual["latencia_ms"][metrica]
+                if antes and depois > antes * (1 + limite):
+                    regressoes.append(f"{nome}: latência {metrica} {antes:.2f} ms -> {depois:.2f} ms (+{depois / antes - 1:.0%})")
+            if atual["sql"]["max"] > anterior["sql"]["max"]:
+                regressoes.append(f"{nome}: instruções SQL {anterior['sql']['max']} -> {atual['sql']['max']}")
+
+        if regressoes:
+            for regressao in regressoes:
+                self.stderr.write(regressao)
+            raise CommandError(f"{len(regressoes)} regressão(ões) em relação à linha de base.")
+        self.stdout.write(self.style.SUCCESS("Nenhuma regressão em relação à linha de base."))
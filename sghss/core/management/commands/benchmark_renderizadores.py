@@ -0,0 +1,83 @@
+import gzip
+import json
+import statistics
+import time
+
+from django.core.management.base import CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from core import renderizadores
+from core.management.commands.benchmark_serializacao import CASOS, Command as BenchmarkSerializacao, _Desfazer
+from core.serializacao_rapida import obter_mapeamento
+
+
+class Command(BenchmarkSerializacao):
+    help = (
+        "Compara a codificação de uma página de consultas, pacientes e logs com o JSONRenderer "
+        "do DRF, o JSON com orjson (JSONRapidoRenderer) e o MessagePack: tempo por página, "
+        "bytes e bytes com gzip. Confirma que o JSON rápido é idêntico ao do DRF. Os dados de "
+        "teste são criados numa transação desfeita ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--linhas", type=int, default=500, help="Linhas por página (o máximo da API é 500).")
+        parser.add_argument("--repeticoes", type=int, default=200)
+
+    def handle(self, *args, **options):
+        if renderizadores.orjson is None:
+            self.stdout.write("orjson não instalado: o JSON rápido usa o JSONRenderer do DRF (pip install orjson).")
+        if renderizadores.msgpack is None:
+            self.stdout.write("msgpack não instalado: MessagePack fica de fora (pip install msgpack).")
+
+        try:
+            with transaction.atomic():
+                self._criar_dados(0, options["linhas"])
+                for nome, queryset, classe_serializer in CASOS:
+                    mapeamento = obter_mapeamento(classe_serializer)
+                    # Os dados como a view os entrega ao renderizador.
+                    dados = mapeamento.serializar(list(mapeamento.valores(queryset.order_by("id")[:options["linhas"]])))
+                    self._comparar(nome, dados, options["repeticoes"])
+                raise _Desfazer
+        except _Desfazer:
+            pass
+
+    def _formatos(self):
+        formatos = [
+            ("JSON (DRF)", JSONRenderer(), JSONRenderer.media_type),
+            ("JSON (orjson)", renderizadores.JSONRapidoRenderer(), JSONRenderer.media_type),
+        ]
+        if renderizadores.MessagePackRenderer.disponivel:
+            formatos.append(
+                ("MessagePack", renderizadores.MessagePackRenderer(), renderizadores.MessagePackRenderer.media_type)
+            )
+        return formatos
+
+    def _comparar(self, nome, dados, repeticoes):
+        self.stdout.write(f"{nome} ({len(dados)} linhas)")
+        referencia = None
+        for rotulo, renderizador, media_type in self._formatos():
+            for _ in range(5):
+                conteudo = renderizador.render(dados, media_type)
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                renderizador.render(dados, media_type)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+
+            if referencia is None:
+                referencia = conteudo
+                verificacao = ""
+            elif media_type == JSONRenderer.media_type:
+                if conteudo != referencia:
+                    raise CommandError(f"{rotulo} difere do JSON do DRF em {nome}.")
+                verificacao = "  bytes idênticos"
+            else:
+                decodificado = renderizadores.msgpack.unpackb(conteudo, raw=False)
+                if decodificado != json.loads(referencia):
+                    raise CommandError(f"{rotulo} não traz os mesmos valores do JSON em {nome}.")
+                verificacao = "  mesmos valores"
+            self.stdout.write(
+                f"  {rotulo:14} {statistics.fmean(tempos):7.3f} ms/página  {len(conteudo):8d} bytes  "
+                f"{len(gzip.compress(conteudo)):7d} com gzip{verificacao}"
+            )
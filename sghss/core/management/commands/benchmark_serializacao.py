@@ -0,0 +1,140 @@
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Usuario, Paciente, ProfissionalSaude, Consulta, LogAcao
+from core.serializacao_rapida import obter_mapeamento
+from core.serializers import PacienteSerializer, ConsultaSerializer, LogAcaoSerializer
+
+PREFIXO_EMAIL = "benchmark-serializacao-"
+TAMANHO_LOTE = 5000
+
+CASOS = (
+    ("consultas", Consulta.objects.select_related("paciente", "profissional", "administrador_criador"), ConsultaSerializer),
+    ("pacientes", Paciente.objects.select_related("usuario"), PacienteSerializer),
+    ("logs", LogAcao.objects.select_related("usuario"), LogAcaoSerializer),
+)
+
+
+class _Desfazer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara linhas/s da leitura com ModelSerializer (instâncias) e do caminho "
+        "rápido (.values() + mapeamento pré-calculado), confirmando que o JSON é idêntico. "
+        "Os dados de teste são criados numa transação desfeita ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--linhas", default="10000,100000", help="Quantidades separadas por vírgula.")
+        parser.add_argument("--repeticoes", type=int, default=3, help="Vale o melhor tempo de cada caminho.")
+
+    def handle(self, *args, **options):
+        try:
+            quantidades = sorted(int(valor) for valor in options["linhas"].split(","))
+        except ValueError:
+            raise CommandError("--linhas deve ser uma lista de inteiros, ex.: 10000,100000.")
+
+        try:
+            with transaction.atomic():
+                criadas = 0
+                for quantidade in quantidades:
+                    self._criar_dados(criadas, quantidade)
+                    criadas = quantidade
+                    for nome, queryset, classe_serializer in CASOS:
+                        self._medir(nome, queryset, classe_serializer, quantidade, options["repeticoes"])
+                raise _Desfazer
+        except _Desfazer:
+            pass
+
+    def _criar_dados(self, inicio, fim):
+        senha = make_password("SenhaBenchmark123")
+        agora = timezone.now()
+
+        if inicio == 0:
+            usuario = Usuario.objects.create(
+                email=f"{PREFIXO_EMAIL}prof@sghss.local", password=senha, papel=Usuario.PAPEL_PROFISSIONAL
+            )
+            self.profissional = ProfissionalSaude.objects.create(
+                usuario=usuario, nome_completo="Profissional Benchmark", especialidade="Clínica", registro_profissional="0"
+            )
+
+        for lote in range(inicio, fim, TAMANHO_LOTE):
+            faixa = range(lote, min(lote + TAMANHO_LOTE, fim))
+            usuarios = Usuario.objects.bulk_create(
+                Usuario(email=f"{PREFIXO_EMAIL}{i}@sghss.local", password=senha, papel=Usuario.PAPEL_PACIENTE)
+                for i in faixa
+            )
+            pacientes = Paciente.objects.bulk_create(
+                Paciente(
+                    usuario=usuario,
+                    nome_completo=f"Paciente {i}",
+                    cpf=f"{i:011d}",
+                    data_nascimento=date(1950, 1, 1) + timedelta(days=i % 20000),
+                    telefone="(11) 99999-0000" if i % 2 else None,
+                    endereco="Rua Benchmark, 1" if i % 3 else None,
+                )
+                for i, usuario in zip(faixa, usuarios)
+            )
+            Consulta.objects.bulk_create(
+                Consulta(
+                    paciente=paciente,
+                    profissional=self.profissional,
+                    tipo_atendimento=Consulta.TIPO_ONLINE if i % 2 else Consulta.TIPO_PRESENCIAL,
+                    data_horario=agora + timedelta(minutes=30 * i),
+                    link_teleconsulta="https://meet.jit.si/abc-def-ghi" if i % 2 else None,
+                    local=None if i % 2 else "Sala 1",
+                )
+                for i, paciente in zip(faixa, pacientes)
+            )
+            LogAcao.objects.bulk_create(
+                LogAcao(
+                    usuario=usuario if i % 4 else None,
+                    acao=LogAcao.ACAO_LOGIN,
+                    entidade=LogAcao.ENTIDADE_USUARIO,
+                    entidade_id=usuario.id,
+                    detalhes="Usuário realizou login no sistema.",
+                    data_hora=agora - timedelta(seconds=i),
+                    ip="10.0.0.1" if i % 2 else "::1",
+                )
+                for i, usuario in zip(faixa, usuarios)
+            )
+
+    def _medir(self, nome, queryset, classe_serializer, quantidade, repeticoes):
+        mapeamento = obter_mapeamento(classe_serializer)
+        if mapeamento is None:
+            raise CommandError(f"{classe_serializer.__name__} não é suportado pelo caminho rápido.")
+        queryset = queryset.order_by("id")[:quantidade]
+
+        def serializer():
+            return classe_serializer(list(queryset), many=True).data
+
+        def rapido():
+            return mapeamento.serializar(list(mapeamento.valores(queryset)))
+
+        tempos = {}
+        saidas = {}
+        for caminho, executar in (("serializer", serializer), ("rápido", rapido)):
+            melhor = None
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                saidas[caminho] = executar()
+                segundos = time.perf_counter() - inicio
+                melhor = segundos if melhor is None else min(melhor, segundos)
+            tempos[caminho] = melhor
+
+        renderizador = JSONRenderer()
+        identico = renderizador.render(saidas["serializer"]) == renderizador.render(saidas["rápido"])
+        self.stdout.write(
+            f"{nome} ({quantidade} linhas): "
+            f"serializer {quantidade / tempos['serializer']:.0f} linhas/s, "
+            f"rápido {quantidade / tempos['rápido']:.0f} linhas/s "
+            f"({tempos['serializer'] / tempos['rápido']:.1f}x), JSON idêntico: {'sim' if identico else 'NÃO'}"
+        )
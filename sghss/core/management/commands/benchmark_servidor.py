@@ -0,0 +1,133 @@
+import http.client
+import json
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.commands.benchmark_operacoes import percentil
+from core.servidor import memoria_processo
+
+# Login com e-mail inexistente: passa pelo banco sem gravar nada.
+CORPO_LOGIN = json.dumps({"email": "benchmark-servidor@sghss.invalid", "senha": "x"})
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o runserver (--noreload --nothreading) com o servir (pré-fork): tempo desde o "
+        "início do processo até a primeira resposta, latência das requisições seguintes e memória "
+        "por processo. Sobe os dois como subprocessos com as configurações atuais e só faz "
+        "logins inválidos (leituras). Memória só no Linux (/proc)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--trabalhadores", type=int, default=4)
+        parser.add_argument("--requisicoes", type=int, default=200)
+        parser.add_argument("--tempo-limite", type=float, default=60.0, help="Segundos para cada servidor responder.")
+
+    def handle(self, *args, **options):
+        cenarios = (
+            ("runserver", ["runserver", "--noreload", "--nothreading"]),
+            (
+                f"servir ({options['trabalhadores']} trab.)",
+                ["servir", "--trabalhadores", str(options["trabalhadores"]), "--endereco"],
+            ),
+        )
+        resultados = []
+        for rotulo, argumentos in cenarios:
+            resultados.append((rotulo, self._medir(argumentos, options)))
+
+        self.stdout.write(
+            f"{'':18} {'1ª resposta':>12} {'p50':>9} {'p95':>9} "
+            f"{'RSS/processo':>13} {'PSS total':>10}"
+        )
+        for rotulo, resultado in resultados:
+            self.stdout.write(
+                f"{rotulo:18} {resultado['pronto_ms']:9.0f} ms {resultado['p50_ms']:6.2f} ms {resultado['p95_ms']:6.2f} ms "
+                f"{self._mb(resultado['rss'])} {self._mb(resultado['pss'], 10)}"
+            )
+
+        runserver, servir = resultados[0][1], resultados[1][1]
+        if runserver["rss"] is not None and servir["pss"] is not None:
+            self.stdout.write(
+                f"{options['trabalhadores']} runservers independentes somariam "
+                f"{options['trabalhadores'] * runserver['rss'] / 1024:.1f} MB de RSS; o servir ocupa "
+                f"{servir['pss'] / 1024:.1f} MB de PSS (mestre e trabalhadores, com as páginas compartilhadas "
+                "divididas entre eles)."
+            )
+
+    def _mb(self, kb, largura=13):
+        texto = "n/d" if kb is None else f"{kb / 1024:.1f} MB"
+        return f"{texto:>{largura}}"
+
+    def _porta_livre(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def _requisitar(self, porta):
+        conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=30)
+        try:
+            inicio = time.perf_counter()
+            conexao.request("POST", "/api/auth/login/", CORPO_LOGIN, {"Content-Type": "application/json"})
+            resposta = conexao.getresponse()
+            resposta.read()
+            if resposta.status != 400:
+                raise CommandError(f"O login de teste respondeu {resposta.status}.")
+            return (time.perf_counter() - inicio) * 1000
+        finally:
+            conexao.close()
+
+    def _medir(self, argumentos, options):
+        porta = self._porta_livre()
+        inicio = time.perf_counter()
+        processo = subprocess.Popen(
+            [sys.executable, sys.argv[0], *argumentos, f"127.0.0.1:{porta}"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            prazo = time.monotonic() + options["tempo_limite"]
+            while True:
+                if processo.poll() is not None:
+                    raise CommandError(f"{' '.join(argumentos)} terminou com código {processo.returncode}.")
+                try:
+                    self._requisitar(porta)
+                    break
+                except (ConnectionRefusedError, ConnectionResetError):
+                    if time.monotonic() > prazo:
+                        raise CommandError(f"{' '.join(argumentos)} não respondeu em {options['tempo_limite']:g} s.")
+                    time.sleep(0.01)
+            pronto_ms = (time.perf_counter() - inicio) * 1000
+
+            latencias = sorted(self._requisitar(porta) for _ in range(options["requisicoes"]))
+            memorias = [memoria_processo(pid) for pid in [processo.pid, *self._filhos(processo.pid)]]
+            rss = pss = None
+            if all(memorias):
+                # Por processo: o maior RSS entre o servidor e seus trabalhadores.
+                rss = max(memoria["rss"] for memoria in memorias)
+                if all("pss" in memoria for memoria in memorias):
+                    pss = sum(memoria["pss"] for memoria in memorias)
+            return {
+                "pronto_ms": pronto_ms,
+                "p50_ms": percentil(latencias, 50),
+                "p95_ms": percentil(latencias, 95),
+                "rss": rss,
+                "pss": pss,
+            }
+        finally:
+            processo.send_signal(signal.SIGTERM)
+            try:
+                processo.wait(timeout=options["tempo_limite"])
+            except subprocess.TimeoutExpired:
+                processo.kill()
+                processo.wait()
+
+    def _filhos(self, pid):
+        try:
+            with open(f"/proc/{pid}/task/{pid}/children") as arquivo:
+                return [int(filho) for filho in arquivo.read().split()]
+        except OSError:
+            return []
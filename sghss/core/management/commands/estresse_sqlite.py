@@ -0,0 +1,201 @@
+import copy
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.models import Usuario, Paciente, ProfissionalSaude, Consulta, LogAcao
+
+SENHA = "SenhaEstresse123"
+
+
+def _registrar_banco(alias, caminho, perfil):
+    """
+    Cria em tempo de execução um alias de banco com o perfil indicado.
+    """
+    configuracao = {"ENGINE": "django.db.backends.sqlite3", "NAME": str(caminho)}
+    configuracao.update(copy.deepcopy(perfil))
+    configuradas = connections.configure_settings({
+        DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS],
+        alias: configuracao,
+    })
+    connections.settings[alias] = configuradas[alias]
+
+
+def _login(banco, usuario_id):
+    # Mesmo SQL do LoginView (sem o hash da senha, que não toca no banco).
+    usuario = Usuario.objects.using(banco).get(pk=usuario_id)
+    Token.objects.using(banco).get_or_create(user=usuario)
+    LogAcao.objects.using(banco).create(
+        usuario=usuario, acao=LogAcao.ACAO_LOGIN, entidade=LogAcao.ENTIDADE_USUARIO, entidade_id=usuario.id,
+        detalhes="Usuário realizou login no sistema.", data_hora=timezone.now(), ip="127.0.0.1",
+    )
+
+
+def _agendar(banco, paciente_id, profissional_ids, data_horario, aleatorio):
+    # Mesmo padrão de ConsultaViewSet.perform_create: dentro da transação, lê
+    # o profissional e os conflitos (verificar_disponibilidade) e só então escreve.
+    with transaction.atomic(using=banco):
+        profissional = ProfissionalSaude.objects.using(banco).select_for_update().get(
+            pk=aleatorio.choice(profissional_ids)
+        )
+        conflito = Consulta.objects.using(banco).filter(
+            profissional=profissional,
+            status=Consulta.STATUS_AGENDADA,
+            data_horario__gt=data_horario - timedelta(minutes=30),
+            data_horario__lt=data_horario + timedelta(minutes=30),
+        ).exists()
+        if conflito:
+            return
+        consulta = Consulta.objects.using(banco).create(
+            paciente_id=paciente_id,
+            profissional=profissional,
+            tipo_atendimento=Consulta.TIPO_ONLINE,
+            data_horario=data_horario,
+            link_teleconsulta="https://meet.jit.si/estresse",
+        )
+        LogAcao.objects.using(banco).create(
+            acao=LogAcao.ACAO_CRIAR_CONSULTA, entidade=LogAcao.ENTIDADE_CONSULTA, entidade_id=consulta.id,
+            detalhes=f"Consulta {consulta.id} criada.", data_hora=timezone.now(), ip="127.0.0.1",
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de concorrência de escrita no SQLite: várias threads, cada uma com sua "
+        "conexão, fazem logins e agendamentos ao mesmo tempo num arquivo temporário, "
+        "uma vez para cada perfil de SGHSS_PERFIS_SQLITE. Relata escritas/s, latências "
+        "e quantas operações falharam com \"database is locked\"."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--trabalhadores", type=int, default=8)
+        parser.add_argument("--segundos", type=float, default=10.0, help="Duração de cada rodada.")
+        parser.add_argument(
+            "--fracao-agendamentos", type=float, default=0.5,
+            help="Fração das operações que são agendamentos (o resto são logins).",
+        )
+        parser.add_argument(
+            "--perfil", action="append",
+            help="Perfil(is) de SGHSS_PERFIS_SQLITE a comparar (padrão: todos).",
+        )
+
+    def handle(self, *args, **options):
+        perfis = getattr(settings, "SGHSS_PERFIS_SQLITE", {})
+        nomes = options["perfil"] or list(perfis)
+        desconhecidos = [nome for nome in nomes if nome not in perfis]
+        if desconhecidos:
+            raise CommandError(f"Perfil(is) desconhecido(s): {', '.join(desconhecidos)}.")
+        if not 0 <= options["fracao_agendamentos"] <= 1:
+            raise CommandError("--fracao-agendamentos deve estar entre 0 e 1.")
+
+        with tempfile.TemporaryDirectory(prefix="sghss-estresse-") as diretorio:
+            for nome in nomes:
+                alias = f"estresse_{nome}"
+                _registrar_banco(alias, Path(diretorio) / f"{nome}.sqlite3", perfis[nome])
+                try:
+                    call_command("migrate", database=alias, verbosity=0)
+                    dados = self._criar_dados(alias, options["trabalhadores"])
+                    resultado = self._rodada(alias, dados, options)
+                finally:
+                    connections[alias].close()
+                self._relatar(nome, resultado, options["segundos"])
+
+    def _criar_dados(self, banco, trabalhadores):
+        senha = make_password(SENHA)
+        profissionais = []
+        for i in range(4):
+            usuario = Usuario.objects.using(banco).create(
+                email=f"prof{i}@estresse.local", password=senha, papel=Usuario.PAPEL_PROFISSIONAL
+            )
+            profissionais.append(ProfissionalSaude.objects.using(banco).create(
+                usuario=usuario, nome_completo=f"Profissional {i}", especialidade="Clínica",
+                registro_profissional=f"CRM-{i}",
+            ))
+
+        pacientes = []
+        for i in range(trabalhadores):
+            usuario = Usuario.objects.using(banco).create(
+                email=f"paciente{i}@estresse.local", password=senha, papel=Usuario.PAPEL_PACIENTE
+            )
+            pacientes.append(Paciente.objects.using(banco).create(
+                usuario=usuario, nome_completo=f"Paciente {i}", cpf=f"{i:011d}", data_nascimento="1990-01-01",
+            ))
+        return {"profissionais": [p.id for p in profissionais], "pacientes": pacientes}
+
+    def _rodada(self, banco, dados, options):
+        barreira = threading.Barrier(options["trabalhadores"])
+        resultados = []
+        trava = threading.Lock()
+        # Cada agendamento usa um horário único: conflitos de agenda não
+        # entram na conta, só a disputa pelo bloqueio do arquivo.
+        base = timezone.now().replace(second=0, microsecond=0) + timedelta(days=1)
+
+        def trabalhador(indice):
+            aleatorio = random.Random(indice)
+            paciente = dados["pacientes"][indice]
+            sucesso, bloqueios, latencias = 0, 0, []
+            barreira.wait()
+            fim = time.monotonic() + options["segundos"]
+            sequencia = 0
+            try:
+                while time.monotonic() < fim:
+                    sequencia += 1
+                    inicio = time.perf_counter()
+                    try:
+                        if aleatorio.random() < options["fracao_agendamentos"]:
+                            horario = base + timedelta(hours=indice * 1_000_000 + sequencia)
+                            _agendar(banco, paciente.id, dados["profissionais"], horario, aleatorio)
+                        else:
+                            _login(banco, paciente.usuario_id)
+                    except OperationalError as erro:
+                        if "locked" not in str(erro) and "busy" not in str(erro):
+                            raise
+                        bloqueios += 1
+                    else:
+                        sucesso += 1
+                    latencias.append(time.perf_counter() - inicio)
+            finally:
+                connections[banco].close()
+            with trava:
+                resultados.append((sucesso, bloqueios, latencias))
+
+        threads = [
+            threading.Thread(target=trabalhador, args=(indice,), name=f"estresse-{indice}")
+            for indice in range(options["trabalhadores"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        latencias = sorted(latencia for _, _, lista in resultados for latencia in lista)
+        return {
+            "sucesso": sum(sucesso for sucesso, _, _ in resultados),
+            "bloqueios": sum(bloqueios for _, bloqueios, _ in resultados),
+            "latencias": latencias,
+        }
+
+    def _relatar(self, nome, resultado, segundos):
+        latencias = resultado["latencias"]
+        total = resultado["sucesso"] + resultado["bloqueios"]
+        if latencias:
+            quantis = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else latencias * 99
+            tempos = f"p50 {quantis[49] * 1000:.1f} ms, p99 {quantis[98] * 1000:.1f} ms"
+        else:
+            tempos = "sem operações"
+        self.stdout.write(
+            f"{nome}: {resultado['sucesso'] / segundos:.0f} operações de escrita/s, "
+            f"{resultado['bloqueios']} de {total} operações com \"database is locked\", {tempos}"
+        )
@@ -0,0 +1,51 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import arquivo_logs, exportacao
+
+
+def _data_hora(valor, fim_do_dia=False):
+    try:
+        return exportacao.ler_data_hora(valor, fim_do_dia)
+    except ValueError:
+        raise CommandError(f"Data inválida: {valor}. Use AAAA-MM-DD ou data/hora ISO 8601.")
+
+
+class Command(BaseCommand):
+    help = "Exporta consultas ou logs em CSV/NDJSON (opcionalmente gzip), em fluxo e com memória constante."
+
+    def add_arguments(self, parser):
+        parser.add_argument("tipo", choices=sorted(exportacao.EXPORTACOES))
+        parser.add_argument("--formato", choices=sorted(exportacao.FORMATOS), default="csv")
+        parser.add_argument("--de", help="Data/hora inicial (AAAA-MM-DD ou ISO 8601).")
+        parser.add_argument("--ate", help="Data/hora final (AAAA-MM-DD ou ISO 8601).")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--saida", help="Arquivo de saída (padrão: nome gerado; '-' para stdout).")
+
+    def handle(self, *args, **options):
+        tipo, formato, comprimir = options["tipo"], options["formato"], options["gzip"]
+        try:
+            pedacos = exportacao.gerar_exportacao(
+                tipo, formato, _data_hora(options["de"]), _data_hora(options["ate"], fim_do_dia=True), comprimir
+            )
+        except arquivo_logs.ArquivamentoEmAndamento as erro:
+            raise CommandError(str(erro))
+
+        saida = options["saida"] or exportacao.nome_arquivo(tipo, formato, comprimir)
+        inicio = time.perf_counter()
+        total = 0
+        destino = sys.stdout.buffer if saida == "-" else open(saida, "wb")
+        try:
+            for pedaco in pedacos:
+                destino.write(pedaco)
+                total += len(pedaco)
+        finally:
+            if destino is not sys.stdout.buffer:
+                destino.close()
+
+        if saida != "-":
+            self.stdout.write(self.style.SUCCESS(
+                f"{total} bytes gravados em {saida} ({time.perf_counter() - inicio:.1f} s)."
+            ))
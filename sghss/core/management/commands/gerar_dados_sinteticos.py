@@ -0,0 +1,422 @@
+import random
+import string
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as hora, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core import busca, cache_respostas, estatisticas, lembretes
+from core.models import Usuario, Paciente, Administrador, ProfissionalSaude, HorarioAtendimento, Consulta, LogAcao
+
+DOMINIO_EMAIL = "sintetico.vidaplus.local"
+
+NOMES = [
+    "Ana", "Maria", "Francisca", "Antônia", "Adriana", "Juliana", "Márcia", "Fernanda", "Patrícia", "Aline",
+    "José", "João", "Antônio", "Francisco", "Carlos", "Paulo", "Pedro", "Lucas", "Luiz", "Marcos",
+    "Gabriel", "Rafael", "Daniel", "Beatriz", "Larissa", "Camila", "Letícia", "Bruno", "Eduardo", "Felipe",
+]
+SOBRENOMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+    "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa",
+    "Rocha", "Dias", "Nascimento", "Andrade", "Moreira", "Nunes", "Marques", "Machado", "Mendes", "Freitas",
+]
+LOGRADOUROS = ["Rua das Flores", "Avenida Brasil", "Rua São João", "Rua XV de Novembro", "Avenida Paulista", "Rua da Paz"]
+ESPECIALIDADES = [
+    ("Clínica Médica", 30), ("Pediatria", 15), ("Ginecologia", 10), ("Cardiologia", 8), ("Dermatologia", 7),
+    ("Ortopedia", 7), ("Psiquiatria", 6), ("Psicologia", 6), ("Oftalmologia", 4), ("Nutrição", 4), ("Fisioterapia", 3),
+]
+LOCAIS = ["Unidade Centro - Sala 1", "Unidade Centro - Sala 2", "Unidade Norte - Sala 3", "Unidade Sul - Sala 4"]
+
+# Expediente usado para os horários de atendimento e para os horários das consultas.
+EXPEDIENTE = [(dia, inicio, fim) for dia in range(5) for inicio, fim in ((hora(8), hora(12)), (hora(13), hora(18)))]
+DURACAO = timedelta(minutes=30)
+
+# Distribuição de status: consultas passadas foram em sua maioria realizadas;
+# as futuras continuam agendadas, com alguns cancelamentos antecipados.
+STATUS_PASSADAS = [
+    (Consulta.STATUS_REALIZADA, 82), (Consulta.STATUS_CANCELADA_PACIENTE, 10),
+    (Consulta.STATUS_CANCELADA_PROFISSIONAL, 3), (Consulta.STATUS_CANCELADA_ADMIN, 2), (Consulta.STATUS_AGENDADA, 3),
+]
+STATUS_FUTURAS = [
+    (Consulta.STATUS_AGENDADA, 90), (Consulta.STATUS_CANCELADA_PACIENTE, 7),
+    (Consulta.STATUS_CANCELADA_PROFISSIONAL, 2), (Consulta.STATUS_CANCELADA_ADMIN, 1),
+]
+JUSTIFICATIVAS = {
+    Consulta.STATUS_CANCELADA_PACIENTE: "Cancelado pelo paciente.",
+    Consulta.STATUS_CANCELADA_PROFISSIONAL: "Profissional indisponível na data.",
+    Consulta.STATUS_CANCELADA_ADMIN: "Cancelado pelo administrador.",
+}
+# Fração de teleconsultas no início e no fim do período (cresce linearmente).
+ONLINE_INICIO = 0.15
+ONLINE_FIM = 0.40
+FRACAO_CRIADAS_POR_ADMIN = 0.3
+
+
+def cpf(base):
+    """
+    CPF formatado com dígitos verificadores válidos a partir de 9 dígitos.
+    """
+    digitos = [int(d) for d in f"{base:09d}"]
+    for tamanho in (9, 10):
+        soma = sum(d * peso for d, peso in zip(digitos, range(tamanho + 1, 1, -1)))
+        resto = soma * 10 % 11
+        digitos.append(0 if resto == 10 else resto)
+    texto = "".join(map(str, digitos))
+    return f"{texto[:3]}.{texto[3:6]}.{texto[6:9]}-{texto[9:]}"
+
+
+def escolher(aleatorio, opcoes):
+    valores, pesos = zip(*opcoes)
+    return aleatorio.choices(valores, weights=pesos)[0]
+
+
+@contextmanager
+def datas_informadas(*modelos):
+    """
+    Desliga o auto_now/auto_now_add dos modelos enquanto ativo: o bulk_create
+    grava as datas geradas em vez da hora em que o comando roda.
+    """
+    campos = [
+        (campo, campo.auto_now, campo.auto_now_add)
+        for modelo in modelos
+        for campo in modelo._meta.concrete_fields
+        if getattr(campo, "auto_now", False) or getattr(campo, "auto_now_add", False)
+    ]
+    for campo, _, _ in campos:
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in campos:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera uma base sintética em escala de produção (usuários, pacientes, profissionais, "
+        "consultas e histórico de logs) com bulk_create em lotes. Com a mesma --seed e um banco "
+        "vazio, o resultado é sempre o mesmo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pacientes", type=int, default=300000)
+        parser.add_argument("--profissionais", type=int, default=3000)
+        parser.add_argument("--administradores", type=int, default=20)
+        parser.add_argument("--consultas", type=int, default=3000000)
+        parser.add_argument("--dias-passados", type=int, default=730, help="Início do período das consultas.")
+        parser.add_argument("--dias-futuros", type=int, default=90, help="Fim do período das consultas.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--referencia", help="Data tomada como \"hoje\" (AAAA-MM-DD, padrão: hoje). Fixe-a para repetir a mesma base.",
+        )
+        parser.add_argument("--lote", type=int, default=10000, help="Linhas por INSERT/transação.")
+        parser.add_argument("--senha", default="SenhaSintetica123", help="Senha de todos os usuários gerados.")
+
+    def handle(self, *args, **options):
+        if Usuario.objects.filter(email__endswith=f"@{DOMINIO_EMAIL}").exists():
+            raise CommandError(f"O banco já tem usuários @{DOMINIO_EMAIL}. Gere os dados num banco vazio.")
+        if options["profissionais"] < 1 or options["pacientes"] < 1 or options["administradores"] < 1:
+            raise CommandError("É preciso ao menos um paciente, um profissional e um administrador.")
+
+        self.aleatorio = random.Random(options["seed"])
+        self.lote = options["lote"]
+        self.total_linhas = 0
+        self.inicio = time.perf_counter()
+        # Hash calculado uma única vez: o PBKDF2 por usuário levaria horas. O sal vem
+        # da seed para que a base gerada seja a mesma também nas senhas.
+        sal = "".join(self.aleatorio.choices(string.ascii_letters + string.digits, k=22))
+        self.senha = make_password(options["senha"], salt=sal)
+        try:
+            referencia = parse_date(options["referencia"]) if options["referencia"] else timezone.localdate()
+        except ValueError:
+            referencia = None
+        if referencia is None:
+            raise CommandError("--referencia deve estar no formato AAAA-MM-DD.")
+        self.agora = datetime.combine(referencia, hora(0), tzinfo=timezone.get_current_timezone())
+
+        self.slots = self._slots(
+            self.agora - timedelta(days=options["dias_passados"]),
+            self.agora + timedelta(days=options["dias_futuros"]),
+        )
+        por_profissional = -(-options["consultas"] // options["profissionais"])
+        if por_profissional > len(self.slots):
+            raise CommandError(
+                f"{options['consultas']} consultas não cabem na agenda de {options['profissionais']} profissionais "
+                f"em {len(self.slots)} horários. Aumente --profissionais ou o período."
+            )
+
+        # Ids atribuídos aqui, em sequência: dispensa RETURNING no INSERT em lote e
+        # permite ligar logs e consultas sem reler o banco.
+        self.proximo_id = {
+            modelo: (modelo.objects.order_by("-pk").values_list("pk", flat=True).first() or 0) + 1
+            for modelo in (Usuario, Paciente, Administrador, ProfissionalSaude, HorarioAtendimento, Consulta, LogAcao)
+        }
+
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                # Só para esta conexão: sem fsync a cada commit e com cache maior.
+                cursor.execute("PRAGMA synchronous = OFF")
+                cursor.execute("PRAGMA cache_size = -200000")
+
+        # Cadastros no ano anterior ao período, antes do primeiro login gerado
+        # (até 30 dias e 20 minutos antes da primeira consulta).
+        self.fim_cadastros = self.slots[0] - timedelta(days=31)
+
+        with datas_informadas(Paciente, Administrador, ProfissionalSaude, Consulta):
+            self.administradores = self._gerar_administradores(options["administradores"])
+            self.profissionais = self._gerar_profissionais(options["profissionais"])
+            self.pacientes = self._gerar_pacientes(options["pacientes"])
+            self._gerar_consultas(options["consultas"])
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [Usuario, Paciente, Administrador, ProfissionalSaude, HorarioAtendimento, Consulta, LogAcao]
+            ):
+                cursor.execute(sql)
+
+        # Os INSERTs em lote não passam pelos sinais que mantêm o painel, a busca, o cache de respostas e os lembretes.
+        cache_respostas.invalidar_modelos(Paciente, Administrador, ProfissionalSaude, Consulta)
+        gravadas = estatisticas.reconstruir(tamanho_lote=self.lote)
+        self.stdout.write(
+            f"estatísticas: {gravadas['consultas']} contadores de consultas, {gravadas['logins']} de logins"
+        )
+        self.stdout.write(f"índice de busca: {busca.reconstruir()} pacientes")
+        self.stdout.write(f"lembretes: {lembretes.reconstruir()} pendentes")
+
+        segundos = time.perf_counter() - self.inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Concluído: {self.total_linhas} linhas em {segundos:.1f} s ({self.total_linhas / segundos:.0f} linhas/s)."
+        ))
+
+    def _ids(self, modelo, quantidade):
+        inicio = self.proximo_id[modelo]
+        self.proximo_id[modelo] += quantidade
+        return range(inicio, inicio + quantidade)
+
+    def _gravar(self, modelo, objetos):
+        if not objetos:
+            return
+        with transaction.atomic():
+            modelo.objects.bulk_create(objetos, batch_size=self.lote)
+        self.total_linhas += len(objetos)
+
+    def _progresso(self, etapa, feitos, total):
+        segundos = time.perf_counter() - self.inicio
+        self.stdout.write(
+            f"{etapa}: {feitos}/{total} ({self.total_linhas} linhas no total, "
+            f"{self.total_linhas / segundos if segundos else 0:.0f} linhas/s)"
+        )
+
+    def _slots(self, inicio, fim):
+        """
+        Horários de consulta (30 min) dentro do expediente, no fuso local.
+        """
+        fuso = timezone.get_current_timezone()
+        slots = []
+        dia = timezone.localtime(inicio).date()
+        while dia <= timezone.localtime(fim).date():
+            for dia_semana, hora_inicio, hora_fim in EXPEDIENTE:
+                if dia.weekday() != dia_semana:
+                    continue
+                horario = datetime.combine(dia, hora_inicio, tzinfo=fuso)
+                limite = datetime.combine(dia, hora_fim, tzinfo=fuso)
+                while horario + DURACAO <= limite:
+                    if inicio <= horario <= fim:
+                        slots.append(horario)
+                    horario += DURACAO
+            dia += timedelta(days=1)
+        return slots
+
+    def _nome(self):
+        a = self.aleatorio
+        return f"{a.choice(NOMES)} {a.choice(SOBRENOMES)} {a.choice(SOBRENOMES)}"
+
+    def _usuarios(self, prefixo, papel, quantidade, primeiro_numero=1, **extras):
+        return [
+            Usuario(
+                id=usuario_id, email=f"{prefixo}{numero}@{DOMINIO_EMAIL}", password=self.senha, papel=papel,
+                date_joined=self.fim_cadastros - timedelta(seconds=self.aleatorio.randrange(365 * 24 * 3600)),
+                **extras,
+            )
+            for numero, usuario_id in enumerate(self._ids(Usuario, quantidade), start=primeiro_numero)
+        ]
+
+    def _gerar_administradores(self, quantidade):
+        usuarios = self._usuarios("admin", Usuario.PAPEL_ADMIN, quantidade, is_staff=True)
+        self._gravar(Usuario, usuarios)
+        administradores = [
+            Administrador(
+                id=admin_id, usuario_id=usuario.id, nome_completo=self._nome(), cargo="Administrador",
+                criado_em=usuario.date_joined, atualizado_em=usuario.date_joined,
+            )
+            for admin_id, usuario in zip(self._ids(Administrador, quantidade), usuarios)
+        ]
+        self._gravar(Administrador, administradores)
+        self._progresso("administradores", quantidade, quantidade)
+        return [(admin.id, admin.usuario_id) for admin in administradores]
+
+    def _gerar_profissionais(self, quantidade):
+        profissionais = []
+        for feitos in range(0, quantidade, self.lote):
+            tamanho = min(self.lote, quantidade - feitos)
+            usuarios = self._usuarios("prof", Usuario.PAPEL_PROFISSIONAL, tamanho, feitos + 1)
+            self._gravar(Usuario, usuarios)
+            lote = [
+                ProfissionalSaude(
+                    id=prof_id,
+                    usuario_id=usuario.id,
+                    nome_completo=self._nome(),
+                    especialidade=escolher(self.aleatorio, ESPECIALIDADES),
+                    registro_profissional=f"CRM-{prof_id:06d}",
+                    duracao_consulta_minutos=30,
+                    criado_em=usuario.date_joined,
+                    atualizado_em=usuario.date_joined,
+                )
+                for prof_id, usuario in zip(self._ids(ProfissionalSaude, tamanho), usuarios)
+            ]
+            self._gravar(ProfissionalSaude, lote)
+            horarios = [
+                HorarioAtendimento(profissional_id=prof.id, dia_semana=dia, hora_inicio=inicio, hora_fim=fim)
+                for prof in lote
+                for dia, inicio, fim in EXPEDIENTE
+            ]
+            for horario, horario_id in zip(horarios, self._ids(HorarioAtendimento, len(horarios))):
+                horario.id = horario_id
+            self._gravar(HorarioAtendimento, horarios)
+            profissionais.extend((prof.id, prof.usuario_id) for prof in lote)
+            self._progresso("profissionais", feitos + tamanho, quantidade)
+        return profissionais
+
+    def _gerar_pacientes(self, quantidade):
+        a = self.aleatorio
+        hoje = self.agora.date()
+        pacientes = []
+        for feitos in range(0, quantidade, self.lote):
+            tamanho = min(self.lote, quantidade - feitos)
+            usuarios = self._usuarios("paciente", Usuario.PAPEL_PACIENTE, tamanho, feitos + 1)
+            self._gravar(Usuario, usuarios)
+            lote = []
+            for paciente_id, usuario in zip(self._ids(Paciente, tamanho), usuarios):
+                idade = min(int(a.triangular(0, 95, 38)), 95)
+                lote.append(Paciente(
+                    id=paciente_id,
+                    usuario_id=usuario.id,
+                    nome_completo=self._nome(),
+                    # 7919 é primo com 10⁹: índices distintos geram CPFs distintos.
+                    cpf=cpf(paciente_id * 7919 % 10 ** 9),
+                    data_nascimento=hoje - timedelta(days=idade * 365 + a.randrange(365)),
+                    telefone=f"({a.randint(11, 99)}) 9{a.randint(1000, 9999)}-{a.randint(1000, 9999)}" if a.random() < 0.9 else None,
+                    endereco=f"{a.choice(LOGRADOUROS)}, {a.randint(1, 3000)}" if a.random() < 0.8 else None,
+                    criado_em=usuario.date_joined,
+                    atualizado_em=usuario.date_joined,
+                ))
+            self._gravar(Paciente, lote)
+            pacientes.extend((paciente.id, paciente.usuario_id) for paciente in lote)
+            self._progresso("pacientes", feitos + tamanho, quantidade)
+        return pacientes
+
+    def _gerar_consultas(self, quantidade):
+        """
+        Cada profissional recebe horários distintos da sua agenda, então não há
+        consultas sobrepostas. Para cada consulta são gerados os logs de login e
+        criação (pelo paciente ou por um administrador) e, se for o caso, o de
+        cancelamento.
+        """
+        a = self.aleatorio
+        base, resto = divmod(quantidade, len(self.profissionais))
+        inicio_periodo = self.slots[0]
+        duracao_periodo = (self.slots[-1] - inicio_periodo).total_seconds() or 1
+        consultas = []
+        logs = []
+        feitos = 0
+
+        for indice, (profissional_id, usuario_profissional) in enumerate(self.profissionais):
+            quantidade_profissional = base + (1 if indice < resto else 0)
+            for data_horario in sorted(a.sample(self.slots, quantidade_profissional)):
+                paciente_id, usuario_paciente = a.choice(self.pacientes)
+                passada = data_horario < self.agora
+                status = escolher(a, STATUS_PASSADAS if passada else STATUS_FUTURAS)
+                fracao_online = ONLINE_INICIO + (ONLINE_FIM - ONLINE_INICIO) * (
+                    (data_horario - inicio_periodo).total_seconds() / duracao_periodo
+                )
+                online = a.random() < fracao_online
+                por_admin = a.random() < FRACAO_CRIADAS_POR_ADMIN
+                admin_id, usuario_admin = a.choice(self.administradores) if por_admin else (None, None)
+                consulta_id = self._ids(Consulta, 1)[0]
+                criada_em = min(data_horario - timedelta(minutes=a.randint(60, 60 * 24 * 30)), self.agora)
+                if status in JUSTIFICATIVAS:
+                    atualizada_em = criada_em + (min(data_horario, self.agora) - criada_em) * a.random()
+                elif status == Consulta.STATUS_REALIZADA:
+                    atualizada_em = min(data_horario + DURACAO, self.agora)
+                else:
+                    atualizada_em = criada_em
+
+                consultas.append(Consulta(
+                    id=consulta_id,
+                    paciente_id=paciente_id,
+                    profissional_id=profissional_id,
+                    administrador_criador_id=admin_id,
+                    tipo_atendimento=Consulta.TIPO_ONLINE if online else Consulta.TIPO_PRESENCIAL,
+                    data_horario=data_horario,
+                    local=None if online else a.choice(LOCAIS),
+                    link_teleconsulta=self._link_teleconsulta() if online else None,
+                    status=status,
+                    justificativa_cancelamento=JUSTIFICATIVAS.get(status),
+                    criado_em=criada_em,
+                    atualizado_em=atualizada_em,
+                ))
+
+                usuario_criador = usuario_admin if por_admin else usuario_paciente
+                ip = f"10.{a.randrange(256)}.{a.randrange(256)}.{a.randrange(1, 255)}"
+                logs.append(self._log(
+                    usuario_criador, LogAcao.ACAO_LOGIN, "Usuário realizou login no sistema.",
+                    criada_em - timedelta(minutes=a.randint(1, 20)), ip, LogAcao.ENTIDADE_USUARIO, usuario_criador,
+                ))
+                logs.append(self._log(
+                    usuario_criador, LogAcao.ACAO_CRIAR_CONSULTA, f"Consulta {consulta_id} criada.",
+                    criada_em, ip, LogAcao.ENTIDADE_CONSULTA, consulta_id,
+                ))
+                if status in JUSTIFICATIVAS:
+                    usuario_cancelamento = {
+                        Consulta.STATUS_CANCELADA_PACIENTE: usuario_paciente,
+                        Consulta.STATUS_CANCELADA_PROFISSIONAL: usuario_profissional,
+                        Consulta.STATUS_CANCELADA_ADMIN: usuario_admin or a.choice(self.administradores)[1],
+                    }[status]
+                    logs.append(self._log(
+                        usuario_cancelamento, LogAcao.ACAO_CANCELAR_CONSULTA,
+                        f"Consulta {consulta_id} cancelada. Status: {status}",
+                        atualizada_em, ip, LogAcao.ENTIDADE_CONSULTA, consulta_id,
+                    ))
+
+                if len(consultas) >= self.lote:
+                    feitos += len(consultas)
+                    self._gravar_consultas(consultas, logs)
+                    self._progresso("consultas", feitos, quantidade)
+                    consultas, logs = [], []
+
+        feitos += len(consultas)
+        self._gravar_consultas(consultas, logs)
+        self._progresso("consultas", feitos, quantidade)
+
+    def _link_teleconsulta(self):
+        # Mesmo formato de views.gerar_nome_sala_aleatorio, mas com o gerador da seed.
+        grupos = ("".join(self.aleatorio.choices(string.ascii_lowercase, k=3)) for _ in range(3))
+        return f"https://meet.jit.si/{'-'.join(grupos)}"
+
+    def _log(self, usuario_id, acao, detalhes, data_hora, ip, entidade, entidade_id):
+        return LogAcao(
+            usuario_id=usuario_id, acao=acao, detalhes=detalhes, data_hora=data_hora, ip=ip,
+            entidade=entidade, entidade_id=entidade_id,
+        )
+
+    def _gravar_consultas(self, consultas, logs):
+        for log, log_id in zip(logs, self._ids(LogAcao, len(logs))):
+            log.id = log_id
+        self._gravar(Consulta, consultas)
+        self._gravar(LogAcao, logs)
@@ -0,0 +1,220 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from core import busca, cache_respostas
+from core.models import Usuario, Paciente
+
+CAMPOS_OBRIGATORIOS = ("email", "senha", "nome_completo", "cpf", "data_nascimento")
+CAMPOS_OPCIONAIS = ("telefone", "endereco")
+TAMANHO_MINIMO_SENHA = 6
+
+
+def _inicializar_processo():
+    # Processos criados por "spawn" (Windows/macOS) não herdam o Django configurado.
+    import django
+    django.setup()
+
+
+def ler_registros(caminho, formato):
+    """
+    Lê o arquivo linha a linha, sem carregá-lo inteiro na memória.
+    Gera (numero_da_linha, dicionario).
+    """
+    with open(caminho, encoding="utf-8", newline="") as arquivo:
+        if formato == "csv":
+            for numero, linha in enumerate(csv.DictReader(arquivo), start=2):
+                yield numero, linha
+        else:
+            for numero, linha in enumerate(arquivo, start=1):
+                if linha.strip():
+                    try:
+                        yield numero, json.loads(linha)
+                    except ValueError:
+                        yield numero, None
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa pacientes em massa de um arquivo CSV ou JSONL (campos: email, senha, "
+        "nome_completo, cpf, data_nascimento, telefone, endereco)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo")
+        parser.add_argument("--formato", choices=["csv", "jsonl"], help="Padrão: deduzido da extensão.")
+        parser.add_argument("--lote", type=int, default=1000, help="Registros por transação.")
+        parser.add_argument("--processos", type=int, default=os.cpu_count() or 1, help="Processos para o hash das senhas.")
+        parser.add_argument("--progresso", help="Arquivo de progresso (padrão: <arquivo>.progresso).")
+        parser.add_argument("--relatorio-erros", help="CSV com as linhas rejeitadas (padrão: <arquivo>.erros.csv).")
+        parser.add_argument("--recomecar", action="store_true", help="Ignora o progresso salvo e começa do início.")
+
+    def handle(self, *args, **options):
+        caminho = Path(options["arquivo"])
+        if not caminho.exists():
+            raise CommandError(f"Arquivo {caminho} não encontrado.")
+
+        formato = options["formato"] or ("jsonl" if caminho.suffix.lower() in (".jsonl", ".ndjson") else "csv")
+        caminho_progresso = Path(options["progresso"] or f"{caminho}.progresso")
+        caminho_erros = Path(options["relatorio_erros"] or f"{caminho}.erros.csv")
+
+        ultima_linha = 0
+        if caminho_progresso.exists() and not options["recomecar"]:
+            ultima_linha = json.loads(caminho_progresso.read_text())["linha"]
+            self.stdout.write(f"Retomando a importação após a linha {ultima_linha}.")
+
+        self.emails_vistos = set()
+        self.cpfs_vistos = set()
+        self.importados = 0
+        self.rejeitados = 0
+        inicio = time.perf_counter()
+
+        modo_erros = "a" if ultima_linha and caminho_erros.exists() else "w"
+        with open(caminho_erros, modo_erros, encoding="utf-8", newline="") as arquivo_erros, \
+                ProcessPoolExecutor(max_workers=options["processos"], initializer=_inicializar_processo) as pool:
+            self.arquivo_erros = arquivo_erros
+            self.relatorio = csv.writer(arquivo_erros)
+            if modo_erros == "w":
+                self.relatorio.writerow(["linha", "email", "cpf", "erro"])
+
+            lote = []
+            for numero, registro in ler_registros(caminho, formato):
+                if numero <= ultima_linha:
+                    continue
+                lote.append((numero, registro))
+                if len(lote) >= options["lote"]:
+                    self._processar_lote(lote, pool, caminho_progresso, inicio)
+                    lote = []
+            if lote:
+                self._processar_lote(lote, pool, caminho_progresso, inicio)
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Importação concluída: {self.importados} pacientes importados, {self.rejeitados} rejeitados, "
+            f"{segundos:.1f} s ({self.importados / segundos if segundos else 0:.0f} linhas/s)."
+        ))
+        if self.rejeitados:
+            self.stdout.write(self.style.WARNING(f"Linhas rejeitadas registradas em {caminho_erros}."))
+
+    def _rejeitar(self, numero, registro, erro):
+        registro = registro if isinstance(registro, dict) else {}
+        self.relatorio.writerow([numero, registro.get("email", ""), registro.get("cpf", ""), erro])
+        self.rejeitados += 1
+
+    def _validar(self, numero, registro):
+        if not isinstance(registro, dict):
+            return self._rejeitar(numero, registro, "Linha inválida.")
+
+        # No JSONL os valores podem vir como números, listas...; um CPF numérico perderia os zeros à esquerda.
+        nao_texto = [
+            campo for campo in CAMPOS_OBRIGATORIOS + CAMPOS_OPCIONAIS
+            if registro.get(campo) is not None and not isinstance(registro[campo], str)
+        ]
+        if nao_texto:
+            return self._rejeitar(numero, registro, f"Campos que devem ser texto: {', '.join(nao_texto)}.")
+
+        dados = {campo: (registro.get(campo) or "").strip() for campo in CAMPOS_OBRIGATORIOS + CAMPOS_OPCIONAIS}
+        faltando = [campo for campo in CAMPOS_OBRIGATORIOS if not dados[campo]]
+        if faltando:
+            return self._rejeitar(numero, registro, f"Campos obrigatórios ausentes: {', '.join(faltando)}.")
+
+        dados["email"] = Usuario.objects.normalize_email(dados["email"])
+        try:
+            validate_email(dados["email"])
+        except ValidationError:
+            return self._rejeitar(numero, registro, "E-mail inválido.")
+
+        if len(dados["senha"]) < TAMANHO_MINIMO_SENHA:
+            return self._rejeitar(numero, registro, f"A senha deve ter ao menos {TAMANHO_MINIMO_SENHA} caracteres.")
+
+        try:
+            dados["data_nascimento"] = parse_date(dados["data_nascimento"])
+        except ValueError:
+            dados["data_nascimento"] = None
+        if dados["data_nascimento"] is None:
+            return self._rejeitar(numero, registro, "Data de nascimento inválida (use AAAA-MM-DD).")
+
+        if len(dados["cpf"]) > Paciente._meta.get_field("cpf").max_length:
+            return self._rejeitar(numero, registro, "CPF inválido.")
+
+        for campo in CAMPOS_OPCIONAIS:
+            dados[campo] = dados[campo] or None
+        return dados
+
+    def _processar_lote(self, lote, pool, caminho_progresso, inicio):
+        validos = []
+        for numero, registro in lote:
+            dados = self._validar(numero, registro)
+            if dados:
+                validos.append((numero, dados))
+
+        # Unicidade verificada em bloco: duas consultas por lote, em vez de duas por paciente.
+        emails_existentes = set(
+            Usuario.objects.filter(email__in=[dados["email"] for _, dados in validos]).values_list("email", flat=True)
+        )
+        cpfs_existentes = set(
+            Paciente.objects.filter(cpf__in=[dados["cpf"] for _, dados in validos]).values_list("cpf", flat=True)
+        )
+
+        aceitos = []
+        for numero, dados in validos:
+            if dados["email"] in emails_existentes or dados["email"] in self.emails_vistos:
+                self._rejeitar(numero, dados, "E-mail já cadastrado.")
+            elif dados["cpf"] in cpfs_existentes or dados["cpf"] in self.cpfs_vistos:
+                self._rejeitar(numero, dados, "CPF já cadastrado.")
+            else:
+                self.emails_vistos.add(dados["email"])
+                self.cpfs_vistos.add(dados["cpf"])
+                aceitos.append(dados)
+
+        if aceitos:
+            senhas = list(pool.map(make_password, [dados["senha"] for dados in aceitos], chunksize=16))
+
+            with transaction.atomic():
+                usuarios = Usuario.objects.bulk_create([
+                    Usuario(email=dados["email"], password=senha, papel=Usuario.PAPEL_PACIENTE)
+                    for dados, senha in zip(aceitos, senhas)
+                ])
+                if any(usuario.pk is None for usuario in usuarios):
+                    # Bancos sem RETURNING no INSERT em lote: recupera os ids pelo e-mail.
+                    ids = dict(
+                        Usuario.objects.filter(email__in=[u.email for u in usuarios]).values_list("email", "id")
+                    )
+                    for usuario in usuarios:
+                        usuario.pk = ids[usuario.email]
+
+                pacientes = Paciente.objects.bulk_create([
+                    Paciente(
+                        usuario=usuario,
+                        nome_completo=dados["nome_completo"],
+                        cpf=dados["cpf"],
+                        data_nascimento=dados["data_nascimento"],
+                        telefone=dados["telefone"],
+                        endereco=dados["endereco"],
+                    )
+                    for usuario, dados in zip(usuarios, aceitos)
+                ])
+                # O bulk_create não dispara os sinais que mantêm o índice de busca e o cache de respostas.
+                busca.indexar_pacientes([paciente.pk for paciente in pacientes if paciente.pk is not None])
+                cache_respostas.invalidar_modelos(Paciente)
+            self.importados += len(aceitos)
+
+        # O progresso só avança depois do commit do lote e do registro das rejeições.
+        self.arquivo_erros.flush()
+        caminho_progresso.write_text(json.dumps({"linha": lote[-1][0]}))
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(
+            f"Linha {lote[-1][0]}: {self.importados} importados, {self.rejeitados} rejeitados "
+            f"({self.importados / segundos if segundos else 0:.0f} linhas/s)."
+        )
@@ -0,0 +1,43 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from core import lembretes
+
+
+class Command(BaseCommand):
+    help = (
+        "Trabalhador que envia os lembretes de consulta (SGHSS_LEMBRETES) quando vencem. "
+        "Pode haver vários rodando ao mesmo tempo; cada lote é reservado por um só. "
+        "Encerre com Ctrl+C ou SIGTERM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--uma-vez", action="store_true", help="Envia o que já venceu e termina.")
+        parser.add_argument(
+            "--reconstruir", action="store_true",
+            help="Recria a fila a partir das consultas agendadas antes de começar (após cargas em massa).",
+        )
+        parser.add_argument("--banco", default="default", help="Alias do banco (settings.DATABASES).")
+
+    def handle(self, *args, **options):
+        if options["reconstruir"]:
+            self.stdout.write(f"Fila reconstruída: {lembretes.reconstruir(options['banco'])} lembretes pendentes.")
+
+        parar = threading.Event()
+        for sinal in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sinal, lambda *args: parar.set())
+
+        trabalhador = lembretes.Trabalhador(banco=options["banco"])
+        metricas = trabalhador.executar(parar, uma_vez=options["uma_vez"], relatar=self._relatar)
+        self._relatar(metricas)
+
+    def _relatar(self, metricas):
+        self.stderr.write(
+            f"lembretes: {metricas['enviados']} enviados ({metricas['vazao_por_s']:.2f}/s), "
+            f"{metricas['falhas']} falhas, {metricas['desistencias']} desistências, "
+            f"{metricas['descartados']} descartados, {metricas['reservados_por_outros']} com outro trabalhador; "
+            f"atraso p50 {metricas['atraso_p50_s']:.1f} s, p95 {metricas['atraso_p95_s']:.1f} s, "
+            f"máx. {metricas['atraso_maximo_s']:.1f} s"
+        )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import estatisticas
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula as tabelas de estatísticas (consultas por dia/profissional/status/tipo "
+        "e logins por dia) a partir de Consulta e LogAcao. Use após cargas em massa "
+        "(bulk_create, importações) ou para corrigir divergências."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Linhas por INSERT.")
+        parser.add_argument("--banco", default="default", help="Alias do banco (settings.DATABASES).")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        gravadas = estatisticas.reconstruir(options["banco"], options["lote"])
+        self.stdout.write(
+            f"Estatísticas reconstruídas em {time.perf_counter() - inicio:.1f} s: "
+            f"{gravadas['consultas']} linhas de consultas, {gravadas['logins']} dias de logins."
+        )
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import busca
+
+
+class Command(BaseCommand):
+    help = (
+        "Recria o índice de busca de pacientes (FTS5) a partir de Paciente e Usuario. "
+        "Use após cargas que gravam pacientes sem passar pelo save() ou para corrigir divergências."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--banco", default="default", help="Alias do banco (settings.DATABASES).")
+
+    def handle(self, *args, **options):
+        if not busca.indice_disponivel(options["banco"]):
+            self.stdout.write("O banco não é SQLite: a busca usa LIKE e não há índice a reconstruir.")
+            return
+        inicio = time.perf_counter()
+        indexados = busca.reconstruir(options["banco"])
+        self.stdout.write(f"Índice de busca reconstruído em {time.perf_counter() - inicio:.1f} s: {indexados} pacientes.")
@@ -0,0 +1,76 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import checks, servidor
+
+
+class Command(BaseCommand):
+    help = (
+        "Servidor de produção com pré-fork (SGHSS_SERVIDOR): aquece a aplicação uma vez no mestre e "
+        "cria os trabalhadores com fork(), que compartilham essa memória. SIGHUP recarrega o código "
+        "sem recusar conexões; SIGTERM ou Ctrl+C encerra esperando as requisições em andamento. "
+        "O HTTP é o do wsgiref, que não é endurecido: use sempre atrás de um proxy reverso (nginx, por "
+        "exemplo), nunca exposto direto à internet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endereco", help="host:porta (padrão: SGHSS_SERVIDOR['ENDERECO']).")
+        parser.add_argument("--trabalhadores", type=int)
+        parser.add_argument("--max-requisicoes", type=int, help="Recicla o trabalhador depois dessas requisições; 0 desliga.")
+        parser.add_argument("--tempo-encerramento", type=float)
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        if not hasattr(os, "fork"):
+            raise CommandError("O servidor com pré-fork precisa de fork() (Linux ou macOS); use o runserver.")
+
+        configuracao = servidor.configuracao_servidor()
+        for opcao, chave in (
+            ("endereco", "ENDERECO"), ("trabalhadores", "TRABALHADORES"),
+            ("max_requisicoes", "MAX_REQUISICOES"), ("tempo_encerramento", "TEMPO_ENCERRAMENTO"),
+        ):
+            if options[opcao] is not None:
+                configuracao[chave] = options[opcao]
+        if configuracao["TRABALHADORES"] < 1:
+            raise CommandError("Informe ao menos 1 trabalhador.")
+        problemas = checks.caches_do_processo()
+        if configuracao["TRABALHADORES"] > 1 and problemas:
+            mensagem = "\n".join(
+                [f"Com {configuracao['TRABALHADORES']} trabalhadores, estes caches ficariam divididos entre eles:"]
+                + [f"  {codigo}: {texto}" for codigo, texto in problemas]
+                + [checks.DICA + " (--trabalhadores 1)"]
+            )
+            # Na recarga, recusar derrubaria o servidor em funcionamento: só avisa.
+            if servidor.AMBIENTE_SOCKET not in os.environ:
+                raise CommandError(mensagem)
+            self.stderr.write(self.style.ERROR(mensagem))
+        try:
+            endereco = servidor.ler_endereco(configuracao["ENDERECO"])
+        except ValueError as erro:
+            raise CommandError(str(erro))
+
+        # Na recarga (SIGHUP), o socket e os trabalhadores antigos vêm do mestre anterior.
+        descritor = os.environ.pop(servidor.AMBIENTE_SOCKET, None)
+        antigos = [int(pid) for pid in os.environ.pop(servidor.AMBIENTE_ANTIGOS, "").split(",") if pid]
+        try:
+            http = servidor.ServidorTrabalhador(
+                endereco, configuracao["BACKLOG"], configuracao["TEMPO_LIMITE_CONEXAO"],
+                descritor=None if descritor is None else int(descritor),
+            )
+        except OSError as erro:
+            raise CommandError(f"Não foi possível abrir {configuracao['ENDERECO']}: {erro}")
+
+        aplicacao, etapas = servidor.aquecer()
+        http.set_app(aplicacao)
+        http.escutar()
+        self.stdout.write(
+            f"Aquecimento em {sum(segundos for _, segundos in etapas) * 1000:.0f} ms: "
+            + ", ".join(f"{nome} {segundos * 1000:.0f} ms" for nome, segundos in etapas)
+        )
+        self.stdout.write(
+            f"Servindo em http://{configuracao['ENDERECO']}/ com {configuracao['TRABALHADORES']} trabalhadores"
+            + (f"; encerrando {len(antigos)} trabalhadores antigos quando estiverem prontos." if antigos else ".")
+        )
+        servidor.Mestre(http, configuracao, self.stdout.write, antigos=antigos, inicio=inicio).executar()
@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.roteamento import configuracao_replicas
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia o banco principal (SQLite) para as réplicas de SGHSS_REPLICAS, fazendo o "
+        "papel da replicação ao testar o roteamento de leituras localmente. Com "
+        "--intervalo, repete a cópia a cada N segundos até ser interrompido."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--intervalo", type=float, help="Segundos entre cópias (simula o atraso da réplica).")
+
+    def handle(self, *args, **options):
+        replicas = configuracao_replicas()["REPLICAS"]
+        if not replicas:
+            raise CommandError("Nenhuma réplica configurada em SGHSS_REPLICAS[\"REPLICAS\"].")
+
+        bancos = [DEFAULT_DB_ALIAS, *replicas]
+        for alias in bancos:
+            if connections[alias].vendor != "sqlite":
+                raise CommandError(f"O banco \"{alias}\" não é SQLite; a replicação fica a cargo do próprio banco.")
+            if connections[alias].is_in_memory_db():
+                raise CommandError(f"O banco \"{alias}\" está em memória e não pode ser copiado.")
+
+        while True:
+            self._copiar(replicas)
+            if not options["intervalo"]:
+                break
+            time.sleep(options["intervalo"])
+
+    def _copiar(self, replicas):
+        principal = connections[DEFAULT_DB_ALIAS]
+        principal.ensure_connection()
+        for alias in replicas:
+            inicio = time.perf_counter()
+            destino = sqlite3.connect(connections[alias].settings_dict["NAME"])
+            try:
+                principal.connection.backup(destino)
+            finally:
+                destino.close()
+            self.stdout.write(f"{alias}: copiada em {(time.perf_counter() - inicio) * 1000:.0f} ms")
@@ -0,0 +1,53 @@
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+from .instrumentacao import ainstrumentar, instrumentar
+from .roteamento import arotear, rotear
+from .views_assincronas import configuracao_asgi
+
+
+@sync_and_async_middleware
+def urlconf_asgi_middleware(get_response):
+    """
+    Sob ASGI, troca o urlconf da requisição por sghss.urls_asgi, que serve
+    login e leituras com views nativas assíncronas. Sob WSGI não faz nada.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if configuracao_asgi()["VIEWS_ASSINCRONAS"]:
+                request.urlconf = "sghss.urls_asgi"
+            return await get_response(request)
+    else:
+        def middleware(request):
+            return get_response(request)
+    return middleware
+
+
+@sync_and_async_middleware
+def instrumentacao_sql_middleware(get_response):
+    """
+    Mede SQL e tempo de cada requisição (core/instrumentacao.py). Só atua com
+    SGHSS_INSTRUMENTACAO["ATIVO"] = True.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return await ainstrumentar(request, get_response)
+    else:
+        def middleware(request):
+            return instrumentar(request, get_response)
+    return middleware
+
+
+@sync_and_async_middleware
+def roteamento_banco_middleware(get_response):
+    """
+    Acompanha, por requisição, se as leituras podem ir para uma réplica
+    (core/roteamento.py). Sem réplicas configuradas, tudo fica no "default".
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return await arotear(request, get_response)
+    else:
+        def middleware(request):
+            return rotear(request, get_response)
+    return middleware
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logacao',
+            name='entidade',
+            field=models.CharField(blank=True, choices=[('USUARIO', 'Usuário'), ('PACIENTE', 'Paciente'), ('ADMINISTRADOR', 'Administrador'), ('PROFISSIONAL', 'Profissional de Saúde'), ('CONSULTA', 'Consulta')], max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='logacao',
+            name='entidade_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='logacao',
+            name='acao',
+            field=models.CharField(choices=[('LOGIN', 'Login'), ('LOGOUT', 'Logout'), ('CRIAR_PACIENTE', 'Criação de paciente'), ('ATUALIZAR_PACIENTE', 'Atualização de paciente'), ('EXCLUIR_PACIENTE', 'Exclusão de paciente'), ('CRIAR_ADMIN', 'Criação de administrador'), ('ATUALIZAR_ADMIN', 'Atualização de administrador'), ('EXCLUIR_ADMIN', 'Exclusão de administrador'), ('CRIAR_PROFISSIONAL', 'Criação de profissional'), ('ATUALIZAR_PROFISSIONAL', 'Atualização de profissional'), ('EXCLUIR_PROFISSIONAL', 'Exclusão de profissional'), ('CRIAR_CONSULTA', 'Criação de consulta'), ('CANCELAR_CONSULTA', 'Cancelamento de consulta')], max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='logacao',
+            index=models.Index(fields=['data_hora'], name='log_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logacao',
+            index=models.Index(fields=['usuario', 'data_hora'], name='log_usuario_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logacao',
+            index=models.Index(fields=['entidade', 'entidade_id', 'data_hora'], name='log_entidade_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logacao',
+            index=models.Index(fields=['acao', 'data_hora'], name='log_acao_data_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+import re
+
+from django.db import migrations
+
+TAMANHO_LOTE = 1000
+
+# Os registros antigos só guardam a entidade no texto de "detalhes",
+# por exemplo "Consulta 42 criada." ou "Paciente 5 atualizado.".
+PADRAO_DETALHES = re.compile(r"^(Consulta|Paciente|Administrador|Profissional) (\d+)\b")
+
+ENTIDADES = {
+    "Consulta": "CONSULTA",
+    "Paciente": "PACIENTE",
+    "Administrador": "ADMINISTRADOR",
+    "Profissional": "PROFISSIONAL",
+}
+
+
+def preencher_entidade(apps, schema_editor):
+    LogAcao = apps.get_model("core", "LogAcao")
+    banco = schema_editor.connection.alias
+    logs = LogAcao.objects.using(banco).filter(entidade__isnull=True).only("id", "acao", "detalhes", "usuario_id").order_by("id")
+    ultimo_id = 0
+
+    while True:
+        lote = list(logs.filter(id__gt=ultimo_id)[:TAMANHO_LOTE])
+        if not lote:
+            break
+        ultimo_id = lote[-1].id
+
+        alterados = []
+        for log in lote:
+            encontrado = PADRAO_DETALHES.match(log.detalhes or "")
+            if encontrado:
+                log.entidade = ENTIDADES[encontrado.group(1)]
+                log.entidade_id = int(encontrado.group(2))
+            elif log.acao in ("LOGIN", "LOGOUT") and log.usuario_id:
+                log.entidade = "USUARIO"
+                log.entidade_id = log.usuario_id
+            else:
+                continue
+            alterados.append(log)
+
+        if alterados:
+            LogAcao.objects.using(banco).bulk_update(alterados, ["entidade", "entidade_id"])
+
+
+def limpar_entidade(apps, schema_editor):
+    LogAcao = apps.get_model("core", "LogAcao")
+    LogAcao.objects.using(schema_editor.connection.alias).update(entidade=None, entidade_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_logacao_entidade_indices"),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_entidade, limpar_entidade),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_consulta_indices_paginacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HorarioAtendimento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(choices=[(0, 'Segunda-feira'), (1, 'Terça-feira'), (2, 'Quarta-feira'), (3, 'Quinta-feira'), (4, 'Sexta-feira'), (5, 'Sábado'), (6, 'Domingo')], verbose_name='Dia da semana')),
+                ('hora_inicio', models.TimeField(verbose_name='Início')),
+                ('hora_fim', models.TimeField(verbose_name='Fim')),
+            ],
+            options={
+                'ordering': ['dia_semana', 'hora_inicio'],
+            },
+        ),
+        migrations.AddField(
+            model_name='profissionalsaude',
+            name='duracao_consulta_minutos',
+            field=models.PositiveSmallIntegerField(default=30, verbose_name='Duração da consulta (minutos)'),
+        ),
+        migrations.AddIndex(
+            model_name='consulta',
+            index=models.Index(condition=models.Q(('status', 'AGENDADA')), fields=['profissional', 'data_horario'], name='consulta_prof_agendada_idx'),
+        ),
+        migrations.AddField(
+            model_name='horarioatendimento',
+            name='profissional',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horarios_atendimento', to='core.profissionalsaude'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_agenda_profissional'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='logacao',
+            name='acao',
+            field=models.CharField(choices=[('LOGIN', 'Login'), ('LOGOUT', 'Logout'), ('CRIAR_PACIENTE', 'Criação de paciente'), ('ATUALIZAR_PACIENTE', 'Atualização de paciente'), ('EXCLUIR_PACIENTE', 'Exclusão de paciente'), ('CRIAR_ADMIN', 'Criação de administrador'), ('ATUALIZAR_ADMIN', 'Atualização de administrador'), ('EXCLUIR_ADMIN', 'Exclusão de administrador'), ('CRIAR_PROFISSIONAL', 'Criação de profissional'), ('ATUALIZAR_PROFISSIONAL', 'Atualização de profissional'), ('EXCLUIR_PROFISSIONAL', 'Exclusão de profissional'), ('CRIAR_CONSULTA', 'Criação de consulta'), ('CANCELAR_CONSULTA', 'Cancelamento de consulta'), ('EXPORTAR_DADOS', 'Exportação de dados')], max_length=255),
+        ),
+    ]
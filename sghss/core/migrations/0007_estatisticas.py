@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_acao_exportar_dados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaLogin',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(unique=True)),
+                ('quantidade', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EstatisticaConsulta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('status', models.CharField(choices=[('AGENDADA', 'Agendada'), ('CANCELADA_PACIENTE', 'Cancelada pelo paciente'), ('CANCELADA_PROFISSIONAL', 'Cancelada pelo profissional'), ('CANCELADA_ADMIN', 'Cancelada pelo administrador'), ('REALIZADA', 'Realizada')], max_length=30)),
+                ('tipo_atendimento', models.CharField(choices=[('PRESENCIAL', 'Presencial'), ('ONLINE', 'Online')], max_length=20)),
+                ('quantidade', models.IntegerField(default=0)),
+                ('profissional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estatisticas', to='core.profissionalsaude')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('data', 'profissional', 'status', 'tipo_atendimento'), name='estatistica_consulta_unica')],
+            },
+        ),
+    ]
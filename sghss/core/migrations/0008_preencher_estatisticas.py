@@ -0,0 +1,60 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+TAMANHO_LOTE = 1000
+
+
+def _gravar(modelo, linhas, banco):
+    lote = []
+    for linha in linhas:
+        lote.append(modelo(**linha))
+        if len(lote) >= TAMANHO_LOTE:
+            modelo.objects.using(banco).bulk_create(lote)
+            lote = []
+    if lote:
+        modelo.objects.using(banco).bulk_create(lote)
+
+
+def preencher_estatisticas(apps, schema_editor):
+    Consulta = apps.get_model("core", "Consulta")
+    LogAcao = apps.get_model("core", "LogAcao")
+    EstatisticaConsulta = apps.get_model("core", "EstatisticaConsulta")
+    EstatisticaLogin = apps.get_model("core", "EstatisticaLogin")
+    banco = schema_editor.connection.alias
+
+    consultas = (
+        Consulta.objects.using(banco)
+        .annotate(data=TruncDate("data_horario"))
+        .values("data", "profissional_id", "status", "tipo_atendimento")
+        .annotate(quantidade=Count("id"))
+        .order_by()
+    )
+    _gravar(EstatisticaConsulta, consultas.iterator(), banco)
+
+    logins = (
+        LogAcao.objects.using(banco)
+        .filter(acao="LOGIN")
+        .annotate(data=TruncDate("data_hora"))
+        .values("data")
+        .annotate(quantidade=Count("id"))
+        .order_by()
+    )
+    _gravar(EstatisticaLogin, logins.iterator(), banco)
+
+
+def limpar_estatisticas(apps, schema_editor):
+    banco = schema_editor.connection.alias
+    apps.get_model("core", "EstatisticaConsulta").objects.using(banco).all().delete()
+    apps.get_model("core", "EstatisticaLogin").objects.using(banco).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_estatisticas"),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_estatisticas, limpar_estatisticas),
+    ]
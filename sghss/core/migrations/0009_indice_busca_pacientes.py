@@ -0,0 +1,37 @@
+from django.db import migrations
+
+TABELA = "core_paciente_busca"
+
+
+def criar_indice(apps, schema_editor):
+    # FTS5 é do SQLite; nos demais bancos a busca usa LIKE (core/busca.py).
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {TABELA} USING fts5("
+        "nome, cpf, email, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4', detail = column)"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {TABELA} (rowid, nome, cpf, email) "
+        "SELECT p.id, p.nome_completo, "
+        "REPLACE(REPLACE(REPLACE(REPLACE(p.cpf, '.', ''), '-', ''), '/', ''), ' ', ''), u.email "
+        "FROM core_paciente p INNER JOIN core_usuario u ON u.id = p.usuario_id"
+    )
+    schema_editor.execute(f"INSERT INTO {TABELA} ({TABELA}) VALUES ('optimize')")
+
+
+def remover_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(f"DROP TABLE {TABELA}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_preencher_estatisticas"),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
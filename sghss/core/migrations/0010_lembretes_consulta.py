@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_indice_busca_pacientes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LembreteConsulta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('antecedencia_minutos', models.PositiveIntegerField()),
+                ('enviar_em', models.DateTimeField()),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('ENVIADO', 'Enviado'), ('FALHOU', 'Falhou')], default='PENDENTE', max_length=10)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('reserva', models.CharField(blank=True, max_length=32, null=True)),
+                ('reservado_ate', models.DateTimeField(blank=True, null=True)),
+                ('enviado_em', models.DateTimeField(blank=True, null=True)),
+                ('erro', models.TextField(blank=True, null=True)),
+                ('consulta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lembretes', to='core.consulta')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'PENDENTE')), fields=['enviar_em', 'id'], name='lembrete_pendente_idx'), models.Index(condition=models.Q(('reserva__isnull', False)), fields=['reserva'], name='lembrete_reserva_idx')],
+            },
+        ),
+    ]
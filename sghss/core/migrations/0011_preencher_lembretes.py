@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+TAMANHO_LOTE = 1000
+ANTECEDENCIAS_MINUTOS = [24 * 60, 60]
+
+
+def preencher_lembretes(apps, schema_editor):
+    Consulta = apps.get_model("core", "Consulta")
+    LembreteConsulta = apps.get_model("core", "LembreteConsulta")
+    banco = schema_editor.connection.alias
+    antecedencias = getattr(settings, "SGHSS_LEMBRETES", {}).get("ANTECEDENCIAS_MINUTOS", ANTECEDENCIAS_MINUTOS)
+    agora = timezone.now()
+
+    agendadas = (
+        Consulta.objects.using(banco)
+        .filter(status="AGENDADA", data_horario__gt=agora)
+        .values_list("id", "data_horario")
+    )
+    lote = []
+    for consulta_id, data_horario in agendadas.iterator(chunk_size=TAMANHO_LOTE):
+        for minutos in antecedencias:
+            enviar_em = data_horario - timedelta(minutes=minutos)
+            if enviar_em > agora:
+                lote.append(LembreteConsulta(consulta_id=consulta_id, antecedencia_minutos=minutos, enviar_em=enviar_em))
+        if len(lote) >= TAMANHO_LOTE:
+            LembreteConsulta.objects.using(banco).bulk_create(lote)
+            lote = []
+    LembreteConsulta.objects.using(banco).bulk_create(lote)
+
+
+def limpar_lembretes(apps, schema_editor):
+    apps.get_model("core", "LembreteConsulta").objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_lembretes_consulta"),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_lembretes, limpar_lembretes),
+    ]
@@ -105,6 +105,7 @@ class ProfissionalSaude(models.Model):
     registro_profissional = models.CharField(
         "Registro profissional (CRM/COREN/Outro)", max_length=50
     )
+    duracao_consulta_minutos = models.PositiveSmallIntegerField("Duração da consulta (minutos)", default=30)
     criado_em = models.DateTimeField("Criado em", auto_now_add=True)
     atualizado_em = models.DateTimeField("Atualizado em", auto_now=True)
 
@@ -112,6 +113,34 @@ class ProfissionalSaude(models.Model):
         return f"{self.nome_completo} - {self.especialidade}"
 
 
+class HorarioAtendimento(models.Model):
+    """
+    Janela semanal de atendimento de um profissional (ex.: segunda, 08:00 às 12:00).
+    Um profissional pode ter várias janelas no mesmo dia.
+    """
+
+    DIA_CHOICES = [
+        (0, "Segunda-feira"),
+        (1, "Terça-feira"),
+        (2, "Quarta-feira"),
+        (3, "Quinta-feira"),
+        (4, "Sexta-feira"),
+        (5, "Sábado"),
+        (6, "Domingo"),
+    ]
+
+    profissional = models.ForeignKey(ProfissionalSaude, on_delete=models.CASCADE, related_name="horarios_atendimento")
+    dia_semana = models.PositiveSmallIntegerField("Dia da semana", choices=DIA_CHOICES)
+    hora_inicio = models.TimeField("Início")
+    hora_fim = models.TimeField("Fim")
+
+    class Meta:
+        ordering = ["dia_semana", "hora_inicio"]
+
+    def __str__(self):
+        return f"{self.profissional} - {self.get_dia_semana_display()} {self.hora_inicio:%H:%M}-{self.hora_fim:%H:%M}"
+
+
 class Consulta(models.Model):
     TIPO_PRESENCIAL = "PRESENCIAL"
     TIPO_ONLINE = "ONLINE"
@@ -156,11 +185,113 @@ class Consulta(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["data_horario", "id"], name="consulta_data_idx"),
+            models.Index(fields=["paciente", "data_horario", "id"], name="consulta_paciente_data_idx"),
+            models.Index(fields=["profissional", "data_horario", "id"], name="consulta_prof_data_idx"),
+            models.Index(
+                fields=["profissional", "data_horario"],
+                condition=models.Q(status="AGENDADA"),
+                name="consulta_prof_agendada_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Consulta {self.id} - {self.paciente} com {self.profissional} em {self.data_horario}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        consulta = super().from_db(db, field_names, values)
+        # Chave em EstatisticaConsulta no momento da leitura: ao salvar, os
+        # contadores são ajustados sem reler a linha (core/estatisticas.py).
+        consulta._chave_estatistica = consulta.chave_estatistica()
+        # Paciente e profissional gravados: o cache de respostas (core/cache_respostas.py)
+        # percebe quando a consulta muda de dono.
+        consulta._participantes = consulta.participantes()
+        # Data e status gravados: os lembretes (core/lembretes.py) só são
+        # reprogramados quando um dos dois muda.
+        consulta._agendamento = consulta.agendamento()
+        return consulta
+
+    def agendamento(self):
+        """
+        (data_horario, status) da consulta, ou None se algum não foi carregado.
+        """
+        if self.get_deferred_fields() & {"data_horario", "status"}:
+            return None
+        return (self.data_horario, self.status)
+
+    def participantes(self):
+        """
+        (paciente, profissional) da consulta, ou None se algum não foi carregado.
+        """
+        if self.get_deferred_fields() & {"paciente_id", "profissional_id"}:
+            return None
+        return (self.paciente_id, self.profissional_id)
+
+    def chave_estatistica(self):
+        """
+        (data local, profissional, status, tipo) da consulta, ou None se algum
+        desses campos não foi carregado.
+        """
+        if self.get_deferred_fields() & {"data_horario", "profissional_id", "status", "tipo_atendimento"}:
+            return None
+        return (
+            timezone.localdate(self.data_horario),
+            self.profissional_id,
+            self.status,
+            self.tipo_atendimento,
+        )
+
 
 class LogAcao(models.Model):
+    ACAO_LOGIN = "LOGIN"
+    ACAO_LOGOUT = "LOGOUT"
+    ACAO_CRIAR_PACIENTE = "CRIAR_PACIENTE"
+    ACAO_ATUALIZAR_PACIENTE = "ATUALIZAR_PACIENTE"
+    ACAO_EXCLUIR_PACIENTE = "EXCLUIR_PACIENTE"
+    ACAO_CRIAR_ADMIN = "CRIAR_ADMIN"
+    ACAO_ATUALIZAR_ADMIN = "ATUALIZAR_ADMIN"
+    ACAO_EXCLUIR_ADMIN = "EXCLUIR_ADMIN"
+    ACAO_CRIAR_PROFISSIONAL = "CRIAR_PROFISSIONAL"
+    ACAO_ATUALIZAR_PROFISSIONAL = "ATUALIZAR_PROFISSIONAL"
+    ACAO_EXCLUIR_PROFISSIONAL = "EXCLUIR_PROFISSIONAL"
+    ACAO_CRIAR_CONSULTA = "CRIAR_CONSULTA"
+    ACAO_CANCELAR_CONSULTA = "CANCELAR_CONSULTA"
+    ACAO_EXPORTAR_DADOS = "EXPORTAR_DADOS"
+
+    ACAO_CHOICES = [
+        (ACAO_LOGIN, "Login"),
+        (ACAO_LOGOUT, "Logout"),
+        (ACAO_CRIAR_PACIENTE, "Criação de paciente"),
+        (ACAO_ATUALIZAR_PACIENTE, "Atualização de paciente"),
+        (ACAO_EXCLUIR_PACIENTE, "Exclusão de paciente"),
+        (ACAO_CRIAR_ADMIN, "Criação de administrador"),
+        (ACAO_ATUALIZAR_ADMIN, "Atualização de administrador"),
+        (ACAO_EXCLUIR_ADMIN, "Exclusão de administrador"),
+        (ACAO_CRIAR_PROFISSIONAL, "Criação de profissional"),
+        (ACAO_ATUALIZAR_PROFISSIONAL, "Atualização de profissional"),
+        (ACAO_EXCLUIR_PROFISSIONAL, "Exclusão de profissional"),
+        (ACAO_CRIAR_CONSULTA, "Criação de consulta"),
+        (ACAO_CANCELAR_CONSULTA, "Cancelamento de consulta"),
+        (ACAO_EXPORTAR_DADOS, "Exportação de dados"),
+    ]
+
+    ENTIDADE_USUARIO = "USUARIO"
+    ENTIDADE_PACIENTE = "PACIENTE"
+    ENTIDADE_ADMINISTRADOR = "ADMINISTRADOR"
+    ENTIDADE_PROFISSIONAL = "PROFISSIONAL"
+    ENTIDADE_CONSULTA = "CONSULTA"
+
+    ENTIDADE_CHOICES = [
+        (ENTIDADE_USUARIO, "Usuário"),
+        (ENTIDADE_PACIENTE, "Paciente"),
+        (ENTIDADE_ADMINISTRADOR, "Administrador"),
+        (ENTIDADE_PROFISSIONAL, "Profissional de Saúde"),
+        (ENTIDADE_CONSULTA, "Consulta"),
+    ]
+
     usuario = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -168,10 +299,97 @@ class LogAcao(models.Model):
         blank=True,
         related_name="logs",
     )
-    acao = models.CharField(max_length=255)
+    acao = models.CharField(max_length=255, choices=ACAO_CHOICES)
+    entidade = models.CharField(max_length=20, choices=ENTIDADE_CHOICES, blank=True, null=True)
+    entidade_id = models.PositiveBigIntegerField(blank=True, null=True)
     detalhes = models.TextField(blank=True, null=True)
     data_hora = models.DateTimeField(default=timezone.now)
     ip = models.GenericIPAddressField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["data_hora"], name="log_data_idx"),
+            models.Index(fields=["usuario", "data_hora"], name="log_usuario_data_idx"),
+            models.Index(fields=["entidade", "entidade_id", "data_hora"], name="log_entidade_data_idx"),
+            models.Index(fields=["acao", "data_hora"], name="log_acao_data_idx"),
+        ]
+
     def __str__(self):
         return f"[{self.data_hora}] {self.usuario} - {self.acao}"
+
+
+class EstatisticaConsulta(models.Model):
+    """
+    Quantidade de consultas por dia, profissional, status e tipo de
+    atendimento, mantida incrementalmente (core/estatisticas.py).
+    """
+
+    data = models.DateField()
+    profissional = models.ForeignKey(ProfissionalSaude, on_delete=models.CASCADE, related_name="estatisticas")
+    status = models.CharField(max_length=30, choices=Consulta.STATUS_CHOICES)
+    tipo_atendimento = models.CharField(max_length=20, choices=Consulta.TIPO_CHOICES)
+    quantidade = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["data", "profissional", "status", "tipo_atendimento"], name="estatistica_consulta_unica"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.data} - {self.profissional_id} - {self.status}/{self.tipo_atendimento}: {self.quantidade}"
+
+
+class EstatisticaLogin(models.Model):
+    """
+    Quantidade de logins por dia, mantida incrementalmente.
+    """
+
+    data = models.DateField(unique=True)
+    quantidade = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.data}: {self.quantidade} logins"
+
+
+class LembreteConsulta(models.Model):
+    """
+    Lembrete de consulta a enviar em "enviar_em" (fila mantida por
+    core/lembretes.py). O trabalhador percorre só o índice parcial das
+    linhas pendentes, em ordem de envio.
+    """
+
+    STATUS_PENDENTE = "PENDENTE"
+    STATUS_ENVIADO = "ENVIADO"
+    STATUS_FALHOU = "FALHOU"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, "Pendente"),
+        (STATUS_ENVIADO, "Enviado"),
+        (STATUS_FALHOU, "Falhou"),
+    ]
+
+    consulta = models.ForeignKey(Consulta, on_delete=models.CASCADE, related_name="lembretes")
+    antecedencia_minutos = models.PositiveIntegerField()
+    enviar_em = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDENTE)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    # Lote que um trabalhador reservou e até quando; depois disso outro pode reservá-lo.
+    reserva = models.CharField(max_length=32, blank=True, null=True)
+    reservado_ate = models.DateTimeField(blank=True, null=True)
+    enviado_em = models.DateTimeField(blank=True, null=True)
+    erro = models.TextField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["enviar_em", "id"],
+                condition=models.Q(status="PENDENTE"),
+                name="lembrete_pendente_idx",
+            ),
+            models.Index(fields=["reserva"], condition=models.Q(reserva__isnull=False), name="lembrete_reserva_idx"),
+        ]
+
+    def __str__(self):
+        return f"Lembrete {self.antecedencia_minutos} min da consulta {self.consulta_id} ({self.status})"
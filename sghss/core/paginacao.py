@@ -0,0 +1,194 @@
+import json
+from base64 import b64decode, b64encode
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def configuracao_paginacao():
+    configuracao = {"TAMANHO_MAXIMO": 500}
+    configuracao.update(getattr(settings, "SGHSS_PAGINACAO", {}))
+    return configuracao
+
+
+class PaginacaoOffset(LimitOffsetPagination):
+    """
+    Paginação por offset/limit, disponível apenas quando o cliente envia
+    "offset" na query string. Faz COUNT(*) a cada página.
+    """
+
+    @property
+    def max_limit(self):
+        return configuracao_paginacao()["TAMANHO_MAXIMO"]
+
+
+class PaginacaoCursor(BasePagination):
+    """
+    Paginação por chave (keyset). Cada view declara uma ordenação estável em
+    "ordenacao_cursor" (ex.: ("data_horario", "id")); a próxima página é
+    buscada com WHERE sobre essa tupla, sem OFFSET e sem COUNT(*), o que usa
+    os índices e mantém o custo constante em qualquer página.
+    """
+
+    cursor_query_param = "cursor"
+    tamanho_query_param = "tamanho"
+    ordenacao_padrao = ("-id",)
+    invalid_cursor_message = "Cursor inválido."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordenacao = self.get_ordering(queryset, view)
+        if PaginacaoOffset.offset_query_param in request.query_params:
+            self.delegado = PaginacaoOffset()
+            return self.delegado.paginate_queryset(queryset.order_by(*self.ordenacao), request, view)
+        self.delegado = None
+        return self.concluir(list(self.preparar(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Versão para views assíncronas: a busca da página usa o ORM assíncrono.
+        """
+        self.ordenacao = self.get_ordering(queryset, view)
+        self.delegado = None
+        return self.concluir([item async for item in self.preparar(queryset, request)])
+
+    def preparar(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.tamanho = self.get_page_size(request)
+        self.campos = [queryset.model._meta.get_field(campo.lstrip("-")) for campo in self.ordenacao]
+
+        self.posicao, self.reverso = self.decode_cursor(request)
+        ordenacao = self.inverter(self.ordenacao) if self.reverso else self.ordenacao
+        queryset = queryset.order_by(*ordenacao)
+        if self.posicao is not None:
+            queryset = queryset.filter(self.filtro_apos(ordenacao, self.posicao))
+        return queryset[:self.tamanho + 1]
+
+    def concluir(self, resultados):
+        ha_mais = len(resultados) > self.tamanho
+        self.page = resultados[:self.tamanho]
+
+        if self.reverso:
+            self.page.reverse()
+            self.tem_proxima = self.posicao is not None
+            self.tem_anterior = ha_mais
+        else:
+            self.tem_proxima = ha_mais
+            self.tem_anterior = self.posicao is not None
+
+        return self.page
+
+    def get_page_size(self, request):
+        tamanho = api_settings.PAGE_SIZE or 50
+        valor = request.query_params.get(self.tamanho_query_param)
+        if valor:
+            try:
+                tamanho = int(valor)
+            except ValueError:
+                raise ValidationError({"detalhe": f"'{self.tamanho_query_param}' deve ser um número inteiro."})
+        return max(1, min(tamanho, configuracao_paginacao()["TAMANHO_MAXIMO"]))
+
+    def get_ordering(self, queryset, view):
+        ordenacao = tuple(getattr(view, "ordenacao_cursor", self.ordenacao_padrao))
+        # A chave precisa ser única para que nenhuma linha seja pulada ou repetida.
+        if ordenacao[-1].lstrip("-") not in ("id", "pk"):
+            ordenacao += ("-id" if ordenacao[-1].startswith("-") else "id",)
+        return ordenacao
+
+    @staticmethod
+    def inverter(ordenacao):
+        return tuple(campo[1:] if campo.startswith("-") else "-" + campo for campo in ordenacao)
+
+    @staticmethod
+    def filtro_apos(ordenacao, posicao):
+        # (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y), respeitando a direção de cada campo.
+        filtro = Q()
+        iguais = {}
+        for campo, valor in zip(ordenacao, posicao):
+            nome = campo.lstrip("-")
+            operador = "lt" if campo.startswith("-") else "gt"
+            filtro |= Q(**iguais, **{f"{nome}__{operador}": valor})
+            iguais[nome] = valor
+        return filtro
+
+    def decode_cursor(self, request):
+        codificado = request.query_params.get(self.cursor_query_param)
+        if not codificado:
+            return None, False
+        try:
+            dados = json.loads(b64decode(codificado.encode("ascii")).decode("utf-8"))
+            valores = dados["p"]
+            if len(valores) != len(self.campos):
+                raise ValueError
+            posicao = [campo.to_python(valor) for campo, valor in zip(self.campos, valores)]
+            return posicao, bool(dados.get("r"))
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instancia, reverso):
+        if isinstance(instancia, dict):
+            # Linha de .values() do caminho rápido de leitura (core/serializacao_rapida.py).
+            instancia = SimpleNamespace(**{campo.attname: instancia[campo.name] for campo in self.campos})
+        valores = [campo.value_to_string(instancia) for campo in self.campos]
+        dados = {"p": valores}
+        if reverso:
+            dados["r"] = 1
+        codificado = b64encode(json.dumps(dados, separators=(",", ":")).encode("utf-8")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, codificado)
+
+    def get_next_link(self):
+        if not self.tem_proxima or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverso=False)
+
+    def get_previous_link(self):
+        if not self.tem_anterior:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverso=True)
+
+    def get_paginated_response(self, data):
+        if self.delegado is not None:
+            return self.delegado.get_paginated_response(data)
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Cursor retornado em next/previous.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.tamanho_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Quantidade de itens por página.",
+                "schema": {"type": "integer"},
+            },
+        ]
@@ -0,0 +1,109 @@
+"""
+Renderizadores e parsers opcionais (REST_FRAMEWORK em settings.py).
+
+* JSONRapidoRenderer/JSONRapidoParser: o mesmo application/json de sempre,
+  codificado com orjson quando a biblioteca está instalada. Textos, inteiros,
+  datas, datas/horas, IPs e decimais saem com os bytes do JSONRenderer
+  (UTF-8, separadores compactos, U+2028/U+2029 escapados; datas e decimais
+  passam pelo mesmo JSONEncoder do DRF). Floats não: o orjson escreve o
+  expoente sem "+" nem zeros (1e16, não 1e+16) e NaN/infinito como null, em
+  vez de recusá-los. Sem orjson, ou com indentação pedida (API navegável,
+  "indent" no Accept), o caminho é o do DRF;
+* MessagePackRenderer/MessagePackParser: application/msgpack (?format=msgpack),
+  com os mesmos valores do JSON (datas como texto ISO 8601, decimais como
+  float). Só são oferecidos quando o pacote msgpack está instalado.
+
+NegociacaoConteudo ignora os renderizadores e parsers indisponíveis: sem
+msgpack, pedir application/msgpack responde 406 e enviá-lo responde 415.
+"""
+import io
+
+from rest_framework.exceptions import ParseError
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_codificador = JSONRenderer.encoder_class()
+
+
+def _padrao(valor):
+    # Tudo o que o orjson/msgpack não codifica do mesmo jeito que o JSON atual.
+    return _codificador.default(valor)
+
+
+class JSONRapidoRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            conteudo = orjson.dumps(
+                data,
+                default=_padrao,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            # Inteiros acima de 64 bits e afins: o JSONRenderer decide.
+            return super().render(data, accepted_media_type, renderer_context)
+        # Como o JSONRenderer: U+2028/U+2029 quebram JavaScript embutido.
+        return conteudo.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class JSONRapidoParser(JSONParser):
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        conteudo = stream.read()
+        try:
+            return orjson.loads(conteudo)
+        except orjson.JSONDecodeError:
+            # Corpo inválido (ou fora do que o orjson aceita, como inteiros
+            # acima de 64 bits): mesmo resultado e mesma mensagem do JSONParser.
+            return super().parse(io.BytesIO(conteudo), media_type, parser_context)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+    disponivel = msgpack is not None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_padrao, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    media_type = "application/msgpack"
+    disponivel = msgpack is not None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as erro:
+            raise ParseError(f"MessagePack parse error - {erro or type(erro).__name__}")
+
+
+def _disponiveis(classes):
+    return [classe for classe in classes if getattr(classe, "disponivel", True)]
+
+
+class NegociacaoConteudo(DefaultContentNegotiation):
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return super().select_renderer(request, _disponiveis(renderers), format_suffix)
+
+    def select_parser(self, request, parsers):
+        return super().select_parser(request, _disponiveis(parsers))
@@ -0,0 +1,167 @@
+"""
+Separação de leituras e escritas entre o banco principal ("default") e
+réplicas de leitura (ver SGHSS_REPLICAS).
+
+Tudo vai para o principal, a menos que a requisição seja marcada como leitura
+segura (list/retrieve dos viewsets, exportações). Mesmo assim, depois da
+primeira escrita a requisição volta ao principal (leitura após escrita), e o
+usuário que escreveu continua no principal por JANELA_PRIMARIO segundos,
+tempo para as réplicas alcançarem o principal.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+CONFIGURACAO_PADRAO = {
+    # Aliases de settings.DATABASES usados como réplicas. Vazio: só o principal.
+    "REPLICAS": [],
+    "JANELA_PRIMARIO": 10,
+    # Alias de settings.CACHES onde fica a marca de "preso ao principal"; deve
+    # ser compartilhado entre os processos do servidor.
+    "CACHE": "default",
+}
+
+PREFIXO_CHAVE = "sghss:primario:"
+
+
+def configuracao_replicas():
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    configuracao.update(getattr(settings, "SGHSS_REPLICAS", {}))
+    return configuracao
+
+
+class EstadoRoteamento:
+    """
+    Banco de leitura da requisição em andamento e se ela já escreveu algo.
+    """
+
+    def __init__(self):
+        self.replica = None
+        self.escreveu = False
+
+
+# Uma ContextVar também é vista pelas threads do sync_to_async.
+_estado_atual = ContextVar("roteamento_banco", default=None)
+
+
+def _chave(usuario):
+    return f"{PREFIXO_CHAVE}{usuario.pk}"
+
+
+def _usuario_identificado(usuario):
+    return usuario is not None and getattr(usuario, "is_authenticated", False)
+
+
+def _sortear_replica(configuracao):
+    estado = _estado_atual.get()
+    if estado is None or estado.escreveu or not configuracao["REPLICAS"]:
+        return None
+    return random.choice(configuracao["REPLICAS"])
+
+
+def usar_replica(usuario):
+    """
+    Marca a requisição atual como leitura segura: as próximas leituras vão para
+    uma réplica, salvo se o usuário escreveu há menos de JANELA_PRIMARIO
+    segundos. Devolve o alias escolhido (ou None, que significa o principal).
+    """
+    configuracao = configuracao_replicas()
+    replica = _sortear_replica(configuracao)
+    if replica is None:
+        return None
+    if _usuario_identificado(usuario) and caches[configuracao["CACHE"]].get(_chave(usuario)):
+        return None
+    _estado_atual.get().replica = replica
+    return replica
+
+
+def leitura_em_replica():
+    """
+    Indica se as leituras da requisição atual estão indo para uma réplica.
+    """
+    estado = _estado_atual.get()
+    return estado is not None and estado.replica is not None and not estado.escreveu
+
+
+def _prender_ao_primario(estado, usuario, configuracao):
+    return estado.escreveu and configuracao["REPLICAS"] and _usuario_identificado(usuario)
+
+
+def rotear(request, get_response):
+    estado = EstadoRoteamento()
+    marcador = _estado_atual.set(estado)
+    try:
+        resposta = get_response(request)
+    finally:
+        _estado_atual.reset(marcador)
+    # O DRF grava o usuário autenticado também no HttpRequest.
+    usuario = getattr(request, "user", None)
+    configuracao = configuracao_replicas()
+    if _prender_ao_primario(estado, usuario, configuracao):
+        caches[configuracao["CACHE"]].set(_chave(usuario), True, configuracao["JANELA_PRIMARIO"])
+    return resposta
+
+
+async def arotear(request, get_response):
+    estado = EstadoRoteamento()
+    marcador = _estado_atual.set(estado)
+    try:
+        resposta = await get_response(request)
+    finally:
+        _estado_atual.reset(marcador)
+    usuario = getattr(request, "user", None)
+    configuracao = configuracao_replicas()
+    if _prender_ao_primario(estado, usuario, configuracao):
+        await caches[configuracao["CACHE"]].aset(_chave(usuario), True, configuracao["JANELA_PRIMARIO"])
+    return resposta
+
+
+class RoteadorLeituraEscrita:
+    """
+    Router de banco (settings.DATABASE_ROUTERS). Fora de uma requisição, ou sem
+    réplicas configuradas, mantém o comportamento padrão do Django.
+    """
+
+    def db_for_read(self, model, **hints):
+        estado = _estado_atual.get()
+        if estado is None or estado.replica is None or estado.escreveu:
+            return None
+        # Leituras dentro de uma transação do principal ficam no principal.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return estado.replica
+
+    def db_for_write(self, model, **hints):
+        estado = _estado_atual.get()
+        if estado is not None:
+            estado.escreveu = True
+        # Uma instância lida da réplica é gravada no principal.
+        instancia = hints.get("instance")
+        if instancia is not None and instancia._state.db in configuracao_replicas()["REPLICAS"]:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # As réplicas têm os mesmos dados do principal.
+        bancos = {DEFAULT_DB_ALIAS, *configuracao_replicas()["REPLICAS"]}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+
+class LeituraReplicaMixin:
+    """
+    Viewsets: as ações em "acoes_replica" leem de uma réplica. A decisão é
+    tomada depois da autenticação, que sempre consulta o principal.
+    """
+
+    acoes_replica = ("list", "retrieve")
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.acoes_replica and request.method in SAFE_METHODS:
+            usar_replica(request.user)
@@ -0,0 +1,247 @@
+"""
+Caminho rápido de leitura para list/retrieve.
+
+Em vez de instanciar modelos e passar cada campo pelo ModelSerializer, as
+linhas são lidas com .values() e convertidas por um mapeamento calculado uma
+única vez a partir do próprio serializer (mesmos campos, mesma ordem, mesmas
+conversões). O JSON resultante é idêntico ao do serializer; as escritas
+continuam usando os serializers normais.
+
+Serializers com algo que o mapeamento não sabe reproduzir (campos calculados,
+relações "many", to_representation customizado...) seguem pelo caminho normal.
+"""
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.http import Http404
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+
+def configuracao_serializacao():
+    configuracao = {"CAMINHO_RAPIDO": True}
+    configuracao.update(getattr(settings, "SGHSS_SERIALIZACAO", {}))
+    return configuracao
+
+
+class CampoNaoSuportado(Exception):
+    pass
+
+
+def _data_hora(valor, fuso):
+    # Mesmo resultado de serializers.DateTimeField().to_representation(valor).
+    texto = valor.astimezone(fuso).isoformat()
+    if texto.endswith("+00:00"):
+        texto = texto[:-6] + "Z"
+    return texto
+
+
+def _data(valor, fuso):
+    return valor.isoformat()
+
+
+def _texto(valor, fuso):
+    return str(valor)
+
+
+# Campos cujo to_representation devolve o próprio valor lido do banco.
+_SEM_CONVERSAO = (
+    serializers.CharField.to_representation,
+    serializers.IntegerField.to_representation,
+    serializers.ChoiceField.to_representation,
+)
+
+
+def _conversor(campo):
+    metodo = type(campo).to_representation
+    if metodo in _SEM_CONVERSAO:
+        return None
+    if metodo is serializers.BigIntegerField.to_representation:
+        if getattr(campo, "coerce_to_string", api_settings.COERCE_BIGINT_TO_STRING):
+            return _texto
+        return None
+    if metodo is serializers.DateTimeField.to_representation:
+        formato = getattr(campo, "format", api_settings.DATETIME_FORMAT)
+        if formato and formato.lower() == ISO_8601 and not hasattr(campo, "timezone"):
+            return _data_hora
+    if metodo is serializers.DateField.to_representation:
+        formato = getattr(campo, "format", api_settings.DATE_FORMAT)
+        if formato and formato.lower() == ISO_8601:
+            return _data
+    raise CampoNaoSuportado(f"{type(campo).__name__} ({campo.field_name})")
+
+
+class MapeamentoRapido:
+    """
+    Mapeamento pré-calculado de um serializer: caminhos do .values() e, para
+    cada campo de saída, (nome, chave na linha, conversor, mapeamento aninhado).
+    Com "campos" (?fields=/?exclude=, core/campos_esparsos.py), só esses campos
+    de primeiro nível são lidos e devolvidos.
+    """
+
+    def __init__(self, classe_serializer, prefixo="", campos=None):
+        serializer = classe_serializer()
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            raise CampoNaoSuportado(f"{classe_serializer.__name__}.to_representation")
+
+        modelo = serializer.Meta.model
+        self.campos = []
+        self.caminhos = []
+
+        for campo in serializer._readable_fields:
+            if campos is not None and campo.field_name not in campos:
+                continue
+            if len(campo.source_attrs) != 1:
+                raise CampoNaoSuportado(campo.field_name)
+            try:
+                campo_modelo = modelo._meta.get_field(campo.source)
+            except FieldDoesNotExist:
+                raise CampoNaoSuportado(campo.field_name)
+            if not campo_modelo.concrete:
+                raise CampoNaoSuportado(campo.field_name)
+
+            chave = prefixo + campo.source
+            if isinstance(campo, serializers.BaseSerializer):
+                if getattr(campo, "many", False):
+                    raise CampoNaoSuportado(campo.field_name)
+                aninhado = MapeamentoRapido(type(campo), prefixo=f"{chave}__")
+                chave_pk = f"{chave}__{campo_modelo.related_model._meta.pk.name}"
+                self.campos.append((campo.field_name, chave_pk, None, aninhado))
+                self.caminhos.append(chave_pk)
+                self.caminhos.extend(aninhado.caminhos)
+            elif isinstance(campo, serializers.PrimaryKeyRelatedField):
+                # .values("paciente") já devolve a chave primária do relacionado.
+                self.campos.append((campo.field_name, chave, None, None))
+                self.caminhos.append(chave)
+            else:
+                self.campos.append((campo.field_name, chave, _conversor(campo), None))
+                self.caminhos.append(chave)
+
+        self.caminhos = list(dict.fromkeys(self.caminhos))
+
+    def valores(self, queryset, extras=()):
+        """
+        queryset.values() com os caminhos do mapeamento e os campos extras
+        necessários para a paginação por cursor.
+        """
+        caminhos = self.caminhos + [campo for campo in extras if campo not in self.caminhos]
+        return queryset.values(*caminhos)
+
+    def para_dict(self, linha, fuso):
+        saida = {}
+        for nome, chave, conversor, aninhado in self.campos:
+            valor = linha[chave]
+            if valor is None:
+                saida[nome] = None
+            elif aninhado is not None:
+                saida[nome] = aninhado.para_dict(linha, fuso)
+            elif conversor is None:
+                saida[nome] = valor
+            else:
+                saida[nome] = conversor(valor, fuso)
+        return saida
+
+    def serializar(self, linhas):
+        fuso = timezone.get_current_timezone()
+        return [self.para_dict(linha, fuso) for linha in linhas]
+
+    def serializar_um(self, linha):
+        return self.para_dict(linha, timezone.get_current_timezone())
+
+
+_mapeamentos = {}
+
+
+def obter_mapeamento(classe_serializer, campos=None):
+    """
+    Mapeamento do serializer (calculado uma vez por classe e conjunto de
+    campos) ou None quando o caminho rápido está desligado ou o serializer não
+    é suportado.
+    """
+    if not configuracao_serializacao()["CAMINHO_RAPIDO"]:
+        return None
+    chave = (classe_serializer, campos)
+    if chave not in _mapeamentos:
+        try:
+            _mapeamentos[chave] = MapeamentoRapido(classe_serializer, campos=campos)
+        except CampoNaoSuportado:
+            _mapeamentos[chave] = None
+    return _mapeamentos[chave]
+
+
+def campos_ordenacao(view):
+    return [campo.lstrip("-") for campo in getattr(view, "ordenacao_cursor", ())] + ["id"]
+
+
+class LeituraRapidaMixin:
+    """
+    list/retrieve pelo caminho rápido quando o serializer da view é suportado.
+    As demais ações (e as views com permissões por objeto) usam o caminho normal.
+
+    alist/aretrieve são as mesmas ações com o ORM assíncrono, chamadas pelas
+    views de core/views_assincronas.py; só servem para views paginadas.
+    """
+
+    def campos_saida(self):
+        # Todos os campos; CamposEsparsosMixin (core/campos_esparsos.py) restringe.
+        return None
+
+    def mapeamento_leitura(self):
+        if self.action not in ("list", "retrieve"):
+            return None
+        if self.action == "retrieve" and any(
+            type(permissao).has_object_permission is not BasePermission.has_object_permission
+            for permissao in self.get_permissions()
+        ):
+            return None
+        return obter_mapeamento(self.get_serializer_class(), self.campos_saida())
+
+    def list(self, request, *args, **kwargs):
+        mapeamento = self.mapeamento_leitura()
+        if mapeamento is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = mapeamento.valores(self.filter_queryset(self.get_queryset()), campos_ordenacao(self))
+        pagina = self.paginate_queryset(queryset)
+        if pagina is not None:
+            return self.get_paginated_response(mapeamento.serializar(pagina))
+        return Response(mapeamento.serializar(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        mapeamento = self.mapeamento_leitura()
+        if mapeamento is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        queryset = mapeamento.valores(self.filter_queryset(self.get_queryset()))
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        linha = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return Response(mapeamento.serializar_um(linha))
+
+    async def alist(self, request, *args, **kwargs):
+        mapeamento = self.mapeamento_leitura()
+        queryset = self.filter_queryset(self.get_queryset())
+        if mapeamento is not None:
+            queryset = mapeamento.valores(queryset, campos_ordenacao(self))
+        pagina = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        if mapeamento is not None:
+            return self.get_paginated_response(mapeamento.serializar(pagina))
+        return self.get_paginated_response(self.get_serializer(pagina, many=True).data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        mapeamento = self.mapeamento_leitura()
+        queryset = self.filter_queryset(self.get_queryset())
+        if mapeamento is not None:
+            queryset = mapeamento.valores(queryset)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            instancia = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, DjangoValidationError):
+            # Mesma mensagem do get_object_or_404.
+            raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+        if mapeamento is not None:
+            return Response(mapeamento.serializar_um(instancia))
+        self.check_object_permissions(request, instancia)
+        return Response(self.get_serializer(instancia).data)
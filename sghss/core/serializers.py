@@ -1,6 +1,22 @@
 from rest_framework import serializers
 from django.utils import timezone
-from .models import Usuario, Paciente, Administrador, ProfissionalSaude, Consulta, LogAcao
+from .models import Usuario, Paciente, Administrador, ProfissionalSaude, HorarioAtendimento, Consulta, LogAcao
+
+
+def _atualizar_usuario(usuario, email, senha):
+    """
+    Grava o e-mail e a senha do perfil num único UPDATE, só com os campos
+    alterados: os sinais do usuário (core/signals.py) olham o update_fields.
+    """
+    campos = []
+    if email and email != usuario.email:
+        usuario.email = email
+        campos.append("email")
+    if senha:
+        usuario.set_password(senha)
+        campos.append("password")
+    if campos:
+        usuario.save(update_fields=campos)
 
 
 class UsuarioSerializer(serializers.ModelSerializer):
@@ -36,16 +52,7 @@ class PacienteSerializer(serializers.ModelSerializer):
         return paciente
 
     def update(self, instance, validated_data):
-        email = validated_data.pop("email", None)
-        senha = validated_data.pop("senha", None)
-
-        if email:
-            instance.usuario.email = email
-            instance.usuario.save()
-        if senha:
-            instance.usuario.set_password(senha)
-            instance.usuario.save()
-
+        _atualizar_usuario(instance.usuario, validated_data.pop("email", None), validated_data.pop("senha", None))
         return super().update(instance, validated_data)
 
 
@@ -76,16 +83,7 @@ class AdministradorSerializer(serializers.ModelSerializer):
         return administrador
 
     def update(self, instance, validated_data):
-        email = validated_data.pop("email", None)
-        senha = validated_data.pop("senha", None)
-
-        if email:
-            instance.usuario.email = email
-            instance.usuario.save()
-        if senha:
-            instance.usuario.set_password(senha)
-            instance.usuario.save()
-
+        _atualizar_usuario(instance.usuario, validated_data.pop("email", None), validated_data.pop("senha", None))
         return super().update(instance, validated_data)
 
 
@@ -99,7 +97,7 @@ class ProfissionalSaudeSerializer(serializers.ModelSerializer):
         fields = [
             "id", "usuario", "email", "senha",
             "nome_completo", "especialidade", "registro_profissional",
-            "criado_em", "atualizado_em"
+            "duracao_consulta_minutos", "criado_em", "atualizado_em"
         ]
         read_only_fields = ["criado_em", "atualizado_em"]
 
@@ -116,17 +114,19 @@ class ProfissionalSaudeSerializer(serializers.ModelSerializer):
         return profissional
 
     def update(self, instance, validated_data):
-        email = validated_data.pop("email", None)
-        senha = validated_data.pop("senha", None)
+        _atualizar_usuario(instance.usuario, validated_data.pop("email", None), validated_data.pop("senha", None))
+        return super().update(instance, validated_data)
 
-        if email:
-            instance.usuario.email = email
-            instance.usuario.save()
-        if senha:
-            instance.usuario.set_password(senha)
-            instance.usuario.save()
 
-        return super().update(instance, validated_data)
+class HorarioAtendimentoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = HorarioAtendimento
+        fields = ["id", "dia_semana", "hora_inicio", "hora_fim"]
+
+    def validate(self, attrs):
+        if attrs["hora_fim"] <= attrs["hora_inicio"]:
+            raise serializers.ValidationError("O horário final deve ser posterior ao inicial.")
+        return attrs
 
 
 class ConsultaSerializer(serializers.ModelSerializer):
@@ -155,4 +155,4 @@ class LogAcaoSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = LogAcao
-        fields = ["id", "usuario", "acao", "detalhes", "data_hora", "ip"]
+        fields = ["id", "usuario", "acao", "entidade", "entidade_id", "detalhes", "data_hora", "ip"]
@@ -0,0 +1,506 @@
+"""
+Servidor de produção com pré-fork (comando "servir").
+
+O processo mestre importa e aquece a aplicação uma única vez (aquecer()):
+carrega a aplicação WSGI com os middlewares, monta as rotas, calcula os
+campos, as colunas e os mapeamentos rápidos dos serializers, abre uma
+conexão com cada banco para validá-lo, atende REQUISICOES_AQUECIMENTO e
+carrega as traduções. Depois cria
+os trabalhadores com fork(). Eles herdam essa memória pronta, compartilhada
+por cópia na escrita (o gc.freeze() evita que a coleta de lixo a suje), e a
+primeira requisição de cada um já não paga importações nem caches frios.
+
+Cada trabalhador atende uma requisição por vez, com o servidor HTTP da
+biblioteca padrão (wsgiref.simple_server), no socket aberto pelo mestre.
+Esse servidor não é endurecido (só HTTP/1.0, uma requisição por conexão,
+sem limites de cabeçalhos nem proteção contra clientes lentos além de
+TEMPO_LIMITE_CONEXAO): o "servir" deve ficar atrás de um proxy reverso
+(nginx, por exemplo), nunca exposto direto à internet.
+A conexão com o banco é aberta logo após o fork, antes do primeiro accept().
+Depois de MAX_REQUISICOES (mais um sorteio de até VARIACAO_MAX_REQUISICOES,
+para não reciclarem todos juntos), o trabalhador termina e o mestre cria
+outro no lugar.
+
+Sinais para o mestre:
+
+* SIGTERM/SIGINT: encerramento gracioso. Os trabalhadores param de aceitar
+  conexões e terminam a requisição em andamento; quem passar de
+  TEMPO_ENCERRAMENTO segundos recebe SIGKILL. Um segundo sinal encerra na hora;
+* SIGHUP: recarga graciosa, para o código e as configurações novos. O mestre
+  roda "manage.py check" e, se passar, se reexecuta mantendo o socket
+  aberto: aquece de novo, cria os novos trabalhadores e, quando estão
+  prontos, encerra os antigos, que terminam o que estavam atendendo. Nenhuma
+  conexão é recusada durante a recarga; se a verificação falhar, os
+  trabalhadores atuais continuam.
+
+Precisa de fork(): Linux ou macOS.
+"""
+import gc
+import io
+import logging
+import os
+import random
+import select
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+from django.apps import apps
+from django.conf import settings
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.core.servers.basehttp import get_internal_wsgi_application
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone, translation
+
+from .arquivo_logs import entradas_arquivadas
+from .auditoria import encerrar_sink
+from .autenticacao import obter_cache
+from .campos_esparsos import campos_legiveis, colunas
+from .serializacao_rapida import obter_mapeamento
+
+logger = logging.getLogger(__name__)
+
+CONFIGURACAO_PADRAO = {
+    "ENDERECO": "127.0.0.1:8000",
+    "TRABALHADORES": 4,
+    # Requisições até o trabalhador ser reciclado; 0 desliga.
+    "MAX_REQUISICOES": 1000,
+    "VARIACAO_MAX_REQUISICOES": 100,
+    # Fila de conexões do listen().
+    "BACKLOG": 128,
+    # Segundos sem receber nada de um cliente antes de desistir da conexão.
+    "TEMPO_LIMITE_CONEXAO": 30,
+    # Segundos para os trabalhadores terminarem no encerramento e na recarga.
+    "TEMPO_ENCERRAMENTO": 30,
+}
+
+# Requisições de leitura, sem autenticação nem banco, que passam pelos
+# middlewares, pela negociação de conteúdo, pelos renderizadores e pelo
+# tratamento de exceções do DRF (OPTIONS: metadados; GET: 405): carregam o
+# que só é importado ou montado na primeira requisição.
+REQUISICOES_AQUECIMENTO = (
+    ("OPTIONS", "login"),
+    ("GET", "login"),
+)
+
+# Estado passado de um mestre para o próximo na recarga (SIGHUP).
+AMBIENTE_SOCKET = "SGHSS_SERVIDOR_SOCKET"
+AMBIENTE_ANTIGOS = "SGHSS_SERVIDOR_ANTIGOS"
+
+
+def configuracao_servidor():
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    configuracao.update(getattr(settings, "SGHSS_SERVIDOR", {}))
+    return configuracao
+
+
+def _views(padroes, encontradas):
+    for padrao in padroes:
+        if isinstance(padrao, URLResolver):
+            _views(padrao.url_patterns, encontradas)
+            continue
+        classe = getattr(padrao.callback, "cls", None)
+        if classe is not None and classe not in encontradas:
+            encontradas.append(classe)
+    return encontradas
+
+
+def _aquecer_rotas():
+    resolver = get_resolver()
+    # Compila as expressões de todas as rotas (resolve e reverse).
+    resolver.reverse_dict
+    return _views(resolver.url_patterns, [])
+
+
+def _aquecer_serializers(views):
+    for view in views:
+        classe = getattr(view, "serializer_class", None)
+        if classe is None:
+            continue
+        campos_legiveis(classe)
+        colunas(classe)
+        obter_mapeamento(classe)
+
+
+def _aquecer_bancos():
+    # Valida cada banco (e aplica os PRAGMAs) antes de subir os trabalhadores.
+    for alias in connections:
+        connections[alias].ensure_connection()
+    # Compila uma consulta por modelo: importa lookups, compiladores e conversores.
+    for modelo in apps.get_app_config("core").get_models():
+        modelo._default_manager.using(DEFAULT_DB_ALIAS).filter(pk=0).exists()
+
+
+def _aquecer_requisicoes(aplicacao):
+    # Sem o aviso "Method Not Allowed" no log.
+    logging.disable(logging.WARNING)
+    try:
+        for metodo, rota in REQUISICOES_AQUECIMENTO:
+            resposta = aplicacao({
+                "REQUEST_METHOD": metodo,
+                "PATH_INFO": reverse(rota),
+                "QUERY_STRING": "",
+                "SERVER_NAME": "localhost",
+                "SERVER_PORT": "80",
+                "REMOTE_ADDR": "127.0.0.1",
+                "HTTP_ACCEPT": "application/json",
+                "wsgi.input": io.BytesIO(),
+                "wsgi.url_scheme": "http",
+                "wsgi.errors": sys.stderr,
+            }, lambda status, cabecalhos, exc_info=None: None)
+            b"".join(resposta)
+            resposta.close()
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def _aquecer_caches():
+    obter_cache()
+    entradas_arquivadas()
+    timezone.get_current_timezone()
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext("Not found.")
+
+
+def aquecer():
+    """
+    Aplicação WSGI carregada e aquecida no processo atual e o tempo de cada
+    etapa, [(etapa, segundos)].
+    """
+    etapas = []
+
+    def medir(nome, executar, *args):
+        inicio = time.perf_counter()
+        resultado = executar(*args)
+        etapas.append((nome, time.perf_counter() - inicio))
+        return resultado
+
+    aplicacao = medir("aplicação", get_internal_wsgi_application)
+    views = medir("rotas", _aquecer_rotas)
+    medir("serializers", _aquecer_serializers, views)
+    medir("bancos", _aquecer_bancos)
+    medir("requisições", _aquecer_requisicoes, aplicacao)
+    medir("caches", _aquecer_caches)
+    # As conexões não atravessam o fork: cada trabalhador abre as suas.
+    connections.close_all()
+    # O que já existe vai para a geração permanente: a coleta de lixo dos
+    # trabalhadores não percorre (nem copia) essas páginas compartilhadas.
+    gc.collect()
+    gc.freeze()
+    return aplicacao, etapas
+
+
+def memoria_processo(pid):
+    """
+    {"rss", "pss", "compartilhada", "privada"} em kB, de /proc/<pid>/smaps_rollup,
+    ou None fora do Linux. Só "rss" quando o kernel não tem smaps_rollup.
+    """
+    memoria = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as arquivo:
+            linhas = arquivo.read().splitlines()
+    except OSError:
+        try:
+            with open(f"/proc/{pid}/status") as arquivo:
+                linhas = [linha.replace("VmRSS", "Rss") for linha in arquivo.read().splitlines()]
+        except OSError:
+            return None
+    for linha in linhas:
+        nome, _, valor = linha.partition(":")
+        if valor.strip().endswith("kB"):
+            memoria[nome] = int(valor.split()[0])
+    if "Rss" not in memoria:
+        return None
+    resultado = {"rss": memoria["Rss"]}
+    if "Pss" in memoria:
+        resultado.update(
+            pss=memoria["Pss"],
+            compartilhada=memoria.get("Shared_Clean", 0) + memoria.get("Shared_Dirty", 0),
+            privada=memoria.get("Private_Clean", 0) + memoria.get("Private_Dirty", 0),
+        )
+    return resultado
+
+
+def ler_endereco(endereco):
+    """
+    (host, porta) de "host:porta", "[::1]:porta" ou só "porta".
+    """
+    host, _, porta = str(endereco).rpartition(":")
+    host = host.strip("[]") or "127.0.0.1"
+    if not porta.isdigit():
+        raise ValueError(f"Endereço inválido: {endereco!r}. Use host:porta.")
+    return host, int(porta)
+
+
+class ManipuladorTrabalhador(WSGIRequestHandler):
+    """
+    Handler do wsgiref sem a linha de acesso no stderr a cada requisição
+    (o log de acesso fica com o proxy reverso). Descarta os cabeçalhos
+    com "_", que no environ se confundiriam com os de "-" (X-Usuario e
+    X_Usuario viram o mesmo HTTP_X_USUARIO), como faz o runserver.
+    """
+
+    def log_message(self, formato, *args):
+        pass
+
+    def get_environ(self):
+        for nome in [nome for nome in self.headers if "_" in nome]:
+            del self.headers[nome]
+        return super().get_environ()
+
+
+class ServidorTrabalhador(WSGIServer):
+    """
+    Servidor HTTP do wsgiref no socket aberto pelo mestre. Todos os
+    trabalhadores esperam no mesmo socket; o tempo limite dele (timeout)
+    faz quem perder a disputa pelo accept() voltar a conferir os sinais.
+    O socket só passa a aceitar conexões em escutar(), depois do aquecimento.
+    """
+
+    # handle_request() volta a cada segundo para conferir os sinais.
+    timeout = 1
+
+    def __init__(self, endereco, backlog=128, tempo_limite_conexao=None, descritor=None):
+        self.request_queue_size = backlog
+        self.tempo_limite_conexao = tempo_limite_conexao
+        self.atendidas = 0
+        self.herdado = descritor is not None
+        if ":" in endereco[0]:
+            self.address_family = socket.AF_INET6
+        super().__init__(endereco, ManipuladorTrabalhador, bind_and_activate=False)
+        if self.herdado:
+            # Socket do mestre anterior (recarga), que já está escutando.
+            self.socket.close()
+            self.socket = socket.socket(fileno=descritor)
+            self.server_address = self.socket.getsockname()
+            host, self.server_port = self.server_address[:2]
+            self.server_name = socket.getfqdn(host)
+            self.setup_environ()
+        else:
+            try:
+                self.server_bind()
+            except BaseException:
+                self.server_close()
+                raise
+        self.socket.settimeout(self.timeout)
+
+    def escutar(self):
+        if not self.herdado:
+            self.server_activate()
+
+    def get_request(self):
+        conexao, endereco = self.socket.accept()
+        conexao.settimeout(self.tempo_limite_conexao)
+        return conexao, endereco
+
+    def finish_request(self, request, client_address):
+        self.atendidas += 1
+        super().finish_request(request, client_address)
+
+    def handle_error(self, request, client_address):
+        erro = sys.exc_info()[1]
+        if isinstance(erro, TimeoutError):
+            logger.info("Conexão de %s encerrada: cliente inativo.", client_address)
+        elif isinstance(erro, ConnectionError):
+            logger.info("Conexão de %s encerrada pelo cliente.", client_address)
+        else:
+            super().handle_error(request, client_address)
+
+
+class Mestre:
+    """
+    Cria e acompanha os trabalhadores (ver o docstring do módulo). "antigos"
+    são os trabalhadores do mestre anterior, encerrados quando os novos
+    ficam prontos.
+    """
+
+    def __init__(self, servidor, configuracao, relatar, antigos=(), inicio=None):
+        self.servidor = servidor
+        self.configuracao = configuracao
+        self.relatar = relatar
+        self.inicio = inicio or time.perf_counter()
+        self.pid = os.getpid()
+        self.trabalhadores = {}
+        self.prontos = set()
+        self.antigos = set(antigos)
+        self.encerrando = False
+        self.sinal = None
+        self.espera_ate = 0
+        self.relatou_pronto = False
+        self._leitura, self._escrita = os.pipe()
+        os.set_blocking(self._leitura, False)
+
+    def executar(self):
+        signal.signal(signal.SIGTERM, self._ao_sinal)
+        signal.signal(signal.SIGINT, self._ao_sinal)
+        signal.signal(signal.SIGHUP, self._ao_sinal)
+        prazo_antigos = time.monotonic() + self.configuracao["TEMPO_ENCERRAMENTO"]
+        while self.sinal != signal.SIGTERM:
+            if self.sinal == signal.SIGHUP:
+                self.sinal = None
+                self._recarregar()
+            self._completar()
+            self._esperar(0.5)
+            self._recolher()
+            if self.antigos and (len(self.prontos) >= self.configuracao["TRABALHADORES"] or time.monotonic() > prazo_antigos):
+                self._sinalizar(self.antigos, signal.SIGTERM)
+                prazo_antigos = float("inf")
+        self._encerrar()
+
+    def _ao_sinal(self, numero, quadro):
+        if numero == signal.SIGHUP:
+            self.sinal = self.sinal or numero
+            return
+        if self.encerrando:
+            # Segundo Ctrl+C/SIGTERM: não espera mais ninguém.
+            self._sinalizar(set(self.trabalhadores) | self.antigos, signal.SIGKILL)
+        self.sinal = signal.SIGTERM
+
+    def _sinalizar(self, pids, numero):
+        for pid in list(pids):
+            try:
+                os.kill(pid, numero)
+            except ProcessLookupError:
+                pass
+
+    def _completar(self):
+        while (
+            len(self.trabalhadores) < self.configuracao["TRABALHADORES"]
+            and time.monotonic() >= self.espera_ate
+            and self.sinal != signal.SIGTERM
+        ):
+            self._criar()
+
+    def _esperar(self, segundos):
+        legiveis, _, _ = select.select([self._leitura], [], [], segundos)
+        if not legiveis:
+            return
+        try:
+            dados = os.read(self._leitura, 4096)
+        except BlockingIOError:
+            return
+        for linha in dados.split():
+            self.prontos.add(int(linha))
+        if not self.relatou_pronto and len(self.prontos) >= self.configuracao["TRABALHADORES"]:
+            self.relatou_pronto = True
+            self._relatar_pronto()
+
+    def _relatar_pronto(self):
+        self.relatar(
+            f"{len(self.prontos)} trabalhadores prontos em {(time.perf_counter() - self.inicio) * 1000:.0f} ms "
+            f"(mestre {self.pid})."
+        )
+        memorias = [memoria_processo(pid) for pid in [self.pid, *sorted(self.prontos)]]
+        if any(memoria is None for memoria in memorias):
+            return
+        for rotulo, memoria in zip(["mestre", *sorted(self.prontos)], memorias):
+            detalhes = f"RSS {memoria['rss'] / 1024:.1f} MB"
+            if "pss" in memoria:
+                detalhes += (
+                    f", PSS {memoria['pss'] / 1024:.1f} MB, compartilhada {memoria['compartilhada'] / 1024:.1f} MB, "
+                    f"privada {memoria['privada'] / 1024:.1f} MB"
+                )
+            self.relatar(f"  {rotulo}: {detalhes}")
+
+    def _recolher(self):
+        while True:
+            try:
+                pid, estado = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.antigos.discard(pid)
+            self.prontos.discard(pid)
+            criado_em = self.trabalhadores.pop(pid, None)
+            codigo = os.waitstatus_to_exitcode(estado)
+            if criado_em is None or codigo == 0 or self.encerrando:
+                continue
+            self.relatar(f"Trabalhador {pid} terminou com código {codigo}; criando outro.")
+            if time.monotonic() - criado_em < 1:
+                # Falha logo ao subir (banco fora do ar, por exemplo): sem laço de forks.
+                self.espera_ate = time.monotonic() + 1
+
+    def _criar(self):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            codigo = 1
+            try:
+                codigo = self._trabalhar()
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(codigo)
+        self.trabalhadores[pid] = time.monotonic()
+
+    def _trabalhar(self):
+        parar = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: parar.set())
+        # Ctrl+C chega ao grupo todo; quem decide é o mestre.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        os.close(self._leitura)
+        random.seed()
+
+        limite = self.configuracao["MAX_REQUISICOES"]
+        if limite:
+            limite += random.randint(0, self.configuracao["VARIACAO_MAX_REQUISICOES"])
+        connections[DEFAULT_DB_ALIAS].ensure_connection()
+        os.write(self._escrita, f"{os.getpid()}\n".encode())
+
+        servidor = self.servidor
+        try:
+            while not parar.is_set() and os.getppid() == self.pid and (not limite or servidor.atendidas < limite):
+                servidor.handle_request()
+        finally:
+            encerrar_sink()
+            connections.close_all()
+            servidor.server_close()
+        return 0
+
+    def _recarregar(self):
+        self.relatar("Recarregando: verificando o código com manage.py check...")
+        verificacao = subprocess.run([sys.executable, sys.argv[0], "check"], capture_output=True, text=True)
+        if verificacao.returncode != 0:
+            self.relatar(
+                "Recarga cancelada; os trabalhadores atuais continuam.\n"
+                + (verificacao.stderr or verificacao.stdout).strip()
+            )
+            return
+        descritor = self.servidor.fileno()
+        os.set_inheritable(descritor, True)
+        os.environ[AMBIENTE_SOCKET] = str(descritor)
+        os.environ[AMBIENTE_ANTIGOS] = ",".join(str(pid) for pid in set(self.trabalhadores) | self.antigos)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execv(sys.executable, [sys.executable, *sys.orig_argv[1:]])
+
+    def _encerrar(self):
+        self.encerrando = True
+        vivos = set(self.trabalhadores) | self.antigos
+        self.relatar(f"Encerrando {len(vivos)} trabalhadores...")
+        self._sinalizar(vivos, signal.SIGTERM)
+        prazo = time.monotonic() + self.configuracao["TEMPO_ENCERRAMENTO"]
+        while (self.trabalhadores or self.antigos) and time.monotonic() < prazo:
+            self._recolher()
+            time.sleep(0.1)
+        if self.trabalhadores or self.antigos:
+            self._sinalizar(set(self.trabalhadores) | self.antigos, signal.SIGKILL)
+            while self.trabalhadores or self.antigos:
+                try:
+                    pid, _ = os.waitpid(-1, 0)
+                except ChildProcessError:
+                    break
+                self.trabalhadores.pop(pid, None)
+                self.antigos.discard(pid)
+        self.servidor.server_close()
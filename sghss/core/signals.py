@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import busca, cache_respostas, estatisticas, lembretes
+from .auditoria import logs_gravados
+from .autenticacao import invalidar_token, invalidar_tokens_dos_usuarios
+from .models import Consulta, Paciente, Administrador, ProfissionalSaude, Usuario
+
+
+@receiver(post_delete, sender=Token)
+def invalidar_token_removido(sender, instance, **kwargs):
+    invalidar_token(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidar_tokens_do_usuario(sender, instance, **kwargs):
+    # Desativação, troca de papel ou de senha: o usuário em cache fica obsoleto.
+    invalidar_tokens_dos_usuarios([instance.pk])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def revogar_tokens_na_troca_de_senha(sender, instance, created, using, **kwargs):
+    # set_password() guarda a senha nova em _password até o fim do save().
+    if created or getattr(instance, "_password", None) is None:
+        return
+    Token.objects.using(using).filter(user_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Paciente)
+def indexar_paciente(sender, instance, using, **kwargs):
+    busca.indexar_pacientes([instance.pk], using)
+
+
+@receiver(post_delete, sender=Paciente)
+def remover_paciente_do_indice(sender, instance, using, **kwargs):
+    busca.remover_paciente(instance.pk, using)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reindexar_email_do_paciente(sender, instance, created, using, update_fields=None, **kwargs):
+    # Na criação o paciente ainda não existe; ele é indexado no próprio save().
+    if created or instance.papel != Usuario.PAPEL_PACIENTE:
+        return
+    if update_fields is not None and "email" not in update_fields:
+        return
+    busca.indexar_usuario(instance.pk, using)
+
+
+PERFIS = {
+    Usuario.PAPEL_PACIENTE: Paciente,
+    Usuario.PAPEL_ADMIN: Administrador,
+    Usuario.PAPEL_PROFISSIONAL: ProfissionalSaude,
+}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def marcar_perfil_alterado(sender, instance, created, using, update_fields=None, **kwargs):
+    # O e-mail do usuário aparece no perfil serializado: o atualizado_em do
+    # perfil, base do ETag (core/condicional.py), precisa mudar junto.
+    if created or instance.papel not in PERFIS:
+        return
+    if update_fields is not None and "email" not in update_fields:
+        return
+    PERFIS[instance.papel].objects.using(using).filter(usuario_id=instance.pk).update(atualizado_em=timezone.now())
+
+
+@receiver(pre_save, sender=Consulta)
+def guardar_chave_estatistica(sender, instance, using, **kwargs):
+    if not estatisticas.ajuste_por_instancia():
+        return
+    # Instância com campos adiados ou montada à mão com pk: a chave anterior
+    # vem do banco. As lidas normalmente já a trazem (Consulta.from_db).
+    if instance.pk is not None and getattr(instance, "_chave_estatistica", None) is None:
+        instance._chave_estatistica = estatisticas.chave_gravada(instance.pk, using)
+
+
+@receiver(post_save, sender=Consulta)
+def atualizar_estatistica_consulta(sender, instance, created, using, **kwargs):
+    atual = instance.chave_estatistica()
+    if atual is None or not estatisticas.ajuste_por_instancia():
+        return
+    anterior = None if created else getattr(instance, "_chave_estatistica", None)
+    estatisticas.mover_consulta(anterior, atual, using)
+    instance._chave_estatistica = atual
+
+
+@receiver(post_delete, sender=Consulta)
+def remover_estatistica_consulta(sender, instance, using, **kwargs):
+    if not estatisticas.ajuste_por_instancia():
+        return
+    anterior = getattr(instance, "_chave_estatistica", None) or instance.chave_estatistica()
+    estatisticas.mover_consulta(anterior, None, using)
+
+
+@receiver(logs_gravados)
+def contabilizar_logins(sender, logs, **kwargs):
+    estatisticas.contabilizar_logins(logs)
+
+
+@receiver(post_save, sender=Paciente)
+@receiver(post_save, sender=Administrador)
+@receiver(post_save, sender=ProfissionalSaude)
+@receiver(post_delete, sender=Paciente)
+@receiver(post_delete, sender=Administrador)
+@receiver(post_delete, sender=ProfissionalSaude)
+def invalidar_respostas_do_perfil(sender, instance, using, **kwargs):
+    cache_respostas.invalidar_perfil(sender, instance.pk, instance.usuario_id, using)
+
+
+@receiver(post_delete, sender=Administrador)
+def invalidar_respostas_de_consultas_criadas(sender, instance, using, **kwargs):
+    # O administrador_criador das consultas vira NULL por UPDATE, sem sinais.
+    cache_respostas.invalidar_modelos(Consulta, banco=using)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidar_respostas_do_usuario(sender, instance, created, using, update_fields=None, **kwargs):
+    # O perfil serializado mostra o e-mail e o papel do usuário.
+    if created or instance.papel not in PERFIS:
+        return
+    if update_fields is not None and not {"email", "papel"} & set(update_fields):
+        return
+    modelo = PERFIS[instance.papel]
+    relacao = modelo._meta.get_field("usuario").remote_field
+    perfil = relacao.get_cached_value(instance, default=None)
+    if perfil is not None:
+        ids = [perfil.pk]
+    else:
+        ids = modelo.objects.using(using).filter(usuario_id=instance.pk).values_list("pk", flat=True)
+    for perfil_id in ids:
+        cache_respostas.invalidar_perfil(modelo, perfil_id, instance.pk, using)
+
+
+@receiver(post_save, sender=Consulta)
+@receiver(post_delete, sender=Consulta)
+def invalidar_respostas_da_consulta(sender, instance, using, created=False, **kwargs):
+    anteriores = None if created else getattr(instance, "_participantes", None)
+    if not created and anteriores is None:
+        # Instância montada à mão: não se sabe a quem a consulta pertencia.
+        cache_respostas.invalidar_modelos(Consulta, banco=using)
+    else:
+        cache_respostas.invalidar_consulta(instance, anteriores, using)
+    instance._participantes = instance.participantes()
+
+
+@receiver(post_save, sender=Consulta)
+def programar_lembretes(sender, instance, created, using, **kwargs):
+    # Agendamento, nova data ou cancelamento (inclusive pela ação "cancelar").
+    lembretes.programar(instance, created, using)
@@ -1,3 +1,1304 @@
-from django.test import TestCase
+import csv
+import io
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+from ipaddress import ip_address
+from unittest import mock
 
-# Testes automatizados podem ser adicionados futuramente.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.test import AsyncClient, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import agenda, arquivo_logs, busca, cache_respostas, checks, estatisticas, instrumentacao, renderizadores, views
+from .auditoria import encerrar_sink, obter_sink
+from .campos_esparsos import campos_legiveis
+from .instrumentacao import OrcamentoSQLExcedido
+from .models import (
+    Usuario, Paciente, Administrador, ProfissionalSaude, HorarioAtendimento, Consulta, LogAcao,
+    EstatisticaConsulta, EstatisticaLogin, LembreteConsulta,
+)
+from .serializacao_rapida import obter_mapeamento
+from .views import PacienteViewSet, ConsultaViewSet
+
+
+class ColetorMedicoes(logging.Handler):
+    """
+    Toma o lugar do console no logger "core.instrumentacao" durante os testes:
+    em vez de imprimir o JSON de cada requisição, guarda (view, quantidade de SQL).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.medicoes = []
+
+    def emit(self, record):
+        dados = record.instrumentacao
+        self.medicoes.append((dados["view"], dados["sql"]["quantidade"]))
+
+
+def orcamentos_declarados():
+    """
+    {"View.acao": orcamento} de todas as views de core/views.py com "orcamento_sql".
+    """
+    declarados = {}
+    for view in vars(views).values():
+        orcamento = getattr(view, "orcamento_sql", None)
+        if not isinstance(view, type) or view.__module__ != views.__name__ or orcamento is None:
+            continue
+        if isinstance(orcamento, dict):
+            declarados.update({f"{view.__name__}.{acao}": valor for acao, valor in orcamento.items()})
+        else:
+            metodos = [metodo for metodo in ("get", "post", "put", "patch", "delete") if hasattr(view, metodo)]
+            declarados.update({f"{view.__name__}.{metodo}": orcamento for metodo in metodos})
+    return declarados
+
+
+def copiar_banco_de_teste(caminho):
+    """
+    Copia o banco de teste (em memória) para um arquivo SQLite.
+    """
+    connection.ensure_connection()
+    destino = sqlite3.connect(caminho)
+    try:
+        connection.connection.backup(destino)
+    finally:
+        destino.close()
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    # Logs gravados na própria requisição: as asserções e os orçamentos de SQL os enxergam.
+    SGHSS_AUDITORIA={"SINK": "core.auditoria.SinkSincrono"},
+    SGHSS_INSTRUMENTACAO={"ATIVO": True, "MODO_ESTRITO": True},
+)
+class ApiTestCase(TransactionTestCase):
+    """
+    Base dos testes da API. A instrumentação roda em modo estrito: a requisição
+    que passar do "orcamento_sql" da view levanta OrcamentoSQLExcedido, e o
+    teste falha. O log de cada requisição fica em self.coletor, sem ir para a saída.
+    """
+
+    def setUp(self):
+        self.coletor = ColetorMedicoes()
+        silenciar = mock.patch.object(instrumentacao.logger, "handlers", [self.coletor])
+        silenciar.start()
+        self.addCleanup(silenciar.stop)
+        # Caches em arquivo e arquivo de logs (core/arquivo_logs.py) num diretório próprio de cada teste.
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio)
+        configuracao = override_settings(
+            CACHES={
+                alias: dict(opcoes, LOCATION=os.path.join(diretorio, alias)) if "LOCATION" in opcoes else opcoes
+                for alias, opcoes in settings.CACHES.items()
+            },
+            SGHSS_ARQUIVO_LOGS={"DIRETORIO": os.path.join(diretorio, "arquivo_logs")},
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        os.mkdir(os.path.join(diretorio, "arquivo_logs"))
+        # Caches frios: o orçamento vale para a primeira requisição, sem tokens nem respostas guardados.
+        for alias in caches:
+            caches[alias].clear()
+        # O flush entre os testes só esvazia as tabelas dos modelos, não o índice FTS5.
+        busca.reconstruir()
+
+        self.usuario_admin = Usuario.objects.create_user(
+            email="admin@sghss.test", password="senha-admin", papel=Usuario.PAPEL_ADMIN, is_staff=True,
+        )
+        self.admin = Administrador.objects.create(usuario=self.usuario_admin, nome_completo="Ana Admin")
+        self.profissional = ProfissionalSaude.objects.create(
+            usuario=Usuario.objects.create_user(
+                email="medico@sghss.test", password="senha-medico", papel=Usuario.PAPEL_PROFISSIONAL,
+            ),
+            nome_completo="Bruno Medico", especialidade="Clínica", registro_profissional="CRM-1",
+        )
+        self.usuario_paciente = Usuario.objects.create_user(
+            email="paciente@sghss.test", password="senha-paciente", papel=Usuario.PAPEL_PACIENTE,
+        )
+        self.paciente = Paciente.objects.create(
+            usuario=self.usuario_paciente, nome_completo="Carla Paciente", cpf="111.222.333-44",
+            data_nascimento="1990-05-01",
+        )
+        self.amanha = (timezone.now() + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+        self.consulta = Consulta.objects.create(
+            paciente=self.paciente, profissional=self.profissional, data_horario=self.amanha,
+        )
+        self.log = LogAcao.objects.create(
+            usuario=self.usuario_admin, acao=LogAcao.ACAO_LOGIN, entidade=LogAcao.ENTIDADE_USUARIO,
+            entidade_id=self.usuario_admin.id,
+        )
+
+        self.token_admin = Token.objects.create(user=self.usuario_admin).key
+        self.token_paciente = Token.objects.create(user=self.usuario_paciente).key
+        self.client = APIClient()
+
+    def criar_paciente(self, email, cpf):
+        """
+        Outro paciente, com usuário, token e uma consulta; devolve (paciente, token).
+        """
+        usuario = Usuario.objects.create_user(email=email, password="senha-outro", papel=Usuario.PAPEL_PACIENTE)
+        paciente = Paciente.objects.create(
+            usuario=usuario, nome_completo="Outro Paciente", cpf=cpf, data_nascimento="1970-01-01",
+        )
+        Consulta.objects.create(
+            paciente=paciente, profissional=self.profissional, data_horario=self.amanha + timedelta(hours=3),
+        )
+        return paciente, Token.objects.create(user=usuario).key
+
+    def como(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+
+    def como_admin(self):
+        self.como(self.token_admin)
+
+
+class ModoEstritoTests(ApiTestCase):
+
+    def test_orcamento_excedido_falha_a_requisicao(self):
+        self.como_admin()
+        with mock.patch.object(PacienteViewSet, "orcamento_sql", {"list": 0}):
+            with self.assertRaises(OrcamentoSQLExcedido):
+                self.client.get("/api/pacientes/")
+
+
+class OrcamentosTests(ApiTestCase):
+    """
+    De onde vem o "orcamento_sql" das views: cada ação com orçamento é
+    requisitada aqui no seu caminho mais caro, com caches frios, e o orçamento
+    declarado é exatamente o maior número de instruções medido. Caminho mais
+    caro quer dizer a entrada máxima que a ação aceita (cancelar_em_lote com
+    cancelamento_lote_maximo consultas em dias diferentes) ou, onde ela não
+    tem limite (exclusões com consultas), poucas consultas: um lote da
+    exclusão em cascata do Django e um de chaves de estatísticas.
+    Instrução a mais falha a requisição (modo estrito); orçamento acima do
+    medido falha test_orcamentos_medidos. Ao mudar uma view, ajuste o número
+    e o comentário que diz de onde vêm as instruções além do básico.
+    """
+
+    maxDiff = None
+
+    def setUp(self):
+        super().setUp()
+        self.medidos = {}
+
+    def medir(self, token, metodo, url, dados=None):
+        for alias in caches:
+            caches[alias].clear()
+        self.coletor.medicoes.clear()
+        if token is None:
+            self.client.credentials()
+        else:
+            self.como(token)
+        resposta = getattr(self.client, metodo)(url, dados, format="json")
+        self.assertLess(resposta.status_code, 400, f"{metodo.upper()} {url}: {getattr(resposta, 'data', None)}")
+        if resposta.streaming:
+            # Solta a trava de leitura do arquivo de logs que a exportação segura até o fim.
+            b"".join(resposta.streaming_content)
+            resposta.close()
+        for view, quantidade in self.coletor.medicoes:
+            self.medidos[view] = max(self.medidos.get(view, 0), quantidade)
+        return resposta
+
+    def dia_sem_consultas(self, dias):
+        return self.amanha + timedelta(days=dias)
+
+    def test_orcamentos_medidos(self):
+        admin, paciente = self.token_admin, self.token_paciente
+        profissional = f"/api/profissionais-saude/{self.profissional.id}/"
+        consulta = f"/api/consultas/{self.consulta.id}/"
+
+        # Autenticação: primeiro login do dia, sem token; logout no fim.
+        self.medir(None, "post", "/api/auth/login/", {"email": "medico@sghss.test", "senha": "senha-medico"})
+        self.medir(admin, "get", "/api/metricas/")
+        self.medir(admin, "get", "/api/estatisticas/", {"profissional": self.profissional.id})
+        for tipo in ("consultas", "logs"):
+            self.medir(admin, "get", f"/api/exportacoes/{tipo}/")
+        self.medir(admin, "post", "/api/batch/", {"requisicoes": [{"metodo": "GET", "url": "/api/consultas/"}]})
+
+        # Logs: um deles já no arquivo, onde a listagem e o detalhe buscam o usuário.
+        antigo = LogAcao.objects.create(
+            usuario=self.usuario_paciente, acao=LogAcao.ACAO_LOGIN, entidade=LogAcao.ENTIDADE_USUARIO,
+            entidade_id=self.usuario_paciente.id, data_hora=timezone.now() - timedelta(days=400),
+        )
+        arquivo_logs.arquivar()
+        self.medir(admin, "get", "/api/logs/")
+        self.medir(admin, "get", f"/api/logs/{antigo.id}/")
+
+        # Profissionais.
+        self.medir(admin, "get", "/api/profissionais-saude/")
+        self.medir(admin, "get", profissional)
+        self.medir(admin, "put", profissional + "horarios-atendimento/", [
+            {"dia_semana": dia, "hora_inicio": "00:00", "hora_fim": "23:59"} for dia in range(7)
+        ])
+        self.medir(paciente, "get", profissional + "horarios-atendimento/")
+        self.medir(paciente, "get", profissional + "horarios-livres/")
+        outro_profissional = self.medir(admin, "post", "/api/profissionais-saude/", {
+            "email": "outro.medico@sghss.test", "senha": "senha-outro", "nome_completo": "Fabio Medico",
+            "especialidade": "Pediatria", "registro_profissional": "CRM-2",
+        }).json()
+        url = f"/api/profissionais-saude/{outro_profissional['id']}/"
+        for metodo in ("put", "patch"):
+            Token.objects.create(user_id=outro_profissional["usuario"]["id"])
+            self.medir(admin, metodo, url, {
+                "email": "outro.medico@sghss.test", "senha": f"senha-{metodo}", "nome_completo": "Fabio Medico",
+                "especialidade": "Pediatria", "registro_profissional": "CRM-2",
+            })
+
+        # Administradores.
+        self.medir(admin, "get", "/api/administradores/")
+        self.medir(admin, "get", f"/api/administradores/{self.admin.id}/")
+        criado = self.medir(admin, "post", "/api/administradores/", {
+            "email": "outro.admin@sghss.test", "senha": "senha-outro", "nome_completo": "Edu Admin",
+        }).json()
+        url = f"/api/administradores/{criado['id']}/"
+        for metodo in ("put", "patch"):
+            Token.objects.create(user_id=criado["usuario"]["id"])
+            self.medir(admin, metodo, url, {
+                "email": "outro.admin@sghss.test", "senha": f"senha-{metodo}", "nome_completo": "Eduardo Admin",
+            })
+
+        # Consultas: datas novas caem em dias sem contador de estatísticas.
+        self.medir(paciente, "get", "/api/consultas/")
+        self.medir(paciente, "get", consulta)
+        for token, dias in ((admin, 1), (paciente, 2)):
+            self.medir(token, "post", "/api/consultas/", {
+                "paciente": self.paciente.id, "profissional": self.profissional.id,
+                "data_horario": self.dia_sem_consultas(dias).isoformat(), "tipo_atendimento": Consulta.TIPO_ONLINE,
+            })
+        for metodo, dias in (("put", 3), ("patch", 4)):
+            self.medir(admin, metodo, consulta, {
+                "paciente": self.paciente.id, "profissional": self.profissional.id,
+                "data_horario": self.dia_sem_consultas(dias).isoformat(),
+            })
+        self.medir(paciente, "post", consulta + "cancelar/")
+        lote = Consulta.objects.bulk_create([
+            Consulta(paciente=self.paciente, profissional=self.profissional, data_horario=self.dia_sem_consultas(10 + dias))
+            for dias in range(views.ConsultaViewSet.cancelamento_lote_maximo)
+        ])
+        estatisticas.reconstruir()
+        self.medir(admin, "post", "/api/consultas/cancelar-em-lote/", {"ids": [c.id for c in lote]})
+
+        # Pacientes, com as exclusões no fim.
+        self.medir(admin, "get", "/api/pacientes/")
+        self.medir(admin, "get", f"/api/pacientes/{self.paciente.id}/")
+        self.medir(admin, "get", "/api/pacientes/busca/", {"q": "Carla"})
+        self.medir(admin, "post", "/api/pacientes/", {
+            "email": "novo@sghss.test", "senha": "senha-nova", "nome_completo": "Davi Novo",
+            "cpf": "555.666.777-88", "data_nascimento": "1985-02-03",
+        })
+        outro, token_outro = self.criar_paciente("outro@sghss.test", "555.666.777-99")
+        url = f"/api/pacientes/{outro.id}/"
+        for metodo in ("put", "patch"):
+            self.medir(token_outro, metodo, url, {
+                "email": "outro@sghss.test", "senha": f"senha-{metodo}", "nome_completo": "Outro Paciente",
+                "cpf": "555.666.777-99", "data_nascimento": "1970-01-01",
+            })
+            token_outro = Token.objects.create(user=outro.usuario).key
+        self.medir(admin, "delete", url)
+        # O administrador excluído deixa de constar como criador das consultas.
+        Consulta.objects.update(administrador_criador_id=criado["id"])
+        self.medir(admin, "delete", f"/api/administradores/{criado['id']}/")
+        # Profissional com token, expediente e uma consulta com lembretes.
+        Token.objects.create(user_id=outro_profissional["usuario"]["id"])
+        HorarioAtendimento.objects.create(
+            profissional_id=outro_profissional["id"], dia_semana=0, hora_inicio="08:00", hora_fim="12:00",
+        )
+        Consulta.objects.create(
+            paciente=self.paciente, profissional_id=outro_profissional["id"], data_horario=self.dia_sem_consultas(5),
+        )
+        self.medir(admin, "delete", f"/api/profissionais-saude/{outro_profissional['id']}/")
+        self.medir(paciente, "post", "/api/auth/logout/")
+
+        self.assertEqual(self.medidos, orcamentos_declarados())
+
+
+class AutenticacaoTests(ApiTestCase):
+
+    def test_login(self):
+        resposta = self.client.post(
+            "/api/auth/login/", {"email": "admin@sghss.test", "senha": "senha-admin"}, format="json",
+        )
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()["token"], self.token_admin)
+
+    def test_login_credenciais_invalidas(self):
+        resposta = self.client.post("/api/auth/login/", {"email": "admin@sghss.test", "senha": "x"}, format="json")
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_logout(self):
+        self.como_admin()
+        self.assertEqual(self.client.post("/api/auth/logout/").status_code, 200)
+        self.assertEqual(self.client.get("/api/pacientes/").status_code, 401)
+
+    def test_cache_sem_hash_da_senha(self):
+        self.como_admin()
+        self.assertEqual(self.client.get("/api/pacientes/").status_code, 200)
+        guardado = caches["compartilhado"].get("sghss:token:" + self.token_admin)
+        self.assertIsNotNone(guardado)
+        self.assertNotIn(self.usuario_admin.password, repr(guardado))
+        # O acerto no cache traz o usuário sem ler a senha.
+        self.assertEqual(self.client.get("/api/pacientes/").status_code, 200)
+
+    def test_troca_de_senha_revoga_o_token(self):
+        self.como(self.token_paciente)
+        self.assertEqual(self.client.get("/api/consultas/").status_code, 200)
+        self.usuario_paciente.set_password("senha-nova")
+        self.usuario_paciente.save()
+        self.assertEqual(self.client.get("/api/consultas/").status_code, 401)
+
+    def test_desativacao_invalida_o_token(self):
+        self.como(self.token_paciente)
+        self.assertEqual(self.client.get("/api/consultas/").status_code, 200)
+        self.usuario_paciente.is_active = False
+        self.usuario_paciente.save()
+        self.assertEqual(self.client.get("/api/consultas/").status_code, 401)
+
+
+class PacienteTests(ApiTestCase):
+
+    def test_list_e_retrieve(self):
+        self.como_admin()
+        self.assertEqual(self.client.get("/api/pacientes/").status_code, 200)
+        self.assertEqual(self.client.get(f"/api/pacientes/{self.paciente.id}/").status_code, 200)
+
+    def test_campos_esparsos(self):
+        self.como_admin()
+        lista, detalhe = "/api/pacientes/", f"/api/pacientes/{self.paciente.id}/"
+        for url in (lista, detalhe):
+            # Campo só de escrita, inexistente ou nenhum campo sobrando: 400.
+            for params in (
+                {"fields": "senha"}, {"fields": "id,inexistente"}, {"exclude": "email"}, {"fields": "id", "exclude": "id"},
+            ):
+                with self.subTest(url=url, **params):
+                    resposta = self.client.get(url, params)
+                    self.assertEqual(resposta.status_code, 400)
+                    self.assertIn("detalhe", resposta.json())
+
+        resposta = self.client.get(lista, {"fields": "nome_completo,id"})
+        self.assertEqual([list(item) for item in resposta.json()["results"]], [["id", "nome_completo"]])
+        self.assertEqual(list(self.client.get(detalhe, {"fields": "id,nome_completo"}).json()), ["id", "nome_completo"])
+
+        completo = self.client.get(detalhe).json()
+        sem_usuario = self.client.get(detalhe, {"exclude": "usuario,endereco"}).json()
+        self.assertEqual(sem_usuario, {campo: valor for campo, valor in completo.items() if campo not in ("usuario", "endereco")})
+
+    def test_create(self):
+        resposta = self.client.post("/api/pacientes/", {
+            "email": "novo@sghss.test", "senha": "senha-nova", "nome_completo": "Davi Novo",
+            "cpf": "555.666.777-88", "data_nascimento": "1985-02-03",
+        }, format="json")
+        self.assertEqual(resposta.status_code, 201)
+
+    def test_update_e_partial_update(self):
+        self.como(self.token_paciente)
+        resposta = self.client.patch(f"/api/pacientes/{self.paciente.id}/", {"telefone": "11 9999-0000"}, format="json")
+        self.assertEqual(resposta.status_code, 200)
+        resposta = self.client.put(f"/api/pacientes/{self.paciente.id}/", {
+            "email": "paciente@sghss.test", "senha": "senha-trocada", "nome_completo": "Carla Souza",
+            "cpf": "111.222.333-44", "data_nascimento": "1990-05-01",
+        }, format="json")
+        self.assertEqual(resposta.status_code, 200)
+        # A senha nova revoga o token usado na troca.
+        self.assertEqual(self.client.get(f"/api/pacientes/{self.paciente.id}/").status_code, 401)
+
+    def test_destroy(self):
+        self.como_admin()
+        self.assertEqual(self.client.delete(f"/api/pacientes/{self.paciente.id}/").status_code, 204)
+
+    def test_cache_nao_mistura_pacientes(self):
+        outro, token_outro = self.criar_paciente("outro@sghss.test", "555.666.777-88")
+        self.como(self.token_paciente)
+        self.assertEqual(self.client.get("/api/pacientes/").json()["results"][0]["id"], self.paciente.id)
+        acertos = cache_respostas.metricas.acertos
+        self.client.get("/api/pacientes/")
+        self.assertEqual(cache_respostas.metricas.acertos, acertos + 1)
+
+        self.como(token_outro)
+        self.assertEqual([p["id"] for p in self.client.get("/api/pacientes/").json()["results"]], [outro.id])
+        self.assertEqual(self.client.get(f"/api/pacientes/{self.paciente.id}/").status_code, 404)
+
+    def test_cache_invalidado_na_alteracao_e_exclusao(self):
+        url = f"/api/pacientes/{self.paciente.id}/"
+        self.como_admin()
+        self.client.get(url)
+        self.client.get("/api/pacientes/")
+        self.assertEqual(self.client.patch(url, {"telefone": "11 9999-0000"}, format="json").status_code, 200)
+        self.assertEqual(self.client.get(url).json()["telefone"], "11 9999-0000")
+        self.assertEqual(self.client.get("/api/pacientes/").json()["results"][0]["telefone"], "11 9999-0000")
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get("/api/pacientes/").json()["results"], [])
+
+    def test_cache_invalidado_pelo_usuario(self):
+        url = f"/api/pacientes/{self.paciente.id}/"
+        self.como_admin()
+        self.assertEqual(self.client.get(url).json()["usuario"]["email"], "paciente@sghss.test")
+        self.usuario_paciente.email = "carla@sghss.test"
+        self.usuario_paciente.save()
+        self.assertEqual(self.client.get(url).json()["usuario"]["email"], "carla@sghss.test")
+        self.assertEqual(self.client.get("/api/pacientes/").json()["results"][0]["usuario"]["email"], "carla@sghss.test")
+
+    def test_busca(self):
+        self.como_admin()
+        resposta = self.client.get("/api/pacientes/busca/", {"q": "Carla"})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual([p["id"] for p in resposta.json()["resultados"]], [self.paciente.id])
+
+
+class BuscaPacientesTests(ApiTestCase):
+
+    def test_candidatos_mais_relevantes_antes_do_limite(self):
+        for numero in range(4):
+            Paciente.objects.create(
+                usuario=Usuario.objects.create_user(
+                    email=f"p{numero}@sghss.test", password="senha-p", papel=Usuario.PAPEL_PACIENTE,
+                ),
+                nome_completo="Roberta Aparecida Souza Lima Ferreira", cpf=f"999.000.000-0{numero}",
+                data_nascimento="1980-01-01",
+            )
+        alvo = Paciente.objects.create(
+            usuario=Usuario.objects.create_user(email="p9@sghss.test", password="senha-p", papel=Usuario.PAPEL_PACIENTE),
+            nome_completo="Souza", cpf="999.000.000-09", data_nascimento="1980-01-01",
+        )
+        with mock.patch.object(busca, "LIMITE_CANDIDATOS", 2):
+            self.assertEqual(busca.buscar("souza", 1), [alvo.id])
+
+    def test_admin_busca_por_trecho(self):
+        self.client.force_login(Usuario.objects.create_superuser(email="root@sghss.test", password="senha-root"))
+        resposta = self.client.get("/admin/core/paciente/", {"q": "arla pac"})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(list(resposta.context["cl"].result_list), [self.paciente])
+
+
+class AdministradorTests(ApiTestCase):
+
+    def test_crud(self):
+        self.como_admin()
+        self.assertEqual(self.client.get("/api/administradores/").status_code, 200)
+        self.assertEqual(self.client.get(f"/api/administradores/{self.admin.id}/").status_code, 200)
+
+        resposta = self.client.post("/api/administradores/", {
+            "email": "outro@sghss.test", "senha": "senha-outro", "nome_completo": "Edu Admin",
+        }, format="json")
+        self.assertEqual(resposta.status_code, 201)
+        url = f"/api/administradores/{resposta.json()['id']}/"
+
+        resposta = self.client.put(url, {
+            "email": "outro@sghss.test", "senha": "senha-outra", "nome_completo": "Eduardo Admin",
+        }, format="json")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(self.client.patch(url, {"cargo": "Diretor"}, format="json").status_code, 200)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+
+
+class ProfissionalSaudeTests(ApiTestCase):
+
+    def test_crud(self):
+        self.como_admin()
+        self.assertEqual(self.client.get("/api/profissionais-saude/").status_code, 200)
+        self.assertEqual(self.client.get(f"/api/profissionais-saude/{self.profissional.id}/").status_code, 200)
+
+        resposta = self.client.post("/api/profissionais-saude/", {
+            "email": "outro.medico@sghss.test", "senha": "senha-outro", "nome_completo": "Fabio Medico",
+            "especialidade": "Pediatria", "registro_profissional": "CRM-2",
+        }, format="json")
+        self.assertEqual(resposta.status_code, 201)
+        url = f"/api/profissionais-saude/{resposta.json()['id']}/"
+
+        resposta = self.client.put(url, {
+            "email": "outro.medico@sghss.test", "senha": "senha-outra", "nome_completo": "Fabio Medico",
+            "especialidade": "Pediatria", "registro_profissional": "CRM-2",
+        }, format="json")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(self.client.patch(url, {"duracao_consulta_minutos": 20}, format="json").status_code, 200)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+
+    def test_destroy_com_consultas(self):
+        self.como_admin()
+        self.assertEqual(self.client.delete(f"/api/profissionais-saude/{self.profissional.id}/").status_code, 204)
+        self.assertFalse(Consulta.objects.exists())
+
+    def test_horarios_atendimento(self):
+        url = f"/api/profissionais-saude/{self.profissional.id}/horarios-atendimento/"
+        self.como_admin()
+        resposta = self.client.put(url, [
+            {"dia_semana": dia, "hora_inicio": "08:00", "hora_fim": "12:00"} for dia in range(5)
+        ], format="json")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.json()), 5)
+        self.assertTrue(LogAcao.objects.filter(
+            acao=LogAcao.ACAO_ATUALIZAR_PROFISSIONAL, entidade_id=self.profissional.id,
+        ).exists())
+
+        self.como(self.token_paciente)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.put(url, [], format="json").status_code, 403)
+
+    def test_horarios_livres(self):
+        self.como(self.token_paciente)
+        resposta = self.client.get(
+            f"/api/profissionais-saude/{self.profissional.id}/horarios-livres/",
+            {"de": self.amanha.date().isoformat(), "ate": self.amanha.date().isoformat()},
+        )
+        self.assertEqual(resposta.status_code, 200)
+
+
+class ConsultaTests(ApiTestCase):
+
+    def test_list_e_retrieve(self):
+        for token in (self.token_admin, self.token_paciente):
+            self.como(token)
+            self.assertEqual(self.client.get("/api/consultas/").status_code, 200)
+            self.assertEqual(self.client.get(f"/api/consultas/{self.consulta.id}/").status_code, 200)
+
+    def test_get_condicional(self):
+        self.como_admin()
+        alteracoes = 0
+        for ativo in (True, False):
+            with self.subTest(cache_respostas=ativo), override_settings(SGHSS_CACHE_RESPOSTAS={"ATIVO": ativo}):
+                for url in ("/api/consultas/", f"/api/consultas/{self.consulta.id}/"):
+                    etag = self.client.get(url)["ETag"]
+                    nao_modificada = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual((nao_modificada.status_code, nao_modificada.content), (304, b""))
+
+                    alteracoes += 1
+                    resposta = self.client.patch(
+                        f"/api/consultas/{self.consulta.id}/", {"local": f"Sala {alteracoes}"}, format="json",
+                    )
+                    self.assertEqual(resposta.status_code, 200)
+                    atual = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(atual.status_code, 200)
+                    self.assertNotEqual(atual["ETag"], etag)
+
+    def test_paginacao_por_cursor(self):
+        outras = Consulta.objects.bulk_create([
+            Consulta(paciente=self.paciente, profissional=self.profissional, data_horario=self.amanha + timedelta(hours=h))
+            for h in range(1, 5)
+        ])
+        ids = [self.consulta.id] + [c.id for c in outras]
+        self.como_admin()
+
+        def pagina(url, **params):
+            resposta = self.client.get(url, params)
+            self.assertEqual(resposta.status_code, 200)
+            dados = resposta.json()
+            return [c["id"] for c in dados["results"]], dados["next"], dados["previous"]
+
+        primeira, proxima, anterior = pagina("/api/consultas/", tamanho=2)
+        self.assertEqual((primeira, anterior), (ids[:2], None))
+        segunda, proxima, anterior_da_segunda = pagina(proxima)
+        self.assertEqual(segunda, ids[2:4])
+        terceira, fim, anterior = pagina(proxima)
+        self.assertEqual((terceira, fim), (ids[4:], None))
+
+        # De volta pelos links "previous".
+        self.assertEqual(pagina(anterior)[0], ids[2:4])
+        voltou, _, anterior = pagina(anterior_da_segunda)
+        self.assertEqual((voltou, anterior), (ids[:2], None))
+
+    def test_paginacao_parametros_invalidos(self):
+        self.como_admin()
+        self.assertEqual(self.client.get("/api/consultas/", {"cursor": "nao-e-um-cursor"}).status_code, 404)
+        resposta = self.client.get("/api/consultas/", {"tamanho": "dez"})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn("tamanho", resposta.json()["detalhe"])
+
+    def test_cache_por_escopo(self):
+        outro, token_outro = self.criar_paciente("outro@sghss.test", "555.666.777-88")
+        self.como_admin()
+        self.assertEqual(len(self.client.get("/api/consultas/").json()["results"]), 2)
+        self.client.get(f"/api/consultas/{self.consulta.id}/")
+
+        # A listagem do administrador, já guardada, não vale para os pacientes.
+        for token, paciente in ((self.token_paciente, self.paciente), (token_outro, outro)):
+            self.como(token)
+            resultados = self.client.get("/api/consultas/").json()["results"]
+            self.assertEqual([c["paciente"] for c in resultados], [paciente.id])
+        # Nem o detalhe guardado para o administrador ou para o dono.
+        self.como(self.token_paciente)
+        self.assertEqual(self.client.get(f"/api/consultas/{self.consulta.id}/").status_code, 200)
+        self.como(token_outro)
+        self.assertEqual(self.client.get(f"/api/consultas/{self.consulta.id}/").status_code, 404)
+
+    def test_cache_invalidado_na_alteracao(self):
+        url = f"/api/consultas/{self.consulta.id}/"
+        self.como(self.token_paciente)
+        self.client.get(url)
+        self.client.get("/api/consultas/")
+        self.como_admin()
+        self.assertEqual(self.client.patch(url, {"local": "Sala 2"}, format="json").status_code, 200)
+        self.como(self.token_paciente)
+        self.assertEqual(self.client.get(url).json()["local"], "Sala 2")
+        self.assertEqual(self.client.get("/api/consultas/").json()["results"][0]["local"], "Sala 2")
+
+    def test_create_pelo_admin(self):
+        self.como_admin()
+        resposta = self.client.post("/api/consultas/", {
+            "paciente": self.paciente.id, "profissional": self.profissional.id,
+            "data_horario": (self.amanha + timedelta(hours=2)).isoformat(), "tipo_atendimento": Consulta.TIPO_ONLINE,
+        }, format="json")
+        self.assertEqual(resposta.status_code, 201)
+        self.assertTrue(resposta.json()["link_teleconsulta"])
+
+    def test_create_pelo_paciente(self):
+        self.como(self.token_paciente)
+        resposta = self.client.post("/api/consultas/", {
+            "paciente": self.paciente.id, "profissional": self.profissional.id,
+            "data_horario": (self.amanha + timedelta(hours=2)).isoformat(),
+        }, format="json")
+        self.assertEqual(resposta.status_code, 201)
+
+    def test_create_com_conflito(self):
+        self.como_admin()
+        resposta = self.client.post("/api/consultas/", {
+            "paciente": self.paciente.id, "profissional": self.profissional.id,
+            "data_horario": self.amanha.isoformat(),
+        }, format="json")
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_update_e_partial_update(self):
+        self.como_admin()
+        url = f"/api/consultas/{self.consulta.id}/"
+        resposta = self.client.put(url, {
+            "paciente": self.paciente.id, "profissional": self.profissional.id,
+            "data_horario": (self.amanha + timedelta(days=1)).isoformat(),
+        }, format="json")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(self.client.patch(url, {"local": "Sala 2"}, format="json").status_code, 200)
+
+    def test_cancelar(self):
+        self.como(self.token_paciente)
+        resposta = self.client.post(f"/api/consultas/{self.consulta.id}/cancelar/")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()["status"], Consulta.STATUS_CANCELADA_PACIENTE)
+
+    def test_fila_de_lembretes(self):
+        def pendentes():
+            return sorted(
+                LembreteConsulta.objects.filter(status=LembreteConsulta.STATUS_PENDENTE)
+                .exclude(consulta=self.consulta).values_list("consulta_id", "enviar_em")
+            )
+
+        self.como_admin()
+        ids = []
+        for horas in (26, 27):
+            data_horario = self.amanha + timedelta(hours=horas)
+            resposta = self.client.post("/api/consultas/", {
+                "paciente": self.paciente.id, "profissional": self.profissional.id, "data_horario": data_horario.isoformat(),
+            }, format="json")
+            self.assertEqual(resposta.status_code, 201)
+            ids.append(resposta.json()["id"])
+        self.assertEqual(pendentes(), sorted(
+            (consulta_id, self.amanha + timedelta(hours=horas) - timedelta(minutes=minutos))
+            for consulta_id, horas in zip(ids, (26, 27))
+            for minutos in (24 * 60, 60)
+        ))
+
+        resposta = self.client.post(f"/api/consultas/{ids[0]}/cancelar/", {"justificativa": "Imprevisto."}, format="json")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual([consulta_id for consulta_id, _ in pendentes()], [ids[1], ids[1]])
+        resposta = self.client.post(
+            "/api/consultas/cancelar-em-lote/", {"ids": [ids[1]], "justificativa": "Feriado."}, format="json",
+        )
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(pendentes(), [])
+
+    def test_cancelar_em_lote_por_ids(self):
+        outras = Consulta.objects.bulk_create([
+            Consulta(paciente=self.paciente, profissional=self.profissional, data_horario=self.amanha + timedelta(hours=h))
+            for h in range(1, 4)
+        ])
+        ids = [self.consulta.id] + [c.id for c in outras] + [0]
+        self.como_admin()
+        resposta = self.client.post(
+            "/api/consultas/cancelar-em-lote/", {"ids": ids, "justificativa": "Feriado."}, format="json",
+        )
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()["canceladas"], 4)
+        self.assertEqual(resposta.json()["resultados"][-1], {"id": 0, "resultado": "nao_encontrada"})
+
+    def test_cancelar_em_lote_por_profissional(self):
+        self.como_admin()
+        dia = self.amanha.date().isoformat()
+        resposta = self.client.post("/api/consultas/cancelar-em-lote/", {
+            "profissional": self.profissional.id, "de": dia, "ate": dia, "justificativa": "Feriado.",
+        }, format="json")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()["canceladas"], 1)
+
+    def test_cancelar_em_lote_parametros_invalidos(self):
+        self.como_admin()
+        dia = self.amanha.date().isoformat()
+        for corpo in (
+            {"profissional": self.profissional.id, "de": 20260101, "ate": dia},
+            {"profissional": self.profissional.id, "de": dia, "ate": ["2026-01-01"]},
+            {"profissional": [self.profissional.id], "de": dia, "ate": dia},
+            {"profissional": True, "de": dia, "ate": dia},
+        ):
+            resposta = self.client.post("/api/consultas/cancelar-em-lote/", corpo, format="json")
+            self.assertEqual(resposta.status_code, 400, corpo)
+            self.assertIn("detalhe", resposta.json())
+        self.assertEqual(Consulta.objects.get().status, Consulta.STATUS_AGENDADA)
+
+    def test_destroy(self):
+        self.como_admin()
+        self.assertEqual(self.client.delete(f"/api/consultas/{self.consulta.id}/").status_code, 405)
+
+
+class AgendamentoConcorrenteTests(ApiTestCase):
+    """
+    Dois agendamentos sobrepostos para o mesmo profissional, em conexões
+    diferentes. Roda numa cópia do banco de teste em arquivo, com o perfil
+    de produção: no banco em memória dos testes (cache compartilhado) o
+    bloqueio é por tabela e falha na hora, em vez de esperar.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.arquivo = os.path.join(tempfile.mkdtemp(), "agenda.sqlite3")
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.arquivo))
+        copiar_banco_de_teste(self.arquivo)
+        self.banco = connections[DEFAULT_DB_ALIAS].__class__, dict(connection.settings_dict, NAME=self.arquivo)
+
+    def agendar(self, resultados, nome):
+        # Conexão própria da thread, no arquivo; as demais threads continuam no banco de teste.
+        classe, configuracao = self.banco
+        connections[DEFAULT_DB_ALIAS] = classe(configuracao, DEFAULT_DB_ALIAS)
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f"Token {self.token_admin}")
+        try:
+            resultados[nome] = cliente.post("/api/consultas/", {
+                "paciente": self.paciente.id, "profissional": self.profissional.id,
+                "data_horario": (self.amanha + timedelta(hours=2)).isoformat(),
+            }, format="json").status_code
+        finally:
+            connections[DEFAULT_DB_ALIAS].close()
+
+    def test_so_um_agendamento_no_mesmo_horario(self):
+        verificado, liberar = threading.Event(), threading.Event()
+        verificar = agenda.verificar_disponibilidade
+        verificacoes = []
+
+        def verificar_e_esperar(*args, **kwargs):
+            verificacoes.append(threading.current_thread().name)
+            verificar(*args, **kwargs)
+            if threading.current_thread().name == "primeiro":
+                # Agenda conferida, consulta ainda não gravada: a janela da corrida.
+                verificado.set()
+                liberar.wait(10)
+
+        resultados = {}
+        with mock.patch.object(agenda, "verificar_disponibilidade", verificar_e_esperar):
+            primeiro = threading.Thread(target=self.agendar, args=(resultados, "primeiro"), name="primeiro")
+            segundo = threading.Thread(target=self.agendar, args=(resultados, "segundo"), name="segundo")
+            primeiro.start()
+            self.assertTrue(verificado.wait(10))
+            segundo.start()
+            # BEGIN IMMEDIATE: o segundo espera o primeiro antes de ler a agenda.
+            segundo.join(0.5)
+            self.assertEqual(verificacoes, ["primeiro"])
+            liberar.set()
+            primeiro.join()
+            segundo.join()
+
+        self.assertEqual(resultados, {"primeiro": 201, "segundo": 400})
+        banco = sqlite3.connect(self.arquivo)
+        self.addCleanup(banco.close)
+        quantidade, = banco.execute(
+            "SELECT COUNT(*) FROM core_consulta WHERE profissional_id = ?", [self.profissional.id]
+        ).fetchone()
+        self.assertEqual(quantidade, 2)
+
+
+@override_settings(SGHSS_REPLICAS={"REPLICAS": ["replica"], "CACHE": "compartilhado"})
+class ReplicaTests(ApiTestCase):
+    """
+    Réplica de leitura num segundo alias SQLite: uma cópia em arquivo do banco
+    de teste, feita no setUp. O que é gravado depois no principal não chega a
+    ela, então o que a API devolve mostra de qual banco cada leitura veio.
+    """
+
+    def setUp(self):
+        super().setUp()
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio)
+        copiar_banco_de_teste(os.path.join(diretorio, "replica.sqlite3"))
+        # Conexão criada aqui, fora de settings.DATABASES: o Django não a
+        # trata como um banco de teste (nem cria nem esvazia).
+        principal = connections[DEFAULT_DB_ALIAS]
+        connections["replica"] = principal.__class__(
+            dict(principal.settings_dict, NAME=os.path.join(diretorio, "replica.sqlite3")), "replica",
+        )
+        self.addCleanup(connections.__delitem__, "replica")
+        self.addCleanup(lambda: connections["replica"].close())
+        # Só no principal.
+        self.nova = Consulta.objects.create(
+            paciente=self.paciente, profissional=self.profissional, data_horario=self.amanha + timedelta(hours=1),
+        )
+
+    def ids_listados(self):
+        resposta = self.client.get("/api/consultas/")
+        self.assertEqual(resposta.status_code, 200)
+        return {consulta["id"] for consulta in resposta.json()["results"]}
+
+    def test_leituras_na_replica(self):
+        self.como_admin()
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            self.assertEqual(self.ids_listados(), {self.consulta.id})
+            self.assertEqual(self.client.get(f"/api/consultas/{self.consulta.id}/").status_code, 200)
+            self.assertEqual(self.client.get(f"/api/consultas/{self.nova.id}/").status_code, 404)
+        self.assertTrue(replica.captured_queries)
+
+    def test_escrita_no_principal_e_leitura_presa_ao_principal(self):
+        self.como_admin()
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            resposta = self.client.post("/api/consultas/", {
+                "paciente": self.paciente.id, "profissional": self.profissional.id,
+                "data_horario": (self.amanha + timedelta(hours=2)).isoformat(),
+            }, format="json")
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(replica.captured_queries, [])
+        criada = resposta.json()["id"]
+        self.assertTrue(Consulta.objects.using(DEFAULT_DB_ALIAS).filter(pk=criada).exists())
+        self.assertFalse(Consulta.objects.using("replica").filter(pk=criada).exists())
+
+        # Dentro de JANELA_PRIMARIO, quem escreveu continua lendo do principal.
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            self.assertEqual(self.ids_listados(), {self.consulta.id, self.nova.id, criada})
+            self.assertEqual(self.client.get(f"/api/consultas/{criada}/").status_code, 200)
+        self.assertEqual(replica.captured_queries, [])
+
+
+class AsgiTests(ApiTestCase):
+    """
+    Caminho ASGI (sghss.urls_asgi): leituras nas views assíncronas, o resto nos viewsets.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.cliente = AsyncClient()
+        self.cabecalhos = {"authorization": f"Token {self.token_admin}"}
+
+    async def test_leituras(self):
+        self.assertEqual((await self.cliente.get("/api/consultas/", headers=self.cabecalhos)).status_code, 200)
+        self.assertEqual((await self.cliente.get(f"/api/consultas/{self.consulta.id}/", headers=self.cabecalhos)).status_code, 200)
+        self.assertEqual((await self.cliente.get(f"/api/logs/{self.log.id}/", headers=self.cabecalhos)).status_code, 200)
+
+    async def test_acao_de_lista_nao_vira_detalhe(self):
+        resposta = await self.cliente.post(
+            "/api/consultas/cancelar-em-lote/", {"ids": [self.consulta.id]}, content_type="application/json",
+            headers=self.cabecalhos,
+        )
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()["canceladas"], 1)
+
+    async def test_acao_de_detalhe(self):
+        resposta = await self.cliente.post(f"/api/consultas/{self.consulta.id}/cancelar/", headers=self.cabecalhos)
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_mesmas_respostas_do_wsgi(self):
+        self.como_admin()
+        for url in (
+            "/api/consultas/", f"/api/consultas/{self.consulta.id}/", "/api/consultas/?fields=id,status",
+            "/api/consultas/?fields=senha", "/api/consultas/0/", "/api/logs/", f"/api/logs/{self.log.id}/",
+            "/api/logs/?exclude=detalhes",
+        ):
+            respostas = []
+            for obter in (self.client.get, async_to_sync(partial(self.cliente.get, headers=self.cabecalhos))):
+                # Sem o cache de respostas, que serviria a segunda com os bytes da primeira.
+                for alias in caches:
+                    caches[alias].clear()
+                respostas.append(obter(url))
+            wsgi, asgi = respostas
+            self.assertEqual((asgi.status_code, asgi.content, asgi.get("ETag")), (wsgi.status_code, wsgi.content, wsgi.get("ETag")), url)
+
+    async def test_sem_autenticacao(self):
+        resposta = await self.cliente.get("/api/consultas/")
+        self.assertEqual(resposta.status_code, 401)
+        self.assertEqual(resposta["WWW-Authenticate"], "Token")
+
+    async def test_login(self):
+        resposta = await self.cliente.post(
+            "/api/auth/login/", {"email": "admin@sghss.test", "senha": "senha-admin"}, content_type="application/json",
+        )
+        self.assertEqual(resposta.json()["token"], self.token_admin)
+        resposta = await self.cliente.post(
+            "/api/auth/login/", {"email": "admin@sghss.test", "senha": "x"}, content_type="application/json",
+        )
+        self.assertEqual((resposta.status_code, resposta.json()), (400, {"detalhe": "Credenciais inválidas."}))
+
+    async def test_orcamento_da_view_drf(self):
+        with mock.patch.object(ConsultaViewSet, "orcamento_sql", {"list": 0}):
+            with self.assertRaises(OrcamentoSQLExcedido):
+                await self.cliente.get("/api/consultas/", headers=self.cabecalhos)
+
+
+class LogAcaoTests(ApiTestCase):
+
+    def test_list_e_retrieve(self):
+        self.como_admin()
+        self.assertEqual(self.client.get("/api/logs/").status_code, 200)
+        self.assertEqual(self.client.get("/api/logs/", {"acao": LogAcao.ACAO_LOGIN}).status_code, 200)
+        self.assertEqual(self.client.get(f"/api/logs/{self.log.id}/").status_code, 200)
+
+
+@override_settings(SGHSS_CACHE_RESPOSTAS={"ATIVO": False})
+class SerializacaoRapidaTests(ApiTestCase):
+    """
+    O caminho rápido (core/serializacao_rapida.py) devolve os mesmos bytes que
+    os serializers em cada listagem e detalhe, com todos os campos e com
+    subconjuntos de ?fields=. Sem o cache de respostas, que serviria a segunda
+    requisição com os bytes da primeira.
+    """
+
+    def respostas(self, url, params):
+        respostas = []
+        for rapido in (True, False):
+            with override_settings(SGHSS_SERIALIZACAO={"CAMINHO_RAPIDO": rapido}):
+                resposta = self.client.get(url, params)
+            self.assertEqual(resposta.status_code, 200, url)
+            respostas.append(resposta.content)
+        return respostas
+
+    def test_mesmo_json_dos_serializers(self):
+        self.criar_paciente("outro@sghss.test", "555.666.777-88")
+        rotas = (
+            ("/api/pacientes/", views.PacienteViewSet, self.paciente.id),
+            ("/api/administradores/", views.AdministradorViewSet, self.admin.id),
+            ("/api/profissionais-saude/", views.ProfissionalSaudeViewSet, self.profissional.id),
+            ("/api/consultas/", views.ConsultaViewSet, self.consulta.id),
+            ("/api/logs/", views.LogAcaoViewSet, self.log.id),
+        )
+        self.como_admin()
+        for url, viewset, pk in rotas:
+            self.assertIsNotNone(obter_mapeamento(viewset.serializer_class), viewset.__name__)
+            legiveis = campos_legiveis(viewset.serializer_class)
+            for params in ({}, {"fields": ",".join(legiveis[::2])}, {"fields": legiveis[-1]}):
+                for endereco in (url, f"{url}{pk}/"):
+                    with self.subTest(url=endereco, **params):
+                        rapida, serializer = self.respostas(endereco, params)
+                        self.assertEqual(rapida, serializer)
+
+
+class PainelTests(ApiTestCase):
+
+    def test_metricas(self):
+        self.como_admin()
+        self.assertEqual(self.client.get("/api/metricas/").status_code, 200)
+
+    def test_estatisticas(self):
+        self.como_admin()
+        self.assertEqual(self.client.get("/api/estatisticas/").status_code, 200)
+        resposta = self.client.get("/api/estatisticas/", {"profissional": self.profissional.id})
+        self.assertEqual(resposta.status_code, 200)
+
+    def contadores(self):
+        # Um contador decrementado até zero continua na tabela; a reconstrução não o cria.
+        return (
+            set(EstatisticaConsulta.objects.filter(quantidade__gt=0).values_list(
+                "data", "profissional_id", "status", "tipo_atendimento", "quantidade",
+            )),
+            set(EstatisticaLogin.objects.values_list("data", "quantidade")),
+        )
+
+    def test_contadores_iguais_aos_reconstruidos(self):
+        estatisticas.reconstruir()
+        login = self.client.post("/api/auth/login/", {"email": "admin@sghss.test", "senha": "senha-admin"}, format="json")
+        self.assertEqual(login.status_code, 200)
+
+        self.como_admin()
+        criadas = []
+        for horas in (1, 2, 3):
+            resposta = self.client.post("/api/consultas/", {
+                "paciente": self.paciente.id, "profissional": self.profissional.id,
+                "data_horario": (self.amanha + timedelta(days=1, hours=horas)).isoformat(),
+            }, format="json")
+            self.assertEqual(resposta.status_code, 201)
+            criadas.append(resposta.json()["id"])
+        resposta = self.client.post(f"/api/consultas/{criadas[0]}/cancelar/", {"justificativa": "Imprevisto."}, format="json")
+        self.assertEqual(resposta.status_code, 200)
+        resposta = self.client.post(
+            "/api/consultas/cancelar-em-lote/", {"ids": [self.consulta.id, *criadas], "justificativa": "Feriado."}, format="json",
+        )
+        self.assertEqual(resposta.json()["canceladas"], 3)
+
+        incrementais = self.contadores()
+        self.assertEqual(sum(linha[-1] for linha in incrementais[0]), 4)
+        estatisticas.reconstruir()
+        self.assertEqual(incrementais, self.contadores())
+
+    def test_exportacoes(self):
+        self.como_admin()
+        for tipo in ("consultas", "logs"):
+            for formato in ("csv", "ndjson"):
+                resposta = self.client.get(f"/api/exportacoes/{tipo}/", {"formato": formato})
+                self.assertEqual(resposta.status_code, 200)
+                self.assertTrue(b"".join(resposta.streaming_content))
+
+    def test_periodo_invalido(self):
+        # Mesma leitura de "de"/"ate" (exportacao.ler_data_hora) na API e no comando.
+        self.como_admin()
+        resposta = self.client.get("/api/exportacoes/consultas/", {"de": "ontem"})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn("'de'", resposta.json()["detalhe"])
+        with self.assertRaisesMessage(CommandError, "Data inválida: ontem."):
+            call_command("exportar_dados", "consultas", de="ontem", saida=os.devnull)
+
+    def test_lote(self):
+        self.como_admin()
+        resposta = self.client.post("/api/batch/", {"requisicoes": [
+            {"metodo": "GET", "url": "/api/consultas/"},
+            {"metodo": "GET", "url": f"/api/pacientes/{self.paciente.id}/"},
+            {"metodo": "POST", "url": f"/api/consultas/{self.consulta.id}/cancelar/", "corpo": {"justificativa": "Viagem."}},
+        ]}, format="json")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual([r["status"] for r in resposta.json()["resultados"]], [200, 200, 200])
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class SinkBufferizadoTests(TransactionTestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(email="admin@sghss.test", password="x", papel=Usuario.PAPEL_ADMIN)
+        self.addCleanup(encerrar_sink)
+
+    def configurar(self, tamanho_lote, intervalo):
+        configuracao = override_settings(SGHSS_AUDITORIA={
+            "SINK": "core.auditoria.SinkBufferizado", "TAMANHO_LOTE": tamanho_lote, "INTERVALO_FLUSH": intervalo,
+        })
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        return obter_sink()
+
+    def registrar(self, sink, quantidade):
+        for _ in range(quantidade):
+            sink.registrar(LogAcao(usuario=self.usuario, acao=LogAcao.ACAO_EXPORTAR_DADOS, data_hora=timezone.now()))
+
+    def esperar_gravados(self, sink, quantidade):
+        # Espera pelas métricas do sink, não pelo banco: no banco de teste em
+        # memória, ler a tabela enquanto a thread do sink grava nela falha
+        # na hora ("database table is locked"). "gravadas" só muda depois do commit.
+        prazo = time.monotonic() + 5
+        while sink.metricas()["gravadas"] < quantidade and time.monotonic() < prazo:
+            time.sleep(0.01)
+        return LogAcao.objects.count()
+
+    def test_flush_pelo_tamanho_do_lote(self):
+        sink = self.configurar(tamanho_lote=3, intervalo=60)
+        self.registrar(sink, 2)
+        time.sleep(0.05)
+        self.assertEqual(LogAcao.objects.count(), 0)
+        self.registrar(sink, 1)
+        self.assertEqual(self.esperar_gravados(sink, 3), 3)
+        self.assertEqual(sink.metricas()["flushes"], 1)
+
+    def test_flush_pelo_intervalo(self):
+        sink = self.configurar(tamanho_lote=100, intervalo=0.05)
+        self.registrar(sink, 1)
+        self.assertEqual(self.esperar_gravados(sink, 1), 1)
+
+    def test_flush_no_encerramento(self):
+        sink = self.configurar(tamanho_lote=100, intervalo=60)
+        self.registrar(sink, 2)
+        self.assertEqual(LogAcao.objects.count(), 0)
+        encerrar_sink()
+        self.assertEqual(LogAcao.objects.count(), 2)
+        self.assertEqual(sink.metricas()["gravadas"], 2)
+
+    def test_rollback_nao_enfileira(self):
+        sink = self.configurar(tamanho_lote=100, intervalo=60)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.registrar(sink, 2)
+                raise RuntimeError
+        encerrar_sink()
+        self.assertEqual(sink.metricas()["enfileiradas"], 0)
+        self.assertEqual(LogAcao.objects.count(), 0)
+
+
+class ArquivoLogsTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.antigo = LogAcao.objects.create(
+            usuario=self.usuario_paciente, acao=LogAcao.ACAO_LOGIN, entidade=LogAcao.ENTIDADE_USUARIO,
+            entidade_id=self.usuario_paciente.id, data_hora=timezone.now() - timedelta(days=400),
+        )
+
+    def ids_exportados(self, **parametros):
+        self.como_admin()
+        resposta = self.client.get("/api/exportacoes/logs/", parametros)
+        self.assertEqual(resposta.status_code, 200)
+        linhas = csv.DictReader(io.StringIO(b"".join(resposta.streaming_content).decode("utf-8")))
+        return [int(linha["id"]) for linha in linhas]
+
+    def segmento(self):
+        [segmento] = arquivo_logs._segmentos(arquivo_logs.diretorio_arquivo())
+        return segmento
+
+    def anexar_antigo(self):
+        """
+        Grava o log antigo no arquivo como um lote, sem apagá-lo do banco nem
+        confirmar: o estado de uma execução que caiu depois do índice.
+        """
+        logs = list(LogAcao.objects.filter(id=self.antigo.id).values(*arquivo_logs.CAMPOS))
+        mes = timezone.localtime(self.antigo.data_hora).strftime("%Y-%m")
+        segmento = arquivo_logs.Segmento(arquivo_logs.diretorio_arquivo(), mes)
+        return segmento, segmento.anexar(logs)
+
+    def test_exportacao_inclui_arquivados(self):
+        self.assertEqual(arquivo_logs.arquivar(), {"arquivados": 1, "recuperados": 0})
+        self.assertFalse(LogAcao.objects.filter(id=self.antigo.id).exists())
+
+        ids = self.ids_exportados()
+        self.assertEqual(ids[:2], [self.antigo.id, self.log.id])
+        self.assertEqual(ids.count(self.antigo.id), 1)
+        self.assertNotIn(self.antigo.id, self.ids_exportados(de=timezone.localdate().isoformat()))
+
+    def test_membro_sem_indice_e_truncado(self):
+        arquivo_logs.arquivar()
+        segmento = self.segmento()
+        tamanho = segmento.dados.stat().st_size
+        # Queda durante a gravação do membro seguinte: bytes no .gz e meia linha no índice.
+        with open(segmento.dados, "ab") as arquivo:
+            arquivo.write(b"\x1f\x8b\x08 incompleto")
+        with open(segmento.indice, "ab") as arquivo:
+            arquivo.write(b'{"bloco":2,"ini')
+
+        self.assertEqual(segmento.recuperar(), [])
+        self.assertEqual(segmento.dados.stat().st_size, tamanho)
+        self.assertTrue(segmento.indice.read_bytes().endswith(b"}\n"))
+        self.assertEqual(self.ids_exportados()[0], self.antigo.id)
+
+    def test_membro_menor_que_o_indice(self):
+        arquivo_logs.arquivar()
+        segmento = self.segmento()
+        with open(segmento.dados, "r+b") as arquivo:
+            arquivo.truncate(segmento.dados.stat().st_size - 1)
+        with self.assertRaises(arquivo_logs.ArquivoCorrompido):
+            segmento.recuperar()
+
+    def test_lote_nao_confirmado(self):
+        segmento, entrada = self.anexar_antigo()
+        self.assertEqual(segmento.recuperar(), [entrada])
+        # As linhas do lote ainda estão no banco: a exportação não as repete.
+        self.assertEqual(self.ids_exportados().count(self.antigo.id), 1)
+
+        self.assertEqual(arquivo_logs.arquivar(), {"arquivados": 0, "recuperados": 1})
+        self.assertFalse(LogAcao.objects.filter(id=self.antigo.id).exists())
+        self.assertEqual(segmento.recuperar(), [])
+        self.assertEqual(self.ids_exportados().count(self.antigo.id), 1)
+
+    def test_lote_excluido_e_nao_confirmado(self):
+        segmento, entrada = self.anexar_antigo()
+        arquivo_logs._excluir_do_banco(entrada, "default")
+        # Queda entre a exclusão e a confirmação: o lote só existe no arquivo.
+        self.assertEqual(self.ids_exportados().count(self.antigo.id), 1)
+        self.assertEqual(arquivo_logs.arquivar(), {"arquivados": 0, "recuperados": 1})
+
+    def test_arquivamento_em_andamento(self):
+        diretorio = arquivo_logs.diretorio_arquivo()
+        with arquivo_logs._trava(diretorio):
+            with self.assertRaises(arquivo_logs.ArquivamentoEmAndamento):
+                arquivo_logs.arquivar()
+            self.como_admin()
+            self.assertEqual(self.client.get("/api/exportacoes/logs/").status_code, 503)
+        self.assertEqual(arquivo_logs.arquivar()["arquivados"], 1)
+
+    def test_exportacao_em_andamento(self):
+        trava = arquivo_logs.travar_leitura()
+        try:
+            # Outras leituras convivem com ela; o arquivamento, não.
+            arquivo_logs.travar_leitura().close()
+            with self.assertRaises(arquivo_logs.ArquivamentoEmAndamento):
+                arquivo_logs.arquivar()
+        finally:
+            trava.close()
+        self.assertEqual(arquivo_logs.arquivar()["arquivados"], 1)
+
+
+@unittest.skipIf(renderizadores.orjson is None, "orjson não instalado")
+class MessagePackTests(ApiTestCase):
+
+    @unittest.skipIf(renderizadores.msgpack is None, "o pacote msgpack não está instalado")
+    def test_mesmos_valores_do_json(self):
+        msgpack = renderizadores.msgpack
+        self.como_admin()
+        for url in ("/api/consultas/", f"/api/consultas/{self.consulta.id}/"):
+            esperado = self.client.get(url).json()
+            resposta = self.client.get(url, HTTP_ACCEPT="application/msgpack")
+            self.assertEqual(resposta.status_code, 200)
+            self.assertEqual(resposta["Content-Type"], "application/msgpack")
+            self.assertEqual(msgpack.unpackb(resposta.content, raw=False, strict_map_key=False), esperado)
+
+        corpo = msgpack.packb({"email": "admin@sghss.test", "senha": "senha-admin"})
+        self.assertEqual(self.client.post("/api/auth/login/", corpo, content_type="application/msgpack").status_code, 200)
+
+    @unittest.skipUnless(renderizadores.msgpack is None, "o pacote msgpack está instalado")
+    def test_indisponivel_sem_msgpack(self):
+        self.como_admin()
+        self.assertEqual(self.client.get("/api/consultas/", HTTP_ACCEPT="application/msgpack").status_code, 406)
+        resposta = self.client.post("/api/auth/login/", b"\x82", content_type="application/msgpack")
+        self.assertEqual(resposta.status_code, 415)
+
+
+class RenderizadoresTests(SimpleTestCase):
+
+    def test_mesmos_bytes_do_drf(self):
+        dados = {
+            "texto": "ação\u2028fim", "inteiro": 7, "nulo": None, "lista": [True, False],
+            "data_hora": timezone.now(), "data": timezone.localdate(), "decimal": Decimal("12.50"),
+            "ip": ip_address("10.0.0.1"), 3: "chave numérica",
+        }
+        self.assertEqual(renderizadores.JSONRapidoRenderer().render(dados), JSONRenderer().render(dados))
+
+
+class VerificacoesTests(SimpleTestCase):
+
+    def codigos(self):
+        return [codigo for codigo, _ in checks.caches_do_processo()]
+
+    def test_caches_compartilhados(self):
+        self.assertEqual(self.codigos(), [])
+
+    @override_settings(SGHSS_CACHE_TOKEN={"CACHE": None}, SGHSS_CACHE_RESPOSTAS={"CACHE": "default"})
+    def test_caches_do_processo(self):
+        self.assertEqual(self.codigos(), ["sghss.W001", "sghss.W002"])
+
+    @override_settings(SGHSS_CACHE_TOKEN={"ATIVO": False, "CACHE": None}, SGHSS_CACHE_RESPOSTAS={"ATIVO": False, "CACHE": "default"})
+    def test_caches_desligados(self):
+        self.assertEqual(self.codigos(), [])
+
+    @override_settings(SGHSS_REPLICAS={"REPLICAS": ["replica"], "CACHE": "default"})
+    def test_marca_do_principal_do_processo(self):
+        self.assertEqual(self.codigos(), ["sghss.W003"])
+
+    @override_settings(SGHSS_REPLICAS={"REPLICAS": [], "CACHE": "default"})
+    def test_sem_replicas(self):
+        self.assertEqual(self.codigos(), [])
+
+    @unittest.skipUnless(hasattr(os, "fork"), "o servir precisa de fork()")
+    @override_settings(SGHSS_CACHE_TOKEN={"CACHE": None})
+    def test_servir_recusa_varios_trabalhadores(self):
+        with self.assertRaisesMessage(CommandError, "sghss.W001"):
+            call_command("servir", trabalhadores=2, endereco="127.0.0.1:0")
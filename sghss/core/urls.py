@@ -4,6 +4,10 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     LoginView,
     LogoutView,
+    MetricasView,
+    EstatisticasView,
+    ExportacaoView,
+    LoteView,
     PacienteViewSet,
     AdministradorViewSet,
     ProfissionalSaudeViewSet,
@@ -21,5 +25,9 @@ router.register(r"logs", LogAcaoViewSet, basename="logs")
 urlpatterns = [
     path("auth/login/", LoginView.as_view(), name="login"),
     path("auth/logout/", LogoutView.as_view(), name="logout"),
+    path("metricas/", MetricasView.as_view(), name="metricas"),
+    path("estatisticas/", EstatisticasView.as_view(), name="estatisticas"),
+    path("exportacoes/<str:tipo>/", ExportacaoView.as_view(), name="exportacoes"),
+    path("batch/", LoteView.as_view(), name="lote"),
     path("", include(router.urls)),
 ]
@@ -1,22 +1,36 @@
 import random
 import string
+from collections import Counter
+from datetime import timedelta
 
+from asgiref.sync import sync_to_async
 from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 
-from rest_framework import viewsets, status
-from rest_framework.authentication import TokenAuthentication
+from rest_framework import serializers, viewsets, status
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Usuario, Paciente, Administrador, ProfissionalSaude, Consulta, LogAcao
+from . import agenda, arquivo_logs, busca, cache_respostas, estatisticas, exportacao, lembretes, lote
+from .arquivo_logs import PaginacaoComArquivo
+from .auditoria import obter_sink
+from .autenticacao import TokenAutenticacaoCache, metricas_cache_token
+from .cache_respostas import CacheRespostaMixin
+from .campos_esparsos import CamposEsparsosMixin, recortar
+from .condicional import RespostaCondicionalMixin
+from .models import Usuario, Paciente, Administrador, ProfissionalSaude, HorarioAtendimento, Consulta, LogAcao
 from .permissions import EhAdministrador
+from .roteamento import LeituraReplicaMixin, usar_replica
+from .serializacao_rapida import LeituraRapidaMixin, obter_mapeamento
 from .serializers import (
     UsuarioSerializer, PacienteSerializer, AdministradorSerializer,
-    ProfissionalSaudeSerializer, ConsultaSerializer, LogAcaoSerializer
+    ProfissionalSaudeSerializer, HorarioAtendimentoSerializer, ConsultaSerializer, LogAcaoSerializer
 )
 
 
@@ -28,60 +42,248 @@ def gerar_nome_sala_aleatorio():
     return "-".join(grupos)
 
 
-def registrar_log(usuario, acao, detalhes="", ip=None):
-    LogAcao.objects.create(
+def registrar_log(usuario, acao, detalhes="", ip=None, entidade=None, entidade_id=None):
+    obter_sink().registrar(LogAcao(
         usuario=usuario if usuario and getattr(usuario, "is_authenticated", False) else None,
         acao=acao,
+        entidade=entidade,
+        entidade_id=entidade_id,
         detalhes=detalhes,
         data_hora=timezone.now(),
         ip=ip,
-    )
+    ))
+
+
+def _parametro_data_hora(params, nome, fim_do_dia=False):
+    # "params" também pode ser o corpo JSON (cancelar_em_lote): o valor pode não ser texto.
+    try:
+        return exportacao.ler_data_hora(params.get(nome), fim_do_dia)
+    except ValueError:
+        raise ValidationError({"detalhe": f"Parâmetro '{nome}' inválido. Use AAAA-MM-DD ou data/hora ISO 8601."})
+
+
+def _parametro_inteiro(params, nome):
+    valor = params.get(nome)
+    if valor is None or valor == "":
+        return None
+    try:
+        # No corpo JSON, true e 1.5 chegariam como 1.
+        if isinstance(valor, (bool, float)):
+            raise ValueError
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValidationError({"detalhe": f"Parâmetro '{nome}' deve ser um número inteiro."})
+
+
+def regras_cancelamento(usuario, justificativa):
+    """
+    Status e justificativa de um cancelamento feito por "usuario", ou a
+    resposta de erro quando ele não pode cancelar: (status, justificativa, erro).
+    """
+    if usuario.papel == Usuario.PAPEL_PACIENTE:
+        return Consulta.STATUS_CANCELADA_PACIENTE, justificativa or "Cancelado pelo paciente.", None
+    if usuario.papel == Usuario.PAPEL_PROFISSIONAL:
+        if not justificativa:
+            erro = Response({"detalhe": "Justificativa é obrigatória para cancelamento."}, status=status.HTTP_400_BAD_REQUEST)
+            return None, None, erro
+        return Consulta.STATUS_CANCELADA_PROFISSIONAL, justificativa, None
+    if usuario.papel == Usuario.PAPEL_ADMIN:
+        return Consulta.STATUS_CANCELADA_ADMIN, justificativa or "Cancelado pelo administrador.", None
+    erro = Response({"detalhe": "Você não tem permissão para cancelar consultas."}, status=status.HTTP_403_FORBIDDEN)
+    return None, None, erro
+
+
+def escopo_consultas(queryset, usuario):
+    """
+    Restringe as consultas ao que o papel do usuário pode ver.
+    """
+    if usuario.papel == Usuario.PAPEL_ADMIN:
+        return queryset
+    if usuario.papel == Usuario.PAPEL_PACIENTE:
+        return queryset.filter(paciente__usuario=usuario)
+    if usuario.papel == Usuario.PAPEL_PROFISSIONAL:
+        return queryset.filter(profissional__usuario=usuario)
+
+    return queryset.none()
+
+
+def parametros_logs(params):
+    """
+    Filtros de /api/logs/ (usuario, acao, entidade, entidade_id, de, ate)
+    lidos da query string; os ausentes ficam como None.
+    """
+    acao = params.get("acao")
+    entidade = params.get("entidade")
+    return {
+        "usuario_id": _parametro_inteiro(params, "usuario"),
+        "acao": acao.upper() if acao else None,
+        "entidade": entidade.upper() if entidade else None,
+        "entidade_id": _parametro_inteiro(params, "entidade_id"),
+        "inicio": _parametro_data_hora(params, "de"),
+        "fim": _parametro_data_hora(params, "ate", fim_do_dia=True),
+    }
+
+
+def filtrar_logs(queryset, params):
+    """
+    Aplica os filtros de /api/logs/ ao queryset de LogAcao.
+    """
+    filtros = parametros_logs(params)
+    if filtros["usuario_id"] is not None:
+        queryset = queryset.filter(usuario_id=filtros["usuario_id"])
+    if filtros["acao"]:
+        queryset = queryset.filter(acao=filtros["acao"])
+    if filtros["entidade"]:
+        queryset = queryset.filter(entidade=filtros["entidade"])
+    if filtros["entidade_id"] is not None:
+        queryset = queryset.filter(entidade_id=filtros["entidade_id"])
+    if filtros["inicio"] is not None:
+        queryset = queryset.filter(data_hora__gte=filtros["inicio"])
+    if filtros["fim"] is not None:
+        queryset = queryset.filter(data_hora__lte=filtros["fim"])
+    return queryset
+
+
+def log_arquivado(pk):
+    """
+    Log já movido para o arquivo (core/arquivo_logs.py), serializado como em
+    /api/logs/<id>/, ou None.
+    """
+    log = arquivo_logs.obter(pk)
+    if log is None:
+        return None
+    return LogAcaoSerializer(arquivo_logs.como_instancias([log])[0]).data
 
 
 class LoginView(APIView):
+    """
+    A view assíncrona de login (core/views_assincronas.py) usa credenciais()
+    e concluir() desta view; só a busca do usuário e o hash da senha diferem.
+    """
+
     authentication_classes = []
     permission_classes = [AllowAny]
+    orcamento_sql = 6
 
-    def post(self, request):
+    def credenciais(self, request):
         email = request.data.get("email")
         senha = request.data.get("senha")
-
         if not email or not senha:
-            return Response({"detalhe": "Informe e-mail e senha."}, status=status.HTTP_400_BAD_REQUEST)
+            raise ValidationError({"detalhe": "Informe e-mail e senha."})
+        return email, senha
 
-        try:
-            usuario = Usuario.objects.get(email=email)
-        except Usuario.DoesNotExist:
-            return Response({"detalhe": "Credenciais inválidas."}, status=status.HTTP_400_BAD_REQUEST)
-
-        if not usuario.check_password(senha):
-            return Response({"detalhe": "Credenciais inválidas."}, status=status.HTTP_400_BAD_REQUEST)
+    def credenciais_invalidas(self):
+        return ValidationError({"detalhe": "Credenciais inválidas."})
 
+    def concluir(self, request, usuario):
         token, _ = Token.objects.get_or_create(user=usuario)
 
-        registrar_log(usuario, "LOGIN", "Usuário realizou login no sistema.", request.META.get("REMOTE_ADDR"))
+        registrar_log(
+            usuario, LogAcao.ACAO_LOGIN, "Usuário realizou login no sistema.", request.META.get("REMOTE_ADDR"),
+            entidade=LogAcao.ENTIDADE_USUARIO, entidade_id=usuario.id,
+        )
 
         return Response({"token": token.key, "usuario": UsuarioSerializer(usuario).data})
 
+    def post(self, request):
+        email, senha = self.credenciais(request)
+        usuario = Usuario.objects.filter(email=email).first()
+        if usuario is None or not usuario.check_password(senha):
+            raise self.credenciais_invalidas()
+        return self.concluir(request, usuario)
+
 
 class LogoutView(APIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TokenAutenticacaoCache]
     permission_classes = [IsAuthenticated]
+    orcamento_sql = 4
 
     def post(self, request):
         Token.objects.filter(user=request.user).delete()
-        registrar_log(request.user, "LOGOUT", "Usuário realizou logout do sistema.", request.META.get("REMOTE_ADDR"))
+        registrar_log(
+            request.user, LogAcao.ACAO_LOGOUT, "Usuário realizou logout do sistema.", request.META.get("REMOTE_ADDR"),
+            entidade=LogAcao.ENTIDADE_USUARIO, entidade_id=request.user.id,
+        )
         return Response({"detalhe": "Logout realizado com sucesso."})
 
 
-class PacienteViewSet(viewsets.ModelViewSet):
+class MetricasView(APIView):
+    authentication_classes = [TokenAutenticacaoCache]
+    permission_classes = [IsAuthenticated, EhAdministrador]
+    orcamento_sql = 2
+
+    def get(self, request):
+        return Response({
+            "auditoria": obter_sink().metricas(),
+            "cache_token": metricas_cache_token(),
+            "cache_respostas": cache_respostas.metricas_cache_respostas(),
+            "lembretes": lembretes.situacao_fila(),
+        })
+
+
+class EstatisticasView(APIView):
+    """
+    Painel de consultas e logins: /api/estatisticas/?de=AAAA-MM-DD&ate=AAAA-MM-DD&profissional=
+    (padrão: últimos 30 dias). Lê apenas as tabelas de estatísticas.
+    """
+
+    authentication_classes = [TokenAutenticacaoCache]
+    permission_classes = [IsAuthenticated, EhAdministrador]
+    orcamento_sql = 5
+    intervalo_padrao_dias = 30
+    intervalo_maximo_dias = 366
+
+    def _parametro_data(self, nome, padrao):
+        valor = self.request.query_params.get(nome)
+        if not valor:
+            return padrao
+        try:
+            data = parse_date(valor)
+        except ValueError:
+            data = None
+        if data is None:
+            raise ValidationError({"detalhe": f"Parâmetro '{nome}' inválido. Use AAAA-MM-DD."})
+        return data
+
+    def get(self, request):
+        fim = self._parametro_data("ate", timezone.localdate())
+        inicio = self._parametro_data("de", fim - timedelta(days=self.intervalo_padrao_dias - 1))
+        if fim < inicio:
+            return Response({"detalhe": "'ate' deve ser igual ou posterior a 'de'."}, status=status.HTTP_400_BAD_REQUEST)
+        if (fim - inicio).days >= self.intervalo_maximo_dias:
+            return Response(
+                {"detalhe": f"O intervalo máximo é de {self.intervalo_maximo_dias} dias."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        usar_replica(request.user)
+        return Response(estatisticas.painel(inicio, fim, _parametro_inteiro(request.query_params, "profissional")))
+
+
+class PacienteViewSet(LeituraReplicaMixin, CacheRespostaMixin, RespostaCondicionalMixin, CamposEsparsosMixin, LeituraRapidaMixin, viewsets.ModelViewSet):
     queryset = Paciente.objects.select_related("usuario").all()
     serializer_class = PacienteSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TokenAutenticacaoCache]
+    ordenacao_cursor = ("id",)
+    acoes_replica = ("list", "retrieve", "busca")
+    acoes_campos = ("list", "retrieve", "busca")
+    orcamento_sql = {
+        # Com senha nova: + SELECTs e DELETE dos tokens do usuário.
+        "list": 3, "retrieve": 3, "create": 7, "update": 10, "partial_update": 10, "busca": 3,
+        # SELECT do paciente pelo destroy() do DRF, que o busca de novo + contagem das chaves de
+        # estatísticas + SELECT do coletor + DELETEs (lembretes, consultas, paciente, índice de
+        # busca) + SELECT e UPDATE dos contadores + log.
+        "destroy": 12,
+    }
+    busca_minimo_caracteres = 2
+    busca_limite_padrao = 20
+    busca_limite_maximo = 100
 
     def get_permissions(self):
         if self.action == "create":
             return [AllowAny()]
+        if self.action == "busca":
+            return [IsAuthenticated(), EhAdministrador()]
         return [IsAuthenticated()]
 
     def get_queryset(self):
@@ -100,140 +302,370 @@ class PacienteViewSet(viewsets.ModelViewSet):
         paciente = serializer.save()
         registrar_log(
             self.request.user if self.request.user.is_authenticated else None,
-            "CRIAR_PACIENTE",
+            LogAcao.ACAO_CRIAR_PACIENTE,
             f"Paciente {paciente.id} criado. Usuário: {paciente.usuario.email}",
             self.request.META.get("REMOTE_ADDR"),
+            entidade=LogAcao.ENTIDADE_PACIENTE,
+            entidade_id=paciente.id,
         )
 
     def perform_update(self, serializer):
         paciente = serializer.save()
-        registrar_log(self.request.user, "ATUALIZAR_PACIENTE", f"Paciente {paciente.id} atualizado.", self.request.META.get("REMOTE_ADDR"))
+        registrar_log(
+            self.request.user, LogAcao.ACAO_ATUALIZAR_PACIENTE, f"Paciente {paciente.id} atualizado.", self.request.META.get("REMOTE_ADDR"),
+            entidade=LogAcao.ENTIDADE_PACIENTE, entidade_id=paciente.id,
+        )
+
+    def perform_destroy(self, instance):
+        with cache_respostas.invalidacoes_em_lote():
+            estatisticas.excluir_com_consultas(instance, instance.consultas.all())
 
     def destroy(self, request, *args, **kwargs):
         paciente = self.get_object()
         usuario = request.user
 
-        if usuario.papel == Usuario.PAPEL_ADMIN or paciente.usuario == usuario:
+        if usuario.papel == Usuario.PAPEL_ADMIN or paciente.usuario_id == usuario.id:
             pid = paciente.id
             response = super().destroy(request, *args, **kwargs)
-            registrar_log(usuario, "EXCLUIR_PACIENTE", f"Paciente {pid} excluído.", request.META.get("REMOTE_ADDR"))
+            registrar_log(
+                usuario, LogAcao.ACAO_EXCLUIR_PACIENTE, f"Paciente {pid} excluído.", request.META.get("REMOTE_ADDR"),
+                entidade=LogAcao.ENTIDADE_PACIENTE, entidade_id=pid,
+            )
             return response
 
         return Response({"detalhe": "Você não tem permissão para excluir este paciente."}, status=status.HTTP_403_FORBIDDEN)
 
+    @action(detail=False, methods=["get"])
+    def busca(self, request):
+        """
+        /api/pacientes/busca/?q=&limite= : pacientes por nome, CPF ou e-mail,
+        do mais ao menos relevante (core/busca.py).
+        """
+        texto = request.query_params.get("q", "").strip()
+        if len(texto) < self.busca_minimo_caracteres:
+            return Response(
+                {"detalhe": f"Informe ao menos {self.busca_minimo_caracteres} caracteres em 'q'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limite = _parametro_inteiro(request.query_params, "limite") or self.busca_limite_padrao
+        limite = min(max(limite, 1), self.busca_limite_maximo)
+
+        # Paciente.objects.db já considera a réplica escolhida para a requisição.
+        ids = busca.buscar(texto, limite, Paciente.objects.db)
+        pacientes = self.get_queryset().filter(id__in=ids)
+        mapeamento = obter_mapeamento(self.get_serializer_class(), self.campos_saida())
+        if mapeamento is None:
+            por_id = {paciente.id: paciente for paciente in pacientes}
+            resultados = self.get_serializer([por_id[i] for i in ids if i in por_id], many=True).data
+        else:
+            por_id = {linha["id"]: linha for linha in mapeamento.valores(pacientes, ["id"])}
+            resultados = mapeamento.serializar([por_id[i] for i in ids if i in por_id])
+        return Response({"resultados": resultados})
+
 
-class AdministradorViewSet(viewsets.ModelViewSet):
+class AdministradorViewSet(LeituraReplicaMixin, CacheRespostaMixin, RespostaCondicionalMixin, CamposEsparsosMixin, LeituraRapidaMixin, viewsets.ModelViewSet):
     queryset = Administrador.objects.select_related("usuario").all()
     serializer_class = AdministradorSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TokenAutenticacaoCache]
     permission_classes = [IsAuthenticated, EhAdministrador]
+    ordenacao_cursor = ("id",)
+    # Com senha nova, update e partial_update: + SELECTs e DELETE dos tokens do usuário.
+    orcamento_sql = {"list": 3, "retrieve": 3, "create": 5, "update": 8, "partial_update": 8, "destroy": 5}
 
     def perform_create(self, serializer):
         admin = serializer.save()
-        registrar_log(self.request.user, "CRIAR_ADMIN", f"Administrador {admin.id} criado.", self.request.META.get("REMOTE_ADDR"))
+        registrar_log(
+            self.request.user, LogAcao.ACAO_CRIAR_ADMIN, f"Administrador {admin.id} criado.", self.request.META.get("REMOTE_ADDR"),
+            entidade=LogAcao.ENTIDADE_ADMINISTRADOR, entidade_id=admin.id,
+        )
 
     def perform_update(self, serializer):
         admin = serializer.save()
-        registrar_log(self.request.user, "ATUALIZAR_ADMIN", f"Administrador {admin.id} atualizado.", self.request.META.get("REMOTE_ADDR"))
+        registrar_log(
+            self.request.user, LogAcao.ACAO_ATUALIZAR_ADMIN, f"Administrador {admin.id} atualizado.", self.request.META.get("REMOTE_ADDR"),
+            entidade=LogAcao.ENTIDADE_ADMINISTRADOR, entidade_id=admin.id,
+        )
 
     def perform_destroy(self, instance):
         aid = instance.id
         instance.delete()
-        registrar_log(self.request.user, "EXCLUIR_ADMIN", f"Administrador {aid} excluído.", self.request.META.get("REMOTE_ADDR"))
+        registrar_log(
+            self.request.user, LogAcao.ACAO_EXCLUIR_ADMIN, f"Administrador {aid} excluído.", self.request.META.get("REMOTE_ADDR"),
+            entidade=LogAcao.ENTIDADE_ADMINISTRADOR, entidade_id=aid,
+        )
 
 
-class ProfissionalSaudeViewSet(viewsets.ModelViewSet):
+class ProfissionalSaudeViewSet(LeituraReplicaMixin, CacheRespostaMixin, RespostaCondicionalMixin, CamposEsparsosMixin, LeituraRapidaMixin, viewsets.ModelViewSet):
     queryset = ProfissionalSaude.objects.select_related("usuario").all()
     serializer_class = ProfissionalSaudeSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TokenAutenticacaoCache]
     permission_classes = [IsAuthenticated, EhAdministrador]
+    ordenacao_cursor = ("id",)
+    acoes_replica = ("list", "retrieve", "horarios_atendimento", "horarios_livres")
+    orcamento_sql = {
+        # Com senha nova: + SELECTs e DELETE dos tokens do usuário.
+        "list": 3, "retrieve": 3, "create": 5, "update": 8, "partial_update": 8,
+        # Com consultas: + DELETE dos lembretes delas.
+        "destroy": 9,
+        "horarios_atendimento": 6, "horarios_livres": 4,
+    }
+
+    def get_permissions(self):
+        if self.action == "horarios_livres" or (self.action == "horarios_atendimento" and self.request.method == "GET"):
+            return [IsAuthenticated()]
+        return super().get_permissions()
 
     def perform_create(self, serializer):
         prof = serializer.save()
-        registrar_log(self.request.user, "CRIAR_PROFISSIONAL", f"Profissional {prof.id} criado.", self.request.META.get("REMOTE_ADDR"))
+        registrar_log(
+            self.request.user, LogAcao.ACAO_CRIAR_PROFISSIONAL, f"Profissional {prof.id} criado.", self.request.META.get("REMOTE_ADDR"),
+            entidade=LogAcao.ENTIDADE_PROFISSIONAL, entidade_id=prof.id,
+        )
 
     def perform_update(self, serializer):
         prof = serializer.save()
-        registrar_log(self.request.user, "ATUALIZAR_PROFISSIONAL", f"Profissional {prof.id} atualizado.", self.request.META.get("REMOTE_ADDR"))
+        registrar_log(
+            self.request.user, LogAcao.ACAO_ATUALIZAR_PROFISSIONAL, f"Profissional {prof.id} atualizado.", self.request.META.get("REMOTE_ADDR"),
+            entidade=LogAcao.ENTIDADE_PROFISSIONAL, entidade_id=prof.id,
+        )
 
     def perform_destroy(self, instance):
         pid = instance.id
-        instance.delete()
-        registrar_log(self.request.user, "EXCLUIR_PROFISSIONAL", f"Profissional {pid} excluído.", self.request.META.get("REMOTE_ADDR"))
-
+        # Os contadores do profissional caem em cascata junto com as consultas.
+        with estatisticas.ajustes_em_lote(), cache_respostas.invalidacoes_em_lote():
+            instance.delete()
+        registrar_log(
+            self.request.user, LogAcao.ACAO_EXCLUIR_PROFISSIONAL, f"Profissional {pid} excluído.", self.request.META.get("REMOTE_ADDR"),
+            entidade=LogAcao.ENTIDADE_PROFISSIONAL, entidade_id=pid,
+        )
 
-class ConsultaViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=["get", "put"], url_path="horarios-atendimento")
+    def horarios_atendimento(self, request, pk=None):
+        profissional = self.get_object()
+
+        if request.method == "PUT":
+            serializer = HorarioAtendimentoSerializer(data=request.data, many=True)
+            serializer.is_valid(raise_exception=True)
+            with transaction.atomic():
+                profissional.horarios_atendimento.all().delete()
+                HorarioAtendimento.objects.bulk_create(
+                    HorarioAtendimento(profissional=profissional, **dados) for dados in serializer.validated_data
+                )
+            registrar_log(
+                request.user, LogAcao.ACAO_ATUALIZAR_PROFISSIONAL,
+                f"Horários de atendimento do profissional {profissional.id} atualizados.", request.META.get("REMOTE_ADDR"),
+                entidade=LogAcao.ENTIDADE_PROFISSIONAL, entidade_id=profissional.id,
+            )
+
+        return Response(HorarioAtendimentoSerializer(profissional.horarios_atendimento.all(), many=True).data)
+
+    @action(detail=True, methods=["get"], url_path="horarios-livres")
+    def horarios_livres(self, request, pk=None):
+        profissional = self.get_object()
+        inicio = _parametro_data_hora(request.query_params, "de") or timezone.now()
+        fim = _parametro_data_hora(request.query_params, "ate", fim_do_dia=True) or inicio + timedelta(days=7)
+
+        if fim <= inicio:
+            return Response({"detalhe": "'ate' deve ser posterior a 'de'."}, status=status.HTTP_400_BAD_REQUEST)
+        if fim - inicio > timedelta(days=agenda.INTERVALO_MAXIMO_DIAS):
+            return Response(
+                {"detalhe": f"O intervalo máximo é de {agenda.INTERVALO_MAXIMO_DIAS} dias."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        campo = serializers.DateTimeField()
+        return Response({
+            "profissional": profissional.id,
+            "duracao_consulta_minutos": profissional.duracao_consulta_minutos,
+            "horarios_livres": [campo.to_representation(h) for h in agenda.horarios_livres(profissional, inicio, fim)],
+        })
+
+
+class ConsultaViewSet(LeituraReplicaMixin, CacheRespostaMixin, RespostaCondicionalMixin, CamposEsparsosMixin, LeituraRapidaMixin, viewsets.ModelViewSet):
     queryset = Consulta.objects.select_related("paciente", "profissional", "administrador_criador").all()
     serializer_class = ConsultaSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TokenAutenticacaoCache]
     permission_classes = [IsAuthenticated]
+    ordenacao_cursor = ("data_horario", "id")
+    orcamento_sql = {
+        # Nova data: + DELETE e INSERT dos lembretes (core/lembretes.py) e, num dia sem
+        # consultas do profissional, o INSERT do contador de estatísticas.
+        "list": 3, "retrieve": 3, "create": 12, "update": 12, "partial_update": 12, "cancelar": 7,
+        # Com cancelamento_lote_maximo consultas em dias diferentes: SELECT + UPDATE + DELETE dos
+        # lembretes + 5 lotes de chaves de estatísticas (SELECT, UPDATE e INSERT cada) + 4 INSERTs
+        # de logs (o Django divide o bulk_create em 999 parâmetros por instrução no SQLite).
+        "cancelar_em_lote": 23,
+    }
+    cancelamento_lote_maximo = 500
 
     def get_queryset(self):
-        usuario = self.request.user
-
-        if usuario.papel == Usuario.PAPEL_ADMIN:
-            return self.queryset
-        if usuario.papel == Usuario.PAPEL_PACIENTE:
-            return self.queryset.filter(paciente__usuario=usuario)
-        if usuario.papel == Usuario.PAPEL_PROFISSIONAL:
-            return self.queryset.filter(profissional__usuario=usuario)
-
-        return Consulta.objects.none()
+        return escopo_consultas(self.queryset, self.request.user)
 
     @transaction.atomic
     def perform_create(self, serializer):
         usuario = self.request.user
+        # O link entra no próprio INSERT, sem um segundo save().
+        extras = {}
+        if serializer.validated_data.get("tipo_atendimento") == Consulta.TIPO_ONLINE:
+            extras["link_teleconsulta"] = f"https://meet.jit.si/{gerar_nome_sala_aleatorio()}"
 
         if usuario.papel == Usuario.PAPEL_PACIENTE:
             paciente = usuario.perfil_paciente
-            consulta = serializer.save(paciente=paciente, administrador_criador=None)
+            agenda.verificar_disponibilidade(serializer.validated_data["profissional"], serializer.validated_data["data_horario"])
+            consulta = serializer.save(paciente=paciente, administrador_criador=None, **extras)
 
         elif usuario.papel == Usuario.PAPEL_ADMIN:
             administrador = usuario.perfil_administrador
-            consulta = serializer.save(administrador_criador=administrador)
+            agenda.verificar_disponibilidade(serializer.validated_data["profissional"], serializer.validated_data["data_horario"])
+            consulta = serializer.save(administrador_criador=administrador, **extras)
 
         else:
             raise ValueError("Apenas pacientes e administradores podem criar consultas.")
 
-        if consulta.tipo_atendimento == Consulta.TIPO_ONLINE and not consulta.link_teleconsulta:
-            consulta.link_teleconsulta = f"https://meet.jit.si/{gerar_nome_sala_aleatorio()}"
-            consulta.save()
+        registrar_log(
+            usuario, LogAcao.ACAO_CRIAR_CONSULTA, f"Consulta {consulta.id} criada.", self.request.META.get("REMOTE_ADDR"),
+            entidade=LogAcao.ENTIDADE_CONSULTA, entidade_id=consulta.id,
+        )
 
-        registrar_log(usuario, "CRIAR_CONSULTA", f"Consulta {consulta.id} criada.", self.request.META.get("REMOTE_ADDR"))
+    @transaction.atomic
+    def perform_update(self, serializer):
+        consulta = serializer.instance
+        if consulta.status == Consulta.STATUS_AGENDADA:
+            agenda.verificar_disponibilidade(
+                serializer.validated_data.get("profissional", consulta.profissional),
+                serializer.validated_data.get("data_horario", consulta.data_horario),
+                ignorar_consulta_id=consulta.id,
+            )
+        serializer.save()
 
     @action(detail=True, methods=["post"])
     def cancelar(self, request, pk=None):
         consulta = self.get_object()
         usuario = request.user
-        justificativa = request.data.get("justificativa")
 
-        if usuario.papel == Usuario.PAPEL_PACIENTE:
-            if consulta.paciente.usuario != usuario:
-                return Response({"detalhe": "Você não pode cancelar consultas de outro paciente."}, status=status.HTTP_403_FORBIDDEN)
-            consulta.status = Consulta.STATUS_CANCELADA_PACIENTE
-            consulta.justificativa_cancelamento = justificativa or "Cancelado pelo paciente."
-
-        elif usuario.papel == Usuario.PAPEL_PROFISSIONAL:
-            if consulta.profissional.usuario != usuario:
-                return Response({"detalhe": "Você não pode cancelar consultas de outros profissionais."}, status=status.HTTP_403_FORBIDDEN)
-            if not justificativa:
-                return Response({"detalhe": "Justificativa é obrigatória para cancelamento."}, status=status.HTTP_400_BAD_REQUEST)
-            consulta.status = Consulta.STATUS_CANCELADA_PROFISSIONAL
-            consulta.justificativa_cancelamento = justificativa
-
-        elif usuario.papel == Usuario.PAPEL_ADMIN:
-            consulta.status = Consulta.STATUS_CANCELADA_ADMIN
-            consulta.justificativa_cancelamento = justificativa or "Cancelado pelo administrador."
-
-        else:
-            return Response({"detalhe": "Você não tem permissão para cancelar consultas."}, status=status.HTTP_403_FORBIDDEN)
+        if usuario.papel == Usuario.PAPEL_PACIENTE and consulta.paciente.usuario_id != usuario.id:
+            return Response({"detalhe": "Você não pode cancelar consultas de outro paciente."}, status=status.HTTP_403_FORBIDDEN)
+        if usuario.papel == Usuario.PAPEL_PROFISSIONAL and consulta.profissional.usuario_id != usuario.id:
+            return Response({"detalhe": "Você não pode cancelar consultas de outros profissionais."}, status=status.HTTP_403_FORBIDDEN)
 
+        novo_status, justificativa, erro = regras_cancelamento(usuario, request.data.get("justificativa"))
+        if erro is not None:
+            return erro
+        consulta.status = novo_status
+        consulta.justificativa_cancelamento = justificativa
         consulta.save()
 
-        registrar_log(usuario, "CANCELAR_CONSULTA", f"Consulta {consulta.id} cancelada. Status: {consulta.status}", request.META.get("REMOTE_ADDR"))
+        registrar_log(
+            usuario, LogAcao.ACAO_CANCELAR_CONSULTA, f"Consulta {consulta.id} cancelada. Status: {consulta.status}", request.META.get("REMOTE_ADDR"),
+            entidade=LogAcao.ENTIDADE_CONSULTA, entidade_id=consulta.id,
+        )
 
         return Response(ConsultaSerializer(consulta).data, status=status.HTTP_200_OK)
 
+    def _consultas_para_cancelar(self, dados):
+        """
+        Consultas visíveis ao usuário indicadas no corpo do cancelamento em lote:
+        por "ids" ou por "profissional" + "de"/"ate" (só as agendadas).
+        Devolve (queryset, ids pedidos ou None).
+        """
+        ids = dados.get("ids")
+        profissional = _parametro_inteiro(dados, "profissional")
+        if (ids is None) == (profissional is None):
+            raise ValidationError({"detalhe": "Informe 'ids' ou 'profissional' com 'de' e 'ate'."})
+
+        consultas = self.get_queryset()
+        if ids is not None:
+            if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+                raise ValidationError({"detalhe": "'ids' deve ser uma lista de números inteiros."})
+            ids = list(dict.fromkeys(ids))
+            if len(ids) > self.cancelamento_lote_maximo:
+                raise ValidationError({"detalhe": f"No máximo {self.cancelamento_lote_maximo} consultas por requisição."})
+            return consultas.filter(id__in=ids), ids
+
+        inicio = _parametro_data_hora(dados, "de")
+        fim = _parametro_data_hora(dados, "ate", fim_do_dia=True)
+        if inicio is None or fim is None:
+            raise ValidationError({"detalhe": "Informe 'de' e 'ate' para cancelar por profissional."})
+        if fim <= inicio:
+            raise ValidationError({"detalhe": "'ate' deve ser posterior a 'de'."})
+        if fim - inicio > timedelta(days=agenda.INTERVALO_MAXIMO_DIAS):
+            raise ValidationError({"detalhe": f"O intervalo máximo é de {agenda.INTERVALO_MAXIMO_DIAS} dias."})
+        consultas = consultas.filter(
+            profissional_id=profissional, status=Consulta.STATUS_AGENDADA, data_horario__range=(inicio, fim)
+        )
+        return consultas, None
+
+    @action(detail=False, methods=["post"], url_path="cancelar-em-lote")
+    def cancelar_em_lote(self, request):
+        """
+        Cancela várias consultas com as regras de "cancelar": um SELECT, um
+        UPDATE, o ajuste das estatísticas, um DELETE dos lembretes e um INSERT em lote dos logs,
+        qualquer que seja a quantidade (até cancelamento_lote_maximo).
+        Só consultas agendadas são canceladas; as demais são informadas.
+        """
+        usuario = request.user
+        novo_status, justificativa, erro = regras_cancelamento(usuario, request.data.get("justificativa"))
+        if erro is not None:
+            return erro
+        consultas, ids_pedidos = self._consultas_para_cancelar(request.data)
+
+        with transaction.atomic():
+            encontradas = list(
+                consultas.select_for_update()
+                .order_by("data_horario", "id")
+                .values_list(
+                    "id", "data_horario", "profissional_id", "status", "tipo_atendimento",
+                    "paciente__usuario_id", "profissional__usuario_id",
+                )[:self.cancelamento_lote_maximo + 1]
+            )
+            if len(encontradas) > self.cancelamento_lote_maximo:
+                return Response(
+                    {"detalhe": f"Mais de {self.cancelamento_lote_maximo} consultas no período; divida o cancelamento."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            canceladas = [linha for linha in encontradas if linha[3] == Consulta.STATUS_AGENDADA]
+            ids_cancelados = [linha[0] for linha in canceladas]
+            if ids_cancelados:
+                Consulta.objects.filter(id__in=ids_cancelados).update(
+                    status=novo_status, justificativa_cancelamento=justificativa, atualizado_em=timezone.now(),
+                )
+
+                # O update() não passa pelos sinais: contadores, cache de respostas e lembretes são ajustados aqui.
+                movimentos = Counter()
+                for _, data_horario, profissional_id, status_anterior, tipo, *_ in canceladas:
+                    data = timezone.localdate(data_horario)
+                    movimentos[(data, profissional_id, status_anterior, tipo)] -= 1
+                    movimentos[(data, profissional_id, novo_status, tipo)] += 1
+                estatisticas.aplicar_movimentos(movimentos)
+                cache_respostas.invalidar_consultas(
+                    ids_cancelados, [usuario_id for linha in canceladas for usuario_id in linha[5:]]
+                )
+                lembretes.remover(ids_cancelados)
+
+                agora = timezone.now()
+                ip = request.META.get("REMOTE_ADDR")
+                obter_sink().registrar_lote([
+                    LogAcao(
+                        usuario=usuario, acao=LogAcao.ACAO_CANCELAR_CONSULTA,
+                        entidade=LogAcao.ENTIDADE_CONSULTA, entidade_id=consulta_id,
+                        detalhes=f"Consulta {consulta_id} cancelada em lote. Status: {novo_status}",
+                        data_hora=agora, ip=ip,
+                    )
+                    for consulta_id in ids_cancelados
+                ])
+
+        situacao = {linha[0]: linha[3] for linha in encontradas}
+        resultados = []
+        for consulta_id in ids_pedidos if ids_pedidos is not None else list(situacao):
+            if consulta_id not in situacao:
+                resultados.append({"id": consulta_id, "resultado": "nao_encontrada"})
+            elif situacao[consulta_id] == Consulta.STATUS_AGENDADA:
+                resultados.append({"id": consulta_id, "resultado": "cancelada", "status": novo_status})
+            else:
+                resultados.append({"id": consulta_id, "resultado": "ignorada", "status": situacao[consulta_id]})
+        return Response({"canceladas": len(ids_cancelados), "resultados": resultados})
+
     def destroy(self, request, *args, **kwargs):
         return Response(
             {"detalhe": "Use o endpoint /consultas/{id}/cancelar/ para cancelar uma consulta."},
@@ -241,8 +673,116 @@ class ConsultaViewSet(viewsets.ModelViewSet):
         )
 
 
-class LogAcaoViewSet(viewsets.ReadOnlyModelViewSet):
+class LogAcaoViewSet(LeituraReplicaMixin, CamposEsparsosMixin, LeituraRapidaMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Filtros opcionais por query string: usuario, acao, entidade, entidade_id,
+    de e ate (datas ou datas/horas ISO 8601). Cada combinação é atendida por
+    um dos índices compostos de LogAcao. Os logs arquivados por
+    "arquivar_logs" continuam listados e acessíveis por id; a consulta extra
+    do orçamento busca os usuários desses logs.
+    """
+
     queryset = LogAcao.objects.select_related("usuario").order_by("-data_hora")
     serializer_class = LogAcaoSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TokenAutenticacaoCache]
+    permission_classes = [IsAuthenticated, EhAdministrador]
+    pagination_class = PaginacaoComArquivo
+    ordenacao_cursor = ("-data_hora", "-id")
+    orcamento_sql = {"list": 3, "retrieve": 3}
+
+    filtros_arquivo = staticmethod(parametros_logs)
+
+    def get_queryset(self):
+        return filtrar_logs(self.queryset, self.request.query_params)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            dados = log_arquivado(self.kwargs["pk"])
+            if dados is None:
+                raise
+            return Response(recortar(dados, self.campos_saida()))
+
+    async def aretrieve(self, request, *args, **kwargs):
+        try:
+            return await super().aretrieve(request, *args, **kwargs)
+        except Http404:
+            dados = await sync_to_async(log_arquivado)(self.kwargs["pk"])
+            if dados is None:
+                raise
+            return Response(recortar(dados, self.campos_saida()))
+
+
+class ExportacaoView(APIView):
+    """
+    Exporta consultas ou logs em fluxo: /api/exportacoes/<consultas|logs>/
+    ?formato=csv|ndjson&de=...&ate=...&gzip=1
+    """
+
+    authentication_classes = [TokenAutenticacaoCache]
     permission_classes = [IsAuthenticated, EhAdministrador]
+    # As linhas exportadas são lidas depois que a view retorna, durante o envio.
+    orcamento_sql = 2
+    # Resposta em fluxo: não cabe no JSON de um lote.
+    permitir_em_lote = False
+
+    def get(self, request, tipo):
+        if tipo not in exportacao.EXPORTACOES:
+            return Response({"detalhe": "Exportação inexistente."}, status=status.HTTP_404_NOT_FOUND)
+
+        formato = request.query_params.get("formato", "csv")
+        if formato not in exportacao.FORMATOS:
+            return Response({"detalhe": "Formato inválido. Use csv ou ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+
+        inicio = _parametro_data_hora(request.query_params, "de")
+        fim = _parametro_data_hora(request.query_params, "ate", fim_do_dia=True)
+        comprimir = request.query_params.get("gzip") in ("1", "true")
+        banco = usar_replica(request.user)
+        try:
+            pedacos = exportacao.gerar_exportacao(tipo, formato, inicio, fim, comprimir, banco)
+        except arquivo_logs.ArquivamentoEmAndamento:
+            return Response(
+                {"detalhe": "Os logs estão sendo arquivados. Tente novamente em alguns minutos."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        registrar_log(
+            request.user, LogAcao.ACAO_EXPORTAR_DADOS,
+            f"Exportação de {tipo} ({formato}) de {inicio or 'início'} até {fim or 'fim'}.",
+            request.META.get("REMOTE_ADDR"),
+        )
+
+        resposta = StreamingHttpResponse(
+            pedacos,
+            content_type="application/gzip" if comprimir else exportacao.FORMATOS[formato][0],
+        )
+        resposta["Content-Disposition"] = f'attachment; filename="{exportacao.nome_arquivo(tipo, formato, comprimir)}"'
+        return resposta
+
+
+class LoteView(APIView):
+    """
+    POST /api/batch/: várias requisições da API numa única ida e volta
+    (core/lote.py). Responde {"resultados": [{"id", "status", "corpo"}, ...]}
+    na ordem enviada e, com "transacao", se ela foi confirmada.
+    """
+
+    authentication_classes = [TokenAutenticacaoCache]
+    permission_classes = [IsAuthenticated]
+    permitir_em_lote = False
+    # Só a autenticação: cada sub-requisição é medida contra o orçamento da própria view.
+    orcamento_sql = 1
+
+    def post(self, request):
+        configuracao = lote.configuracao_lote()
+        itens = lote.ler_lote(request.data, configuracao)
+        transacao = bool(request.data.get("transacao"))
+        resultados, confirmada = lote.executar_lote(
+            request._request, itens, request.user, request.auth,
+            paralelo=bool(request.data.get("paralelo")), transacao=transacao, configuracao=configuracao,
+        )
+        dados = {"resultados": resultados}
+        if transacao:
+            dados["transacao_confirmada"] = confirmada
+        return Response(dados)
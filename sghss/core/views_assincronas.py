@@ -0,0 +1,172 @@
+"""
+Views assíncronas servidas apenas pelo caminho ASGI (sghss/urls_asgi.py).
+
+São invólucros das views DRF: a requisição passa pelo initial() da própria
+view (autenticação, permissões, negociação de formato, ?fields= e réplica),
+a ação roda pelos mesmos mixins, nas versões alist/aretrieve que leem com o
+ORM assíncrono, e erros e renderização também são os da view DRF. O login
+verifica a senha num pool limitado de threads ou processos, sem bloquear o
+event loop. Qualquer requisição que essas views não tratam (escrita,
+?offset=, API navegável, MessagePack) é repassada para a view síncrona.
+
+Como nas views do DRF, os atributos "cls" e "actions" identificam a view e
+a ação: a instrumentação (core/instrumentacao.py) mede cada requisição contra
+o "orcamento_sql" da view DRF correspondente.
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import Usuario
+from .paginacao import PaginacaoOffset
+from .renderizadores import MessagePackRenderer
+from .views import LoginView, ConsultaViewSet, LogAcaoViewSet
+
+CONFIGURACAO_PADRAO = {
+    "VIEWS_ASSINCRONAS": True,
+    # "thread" ou "process". O PBKDF2 do hashlib libera o GIL, então threads
+    # já paralelizam o hash; "process" isola totalmente a CPU do worker.
+    "POOL_HASH": "thread",
+    "TRABALHADORES_HASH": 4,
+}
+
+
+def configuracao_asgi():
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    configuracao.update(getattr(settings, "SGHSS_ASGI", {}))
+    return configuracao
+
+
+_pool_hash = None
+
+
+def _inicializar_processo():
+    # Processos criados por "spawn" (Windows/macOS) não herdam o Django configurado.
+    import django
+    django.setup()
+
+
+def obter_pool_hash():
+    global _pool_hash
+    if _pool_hash is None:
+        configuracao = configuracao_asgi()
+        if configuracao["POOL_HASH"] == "process":
+            _pool_hash = ProcessPoolExecutor(
+                max_workers=configuracao["TRABALHADORES_HASH"], initializer=_inicializar_processo
+            )
+        else:
+            _pool_hash = ThreadPoolExecutor(max_workers=configuracao["TRABALHADORES_HASH"])
+    return _pool_hash
+
+
+def _hash_precisa_atualizar(senha_codificada):
+    preferido = get_hasher("default")
+    try:
+        atual = identify_hasher(senha_codificada)
+    except ValueError:
+        return False
+    return atual.algorithm != preferido.algorithm or preferido.must_update(senha_codificada)
+
+
+def _atualizar_hash(usuario, senha):
+    usuario.set_password(senha)
+    usuario.save(update_fields=["password"])
+
+
+async def verificar_senha(usuario, senha):
+    """
+    Mesmo resultado de usuario.check_password(senha), com o hash calculado fora
+    do event loop. Hashes antigos continuam sendo atualizados após o login.
+    """
+    loop = asyncio.get_running_loop()
+    valida = await loop.run_in_executor(obter_pool_hash(), check_password, senha, usuario.password)
+    if valida and _hash_precisa_atualizar(usuario.password):
+        await sync_to_async(_atualizar_hash)(usuario, senha)
+    return valida
+
+
+def _tratar_sincrono(request):
+    """
+    Indica se a requisição deve seguir pela view DRF síncrona.
+    """
+    return (
+        request.method != "GET"
+        or "format" in request.GET
+        or PaginacaoOffset.offset_query_param in request.GET
+        or "text/html" in request.headers.get("Accept", "")
+        or MessagePackRenderer.media_type in request.headers.get("Accept", "")
+    )
+
+
+async def _delegar(view, request, **kwargs):
+    return await sync_to_async(view)(request, **kwargs)
+
+
+async def _despachar(view, request, executar, **kwargs):
+    """
+    O dispatch() do DRF com a ação assíncrona executar(view, request, **kwargs):
+    mesma inicialização, mesmo tratamento de erros e mesma finalização.
+    """
+    view.args, view.kwargs = (), kwargs
+    view.format_kwarg = view.get_format_suffix(**kwargs)
+    view.headers = view.default_response_headers
+    request = view.initialize_request(request, **kwargs)
+    view.request = request
+    try:
+        # Autenticação e escolha da réplica consultam o banco e os caches.
+        await sync_to_async(view.initial)(request, **kwargs)
+        resposta = await executar(view, request, **kwargs)
+    except Exception as erro:
+        resposta = view.handle_exception(erro)
+    return view.finalize_response(request, resposta, **kwargs)
+
+
+def _view_de_leitura(classe_view, acoes):
+    """
+    View assíncrona do viewset com as ações "acoes" ({"get": "list", ...},
+    como em as_view()): o GET roda a versão "a" da ação; o resto, a view DRF.
+    """
+    view_sincrona = classe_view.as_view(acoes)
+    executar = getattr(classe_view, "a" + acoes["get"])
+
+    @csrf_exempt
+    async def view(request, **kwargs):
+        if _tratar_sincrono(request):
+            return await _delegar(view_sincrona, request, **kwargs)
+        return await _despachar(classe_view(action_map=acoes), request, executar, **kwargs)
+
+    view.cls = classe_view
+    view.actions = acoes
+    return view
+
+
+consultas = _view_de_leitura(ConsultaViewSet, {"get": "list", "post": "create"})
+consulta = _view_de_leitura(
+    ConsultaViewSet, {"get": "retrieve", "put": "update", "patch": "partial_update", "delete": "destroy"}
+)
+logs = _view_de_leitura(LogAcaoViewSet, {"get": "list"})
+log = _view_de_leitura(LogAcaoViewSet, {"get": "retrieve"})
+
+_login_sincrono = LoginView.as_view()
+
+
+async def _entrar(view, request):
+    email, senha = view.credenciais(request)
+    usuario = await Usuario.objects.filter(email=email).afirst()
+    if usuario is None or not await verificar_senha(usuario, senha):
+        raise view.credenciais_invalidas()
+    return await sync_to_async(view.concluir)(request, usuario)
+
+
+@csrf_exempt
+async def login(request):
+    if request.method != "POST":
+        return await _delegar(_login_sincrono, request)
+    return await _despachar(LoginView(), request, _entrar)
+
+
+login.cls = LoginView
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -21,6 +22,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.instrumentacao_sql_middleware",
+    "core.middleware.roteamento_banco_middleware",
+    "core.middleware.urlconf_asgi_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -59,6 +63,54 @@ DATABASES = {
     }
 }
 
+# Perfis de conexão do SQLite, aplicados sobre DATABASES["default"].
+# "producao": WAL (leitores não bloqueiam o escritor), synchronous=NORMAL
+# (seguro com WAL), espera de até 20 s por um bloqueio em vez de falhar na
+# hora, mmap e cache maiores, conexões persistentes e BEGIN IMMEDIATE: toda
+# transação (ex.: ConsultaViewSet.perform_create) já começa com o bloqueio de
+# escrita, então não falha com "database is locked" ao passar de leitura para
+# escrita. "padrao": o comportamento original do Django. No ASGI o Django
+# recomenda CONN_MAX_AGE = 0. Comparação: python manage.py estresse_sqlite.
+SGHSS_PERFIS_SQLITE = {
+    "padrao": {},
+    "producao": {
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "transaction_mode": "IMMEDIATE",
+            "init_command": (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "PRAGMA busy_timeout=20000;"
+                "PRAGMA mmap_size=268435456;"
+                "PRAGMA cache_size=-20000;"
+                "PRAGMA temp_store=MEMORY;"
+            ),
+        },
+    },
+}
+SGHSS_PERFIL_SQLITE = "producao"
+DATABASES["default"].update(SGHSS_PERFIS_SQLITE[SGHSS_PERFIL_SQLITE])
+
+# Réplicas de leitura (core/roteamento.py): list/retrieve dos viewsets e as
+# exportações leem de uma das réplicas; escritas, leituras depois de uma
+# escrita e o usuário que escreveu há menos de JANELA_PRIMARIO segundos ficam
+# no "default". Para testar localmente com dois arquivos SQLite:
+#     DATABASES["replica"] = {
+#         "ENGINE": "django.db.backends.sqlite3",
+#         "NAME": BASE_DIR / "replica.sqlite3",
+#         "TEST": {"MIRROR": "default"},
+#     }
+#     SGHSS_REPLICAS["REPLICAS"] = ["replica"]
+# e copie o principal para a réplica com "python manage.py sincronizar_replicas".
+SGHSS_REPLICAS = {
+    "REPLICAS": [],
+    "JANELA_PRIMARIO": 10,
+    # Marca de "preso ao principal"; deve ser vista por todos os processos.
+    "CACHE": "compartilhado",
+}
+DATABASE_ROUTERS = ["core.roteamento.RoteadorLeituraEscrita"]
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -77,12 +129,180 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Modelo de usuário customizado
 AUTH_USER_MODEL = "core.Usuario"
 
-# DRF - Token Authentication
+# DRF - Token Authentication (com cache dos tokens resolvidos)
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "core.autenticacao.TokenAutenticacaoCache",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # Paginação por cursor em todas as listagens (?cursor=...&tamanho=...).
+    # Enviar "offset" na query string ativa a paginação por offset/limit.
+    "DEFAULT_PAGINATION_CLASS": "core.paginacao.PaginacaoCursor",
+    "PAGE_SIZE": 50,
+    # JSON codificado com orjson (mesmos bytes do JSONRenderer) e MessagePack
+    # (Accept: application/msgpack) quando as bibliotecas estão instaladas;
+    # sem elas, JSON do DRF e MessagePack indisponível (core/renderizadores.py).
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderizadores.JSONRapidoRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        "core.renderizadores.MessagePackRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.renderizadores.JSONRapidoParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+        "core.renderizadores.MessagePackParser",
+    ],
+    "DEFAULT_CONTENT_NEGOTIATION_CLASS": "core.renderizadores.NegociacaoConteudo",
+}
+
+SGHSS_PAGINACAO = {
+    "TAMANHO_MAXIMO": 500,
+}
+
+# Auditoria (LogAcao): os registros são enfileirados e gravados em lote por uma
+# thread de fundo. Para gravá-los na hora, dentro da transação da requisição
+# (como nos testes da API), use "SINK": "core.auditoria.SinkSincrono".
+SGHSS_AUDITORIA = {
+    "SINK": "core.auditoria.SinkBufferizado",
+    "TAMANHO_LOTE": 200,
+    "INTERVALO_FLUSH": 1.0,
+    "TAMANHO_MAXIMO_FILA": 10000,
+}
+
+# Instrumentação de SQL por requisição (core/instrumentacao.py): cabeçalho
+# Server-Timing e log "core.instrumentacao" com quantidade/tempo de SQL,
+# instruções mais lentas e repetidas. Desligada por padrão; os testes da API
+# (core/tests.py) a ligam em modo estrito, que falha a requisição que estourar o
+# "orcamento_sql" declarado na view.
+SGHSS_INSTRUMENTACAO = {
+    "ATIVO": False,
+    "MODO_ESTRITO": False,
+    "MAIS_LENTAS": 3,
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core.instrumentacao": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
+# Cache dos tokens já autenticados (core/autenticacao.py), no alias "CACHE" de
+# CACHES. Precisa ser compartilhado entre os processos do servidor, senão o
+# logout feito num processo não vale nos outros (manage.py check avisa). Com
+# "CACHE": None, cada processo guarda até TAMANHO_MAXIMO tokens em memória,
+# o que só serve para um único processo.
+SGHSS_CACHE_TOKEN = {
+    "ATIVO": True,
+    "TAMANHO_MAXIMO": 10000,
+    "TTL": 300,
+    "CACHE": "compartilhado",
+}
+
+# Caminho ASGI (sghss.asgi): login e leituras de consultas/logs usam views
+# nativas assíncronas; o hash da senha roda num pool ("thread" ou "process").
+# O caminho WSGI não é afetado.
+SGHSS_ASGI = {
+    "VIEWS_ASSINCRONAS": True,
+    "POOL_HASH": "thread",
+    "TRABALHADORES_HASH": 4,
+}
+
+# Caches do Django. "compartilhado" e "respostas" (respostas de list/retrieve
+# dos viewsets, SGHSS_CACHE_RESPOSTAS) ficam em arquivos, vistos por todos os
+# processos da máquina (core/cache_arquivo.py), em DIRETORIO_CACHE: fora do
+# código, já que guardam dados de usuários e pacientes (variável de ambiente
+# SGHSS_DIRETORIO_CACHE; padrão ~/.cache/sghss). MAX_ENTRIES limita o número de
+# entradas. Com mais de uma máquina, troque-os por Redis ou Memcached. O
+# locmem é de cada processo: o "manage.py check" avisa se um recurso que
+# precisa ser compartilhado estiver num cache assim, e o "servir" com mais de
+# um trabalhador não sobe.
+DIRETORIO_CACHE = Path(os.environ.get("SGHSS_DIRETORIO_CACHE", Path.home() / ".cache" / "sghss"))
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Tokens (SGHSS_CACHE_TOKEN) e marcas de "preso ao principal" (SGHSS_REPLICAS).
+    "compartilhado": {
+        "BACKEND": "core.cache_arquivo.CacheArquivo",
+        "LOCATION": DIRETORIO_CACHE / "compartilhado",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "respostas": {
+        "BACKEND": "core.cache_arquivo.CacheArquivo",
+        "LOCATION": DIRETORIO_CACHE / "respostas",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+
+# Cache de respostas (core/cache_respostas.py): a chave leva a URL, o formato
+# e o escopo de quem pede (administradores ou o próprio paciente/profissional);
+# os sinais dos modelos invalidam só as entradas afetadas. TTLs em segundos;
+# respostas maiores que TAMANHO_MAXIMO_ENTRADA bytes não são guardadas.
+SGHSS_CACHE_RESPOSTAS = {
+    "ATIVO": True,
+    "CACHE": "respostas",
+    "TTL_LISTA": 60,
+    "TTL_DETALHE": 300,
+    "TAMANHO_MAXIMO_ENTRADA": 256 * 1024,
+}
+
+# Leituras (list/retrieve) montadas direto de .values(), sem instanciar os
+# modelos nem passar pelos ModelSerializers. O JSON é o mesmo; desative aqui
+# para voltar ao caminho dos serializers.
+SGHSS_SERIALIZACAO = {
+    "CAMINHO_RAPIDO": True,
+}
+
+# Retenção dos logs de auditoria (core/arquivo_logs.py): "arquivar_logs" move
+# os logs com mais de RETENCAO_DIAS para arquivos mensais gzip em DIRETORIO,
+# TAMANHO_LOTE linhas por vez. /api/logs/ continua listando esses logs.
+SGHSS_ARQUIVO_LOGS = {
+    "RETENCAO_DIAS": 365,
+    "DIRETORIO": BASE_DIR / "arquivo_logs",
+    "TAMANHO_LOTE": 5000,
+}
+
+# Lembretes de consulta (core/lembretes.py), enviados pelo trabalhador
+# "processar_lembretes" ANTECEDENCIAS_MINUTOS antes de cada consulta agendada.
+# BackendArquivo grava as mensagens em ARQUIVO_ENVIOS (JSONL) em vez da saída padrão.
+SGHSS_LEMBRETES = {
+    "BACKEND": "core.lembretes.BackendConsole",
+    # "BACKEND": "core.lembretes.BackendArquivo",
+    # "ARQUIVO_ENVIOS": BASE_DIR / "lembretes_enviados.jsonl",
+    "ANTECEDENCIAS_MINUTOS": [24 * 60, 60],
+    "TAMANHO_LOTE": 100,
+    "INTERVALO_RECARGA": 30,
+    "RESERVA_SEGUNDOS": 120,
+    "MAX_TENTATIVAS": 5,
+}
+
+# Requisições em lote (POST /api/batch/, core/lote.py): até MAX_REQUISICOES por
+# lote e TEMPO_MAXIMO segundos no total; com "paralelo", os GETs seguidos rodam
+# em até TRABALHADORES threads.
+SGHSS_LOTE = {
+    "MAX_REQUISICOES": 20,
+    "TEMPO_MAXIMO": 10,
+    "TRABALHADORES": 4,
+}
+
+# Servidor de produção com pré-fork (core/servidor.py, comando "servir"): o
+# mestre aquece a aplicação e cria TRABALHADORES processos, reciclados depois
+# de MAX_REQUISICOES (+ até VARIACAO_MAX_REQUISICOES). SIGHUP recarrega sem
+# recusar conexões; no encerramento, espera até TEMPO_ENCERRAMENTO segundos.
+SGHSS_SERVIDOR = {
+    "ENDERECO": "127.0.0.1:8000",
+    "TRABALHADORES": 4,
+    "MAX_REQUISICOES": 1000,
+    "VARIACAO_MAX_REQUISICOES": 100,
+    "BACKLOG": 128,
+    "TEMPO_LIMITE_CONEXAO": 30,
+    "TEMPO_ENCERRAMENTO": 30,
 }
@@ -0,0 +1,28 @@
+import re
+
+from django.urls import include, path, re_path
+
+from core import views_assincronas
+from core.views import ConsultaViewSet, LogAcaoViewSet
+
+
+def _rota_detalhe(prefixo, viewset):
+    """
+    Rota de detalhe do viewset que não captura como pk as ações de lista
+    (@action(detail=False), ex.: "cancelar-em-lote"): elas seguem para sghss.urls.
+    """
+    acoes = [re.escape(acao.url_path) for acao in viewset.get_extra_actions() if not acao.detail]
+    exclusao = f"(?!(?:{'|'.join(acoes)})/$)" if acoes else ""
+    return rf"^{prefixo}/{exclusao}(?P<pk>[^/.]+)/$"
+
+
+# Usado apenas no caminho ASGI (core.middleware.urlconf_asgi_middleware).
+# As rotas abaixo têm precedência; o restante vem de sghss.urls.
+urlpatterns = [
+    path("api/auth/login/", views_assincronas.login),
+    path("api/consultas/", views_assincronas.consultas),
+    re_path(_rota_detalhe("api/consultas", ConsultaViewSet), views_assincronas.consulta),
+    path("api/logs/", views_assincronas.logs),
+    re_path(_rota_detalhe("api/logs", LogAcaoViewSet), views_assincronas.log),
+    path("", include("sghss.urls")),
+]